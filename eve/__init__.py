@@ -9,6 +9,9 @@
     :copyright: (c) 2017 by Nicola Iarocci.
     :license: BSD, see LICENSE for more details.
 
+    .. versionchanged:: 2.4
+       'QUERY_CURSOR' added.
+
     .. versionchanged:: 0.5
        'SERVER_NAME' removed.
        'QUERY_WHERE' added.
@@ -81,6 +84,7 @@ QUERY_PAGE = "page"
 QUERY_MAX_RESULTS = "max_results"
 QUERY_EMBEDDED = "embedded"
 QUERY_PROJECTION = "projection"
+QUERY_CURSOR = "cursor"
 
 VALIDATION_ERROR_STATUS = 422
 VALIDATION_ERROR_AS_LIST = False
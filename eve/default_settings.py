@@ -11,6 +11,58 @@
     :copyright: (c) 2017 by Nicola Iarocci.
     :license: BSD, see LICENSE for more details.
 
+    .. versionchanged:: 2.4
+       'KEYSET_PAGINATION' added and set to False.
+       'QUERY_CURSOR' added and set to 'cursor'.
+       'COUNT_STRATEGY' added and set to 'exact'.
+       'COUNT_LIMIT' added and set to 1000.
+       'COUNT_CACHE_TTL' added and set to 60.
+       'HEADER_TOTAL_COUNT_STRATEGY' added and set to 'X-Total-Count-Strategy'.
+       'EMBEDDING_LOOKUP' added and set to False.
+       'STREAMING_GET' added and set to False.
+       'STREAMING_GET_CHUNK_SIZE' added and set to 100.
+       'EXPORT' added and set to False.
+       'EXPORT_URL' added and set to '_export'.
+       'EXPORT_BATCH_SIZE' added and set to 1000.
+       'QUERY_EXPORT_AFTER' added and set to 'after'.
+       'JSON_BACKEND' added and set to 'simplejson'.
+       'ETAG_VERSION' added and set to 1.
+       'ETAG_HASH' added and set to 'sha1'.
+       'REUSE_VALIDATORS' added and set to True.
+       'DATA_RELATION_CACHE_TTL' added and set to 0.
+       'BULK_EDIT' added and set to False.
+       'BULK_EDIT_URL' added and set to '_bulk'.
+       'BULK_INSERT_UNORDERED' added and set to False.
+       'BULK_INSERT_CHUNK_SIZE' added and set to 1000.
+       'NDJSON_INGESTION' added and set to False.
+       'NDJSON_BATCH_SIZE' added and set to 1000.
+       'VALIDATION_WORKERS' added and set to 0.
+       'VALIDATION_WORKERS_THRESHOLD' added and set to 1000.
+       'PATCH_FIND_AND_MODIFY' added and set to False.
+       'VERSION_STORAGE' added and set to 'full'.
+       'VERSION_SNAPSHOT_INTERVAL' added and set to 10.
+       'VERSION_DELTA' added and set to '_delta'.
+       'MONGO_VERSIONS_INDEX' added and set to False.
+       'MONGO_QUERY_DATES_BY_SCHEMA' added and set to False.
+       'OPLOG_WRITER' added and set to 'sync'.
+       'OPLOG_QUEUE_SIZE' added and set to 10000.
+       'OPLOG_BATCH_SIZE' added and set to 500.
+       'OPLOG_FLUSH_INTERVAL' added and set to 1.0.
+       'OPLOG_WRITE_TIMEOUT' added and set to 10.
+       'OPLOG_CAPPED_SIZE' added and set to None.
+       'OPLOG_TTL' added and set to None.
+       'MONGO_OPLOG_INDEXES' added and set to True.
+       'OPLOG_TAIL' added and set to False.
+       'OPLOG_TAIL_URL' added and set to '_tail'.
+       'OPLOG_TAIL_TIMEOUT' added and set to 30.
+       'OPLOG_TAIL_DELAY' added and set to 2.
+       'CHANGE_FEED' added and set to False.
+       'CHANGE_FEED_URL' added and set to '_changes'.
+       'CHANGE_FEED_BUFFER' added and set to 1000.
+       'CHANGE_FEED_HEARTBEAT' added and set to 15.
+       'RATE_LIMIT_BACKEND' added and set to 'redis'.
+       'RATE_LIMIT_SYNC_INTERVAL' added and set to 1.0.
+
     .. versionchanged:: 2.0
        'MONGO_OPTIONS', 'uuidRepresentation' option added.
 
@@ -132,6 +184,18 @@ NORMALIZE_DOTTED_FIELDS = True
 # is retuned as string, while multiple errors are returned as a list).
 VALIDATION_ERROR_AS_LIST = False
 
+# validators are kept around and reused across requests (per thread).
+REUSE_VALIDATORS = True
+
+# seconds data_relation references known to exist are cached for, within a
+# request (0 disables the cache).
+DATA_RELATION_CACHE_TTL = 0
+
+# worker processes validating the documents of large bulk inserts in parallel
+# (0 disables them), and the payload size from which they are used.
+VALIDATION_WORKERS = 0
+VALIDATION_WORKERS_THRESHOLD = 1000
+
 # codes for which we want to return a standard response which includes
 # a JSON body with the status, code, and description.
 STANDARD_ERRORS = [400, 401, 403, 404, 405, 406, 409, 410, 412, 422, 428, 429]
@@ -144,6 +208,10 @@ LATEST_VERSION = "_latest_version"
 VERSION_ID_SUFFIX = "_document"
 VERSION_DIFF_INCLUDE = []  # always include these fields when diffing
 
+# in shadow documents stored as deltas, lists the fields removed since the
+# previous version
+VERSION_DELTA = "_delta"
+
 API_VERSION = ""
 URL_PREFIX = ""
 ID_FIELD = "_id"
@@ -159,13 +227,17 @@ X_MAX_AGE = 21600  # Access-Control-Max-Age when CORS is enabled
 HATEOAS = True  # HATEOAS enabled by default.
 IF_MATCH = True  # IF_MATCH (ETag match) enabled by default.
 ENFORCE_IF_MATCH = True  # ENFORCE_IF_MATCH enabled by default.
+ETAG_VERSION = 1  # 2 hashes documents encoded with orjson, 3 a binary encoding
+ETAG_HASH = "sha1"  # 'blake2b', 'xxhash' or any other hashlib algorithm
 
 ALLOWED_FILTERS = ["*"]  # filtering enabled by default
 VALIDATE_FILTERS = False
 SORTING = True  # sorting enabled by default.
 JSON_SORT_KEYS = False  # json key sorting
+JSON_BACKEND = "simplejson"  # or 'orjson' (needs the orjson package)
 RENDERERS = ["eve.render.JSONRenderer", "eve.render.XMLRenderer"]
 EMBEDDING = True  # embedding enabled by default
+EMBEDDING_LOOKUP = False  # embed with server-side $lookup stages
 PROJECTION = True  # projection enabled by default
 PAGINATION = True  # pagination enabled by default.
 PAGINATION_LIMIT = 50
@@ -173,11 +245,21 @@ PAGINATION_DEFAULT = 25
 VERSIONING = False  # turn document versioning on or off.
 VERSIONS = "_versions"  # suffix for parallel collection w/old versions
 VERSION_PARAM = "version"  # URL param for specific version of a document.
+VERSION_STORAGE = "full"  # or 'delta': only store the fields which changed
+VERSION_SNAPSHOT_INTERVAL = 10  # full copy every N versions with 'delta'
 INTERNAL_RESOURCE = False  # resources are public by default.
 JSONP_ARGUMENT = None  # JSONP disabled by default.
 SOFT_DELETE = False  # soft delete disabled by default.
 SHOW_DELETED_PARAM = "show_deleted"
 BULK_ENABLED = True
+# when enabled, bulk inserts are unordered and performed BULK_INSERT_CHUNK_SIZE
+# documents at a time; documents which fail to insert are reported one by one.
+BULK_INSERT_UNORDERED = False
+BULK_INSERT_CHUNK_SIZE = 1000
+# when enabled, POST requests with 'application/x-ndjson' payloads are read
+# and inserted NDJSON_BATCH_SIZE documents at a time.
+NDJSON_INGESTION = False
+NDJSON_BATCH_SIZE = 1000
 
 OPLOG = False  # oplog is disabled by default.
 OPLOG_NAME = "oplog"  # default oplog resource name.
@@ -195,6 +277,25 @@ OPLOG_CHANGE_METHODS = [
     "PUT",
 ]  # methods which write changes to the oplog
 OPLOG_RETURN_EXTRA_FIELD = False  # oplog does not return the 'extra' field.
+# how oplog entries are written: 'sync' (by the request), 'async' (in batches,
+# by a background thread) or 'async_fsync' (same, but the request waits for a
+# journaled write).
+OPLOG_WRITER = "sync"
+OPLOG_QUEUE_SIZE = 10000  # max requests waiting for the oplog writer.
+OPLOG_BATCH_SIZE = 500  # entries written with a single insert_many.
+OPLOG_FLUSH_INTERVAL = 1.0  # max seconds entries wait for a batch to fill up.
+OPLOG_WRITE_TIMEOUT = 10  # max seconds 'async_fsync' requests wait for the writer.
+OPLOG_CAPPED_SIZE = None  # size in bytes of the oplog, as a capped collection.
+OPLOG_TTL = None  # seconds after which oplog entries expire.
+MONGO_OPLOG_INDEXES = True  # index the oplog on 'r' and 'i', with '_updated'.
+# when enabled (and OPLOG_ENDPOINT is set), clients can wait for new oplog
+# entries at OPLOG_ENDPOINT/OPLOG_TAIL_URL, up to OPLOG_TAIL_TIMEOUT seconds.
+OPLOG_TAIL = False
+OPLOG_TAIL_URL = "_tail"
+OPLOG_TAIL_TIMEOUT = 30
+# tailed entries are returned once their ids are this many seconds old, so that
+# entries written concurrently (with lower ids) by other processes are not lost.
+OPLOG_TAIL_DELAY = 2
 
 RESOURCE_METHODS = ["GET"]
 ITEM_METHODS = ["GET"]
@@ -243,10 +344,49 @@ QUERY_PAGE = "page"
 QUERY_MAX_RESULTS = "max_results"
 QUERY_EMBEDDED = "embedded"
 QUERY_AGGREGATION = "aggregate"
+QUERY_CURSOR = "cursor"
+QUERY_EXPORT_AFTER = "after"
 
 HEADER_TOTAL_COUNT = "X-Total-Count"
 OPTIMIZE_PAGINATION_FOR_SPEED = False
 
+# when enabled, collection pages are addressed by opaque cursor tokens
+# (?cursor=) instead of page numbers (keyset pagination).
+KEYSET_PAGINATION = False
+
+# how collection totals are computed: 'exact', 'capped' (count up to
+# COUNT_LIMIT documents), 'estimated' (collection metadata, when the query has
+# no filter) or 'cached' (exact counts cached for COUNT_CACHE_TTL seconds).
+COUNT_STRATEGY = "exact"
+COUNT_LIMIT = 1000
+COUNT_CACHE_TTL = 60
+HEADER_TOTAL_COUNT_STRATEGY = "X-Total-Count-Strategy"
+
+# when enabled, collection pages are encoded and sent while the database
+# cursor is consumed, STREAMING_GET_CHUNK_SIZE documents at a time.
+STREAMING_GET = False
+STREAMING_GET_CHUNK_SIZE = 100
+
+# when enabled, '<resource>/EXPORT_URL' streams the whole (filtered) resource
+# as newline-delimited JSON, fetching EXPORT_BATCH_SIZE documents at a time.
+EXPORT = False
+EXPORT_URL = "_export"
+EXPORT_BATCH_SIZE = 1000
+
+# when enabled, '<resource>/BULK_EDIT_URL' accepts lists of PATCH, PUT and
+# DELETE operations (as allowed by ITEM_METHODS), applied with a single write.
+BULK_EDIT = False
+BULK_EDIT_URL = "_bulk"
+
+# when enabled, '<resource>/CHANGE_FEED_URL' streams the changes made to the
+# resource documents as Server-Sent Events. The local change feed keeps the
+# last CHANGE_FEED_BUFFER changes of each resource, so that clients can resume.
+# Idle connections get a comment every CHANGE_FEED_HEARTBEAT seconds.
+CHANGE_FEED = False
+CHANGE_FEED_URL = "_changes"
+CHANGE_FEED_BUFFER = 1000
+CHANGE_FEED_HEARTBEAT = 15
+
 # user-restricted resource access is disabled by default.
 AUTH_FIELD = None
 
@@ -257,23 +397,39 @@ ALLOW_UNKNOWN = False
 # http://geojson.org/geojson-spec.html#geojson-objects
 ALLOW_CUSTOM_FIELDS_IN_GEOJSON = False
 
-# Rate limits are disabled by default. Needs a running redis-server.
+# Rate limits are disabled by default. Needs a running redis-server, unless
+# requests are counted by the worker processes (RATE_LIMIT_BACKEND = 'local').
 RATE_LIMIT_GET = None
 RATE_LIMIT_POST = None
 RATE_LIMIT_PATCH = None
 RATE_LIMIT_DELETE = None
+# how requests are counted: 'redis', 'redis_script' (single round trip),
+# 'local' (by each process) or 'local_sync' (by each process, synced to redis
+# every RATE_LIMIT_SYNC_INTERVAL seconds).
+RATE_LIMIT_BACKEND = "redis"
+RATE_LIMIT_SYNC_INTERVAL = 1.0
 
 # disallow Mongo's javascript queries as they might be vulnerable to injection
 # attacks ('ReDoS' especially), are probably too complex for the average API
 # end-user and finally can  seriously impact overall performance.
 MONGO_QUERY_BLACKLIST = ["$where", "$regex"]
 MONGO_QUERY_WHITELIST = []
+# only parse query values as dates when the field is a datetime (or is not in
+# the schema), instead of trying every string value.
+MONGO_QUERY_DATES_BY_SCHEMA = False
 # Explicitly set default write_concern to 'safe' (do regular
 # aknowledged writes). This is also the current PyMongo/Mongo default setting.
 MONGO_WRITE_CONCERN = {"w": 1}
 MONGO_OPTIONS = {"connect": True, "tz_aware": True, "uuidRepresentation": "standard"}
+# index shadow collections on document id and version number (when the
+# resource is registered, which then needs the database to be reachable).
+MONGO_VERSIONS_INDEX = False
 
 # if true, the document will be normalized according to the schema during patch
 # this means fields will be reset their the default value, if any, unless
 # contained in the patch body.
 NORMALIZE_ON_PATCH = True
+
+# if true, PATCH requests carrying an If-Match header update documents with a
+# single find_one_and_update, instead of loading them first (when possible).
+PATCH_FIND_AND_MODIFY = False
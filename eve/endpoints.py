@@ -20,7 +20,8 @@ from flask import request
 
 import eve
 from eve.auth import requires_auth, resource_auth
-from eve.methods import delete, deleteitem, get, getitem, patch, post, put
+from eve.methods import (bulk_edit, changes, delete, deleteitem, export, get,
+                         getitem, patch, post, put, tail)
 from eve.methods.common import ratelimit
 from eve.render import send_response
 from eve.utils import config, date_to_rfc1123, weak_date
@@ -107,8 +108,72 @@ def item_endpoint(**lookup):
     return send_response(resource, response)
 
 
-@ratelimit()
+def export_endpoint(**lookup):
+    """Export endpoint handler
+
+    :param lookup: sub resource query
+
+    .. versionadded:: 2.4
+    """
+    resource = _resource()
+    response = None
+    if request.method in ("GET", "HEAD"):
+        response = export(resource, **lookup)
+    elif request.method != "OPTIONS":
+        abort(405)
+    return send_response(resource, response)
+
+
+def changes_endpoint(**lookup):
+    """Change feed endpoint handler
+
+    :param lookup: sub resource query
+
+    .. versionadded:: 2.4
+    """
+    resource = _resource()
+    response = None
+    if request.method in ("GET", "HEAD"):
+        response = changes(resource, **lookup)
+    elif request.method != "OPTIONS":
+        abort(405)
+    return send_response(resource, response)
+
+
+def tail_endpoint(**lookup):
+    """Oplog tail endpoint handler
+
+    :param lookup: sub resource query
+
+    .. versionadded:: 2.4
+    """
+    resource = _resource()
+    response = None
+    if request.method in ("GET", "HEAD"):
+        response = tail(resource, **lookup)
+    elif request.method != "OPTIONS":
+        abort(405)
+    return send_response(resource, response)
+
+
+def bulk_endpoint(**lookup):
+    """Bulk edit endpoint handler
+
+    :param lookup: sub resource query
+
+    .. versionadded:: 2.4
+    """
+    resource = _resource()
+    response = None
+    if request.method in ("PATCH", "PUT", "DELETE"):
+        response = bulk_edit(resource, **lookup)
+    elif request.method != "OPTIONS":
+        abort(405)
+    return send_response(resource, response)
+
+
 @requires_auth("home")
+@ratelimit("home")
 def home_endpoint():
     """Home/API entry point. Will provide links to each available resource
 
@@ -16,6 +16,7 @@ import sys
 import warnings
 from typing import TYPE_CHECKING
 
+from cerberus import rules_set_registry, schema_registry
 from events import Events
 from flask import Flask
 from werkzeug.routing import BaseConverter
@@ -23,14 +24,21 @@ from werkzeug.serving import WSGIRequestHandler
 
 import eve
 from eve import default_settings
-from eve.endpoints import (collections_endpoint, error_endpoint, home_endpoint,
-                           item_endpoint, media_endpoint,
-                           schema_collection_endpoint, schema_item_endpoint)
+from eve.endpoints import (bulk_endpoint, changes_endpoint,
+                           collections_endpoint, error_endpoint,
+                           export_endpoint, home_endpoint, item_endpoint,
+                           media_endpoint, schema_collection_endpoint,
+                           schema_item_endpoint, tail_endpoint)
 from eve.exceptions import ConfigException, SchemaException
+from eve.io.changes import LocalChangeFeed
 from eve.io.mongo import (GridFSMediaStorage, Mongo, Validator,
                           ensure_mongo_indexes)
 from eve.logging import RequestFilter
-from eve.utils import api_prefix, extract_key_values
+from eve.methods.common import field_definition
+from eve.oplog import OplogWriter
+from eve.ratelimit import RateLimiter
+from eve.utils import api_prefix, etag_hash, extract_key_values, orjson
+from eve.validation import ValidationWorkers, ValidatorPool
 
 
 class EveWSGIRequestHandler(WSGIRequestHandler):
@@ -80,8 +88,20 @@ class Eve(Flask, Events):
                          as eve.io.base.BaseJSONEncoder subclass.
     :param media: the media storage class. Must be a
                   :class:`~eve.io.media.MediaStorage` subclass.
+    :param change_feed: the change feed class. Must be a
+                        :class:`~eve.io.changes.ChangeFeed` subclass. Defaults
+                        to :class:`~eve.io.changes.LocalChangeFeed`.
     :param kwargs: optional, standard, Flask parameters.
 
+    .. versionchanged:: 2.4
+       Cache compiled serialization plans in 'serialization_plans'.
+       Key schema caches on 'schema_version'.
+       Reuse validators through 'validator_pool'.
+       Validate large bulk inserts through 'validation_workers'.
+       Write oplog entries through 'oplog_writer'.
+       'change_feed' argument added.
+       Count rate limited requests through 'rate_limiter'.
+
     .. versionchanged:: 0.6.1
        Fix: When `SOFT_DELETE` is active an exclusive `datasource.projection`
        causes a 500 error. Closes #752.
@@ -127,6 +147,24 @@ class Eve(Flask, Events):
     #: Allowed methods for item endpoints
     supported_item_methods = ["GET", "PATCH", "DELETE", "PUT"]
 
+    #: Allowed strategies for collection counts
+    supported_count_strategies = ["exact", "capped", "estimated", "cached"]
+
+    #: Allowed storage modes for document versions
+    supported_version_storages = ["full", "delta"]
+
+    #: Allowed JSON encoding backends
+    supported_json_backends = ["simplejson", "orjson"]
+
+    #: Allowed ETag algorithm versions
+    supported_etag_versions = [1, 2, 3]
+
+    #: Allowed oplog writer modes
+    supported_oplog_writers = ["sync", "async", "async_fsync"]
+
+    #: Allowed rate limit backends
+    supported_rate_limit_backends = ["redis", "redis_script", "local", "local_sync"]
+
     def __init__(
         self,
         import_name=__package__,
@@ -138,6 +176,7 @@ class Eve(Flask, Events):
         url_converters=None,
         json_encoder=None,
         media=GridFSMediaStorage,
+        change_feed=LocalChangeFeed,
         **kwargs
     ):
         """Eve main WSGI app is implemented as a Flask subclass. Since we want
@@ -151,6 +190,10 @@ class Eve(Flask, Events):
         self.logger.addFilter(RequestFilter())
 
         self.validator = validator
+        self.validator_pool = ValidatorPool(self)
+        self.validation_workers = ValidationWorkers(self)
+        self.oplog_writer = OplogWriter(self)
+        self.rate_limiter = RateLimiter(self)
         self.settings = settings
 
         self.load_config()
@@ -168,8 +211,15 @@ class Eve(Flask, Events):
             self.data.json_encoder_class = json_encoder
 
         self.media = media(self) if media else None
+        self.change_feed = change_feed(self) if change_feed else None
         self.redis = redis
 
+        # compiled serialization plans, by resource. See
+        # eve.methods.common.serialization_plan.
+        self.serialization_plans = {}
+        # bumped whenever the domain schemas might have changed.
+        self._schema_version = 0
+
         if auth:
             self.auth = auth() if callable(auth) else auth
         else:
@@ -201,6 +251,9 @@ class Eve(Flask, Events):
 
         self.register_error_handlers()
 
+        # last, as the validation workers are forked.
+        self.validation_workers.start()
+
     def run(self, host=None, port=None, debug=None, **options):
         """
         Pass our own subclass of :class:`werkzeug.serving.WSGIRequestHandler
@@ -331,6 +384,11 @@ class Eve(Flask, Events):
         """Makes sure that REST methods expressed in the configuration
         settings are supported.
 
+        .. versionchanged:: 2.4
+           Validate JSON_BACKEND, ETAG_VERSION and ETAG_HASH.
+           Validate OPLOG_WRITER, OPLOG_CAPPED_SIZE and OPLOG_TTL.
+           Validate RATE_LIMIT_BACKEND and the RATE_LIMIT_<METHOD> limits.
+
         .. versionchanged:: 0.2.0
            Default supported methods are now class-level attributes.
            Resource validation delegated to _validate_resource_settings().
@@ -360,12 +418,114 @@ class Eve(Flask, Events):
         for resource, settings in self.config["DOMAIN"].items():
             self._validate_resource_settings(resource, settings)
 
+        self._validate_encoding_settings()
+        self._validate_oplog_settings()
+        self._validate_rate_limit_settings()
+
+    def _validate_oplog_settings(self):
+        """Makes sure that OPLOG_WRITER is supported, and that the oplog is
+        not both capped and expiring, which MongoDB does not allow.
+
+        .. versionadded:: 2.4
+        """
+        writer = self.config["OPLOG_WRITER"]
+        if writer not in self.supported_oplog_writers:
+            raise ConfigException(
+                'Unknown OPLOG_WRITER "%s". Supported: %s'
+                % (writer, ", ".join(self.supported_oplog_writers))
+            )
+
+        if self.config["OPLOG_CAPPED_SIZE"] and self.config["OPLOG_TTL"]:
+            raise ConfigException(
+                "OPLOG_CAPPED_SIZE and OPLOG_TTL can't be both set: capped "
+                "collections don't support TTL indexes."
+            )
+
+    def _validate_rate_limit_settings(self):
+        """Makes sure that RATE_LIMIT_BACKEND is supported, and that the
+        RATE_LIMIT_<METHOD> limits are well formed.
+
+        .. versionadded:: 2.4
+        """
+        backend = self.config["RATE_LIMIT_BACKEND"]
+        if backend not in self.supported_rate_limit_backends:
+            raise ConfigException(
+                'Unknown RATE_LIMIT_BACKEND "%s". Supported: %s'
+                % (backend, ", ".join(self.supported_rate_limit_backends))
+            )
+        for method in self.supported_item_methods + ["POST"]:
+            setting = "RATE_LIMIT_" + method
+            self.validate_rate_limit(self.config.get(setting), setting)
+
+    def validate_rate_limit(self, limit, setting):
+        """Makes sure that a rate limit is either None or a (limit, period)
+        pair of positive numbers.
+
+        :param limit: the rate limit.
+        :param setting: name of the setting. Used when raising the exception.
+
+        .. versionadded:: 2.4
+        """
+        if limit is None:
+            return
+        if (
+            not isinstance(limit, (list, tuple))
+            or len(limit) != 2
+            or not all(
+                isinstance(v, (int, float)) and not isinstance(v, bool) and v > 0
+                for v in limit
+            )
+        ):
+            raise ConfigException(
+                "%s must be None or a (limit, period) pair of positive "
+                "numbers, got %r" % (setting, limit)
+            )
+
+    def _validate_encoding_settings(self):
+        """Makes sure that JSON_BACKEND, ETAG_VERSION and ETAG_HASH are
+        supported, and that orjson is available if any of them requires it.
+
+        .. versionadded:: 2.4
+        """
+        backend = self.config["JSON_BACKEND"]
+        if backend not in self.supported_json_backends:
+            raise ConfigException(
+                'Unknown JSON_BACKEND "%s". Supported: %s'
+                % (backend, ", ".join(self.supported_json_backends))
+            )
+
+        version = self.config["ETAG_VERSION"]
+        if version not in self.supported_etag_versions:
+            raise ConfigException(
+                'Unknown ETAG_VERSION "%s". Supported: %s'
+                % (version, ", ".join(map(str, self.supported_etag_versions)))
+            )
+
+        if (backend == "orjson" or version == 2) and orjson is None:
+            raise ConfigException(
+                "JSON_BACKEND 'orjson' and ETAG_VERSION 2 need the orjson "
+                "package to be installed."
+            )
+
+        try:
+            etag_hash(self.config["ETAG_HASH"])()
+        except (ImportError, ValueError):
+            raise ConfigException(
+                'Unknown ETAG_HASH "%s", or its package is not installed.'
+                % self.config["ETAG_HASH"]
+            )
+
     def _validate_resource_settings(self, resource, settings):
         """Validates one resource in configuration settings.
 
         :param resource: name of the resource which settings refer to.
         :param settings: settings of resource to be validated.
 
+        .. versionchanged:: 2.4
+           validate 'count_strategy'.
+           validate 'version_storage' and 'version_snapshot_interval'.
+           validate 'rate_limit' and 'item_rate_limit'.
+
         .. versionchanged:: 0.4
            validate that auth_field is not set to ID_FIELD. See #266.
 
@@ -408,6 +568,57 @@ class Eve(Flask, Events):
                 "(%s)" % (resource, settings["id_field"])
             )
 
+        if settings["count_strategy"] not in self.supported_count_strategies:
+            raise ConfigException(
+                '"%s": unknown count_strategy "%s". Supported: %s'
+                % (
+                    resource,
+                    settings["count_strategy"],
+                    ", ".join(self.supported_count_strategies),
+                )
+            )
+
+        # collection metadata can't tell how many documents match a filter.
+        # Only explicit settings get here, see _set_resource_defaults().
+        if settings["count_strategy"] == "estimated" and (
+            settings["soft_delete"] or settings["datasource"]["filter"]
+        ):
+            raise ConfigException(
+                '"%s": count_strategy "estimated" can\'t be used along with '
+                "soft_delete or a datasource filter" % resource
+            )
+
+        if settings["version_storage"] not in self.supported_version_storages:
+            raise ConfigException(
+                '"%s": unknown version_storage "%s". Supported: %s'
+                % (
+                    resource,
+                    settings["version_storage"],
+                    ", ".join(self.supported_version_storages),
+                )
+            )
+
+        if settings["version_snapshot_interval"] < 1:
+            raise ConfigException(
+                '"%s": version_snapshot_interval must be greater than 0' % resource
+            )
+
+        self.validate_methods(
+            self.supported_resource_methods,
+            settings["rate_limit"] or {},
+            "[%s] rate_limit " % resource,
+        )
+        self.validate_methods(
+            self.supported_item_methods,
+            settings["item_rate_limit"] or {},
+            "[%s] item_rate_limit " % resource,
+        )
+        for setting in ("rate_limit", "item_rate_limit"):
+            for method, limit in (settings[setting] or {}).items():
+                self.validate_rate_limit(
+                    limit, '"%s": %s %s' % (resource, setting, method)
+                )
+
         self.validate_schema(resource, settings["schema"])
 
     def validate_roles(self, directive, candidate, resource):
@@ -448,6 +659,9 @@ class Eve(Flask, Events):
         :param resource: resource name.
         :param schema: schema definition for the resource.
 
+        .. versionchanged:: 2.4
+           Checks against VERSION_DELTA when versions are stored as deltas.
+
         .. versionchanged:: 0.6.2
            Do not allow '$' and '.' in root and dict field names. #780.
 
@@ -496,6 +710,8 @@ class Eve(Flask, Events):
                 self.config["LATEST_VERSION"],
                 resource_settings["id_field"] + self.config["VERSION_ID_SUFFIX"],
             ]
+            if resource_settings["version_storage"] == "delta":
+                fields += [self.config["VERSION_DELTA"]]
         if resource_settings["soft_delete"] is True:
             fields += [self.config["DELETED"]]
 
@@ -603,6 +819,21 @@ class Eve(Flask, Events):
     def _set_resource_defaults(self, resource, settings):
         """Low-level method which sets default values for one resource.
 
+        .. versionchanged:: 2.4
+           Added 'keyset_pagination'.
+           Added 'count_strategy', 'count_limit' and 'count_cache_ttl'.
+           Added 'embedding_lookup'.
+           Added 'streaming_get'.
+           Added 'export'.
+           Added 'bulk_edit'.
+           Added 'bulk_insert_unordered' and 'bulk_insert_chunk_size'.
+           Added 'ndjson_ingestion'.
+           Added 'patch_find_and_modify'.
+           Added 'version_storage' and 'version_snapshot_interval'.
+           Added 'change_feed'.
+           Added 'rate_limit' and 'item_rate_limit'.
+           Added 'mongo_query_dates_by_schema'.
+
         .. versionchanged:: 1.1.0
            Added 'mongo_query_whitelist'.
 
@@ -658,11 +889,23 @@ class Eve(Flask, Events):
         settings.setdefault("sorting", self.config["SORTING"])
         settings.setdefault("embedding", self.config["EMBEDDING"])
         settings.setdefault("embedded_fields", [])
+        settings.setdefault("embedding_lookup", self.config["EMBEDDING_LOOKUP"])
         settings.setdefault("pagination", self.config["PAGINATION"])
         settings.setdefault("projection", self.config["PROJECTION"])
         settings.setdefault("versioning", self.config["VERSIONING"])
+        settings.setdefault("version_storage", self.config["VERSION_STORAGE"])
+        settings.setdefault(
+            "version_snapshot_interval", self.config["VERSION_SNAPSHOT_INTERVAL"]
+        )
         settings.setdefault("soft_delete", self.config["SOFT_DELETE"])
         settings.setdefault("bulk_enabled", self.config["BULK_ENABLED"])
+        settings.setdefault(
+            "bulk_insert_unordered", self.config["BULK_INSERT_UNORDERED"]
+        )
+        settings.setdefault(
+            "bulk_insert_chunk_size", self.config["BULK_INSERT_CHUNK_SIZE"]
+        )
+        settings.setdefault("ndjson_ingestion", self.config["NDJSON_INGESTION"])
         settings.setdefault("internal_resource", self.config["INTERNAL_RESOURCE"])
         settings.setdefault("etag_ignore_fields", None)
         # TODO make sure that this we really need the test below
@@ -679,6 +922,9 @@ class Eve(Flask, Events):
         settings.setdefault(
             "mongo_query_whitelist", self.config["MONGO_QUERY_WHITELIST"]
         )
+        settings.setdefault(
+            "mongo_query_dates_by_schema", self.config["MONGO_QUERY_DATES_BY_SCHEMA"]
+        )
         settings.setdefault("mongo_write_concern", self.config["MONGO_WRITE_CONCERN"])
         settings.setdefault("mongo_indexes", {})
         settings.setdefault("hateoas", self.config["HATEOAS"])
@@ -690,13 +936,35 @@ class Eve(Flask, Events):
             "normalize_dotted_fields", self.config["NORMALIZE_DOTTED_FIELDS"]
         )
         settings.setdefault("normalize_on_patch", self.config["NORMALIZE_ON_PATCH"])
+        settings.setdefault(
+            "patch_find_and_modify", self.config["PATCH_FIND_AND_MODIFY"]
+        )
         settings.setdefault("optimize_pagination_for_speed", self.config["OPTIMIZE_PAGINATION_FOR_SPEED"])
+        settings.setdefault("keyset_pagination", self.config["KEYSET_PAGINATION"])
+        settings.setdefault("count_limit", self.config["COUNT_LIMIT"])
+        settings.setdefault("count_cache_ttl", self.config["COUNT_CACHE_TTL"])
+        settings.setdefault("streaming_get", self.config["STREAMING_GET"])
+        settings.setdefault("export", self.config["EXPORT"])
+        settings.setdefault("bulk_edit", self.config["BULK_EDIT"])
+        settings.setdefault("change_feed", self.config["CHANGE_FEED"])
+        settings.setdefault("rate_limit", None)
+        settings.setdefault("item_rate_limit", None)
         # empty schemas are allowed for read-only access to resources
         schema = settings.setdefault("schema", {})
         self.set_schema_defaults(schema, settings["id_field"])
 
         self._set_resource_datasource(resource, schema, settings)
 
+        # collection metadata can't tell how many documents match a filter:
+        # the global 'estimated' strategy falls back to exact counts there.
+        if "count_strategy" not in settings:
+            strategy = self.config["COUNT_STRATEGY"]
+            if strategy == "estimated" and (
+                settings["soft_delete"] or settings["datasource"]["filter"]
+            ):
+                strategy = "exact"
+            settings["count_strategy"] = strategy
+
     def _set_resource_datasource(self, resource, schema, settings):
         """Set the default values for the resource 'datasource' setting.
 
@@ -826,6 +1094,32 @@ class Eve(Flask, Events):
         for data_relation in list(extract_key_values("data_relation", schema)):
             data_relation.setdefault("field", id_field)
 
+    @property
+    def schema_version(self):
+        """Identifies the current state of the domain schemas, so that what is
+        compiled from them (serialization plans, validators, query
+        normalizers) can be cached. It changes when resources are registered,
+        when the Cerberus schema and rules set registries are updated and when
+        :meth:`invalidate_schema_caches` is called.
+
+        .. versionadded:: 2.4
+        """
+        return (
+            self._schema_version,
+            tuple(map(id, schema_registry.all().values())),
+            tuple(map(id, rules_set_registry.all().values())),
+        )
+
+    def invalidate_schema_caches(self):
+        """Drops whatever has been compiled from the domain schemas. Must be
+        called after a schema has been changed in place, as such changes
+        can't be detected (registering the resource again works too).
+
+        .. versionadded:: 2.4
+        """
+        self._schema_version += 1
+        field_definition.cache_clear()
+
     @property
     def api_prefix(self):
         """Prefix to API endpoints.
@@ -838,6 +1132,12 @@ class Eve(Flask, Events):
         """Builds the API url map for one resource. Methods are enabled for
         each mapped endpoint, as configured in the settings.
 
+        .. versionchanged:: 2.4
+           Support for the export endpoint.
+           Support for the bulk edit endpoint.
+           Support for the oplog tail endpoint.
+           Support for the change feed endpoint.
+
         .. versionchanged:: 0.5
            Don't add resource to url rules if it's flagged as internal.
            Strip regexes out of config.URLS helper. Closes #466.
@@ -868,6 +1168,55 @@ class Eve(Flask, Events):
             methods=settings["resource_methods"] + ["OPTIONS"],
         )
 
+        # export endpoint
+        if settings["export"]:
+            endpoint = resource + "|export"
+            self.add_url_rule(
+                "%s/%s" % (url, self.config["EXPORT_URL"]),
+                endpoint,
+                view_func=export_endpoint,
+                methods=["GET", "OPTIONS"],
+            )
+
+        # change feed endpoint
+        if settings["change_feed"] and self.change_feed is not None:
+            endpoint = resource + "|changes"
+            self.add_url_rule(
+                "%s/%s" % (url, self.config["CHANGE_FEED_URL"]),
+                endpoint,
+                view_func=changes_endpoint,
+                methods=["GET", "OPTIONS"],
+            )
+
+        # oplog tail endpoint
+        if (
+            self.config["OPLOG"]
+            and self.config["OPLOG_TAIL"]
+            and resource == self.config["OPLOG_NAME"]
+        ):
+            endpoint = resource + "|tail"
+            self.add_url_rule(
+                "%s/%s" % (url, self.config["OPLOG_TAIL_URL"]),
+                endpoint,
+                view_func=tail_endpoint,
+                methods=["GET", "OPTIONS"],
+            )
+
+        # bulk edit endpoint
+        bulk_methods = [
+            method
+            for method in ("PATCH", "PUT", "DELETE")
+            if method in settings["item_methods"]
+        ]
+        if settings["bulk_edit"] and bulk_methods:
+            endpoint = resource + "|bulk"
+            self.add_url_rule(
+                "%s/%s" % (url, self.config["BULK_EDIT_URL"]),
+                endpoint,
+                view_func=bulk_endpoint,
+                methods=bulk_methods + ["OPTIONS"],
+            )
+
         # item endpoint
         if settings["item_lookup"]:
             item_url = "%s/<%s:%s>" % (
@@ -966,6 +1315,12 @@ class Eve(Flask, Events):
         :param resource: resource name.
         :param settings: settings for given resource.
 
+        .. versionchanged:: 2.4
+           Compile the resource query normalizer.
+           Project 'VERSION_DELTA' on shadow collections.
+           Compile the resource rate limits.
+           Invalidate the schema caches.
+
         .. versionchanged:: 0.6
            Support for 'mongo_indexes'.
 
@@ -994,6 +1349,14 @@ class Eve(Flask, Events):
             self.config["DOMAIN"][versioned_resource]["datasource"][
                 "source"
             ] += self.config["VERSIONS"]
+            projection = self.config["DOMAIN"][versioned_resource]["datasource"][
+                "projection"
+            ]
+            if projection:
+                # shadow documents stored as deltas must be told apart.
+                projection[self.config["VERSION_DELTA"]] = 1
+            # version listings are paginated by page number.
+            self.config["DOMAIN"][versioned_resource]["keyset_pagination"] = False
             self.config["SOURCES"][versioned_resource] = copy.deepcopy(
                 self.config["SOURCES"][resource]
             )
@@ -1008,6 +1371,17 @@ class Eve(Flask, Events):
         # create the mongo db indexes
         ensure_mongo_indexes(self, resource)
 
+        self.rate_limiter.compile_policies(resource)
+
+        # the schema might have changed.
+        self.invalidate_schema_caches()
+
+        # compile the query normalizers
+        if isinstance(self.data, Mongo):
+            self.data.compile_query_normalizer(resource)
+            if settings["versioning"] is True:
+                self.data.compile_query_normalizer(versioned_resource)
+
         # flask-pymongo compatibility.
         if "MONGO_OPTIONS" in self.config["DOMAIN"]:
             connect = self.config["DOMAIN"]["MONGO_OPTIONS"].get("connect", True)
@@ -1030,11 +1404,18 @@ class Eve(Flask, Events):
     def _init_oplog(self):
         """If enabled, configures the OPLOG endpoint.
 
+        .. versionchanged:: 2.4
+           Journaled write concern with the 'async_fsync' OPLOG_WRITER.
+           Index the oplog by resource and document, and optionally expire
+           its entries after OPLOG_TTL seconds.
+
         .. versionchanged:: 0.7
            Add 'u' field to oplog audit schema. See #846.
 
         .. versionadded:: 0.5
         """
+        self._validate_oplog_settings()
+
         name, endpoint, audit, extra = (
             self.config["OPLOG_NAME"],
             self.config["OPLOG_ENDPOINT"],
@@ -1046,6 +1427,24 @@ class Eve(Flask, Events):
 
         settings.setdefault("datasource", {"source": name})
 
+        if self.config["OPLOG_WRITER"] == "async_fsync":
+            settings.setdefault(
+                "mongo_write_concern", dict(self.config["MONGO_WRITE_CONCERN"], j=True)
+            )
+
+        if isinstance(self.data, Mongo):
+            # sync clients query the oplog by resource or document, and date.
+            indexes = settings.setdefault("mongo_indexes", {})
+            updated = (self.config["LAST_UPDATED"], 1)
+            if self.config["MONGO_OPLOG_INDEXES"]:
+                indexes.setdefault("oplog_resource", [("r", 1), updated])
+                indexes.setdefault("oplog_document", [("i", 1), updated])
+            if self.config["OPLOG_TTL"]:
+                indexes.setdefault(
+                    "oplog_ttl",
+                    ([updated], {"expireAfterSeconds": self.config["OPLOG_TTL"]}),
+                )
+
         # this endpoint is always read-only
         settings["resource_methods"] = ["GET"]
         settings["item_methods"] = ["GET"]
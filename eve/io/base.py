@@ -14,6 +14,7 @@ from copy import copy
 
 import simplejson as json
 from flask import abort, request
+from werkzeug.exceptions import HTTPException
 
 from eve.auth import auth_field_and_value
 from eve.utils import auto_fields, config, date_to_str, debug_error_message
@@ -22,8 +23,16 @@ from eve.utils import auto_fields, config, date_to_str, debug_error_message
 class BaseJSONEncoder(json.JSONEncoder):
     """Proprietary JSONEconder subclass used by the json render function.
     This is needed to address the encoding of special values.
+
+    .. versionchanged:: 2.4
+       Added 'orjson_fast_types'.
     """
 
+    #: Types which the orjson backend can encode on its own, just like
+    #: :meth:`default` does. Only looked up on the class itself, so that
+    #: subclasses with a different :meth:`default` don't inherit it.
+    orjson_fast_types = (datetime.datetime,)
+
     def default(self, obj):
         if isinstance(obj, datetime.datetime):
             # convert any datetime to RFC 1123 format
@@ -143,6 +152,73 @@ class DataLayer():
         """
         raise NotImplementedError
 
+    def keyset_sort(self, resource, req):
+        """Returns the sort applied to a keyset paginated request, as a list
+        of ``(field, direction)`` tuples. The list must end with a unique
+        tie-breaker (usually the id field) so that the sort is total. Only
+        implement this if the data layer supports keyset pagination.
+
+        :param resource: resource being accessed.
+        :param req: an instance of ``eve.utils.ParsedRequest``.
+
+        .. versionadded:: 2.4
+        """
+        raise NotImplementedError
+
+    def export(self, resource, req, sub_resource_lookup, after=None):
+        """Returns an iterable over all the documents matching the request,
+        sorted by id field, to be streamed to the client by the export
+        endpoint. Unlike :meth:`find`, pagination is ignored and no count is
+        performed. Only implement this if the data layer supports exports.
+
+        :param resource: resource being accessed.
+        :param req: an instance of ``eve.utils.ParsedRequest``.
+        :param sub_resource_lookup: sub-resource lookup from the endpoint url.
+        :param after: only return documents whose id is greater than this
+                      one, so that interrupted exports can be resumed.
+
+        .. versionadded:: 2.4
+        """
+        raise NotImplementedError
+
+    def tail(self, resource, req, sub_resource_lookup, after=None, timeout=0, delay=0):
+        """Returns a ``(documents, after)`` tuple, with the documents added to
+        the resource after the one with id `after`, sorted by id field, and
+        the id clients should pass as `after` to get the next ones. When no
+        such document exists yet, waits up to `timeout` seconds for one to be
+        added. Documents whose id was generated less than `delay` seconds ago
+        are held back, since documents with lower ids might still be added by
+        other writers. Only implement this if the data layer supports tailing.
+
+        :param resource: resource being accessed.
+        :param req: an instance of ``eve.utils.ParsedRequest``.
+        :param sub_resource_lookup: sub-resource lookup from the endpoint url.
+        :param after: only return documents whose id is greater than this
+                      one. If None, only documents added from now on are
+                      returned.
+        :param timeout: max seconds to wait for new documents.
+        :param delay: min age, in seconds, of the returned documents ids.
+
+        .. versionadded:: 2.4
+        """
+        raise NotImplementedError
+
+    def lookup_embeddable(self, resource, field):
+        """Returns True if the data layer can embed `field` server-side, along
+        with the documents returned by :meth:`find`. Fields which can be
+        embedded are listed with the ``embedded_lookup`` attribute of the
+        ``eve.utils.ParsedRequest`` instance passed to :meth:`find`, which
+        can clear the list if embedding turns out to be impossible: the fields
+        are then embedded by the caller. Only implement this if the data layer
+        supports server-side embedding.
+
+        :param resource: resource being accessed.
+        :param field: the embedded field.
+
+        .. versionadded:: 2.4
+        """
+        raise NotImplementedError
+
     def aggregate(self, resource, pipeline, options):
         """Perform an aggregation on the resource datasource and returns
         the result. Only implent this if the underlying db engine supports
@@ -228,6 +304,24 @@ class DataLayer():
         """
         raise NotImplementedError
 
+    def existing_values(self, resource, field, values):
+        """Returns which of `values` are stored in the `field` of (at least)
+        one document of `resource`. Used to validate data relations.
+
+        The default implementation performs one :meth:`find_one` per value;
+        data layers are encouraged to override it with a single query.
+
+        :param resource: resource name.
+        :param field: the field to look the values up in.
+        :param values: a list of (hashable) values.
+        :return: the set of the values which were found.
+
+        .. versionadded:: 2.4
+        """
+        return set(
+            value for value in values if self.find_one(resource, None, **{field: value})
+        )
+
     def insert(self, resource, doc_or_docs):
         """Inserts a document into a resource collection/table.
 
@@ -243,6 +337,31 @@ class DataLayer():
         """
         raise NotImplementedError
 
+    def insert_unordered(self, resource, documents, chunk_size=None):
+        """Inserts documents into a resource collection/table, independently
+        of each other: a failed insert does not prevent the others.
+
+        The default implementation inserts the documents one at a time; data
+        layers are encouraged to override it with batch writes.
+
+        :param resource: resource being accessed.
+        :param documents: list of json documents to be added to the database.
+        :param chunk_size: maximum number of documents written at a time.
+        :return: a list with, for each document, an ``(id, status)`` tuple.
+                 `status` is None if the document was inserted (with `id`),
+                 or the HTTP status code telling why it was not (409 for
+                 duplicate keys).
+
+        .. versionadded:: 2.4
+        """
+        outcomes = []
+        for document in documents:
+            try:
+                outcomes.append((self.insert(resource, [document])[0], None))
+            except HTTPException as e:
+                outcomes.append((None, e.code))
+        return outcomes
+
     def update(self, resource, id_, updates, original):
         """Updates a collection/table document/row.
         :param resource: resource being accessed. You should then use
@@ -258,6 +377,35 @@ class DataLayer():
         """
         raise NotImplementedError
 
+    def find_one_and_update(self, resource, id_, updates, etag):
+        """Updates a document, provided its stored etag is `etag`, and
+        returns it as updated. Returns None if there is no such document (or
+        it can't be updated in place), in which case the caller is expected
+        to go through the regular, slower path: load the document, then
+        :meth:`update` it.
+
+        The default implementation loads the document, updates it, then loads
+        it again; data layers are encouraged to override it with a single
+        round trip.
+
+        :param resource: resource being accessed.
+        :param id_: the unique id of the document.
+        :param updates: the fields to be set (nested fields can be addressed
+                        with dot notation).
+        :param etag: the etag the stored document is expected to have.
+
+        .. versionadded:: 2.4
+        """
+        id_field = config.DOMAIN[resource]["id_field"]
+        original = self.find_one(resource, None, **{id_field: id_})
+        if not original or original.get(config.ETAG) != etag:
+            return None
+        try:
+            self.update(resource, id_, updates, original)
+        except self.OriginalChangedError:
+            return None
+        return self.find_one(resource, None, **{id_field: id_})
+
     def replace(self, resource, id_, document, original):
         """Replaces a collection/table document/row.
         :param resource: resource being accessed. You should then use
@@ -273,6 +421,43 @@ class DataLayer():
         """
         raise NotImplementedError
 
+    def bulk_change(self, resource, changes):
+        """Applies a batch of changes to the documents of a resource. Each
+        change is a ``(operation, id_, document, original)`` tuple, where
+        `operation` is either ``'update'`` (`document` holds the fields to be
+        set), ``'replace'`` or ``'remove'`` (`document` is ignored). Changes
+        are applied independently of each other, and only if the stored
+        document still matches the etag of `original`.
+
+        The default implementation applies the changes one at a time; data
+        layers are encouraged to override it with a single batch write.
+
+        :param resource: resource being accessed.
+        :param changes: the list of changes to apply.
+        :return: a list with, for each change, None if it was applied, or the
+                 HTTP status code telling why it was not (412 if the document
+                 was changed in the meantime).
+
+        .. versionadded:: 2.4
+        """
+        id_field = config.DOMAIN[resource]["id_field"]
+        results = []
+        for operation, id_, document, original in changes:
+            try:
+                if operation == "update":
+                    self.update(resource, id_, document, original)
+                elif operation == "replace":
+                    self.replace(resource, id_, document, original)
+                else:
+                    self.remove(resource, {id_field: id_})
+            except self.OriginalChangedError:
+                results.append(412)
+            except HTTPException as e:
+                results.append(e.code)
+            else:
+                results.append(None)
+        return results
+
     def remove(self, resource, lookup):
         """Removes a document/row or an entire set of documents/rows from a
         database collection/table.
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.io.changes
+    ~~~~~~~~~~~~~~
+
+    Change feeds for Eve-powered APIs.
+
+    :copyright: (c) 2017 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import collections
+import copy
+import threading
+import time
+
+#: A change made to a document: the event id, the operation performed
+#: ('insert', 'update', 'replace' or 'delete') and the document.
+Change = collections.namedtuple("Change", "id op document")
+
+
+class ChangeFeed:
+    """The ChangeFeed class provides a standardized API for publishing the
+    changes made to the documents of a resource, and for subscribing to them,
+    as the change feed endpoint does (see ``CHANGE_FEED``).
+
+    .. versionadded:: 2.4
+    """
+
+    def __init__(self, app=None):
+        """
+        :param app: the flask application (eve itself). This can be used by
+        the class to access, amongst other things, the app.config object to
+        retrieve class-specific settings.
+        """
+        self.app = app
+
+    def publish(self, resource, op, documents):
+        """Invoked by write requests once `documents` have been stored
+        ('insert', 'update', 'replace') or deleted ('delete'). Documents are
+        passed as stored; deleted documents as they were before deletion.
+        Change feeds which watch the database themselves can ignore it.
+
+        :param resource: the resource name.
+        :param op: the operation performed.
+        :param documents: the list of documents involved.
+        """
+        pass
+
+    def subscribe(self, resource, last_event_id=None, match=None):
+        """Returns an iterator over the changes made to `resource` from now
+        on, as :class:`Change` tuples. None is yielded when no change has been
+        made for ``CHANGE_FEED_HEARTBEAT`` seconds, so that idle connections
+        can be kept alive. The iterator is closed when the client goes away.
+
+        If `last_event_id` is given, changes are resumed after the change with
+        that id. If the changes made since can't be told, a 'reset' change
+        (with no document) is yielded first, and clients should reload the
+        resource.
+
+        :param resource: the resource name.
+        :param last_event_id: the id of the last change the client received.
+        :param match: a callable which is passed each changed document, and
+                      returns whether the client can see it.
+        """
+        raise NotImplementedError
+
+
+class LocalChangeFeed(ChangeFeed):
+    """In-process change feed. Changes published by write requests are kept
+    in a buffer of the last ``CHANGE_FEED_BUFFER`` changes of each resource,
+    where subscribers wait for them. Only the changes made by the current
+    process are seen: APIs running on several processes should use a feed
+    watching the database, like :class:`~eve.io.mongo.MongoChangeFeed`.
+
+    Changes of documents which are not visible through the resource datasource
+    filter are not published.
+
+    .. versionadded:: 2.4
+    """
+
+    def __init__(self, app=None):
+        super().__init__(app)
+        self._condition = threading.Condition()
+        self._changes = {}
+        # id of the last change evicted from each resource buffer.
+        self._evicted = {}
+        # ids keep growing across restarts, so that older ones are detected.
+        self._first_id = self._last_id = time.time_ns() // 1000
+
+    def publish(self, resource, op, documents):
+        resource_def = self.app.config["DOMAIN"][resource]
+        if op != "delete" and resource_def["datasource"]["filter"]:
+            id_field = resource_def["id_field"]
+            visible = self.app.data.existing_values(
+                resource, id_field, [document[id_field] for document in documents]
+            )
+            documents = [d for d in documents if d[id_field] in visible]
+        if not documents:
+            return
+
+        # documents keep being altered by the request.
+        documents = copy.deepcopy(documents)
+        with self._condition:
+            changes = self._changes.get(resource)
+            if changes is None:
+                changes = self._changes[resource] = collections.deque(
+                    maxlen=self.app.config["CHANGE_FEED_BUFFER"]
+                )
+            for document in documents:
+                if len(changes) == changes.maxlen:
+                    self._evicted[resource] = changes[0].id
+                self._last_id += 1
+                changes.append(Change(self._last_id, op, document))
+            self._condition.notify_all()
+
+    def subscribe(self, resource, last_event_id=None, match=None):
+        with self._condition:
+            after = self._last_id
+            reset = False
+            if last_event_id is not None:
+                try:
+                    last_event_id = int(last_event_id)
+                except ValueError:
+                    reset = True
+                else:
+                    reset = not (
+                        self._evicted.get(resource, self._first_id)
+                        <= last_event_id
+                        <= self._last_id
+                    )
+                    if not reset:
+                        after = last_event_id
+        return self._listen(resource, after, reset, match)
+
+    def _listen(self, resource, after, reset, match):
+        if reset:
+            yield Change(after, "reset", None)
+
+        heartbeat = self.app.config["CHANGE_FEED_HEARTBEAT"]
+        while True:
+            with self._condition:
+                pending = self._pending(resource, after)
+                if not pending:
+                    self._condition.wait(heartbeat)
+                    pending = self._pending(resource, after)
+            if not pending:
+                yield None
+                continue
+            for change in pending:
+                after = change.id
+                if match is None or match(change.document):
+                    yield change
+
+    def _pending(self, resource, after):
+        return [c for c in self._changes.get(resource, ()) if c.id > after]
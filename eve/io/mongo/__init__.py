@@ -11,6 +11,7 @@
 """
 
 # flake8: noqa
+from eve.io.mongo.changes import MongoChangeFeed
 from eve.io.mongo.mongo import Mongo, MongoJSONEncoder, ensure_mongo_indexes
 from eve.io.mongo.media import GridFSMediaStorage
 from eve.io.mongo.validation import Validator
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.io.mongo.changes
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Change feed watching MongoDB change streams.
+
+    :copyright: (c) 2017 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import pymongo
+
+from eve.io.changes import Change, ChangeFeed
+
+
+class MongoChangeFeed(ChangeFeed):
+    """Change feed watching the change stream of the resource collection, so
+    that changes made by any process (even outside of the API) are seen.
+    Needs a replica set or a sharded cluster. Event ids are change stream
+    resume tokens: clients can resume as long as the changes they missed are
+    still in the MongoDB oplog.
+
+    Datasource filters are applied by the change stream. Deleted documents
+    can't be matched against them, nor against user-restricted resource
+    access, so deletions are only notified to clients with unrestricted
+    access to resources without a datasource filter.
+
+    With ``soft_delete`` enabled, documents being marked as deleted are
+    notified as 'delete' changes, like :class:`~eve.io.changes.LocalChangeFeed`
+    does, instead of updates.
+
+    .. versionadded:: 2.4
+    """
+
+    #: Change stream operation types which are notified.
+    operation_types = ("insert", "update", "replace", "delete")
+
+    def subscribe(self, resource, last_event_id=None, match=None):
+        datasource, filter_, _, _ = self.app.data.datasource(resource)
+        soft_delete = self.app.config["DOMAIN"][resource]["soft_delete"]
+        collection = self.app.data.pymongo(resource).db[datasource]
+
+        stage = {"operationType": {"$in": list(self.operation_types)}}
+        if filter_:
+            stage = {"$and": [stage, _prefix_fields(filter_, "fullDocument.")]}
+        pipeline = [{"$match": stage}]
+
+        kwargs = {
+            "full_document": "updateLookup",
+            "max_await_time_ms": int(self.app.config["CHANGE_FEED_HEARTBEAT"] * 1000),
+        }
+        reset = False
+        if last_event_id is not None:
+            try:
+                stream = collection.watch(
+                    pipeline, resume_after={"_data": last_event_id}, **kwargs
+                )
+            except pymongo.errors.OperationFailure:
+                # unknown token, or no longer in the oplog.
+                reset = True
+            else:
+                return self._listen(stream, False, match, soft_delete)
+        return self._listen(
+            collection.watch(pipeline, **kwargs), reset, match, soft_delete
+        )
+
+    def _listen(self, stream, reset, match, soft_delete):
+        with stream:
+            if reset:
+                token = stream.resume_token
+                yield Change(token and token["_data"], "reset", None)
+            while stream.alive:
+                change = stream.try_next()
+                if change is None:
+                    yield None
+                    continue
+                document = change.get("fullDocument") or change["documentKey"]
+                op = change["operationType"]
+                if soft_delete and _soft_deleted(change, self.app.config["DELETED"]):
+                    op = "delete"
+                if match is None or match(document):
+                    yield Change(change["_id"]["_data"], op, document)
+
+
+def _soft_deleted(change, deleted):
+    """Returns True if `change` marks a document as (soft) deleted."""
+    if change["operationType"] == "update":
+        fields = change.get("updateDescription", {}).get("updatedFields", {})
+        return fields.get(deleted) is True
+    if change["operationType"] == "replace":
+        return (change.get("fullDocument") or {}).get(deleted) is True
+    return False
+
+
+def _prefix_fields(query, prefix):
+    """Returns `query` with `prefix` prepended to its field names."""
+    prefixed = {}
+    for key, value in query.items():
+        if key in ("$and", "$or", "$nor"):
+            prefixed[key] = [_prefix_fields(q, prefix) for q in value]
+        elif key.startswith("$"):
+            prefixed[key] = value
+        else:
+            prefixed[prefix + key] = value
+    return prefixed
@@ -12,32 +12,73 @@
 import ast
 import decimal
 import itertools
+import re
+import time
+import uuid
 from collections import OrderedDict
 from copy import copy
-from datetime import datetime
+from datetime import datetime, timezone
 
 import pymongo
 import simplejson as json
-from bson import ObjectId, decimal128
+from bson import SON, Binary, Int64, ObjectId, Regex, Timestamp, decimal128
 from bson.dbref import DBRef
+from bson.json_util import dumps
 from flask import abort, g, request
-from pymongo import WriteConcern
+from pymongo import (DeleteOne, ReplaceOne, ReturnDocument, UpdateOne,
+                     WriteConcern)
 from werkzeug.exceptions import HTTPException
 
 from eve.auth import resource_auth
 from eve.io.base import BaseJSONEncoder, ConnectionException, DataLayer
+from eve.io.mongo.normalizer import QueryNormalizer
 from eve.io.mongo.parser import ParseError, parse
-from eve.utils import (config, debug_error_message, str_to_date, str_type,
+from eve.utils import (config, debug_error_message, str_to_date,
                        validate_filters)
 
-from ...versioning import versioned_id_field
 from .flask_pymongo import PyMongo
 
+#: BSON types (``$type`` aliases) in MongoDB sort order. Missing fields sort
+#: as null. MinKey, MaxKey and deprecated types are left out.
+BSON_SORT_ORDER = [
+    "null",
+    "number",
+    "string",
+    "object",
+    "array",
+    "binData",
+    "objectId",
+    "bool",
+    "date",
+    "timestamp",
+    "regex",
+]
+
+#: Python types of the values found in keyset pagination cursors, with the
+#: index of their BSON type in :data:`BSON_SORT_ORDER`. Bool comes before int,
+#: as it is a subclass.
+BSON_SORT_TYPES = [
+    (type(None), 0),
+    (bool, 7),
+    ((int, float, Int64, decimal128.Decimal128), 1),
+    (str, 2),
+    (dict, 3),
+    ((list, tuple), 4),
+    ((bytes, Binary, uuid.UUID), 5),
+    (ObjectId, 6),
+    (datetime, 8),
+    (Timestamp, 9),
+    ((Regex, re.Pattern), 10),
+]
+
 
 class MongoJSONEncoder(BaseJSONEncoder):
     """Proprietary JSONEconder subclass used by the json render function.
     This is needed to address the encoding of special values.
 
+    .. versionchanged:: 2.4
+       Added 'orjson_fast_types'.
+
     .. versionchanged:: 0.8.2
        Key-value pair order in DBRef are honored when encoding. Closes #1255.
 
@@ -47,6 +88,8 @@ class MongoJSONEncoder(BaseJSONEncoder):
     .. versionadded:: 0.2
     """
 
+    orjson_fast_types = (datetime, ObjectId, decimal128.Decimal128, DBRef)
+
     def default(self, obj):
         if isinstance(obj, ObjectId):
             # BSON/Mongo ObjectId is rendered as a string
@@ -111,6 +154,18 @@ class Mongo(DataLayer):
     # with their own implementation.
     json_encoder_class = MongoJSONEncoder
 
+    # prefix of the temporary fields which receive the $lookup results when
+    # embedding documents server-side.
+    lookup_prefix = "__lookup_"
+
+    # maximum number of cached counts per collection ('cached' count strategy).
+    # The collection cache is flushed when the limit is reached.
+    count_cache_size = 1000
+
+    # seconds between queries while waiting for new documents to be tailed,
+    # when they can't be awaited with a tailable cursor.
+    tail_poll_interval = 0.5
+
     operators = set(
         ["$gt", "$gte", "$in", "$lt", "$lte", "$ne", "$nin", "$eq"]
         + ["$or", "$and", "$not", "$nor"]
@@ -127,6 +182,10 @@ class Mongo(DataLayer):
     def init_app(self, app):
         """Initialize PyMongo.
 
+        .. versionchanged:: 2.4
+           Initialize the collection count cache.
+           Initialize the query normalizers.
+
         .. versionchanged:: 0.6
            Use mongo_prefix for multidb support.
 
@@ -136,6 +195,8 @@ class Mongo(DataLayer):
         # mongod must be running or this will raise an exception
         self.driver = PyMongos(self)
         self.mongo_prefix = None
+        self._count_cache = {}
+        self._query_normalizers = {}
 
     def find(self, resource, req, sub_resource_lookup, perform_count=True):
         """Retrieves a set of documents matching a given request. Queries can
@@ -154,6 +215,11 @@ class Mongo(DataLayer):
         :param req: a :class:`ParsedRequest`instance.
         :param sub_resource_lookup: sub-resource lookup from the endpoint url.
 
+        .. versionchanged:: 2.4
+           Support for keyset pagination.
+           Support for count strategies.
+           Server-side embedding of 'req.embedded_lookup' fields.
+
         .. versionchanged:: 0.6
            Support for multiple databases.
            Filter soft deleted documents by default
@@ -201,10 +267,16 @@ class Mongo(DataLayer):
         """
         args = {}
 
+        keyset = (
+            req is not None
+            and config.DOMAIN[resource]["pagination"]
+            and config.DOMAIN[resource]["keyset_pagination"]
+        )
+
         if req and req.max_results:
             args["limit"] = req.max_results
 
-        if req and req.page > 1:
+        if req and req.page > 1 and not keyset:
             args["skip"] = (req.page - 1) * req.max_results
 
         # TODO sort syntax should probably be coherent with 'where': either
@@ -215,27 +287,7 @@ class Mongo(DataLayer):
         # return an error)
 
         client_sort = self._convert_sort_request_to_dict(req)
-        spec = self._convert_where_request_to_dict(resource, req)
-
-        bad_filter = validate_filters(spec, resource)
-        if bad_filter:
-            abort(400, bad_filter)
-
-        if sub_resource_lookup:
-            spec = self.combine_queries(spec, sub_resource_lookup)
-
-        if (
-            config.DOMAIN[resource]["soft_delete"]
-            and not (req and req.show_deleted)
-            and not self.query_contains_field(spec, config.DELETED)
-        ):
-            # Soft delete filtering applied after validate_filters call as
-            # querying against the DELETED field must always be allowed when
-            # soft_delete is enabled
-            spec = self.combine_queries(spec, {config.DELETED: {"$ne": True}})
-
-        spec = self._mongotize(spec, resource)
-
+        spec = self._client_spec(resource, req, sub_resource_lookup)
         client_projection = self._client_projection(req)
 
         datasource, spec, projection, sort = self._datasource_ex(
@@ -248,6 +300,20 @@ class Mongo(DataLayer):
         if len(spec) > 0:
             args["filter"] = spec
 
+        reverse = False
+        if keyset:
+            # the count must not be affected by the cursor, so the range
+            # predicate is only added to the find() filter.
+            sort = self._keyset_sort(resource, sort)
+            if req.cursor:
+                reverse = req.cursor["reverse"]
+                boundary = self._keyset_predicate(sort, req.cursor)
+                args["filter"] = (
+                    self.combine_queries(spec, boundary) if spec else boundary
+                )
+            if reverse:
+                sort = [(field, -direction) for field, direction in sort]
+
         if sort is not None:
             args["sort"] = sort
 
@@ -256,7 +322,21 @@ class Mongo(DataLayer):
 
         target = self.pymongo(resource).db[datasource]
         try:
-            result = target.find(**args)
+            result = None
+            if req and req.embedded_lookup:
+                try:
+                    result = self._find_with_lookups(
+                        resource, target, args, req.embedded_lookup
+                    )
+                except pymongo.errors.OperationFailure as e:
+                    # e.g. MongoDB < 5.0. Embedded fields are left to the
+                    # caller, which resolves them in batches.
+                    self.app.logger.warning(
+                        "Server-side embedding failed, falling back: %s", e
+                    )
+                    req.embedded_lookup = []
+            if result is None:
+                result = target.find(**args)
         except TypeError as e:
             # pymongo raises ValueError when invalid query paramenters are
             # included. We do our best to catch them beforehand but, especially
@@ -264,28 +344,417 @@ class Mongo(DataLayer):
             self.app.logger.exception(e)
             abort(400, description=debug_error_message(str(e)))
 
+        if reverse:
+            # previous page has been fetched backwards; restore the order.
+            result = list(result)[::-1]
+
         if perform_count:
-            try:
-                count = target.count_documents(spec)
-            except Exception:
-                # fallback to deprecated method. this might happen when the query
-                # includes operators not supported by count_documents(). one
-                # documented use-case is when we're running on mongo 3.4 and below,
-                # which does not support $expr ($expr must replace $where # in
-                # count_documents()).
-
-                # 1. Mongo 3.6+; $expr: pass
-                # 2. Mongo 3.6+; $where: pass (via fallback)
-                # 3. Mongo 3.4; $where: pass (via fallback)
-                # 4. Mongo 3.4; $expr: fail (operator not supported by db)
-
-                # See: http://api.mongodb.com/python/current/api/pymongo/collection.html#pymongo.collection.Collection.count
-                count = target.count()
+            count, strategy = self._count(resource, target, spec)
+            if req:
+                req.count_strategy = strategy
         else:
             count = None
 
         return result, count
 
+    def export(self, resource, req, sub_resource_lookup, after=None):
+        """Returns a cursor over all the documents matching a given request,
+        sorted by id field. Pagination and sort arguments are ignored, and no
+        count is performed. Documents are fetched in batches of
+        ``EXPORT_BATCH_SIZE``. The cursor does not time out on the server, so
+        it must be closed when done.
+
+        :param resource: resource name.
+        :param req: a :class:`ParsedRequest`instance.
+        :param sub_resource_lookup: sub-resource lookup from the endpoint url.
+        :param after: only return documents with an id greater than this one.
+
+        .. versionadded:: 2.4
+        """
+        id_field = config.DOMAIN[resource]["id_field"]
+        spec = self._client_spec(resource, req, sub_resource_lookup)
+        if after is not None:
+            # resume an interrupted export.
+            boundary = self._mongotize({id_field: {"$gt": after}}, resource)
+            spec = self.combine_queries(spec, boundary) if spec else boundary
+
+        datasource, spec, projection, _ = self._datasource_ex(
+            resource, spec, self._client_projection(req)
+        )
+
+        args = {
+            "sort": [(id_field, 1)],
+            "batch_size": config.EXPORT_BATCH_SIZE,
+            "no_cursor_timeout": True,
+        }
+        if len(spec) > 0:
+            args["filter"] = spec
+        if projection:
+            args["projection"] = projection
+
+        target = self.pymongo(resource).db[datasource]
+        try:
+            return target.find(**args)
+        except TypeError as e:
+            self.app.logger.exception(e)
+            abort(400, description=debug_error_message(str(e)))
+
+    def tail(self, resource, req, sub_resource_lookup, after=None, timeout=0, delay=0):
+        """Returns the documents added after the one with id `after`, and
+        the id of the last of them (or `after` itself, if there are none).
+        Documents are found by id field, so the query is always indexed, and
+        at most ``max_results`` are returned. While there are none, a tailable
+        cursor awaits new documents on capped collections; other collections
+        are polled every :attr:`tail_poll_interval` seconds.
+
+        ObjectIds only increase with time across processes down to the
+        second, and are generated before the document is stored. With
+        `delay`, documents are returned once their id is that many seconds
+        old, when documents with lower ids can be expected to be stored too.
+
+        :param resource: resource name.
+        :param req: a :class:`ParsedRequest`instance.
+        :param sub_resource_lookup: sub-resource lookup from the endpoint url.
+        :param after: only return documents with an id greater than this one.
+                      If None, start from the last document.
+        :param timeout: max seconds to wait for new documents.
+        :param delay: min age, in seconds, of the returned documents ids.
+
+        .. versionadded:: 2.4
+        """
+        id_field = config.DOMAIN[resource]["id_field"]
+        datasource, _, _, _ = self._datasource_ex(resource)
+        target = self.pymongo(resource).db[datasource]
+        deadline = time.monotonic() + timeout
+
+        def settled():
+            # the lowest id generated 'delay' seconds ago.
+            since = datetime.fromtimestamp(time.time() - delay, timezone.utc)
+            return {id_field: {"$lt": ObjectId.from_datetime(since)}}
+
+        if after is None:
+            last = target.find_one(
+                settled() if delay else {}, {id_field: 1}, sort=[(id_field, -1)]
+            )
+            after = last[id_field] if last else None
+        else:
+            after = self._mongotize({id_field: after}, resource)[id_field]
+
+        tailable = True
+        while True:
+            spec = self._client_spec(resource, req, sub_resource_lookup)
+            if after is not None:
+                boundary = {id_field: {"$gt": after}}
+                spec = self.combine_queries(spec, boundary) if spec else boundary
+            datasource, spec, projection, _ = self._datasource_ex(
+                resource, spec, self._client_projection(req)
+            )
+            # newer documents are awaited, then polled until they settle.
+            await_spec = spec
+            if delay:
+                spec = self.combine_queries(spec, settled()) if spec else settled()
+
+            documents = list(
+                target.find(
+                    spec, projection, sort=[(id_field, 1)], limit=req.max_results
+                )
+            )
+            remaining = deadline - time.monotonic()
+            if documents or remaining <= 0:
+                break
+
+            if tailable:
+                try:
+                    # returns as soon as a matching document is added.
+                    cursor = target.find(
+                        await_spec,
+                        {id_field: 1},
+                        cursor_type=pymongo.CursorType.TAILABLE_AWAIT,
+                        max_await_time_ms=int(remaining * 1000) or 1,
+                    )
+                    with cursor:
+                        if next(cursor, None) is not None and not delay:
+                            continue
+                        tailable = cursor.alive
+                except pymongo.errors.OperationFailure:
+                    # not a capped collection.
+                    tailable = False
+                remaining = deadline - time.monotonic()
+            if remaining > 0:
+                time.sleep(min(self.tail_poll_interval, remaining))
+
+        if documents:
+            after = documents[-1][id_field]
+        return documents, after
+
+    def lookup_embeddable(self, resource, field):
+        """Returns True if `field` can be embedded with a $lookup stage. That
+        is the case for top-level fields holding an id, or a list of ids, of
+        a non-versioned data relation stored in the same database.
+
+        :param resource: resource name.
+        :param field: the embedded field.
+
+        .. versionadded:: 2.4
+        """
+        if "." in field:
+            return False
+        definition = config.DOMAIN[resource]["schema"].get(field) or {}
+        if definition.get("type") == "list":
+            definition = definition.get("schema") or {}
+        data_relation = definition.get("data_relation")
+        if (
+            not data_relation
+            or data_relation.get("version") is True
+            or definition.get("type") == "dbref"
+        ):
+            return False
+        return self.current_mongo_prefix(resource) == self.current_mongo_prefix(
+            data_relation["resource"]
+        )
+
+    def _find_with_lookups(self, resource, target, args, fields):
+        """Performs a find as an aggregation, embedding `fields` with $lookup
+        stages. Related documents are fetched in the same round trip as the
+        page, honoring the related resource datasource (filter, projection),
+        soft delete and auth_field settings.
+
+        .. versionadded:: 2.4
+        """
+        pipeline = []
+        if args.get("filter"):
+            pipeline.append({"$match": args["filter"]})
+        if args.get("sort"):
+            pipeline.append({"$sort": SON(args["sort"])})
+        if args.get("skip"):
+            pipeline.append({"$skip": args["skip"]})
+        if args.get("limit"):
+            pipeline.append({"$limit": args["limit"]})
+        if args.get("projection"):
+            pipeline.append({"$project": args["projection"]})
+
+        keys = {}
+        for field in fields:
+            stage, keys[field] = self._lookup_stage(resource, field)
+            pipeline.append({"$lookup": stage})
+
+        return self._stitch_lookups(resource, target.aggregate(pipeline), keys)
+
+    def _lookup_stage(self, resource, field):
+        """Returns the $lookup stage embedding `field`, and the name of the
+        related document field matched by the references.
+
+        .. versionadded:: 2.4
+        """
+        definition = config.DOMAIN[resource]["schema"][field]
+        if definition.get("type") == "list":
+            definition = definition["schema"]
+        related = definition["data_relation"]["resource"]
+        key = (
+            definition["data_relation"].get("field")
+            or config.DOMAIN[related]["id_field"]
+        )
+
+        source, filter_, projection, _ = self._datasource_ex(related, {})
+        if config.DOMAIN[related]["soft_delete"]:
+            filter_ = self.combine_queries(
+                filter_ or {}, {config.DELETED: {"$ne": True}}
+            )
+
+        stage = {
+            "from": source,
+            "localField": field,
+            "foreignField": key,
+            "as": self.lookup_prefix + field,
+        }
+        pipeline = []
+        if filter_:
+            pipeline.append({"$match": filter_})
+        if projection:
+            projection = dict(projection)
+            projection[key] = 1
+            pipeline.append({"$project": projection})
+        if pipeline:
+            # localField/foreignField along with a pipeline need MongoDB 5.0+
+            stage["pipeline"] = pipeline
+        return stage, key
+
+    def _stitch_lookups(self, resource, cursor, keys):
+        """Replaces the references of each document with the documents
+        fetched by the $lookup stages, preserving the references order.
+        Dangling references are dropped from lists, or replaced by None.
+        Soft deleted documents keep their references.
+
+        .. versionadded:: 2.4
+        """
+        soft_delete = config.DOMAIN[resource]["soft_delete"]
+        for document in cursor:
+            deleted = soft_delete and document.get(config.DELETED) is True
+            for field, key in keys.items():
+                related = dict(
+                    (doc.get(key), doc)
+                    for doc in document.pop(self.lookup_prefix + field, [])
+                )
+                if deleted or field not in document:
+                    continue
+                value = document[field]
+                if isinstance(value, list):
+                    document[field] = [
+                        copy(related[ref]) for ref in value if ref in related
+                    ]
+                else:
+                    document[field] = related.get(value)
+            yield document
+
+    def _count(self, resource, target, spec):
+        """Returns a ``(count, strategy)`` tuple for the documents matching
+        `spec`, according to the resource `count_strategy`. The returned
+        strategy is the one which actually produced the number: 'capped' if
+        the count reached `count_limit`, 'estimated' if collection metadata
+        was used, 'cached' if the count was served from the cache and 'exact'
+        otherwise.
+
+        .. versionadded:: 2.4
+        """
+        settings = config.DOMAIN[resource]
+        strategy = settings["count_strategy"]
+
+        if strategy == "estimated" and not spec:
+            return target.estimated_document_count(), "estimated"
+
+        if strategy == "capped":
+            limit = settings["count_limit"]
+            count = self._count_documents(target, spec, limit=limit)
+            return count, "capped" if count >= limit else "exact"
+
+        if strategy == "cached":
+            cache = self._count_cache.setdefault(
+                (target.database.name, target.name), {}
+            )
+            key = dumps(spec, sort_keys=True)
+            now = time.time()
+            hit = cache.get(key)
+            if hit and hit[1] > now:
+                return hit[0], "cached"
+            count = self._count_documents(target, spec)
+            if len(cache) >= self.count_cache_size:
+                cache.clear()
+            cache[key] = (count, now + settings["count_cache_ttl"])
+            return count, "exact"
+
+        return self._count_documents(target, spec), "exact"
+
+    def _count_documents(self, target, spec, **kwargs):
+        """Counts the documents matching `spec`.
+
+        .. versionadded:: 2.4
+        """
+        try:
+            return target.count_documents(spec, **kwargs)
+        except Exception:
+            # fallback to deprecated method. this might happen when the query
+            # includes operators not supported by count_documents(). one
+            # documented use-case is when we're running on mongo 3.4 and below,
+            # which does not support $expr ($expr must replace $where # in
+            # count_documents()).
+
+            # 1. Mongo 3.6+; $expr: pass
+            # 2. Mongo 3.6+; $where: pass (via fallback)
+            # 3. Mongo 3.4; $where: pass (via fallback)
+            # 4. Mongo 3.4; $expr: fail (operator not supported by db)
+
+            # See: http://api.mongodb.com/python/current/api/pymongo/collection.html#pymongo.collection.Collection.count
+            return target.count()
+
+    def _invalidate_count_cache(self, resource, datasource):
+        """Drops the cached counts of a collection. Called by write methods.
+
+        .. versionadded:: 2.4
+        """
+        self._count_cache.pop((self.pymongo(resource).db.name, datasource), None)
+
+    def keyset_sort(self, resource, req):
+        """Returns the sort applied to a keyset paginated request: the client
+        sort, or the resource default sort, followed by the id field.
+
+        :param resource: resource name.
+        :param req: a :class:`ParsedRequest` instance.
+
+        .. versionadded:: 2.4
+        """
+        sort = self._convert_sort_request_to_dict(req)
+        if not sort and config.DOMAIN[resource]["sorting"]:
+            sort = self.datasource(resource)[3]
+        return self._keyset_sort(resource, sort)
+
+    def _keyset_sort(self, resource, sort):
+        """Normalizes a sort to a list of ``(field, direction)`` tuples and
+        appends the id field as a tie-breaker, if missing.
+
+        .. versionadded:: 2.4
+        """
+        if isinstance(sort, dict):
+            sort = list(sort.items())
+        sort = [(field, int(direction)) for field, direction in (sort or [])]
+        id_field = config.DOMAIN[resource]["id_field"]
+        if id_field not in [field for field, _ in sort]:
+            sort.append((id_field, 1))
+        return sort
+
+    def _keyset_predicate(self, sort, cursor):
+        """Returns the query matching the documents which follow the cursor
+        boundary (or precede it, if the cursor is reversed) in sort order.
+        Cursors built for another sort are rejected.
+
+        .. versionadded:: 2.4
+        """
+        values = cursor["values"]
+        fields = [field for field, _ in sort]
+        if cursor["fields"] != fields or len(values) != len(fields):
+            abort(400, description="Cursor does not match the current sort")
+
+        clauses = []
+        for i, (field, direction) in enumerate(sort):
+            ascending = (direction > 0) != cursor["reverse"]
+            boundary = self._keyset_boundary(field, values[i], ascending)
+            if boundary is None:
+                # nothing sorts before null.
+                continue
+            # equality on null matches missing fields too, as they sort alike.
+            clause = dict((f, v) for (f, _), v in zip(sort[:i], values[:i]))
+            clause.update(boundary)
+            clauses.append(clause)
+        return {"$or": clauses} if len(clauses) > 1 else clauses[0]
+
+    def _keyset_boundary(self, field, value, ascending):
+        """Returns the query matching the values of `field` which follow
+        `value` in sort order (or precede it, if not `ascending`), or None if
+        there can't be any. Range operators only match values of the same BSON
+        type, so values of other types (null and missing ones included) are
+        matched, or ruled out, by type.
+
+        .. versionadded:: 2.4
+        """
+        rank = next(
+            (rank for types, rank in BSON_SORT_TYPES if isinstance(value, types)),
+            None,
+        )
+        if rank is None:
+            return {field: {"$gt" if ascending else "$lt": value}}
+
+        lower = [{field: {"$type": alias}} for alias in BSON_SORT_ORDER[1:rank]]
+        if ascending:
+            if value is None:
+                return {field: {"$ne": None}}
+            # whatever does not sort before, or with, the value.
+            query = {field: {"$not": {"$lte": value}, "$ne": None}}
+            if lower:
+                query["$nor"] = lower
+            return query
+        if value is None:
+            return None
+        return {"$or": [{field: {"$lt": value}}, {field: None}] + lower}
+
     def find_one(
         self,
         resource,
@@ -419,6 +888,47 @@ class Mongo(DataLayer):
         )
         return documents
 
+    def existing_values(self, resource, field, values):
+        """Returns which of `values` are stored in the `field` of (at least)
+        one document of `resource`, with a single ``$in`` query projecting
+        `field` only. Datasource filters, user-restricted resource access and
+        soft deletes are honored as in :meth:`find_one`.
+
+        :param resource: resource name.
+        :param field: the field to look the values up in.
+        :param values: a list of (hashable) values.
+        :return: the set of the values which were found.
+
+        .. versionadded:: 2.4
+        """
+        values = list(values)
+        if not values:
+            return set()
+
+        lookup = {field: {"$in": list(values)}}
+        self._mongotize(lookup, resource)
+        # the query values, as cast by _mongotize, and the original ones.
+        originals = {}
+        for value, cast in zip(values, lookup[field]["$in"]):
+            originals.setdefault(cast, []).append(value)
+
+        datasource, filter_, _, _ = self._datasource_ex(resource, lookup)
+        if config.DOMAIN[resource]["soft_delete"]:
+            filter_ = self.combine_queries(filter_, {config.DELETED: {"$ne": True}})
+
+        found = set()
+        target = self.pymongo(resource).db[datasource]
+        for document in target.find(filter_, {field: 1}):
+            stored = document
+            for key in field.split("."):
+                stored = stored.get(key) if isinstance(stored, dict) else None
+            for value in stored if isinstance(stored, list) else [stored]:
+                try:
+                    found.update(originals.get(value, ()))
+                except TypeError:
+                    pass
+        return found
+
     def aggregate(self, resource, pipeline, options):
         """
         .. versionadded:: 0.7
@@ -489,6 +999,45 @@ class Mongo(DataLayer):
                     "pymongo.errors.BulkWriteError: %s" % e
                 ),
             )
+        finally:
+            self._invalidate_count_cache(resource, datasource)
+
+    def insert_unordered(self, resource, documents, chunk_size=None):
+        """Inserts documents with unordered ``insert_many`` calls, of (at
+        most) `chunk_size` documents each. Write errors are reported per
+        document instead of aborting the request.
+
+        .. versionadded:: 2.4
+        """
+        datasource, _, _, _ = self._datasource_ex(resource)
+        coll = self.get_collection_with_write_concern(datasource, resource)
+        chunk_size = chunk_size or len(documents) or 1
+
+        outcomes = []
+        try:
+            for start in range(0, len(documents), chunk_size):
+                chunk = documents[start : start + chunk_size]
+                statuses = [None] * len(chunk)
+                try:
+                    coll.insert_many(chunk, ordered=False)
+                except pymongo.errors.BulkWriteError as e:
+                    for error in e.details["writeErrors"]:
+                        if error["code"] == 11000:
+                            statuses[error["index"]] = 409
+                        else:
+                            self.app.logger.error(error["errmsg"])
+                            statuses[error["index"]] = 500
+                except pymongo.errors.PyMongoError as e:
+                    # see comment in :func:`insert()`.
+                    self.app.logger.exception(e)
+                    statuses = [500] * len(chunk)
+                outcomes.extend(
+                    (None, status) if status else (document.get("_id"), None)
+                    for document, status in zip(chunk, statuses)
+                )
+        finally:
+            self._invalidate_count_cache(resource, datasource)
+        return outcomes
 
     def _change_request(self, resource, id_, changes, original, replace=False):
         """Performs a change, be it a replace or update.
@@ -559,6 +1108,8 @@ class Mongo(DataLayer):
                         "pymongo.errors.OperationFailure: %s" % e
                     ),
                 )
+        finally:
+            self._invalidate_count_cache(resource, datasource)
 
     def update(self, resource, id_, updates, original):
         """Updates a collection document.
@@ -594,6 +1145,65 @@ class Mongo(DataLayer):
 
         return self._change_request(resource, id_, {"$set": updates}, original)
 
+    def find_one_and_update(self, resource, id_, updates, etag):
+        """Updates a document with a single ``find_one_and_update``, filtered
+        on the document id and `etag`, and returns it as updated. Nested
+        fields are only set if their parents are documents, or missing.
+
+        .. versionadded:: 2.4
+        """
+        id_field = config.DOMAIN[resource]["id_field"]
+        query = {id_field: id_, config.ETAG: etag}
+        parents = set()
+        for field in updates:
+            path = field.split(".")[:-1]
+            parents.update(".".join(path[: i + 1]) for i in range(len(path)))
+        if parents:
+            # a null (or scalar) parent would be replaced by the caller.
+            query["$and"] = [
+                {"$or": [{parent: {"$exists": False}}, {parent: {"$type": "object"}}]}
+                for parent in sorted(parents)
+            ]
+        datasource, filter_, projection, _ = self._datasource_ex(resource, query)
+
+        coll = self.get_collection_with_write_concern(datasource, resource)
+        try:
+            return coll.find_one_and_update(
+                filter_,
+                {"$set": updates},
+                projection=projection or None,
+                return_document=ReturnDocument.AFTER,
+            )
+        except pymongo.errors.DuplicateKeyError as e:
+            abort(
+                400,
+                description=debug_error_message(
+                    "pymongo.errors.DuplicateKeyError: %s" % e
+                ),
+            )
+        except pymongo.errors.OperationFailure as e:
+            if e.code == 28:
+                # a nested field can't be set, as its parent is not a
+                # document: let the caller merge the changes instead.
+                return None
+            if e.code in (66, 16837):
+                # see _change_request().
+                abort(
+                    400,
+                    description=debug_error_message(
+                        "pymongo.errors.OperationFailure: %s" % e
+                    ),
+                )
+            self.app.logger.exception(e)
+            abort(
+                500,
+                description=debug_error_message(
+                    "pymongo.errors.OperationFailure: %s" % e
+                ),
+            )
+        finally:
+            self._invalidate_count_cache(resource, datasource)
+
     def replace(self, resource, id_, document, original):
         """Replaces an existing document.
         .. versionchanged:: 0.6
@@ -615,6 +1225,83 @@ class Mongo(DataLayer):
 
         return self._change_request(resource, id_, document, original, replace=True)
 
+    def bulk_change(self, resource, changes):
+        """Applies a batch of changes with a single, unordered
+        ``bulk_write``. Each write is filtered by the original etag (if any),
+        so changes whose document was modified in the meantime don't match:
+        they are then told apart with one more query, and reported with a 412.
+
+        .. versionadded:: 2.4
+        """
+        if not changes:
+            return []
+
+        id_field = config.DOMAIN[resource]["id_field"]
+        requests = []
+        for operation, id_, document, original in changes:
+            query = {id_field: id_}
+            if config.ETAG in original:
+                query[config.ETAG] = original[config.ETAG]
+            datasource, filter_, _, _ = self._datasource_ex(resource, query)
+            if operation == "update":
+                requests.append(UpdateOne(filter_, {"$set": document}))
+            elif operation == "replace":
+                requests.append(ReplaceOne(filter_, document))
+            else:
+                requests.append(DeleteOne(filter_))
+
+        results = [None] * len(changes)
+        coll = self.get_collection_with_write_concern(datasource, resource)
+        try:
+            result = coll.bulk_write(requests, ordered=False)
+            if not result.acknowledged:
+                return results
+            applied = result.matched_count + result.deleted_count
+        except pymongo.errors.BulkWriteError as e:
+            for error in e.details["writeErrors"]:
+                # duplicate keys, and attempts to update immutable fields
+                # (see _change_request()), are reported as bad requests.
+                if error["code"] in (11000, 66, 16837):
+                    results[error["index"]] = 400
+                else:
+                    self.app.logger.error(error["errmsg"])
+                    results[error["index"]] = 500
+            applied = e.details["nMatched"] + e.details["nRemoved"]
+        except pymongo.errors.OperationFailure as e:
+            # see comment in :func:`insert()`.
+            self.app.logger.exception(e)
+            abort(
+                500,
+                description=debug_error_message(
+                    "pymongo.errors.OperationFailure: %s" % e
+                ),
+            )
+        finally:
+            self._invalidate_count_cache(resource, datasource)
+
+        pending = [i for i, status in enumerate(results) if status is None]
+        if applied < len(pending):
+            # some documents did not match: find out which ones, by comparing
+            # their current etags with the expected ones.
+            ids = [changes[i][1] for i in pending]
+            current = dict(
+                (document[id_field], document.get(config.ETAG))
+                for document in coll.find(
+                    {id_field: {"$in": ids}}, {id_field: 1, config.ETAG: 1}
+                )
+            )
+            for i in pending:
+                operation, id_, document, _ = changes[i]
+                if operation == "remove":
+                    changed = id_ in current
+                elif config.ETAG in document:
+                    changed = current.get(id_, None) != document[config.ETAG]
+                else:
+                    changed = id_ not in current
+                if changed:
+                    results[i] = 412
+        return results
+
     def remove(self, resource, lookup):
         """Removes a document or the entire set of documents from a
         collection.
@@ -666,6 +1353,8 @@ class Mongo(DataLayer):
                     "pymongo.errors.OperationFailure: %s" % e
                 ),
             )
+        finally:
+            self._invalidate_count_cache(resource, datasource)
 
     # TODO: The next three methods could be pulled out to form the basis
     # of a separate MonqoQuery class
@@ -787,6 +1476,11 @@ class Mongo(DataLayer):
         """Recursively iterates a JSON dictionary, turning RFC-1123 strings
         into datetime values and ObjectId-link strings into ObjectIds.
 
+        .. versionchanged:: 2.4
+           Delegate to the resource :class:`QueryNormalizer`, which can
+           parse dates only when the field schema type calls for it
+           ('mongo_query_dates_by_schema').
+
         .. versionchanged:: 0.3
            'query_objectid_as_string' allows to bypass casting string types
            to objectids.
@@ -803,80 +1497,47 @@ class Mongo(DataLayer):
 
         .. versionadded:: 0.0.4
         """
-        resource_def = config.DOMAIN[resource]
-        schema = resource_def.get("schema")
-        id_field = resource_def["id_field"]
-        id_field_versioned = versioned_id_field(resource_def)
-        query_objectid_as_string = resource_def.get("query_objectid_as_string", False)
-        parse_objectid = parse_objectid or not query_objectid_as_string
-
-        def try_cast(k, v, should_parse_objectid):
-            try:
-                return datetime.strptime(v, config.DATE_FORMAT)
-            except Exception:
-                if k in (id_field, id_field_versioned) or should_parse_objectid:
-                    try:
-                        # Convert to unicode because ObjectId() interprets
-                        # 12-character strings (but not unicode) as binary
-                        # representations of ObjectId's.  See
-                        # https://github.com/pyeve/eve/issues/508
-                        try:
-                            r = ObjectId(unicode(v))
-                        except NameError:
-                            # We're on Python 3 so it's all unicode already.
-                            r = ObjectId(v)
-                        return r
-                    except Exception:
-                        return v
-                else:
-                    return v
+        query_objectid_as_string = config.DOMAIN[resource].get(
+            "query_objectid_as_string", False
+        )
+        return self.query_normalizer(resource).normalize(
+            source, parse_objectid=parse_objectid or not query_objectid_as_string
+        )
 
-        def get_schema_type(keys, schema):
-            def dict_sub_schema(base):
-                if base.get("type") == "dict":
-                    return base.get("schema")
-                return base
+    def query_normalizer(self, resource):
+        """Returns the :class:`QueryNormalizer` of a resource. Normalizers are
+        compiled when resources are registered, or on first use, and compiled
+        again along with the other schema caches (see
+        :meth:`eve.Eve.invalidate_schema_caches`).
 
-            if not isinstance(schema, dict):
-                return None
-            if not keys:
-                return schema.get("type")
-
-            k = keys[0]
-            keys = keys[1:]
-            schema_type = schema[k].get("type") if k in schema else None
-            if schema_type == "list":
-                if "items" in schema[k]:
-                    items = schema[k].get("items") or []
-                    possible_types = [get_schema_type(keys, item) for item in items]
-                    if "objectid" in possible_types:
-                        return "objectid"
-                    return next((t for t in possible_types if t), None)
-                if "schema" in schema[k]:
-                    # recursively check the schema
-                    return get_schema_type(keys, dict_sub_schema(schema[k]["schema"]))
-            elif schema_type == "dict":
-                if "schema" in schema[k]:
-                    return get_schema_type(keys, dict_sub_schema(schema[k]["schema"]))
-            else:
-                return schema_type
-
-        for k, v in source.items():
-            keys = k.split(".")
-            schema_type = get_schema_type(keys, schema)
-            is_objectid = (schema_type == "objectid") or parse_objectid
-            if isinstance(v, dict):
-                self._mongotize(v, resource, is_objectid)
-            elif isinstance(v, list):
-                for i, v1 in enumerate(v):
-                    if isinstance(v1, dict):
-                        source[k][i] = self._mongotize(v1, resource)
-                    else:
-                        source[k][i] = try_cast(k, v1, is_objectid)
-            elif isinstance(v, str_type):
-                source[k] = try_cast(k, v, is_objectid)
+        :param resource: resource name.
+
+        .. versionadded:: 2.4
+        """
+        cached = self._query_normalizers.get(resource)
+        if (
+            cached is None
+            or cached[0] is not self.app.config["DOMAIN"][resource].get("schema")
+            or cached[1] != self.app.schema_version
+        ):
+            return self.compile_query_normalizer(resource)
+        return cached[2]
+
+    def compile_query_normalizer(self, resource):
+        """Compiles, and returns, the :class:`QueryNormalizer` of a resource.
+
+        :param resource: resource name.
 
-        return source
+        .. versionadded:: 2.4
+        """
+        resource_def = self.app.config["DOMAIN"][resource]
+        normalizer = QueryNormalizer(resource_def, self.app.config["VERSION_ID_SUFFIX"])
+        self._query_normalizers[resource] = (
+            resource_def.get("schema"),
+            self.app.schema_version,
+            normalizer,
+        )
+        return normalizer
 
     def _sanitize(self, resource, spec):
         """Makes sure that only allowed operators are included in the query,
@@ -931,6 +1592,38 @@ class Mongo(DataLayer):
 
         return spec
 
+    def _client_spec(self, resource, req, sub_resource_lookup):
+        """Returns the query filter for a client request: the client query
+        (once validated), the sub-resource lookup and the soft delete
+        filter, combined.
+
+        :param resource: resource name.
+        :param req: a :class:`ParsedRequest`instance.
+        :param sub_resource_lookup: sub-resource lookup from the endpoint url.
+
+        .. versionadded:: 2.4
+        """
+        spec = self._convert_where_request_to_dict(resource, req)
+
+        bad_filter = validate_filters(spec, resource)
+        if bad_filter:
+            abort(400, bad_filter)
+
+        if sub_resource_lookup:
+            spec = self.combine_queries(spec, sub_resource_lookup)
+
+        if (
+            config.DOMAIN[resource]["soft_delete"]
+            and not (req and req.show_deleted)
+            and not self.query_contains_field(spec, config.DELETED)
+        ):
+            # Soft delete filtering applied after validate_filters call as
+            # querying against the DELETED field must always be allowed when
+            # soft_delete is enabled
+            spec = self.combine_queries(spec, {config.DELETED: {"$ne": True}})
+
+        return self._mongotize(spec, resource)
+
     def _convert_sort_request_to_dict(self, req):
         """Converts the contents of a `ParsedRequest`'s `sort` property to
         a dict
@@ -1069,9 +1762,13 @@ class Mongo(DataLayer):
         maintainer to change the write concern setting on the fly, hence the
         clone.
 
+        .. versionchanged:: 2.4
+           Honor the 'j' (journal) option.
+
         .. versionadded:: 0.6.1
         """
-        wc = WriteConcern(config.DOMAIN[resource]["mongo_write_concern"]["w"])
+        write_concern = config.DOMAIN[resource]["mongo_write_concern"]
+        wc = WriteConcern(write_concern["w"], j=write_concern.get("j"))
         return self.pymongo(resource).db[datasource].with_options(write_concern=wc)
 
 
@@ -1100,9 +1797,36 @@ def ensure_mongo_indexes(app, resource):
     """Make sure 'mongo_indexes' is respected and mongo indexes are created on
     the current database.
 
+    .. versionchanged:: 2.4
+       Index the shadow collection of versioned resources on document id and
+       version number, when 'MONGO_VERSIONS_INDEX' is enabled and the data
+       layer is Mongo.
+       Create the oplog as a capped collection when 'OPLOG_CAPPED_SIZE' is
+       set.
+
     .. versionaddded:: 0.8
     """
-    mongo_indexes = app.config["DOMAIN"][resource]["mongo_indexes"]
+    resource_def = app.config["DOMAIN"][resource]
+    if (
+        app.config["OPLOG"]
+        and app.config["OPLOG_CAPPED_SIZE"]
+        and resource == app.config["OPLOG_NAME"]
+        and isinstance(app.data, Mongo)
+    ):
+        _create_capped_collection(app, resource, app.config["OPLOG_CAPPED_SIZE"])
+
+    if (
+        resource_def["versioning"]
+        and app.config["MONGO_VERSIONS_INDEX"]
+        and isinstance(app.data, Mongo)
+    ):
+        keys = [
+            (resource_def["id_field"] + app.config["VERSION_ID_SUFFIX"], 1),
+            (app.config["VERSION"], 1),
+        ]
+        _create_index(app, resource, "document_versions", keys, {}, versions_only=True)
+
+    mongo_indexes = resource_def["mongo_indexes"]
     if not mongo_indexes:
         return
 
@@ -1116,7 +1840,43 @@ def ensure_mongo_indexes(app, resource):
         _create_index(app, resource, name, list_of_keys, index_options)
 
 
-def _create_index(app, resource, name, list_of_keys, index_options):
+def _create_capped_collection(app, resource, size):
+    """Create the mongo collection behind the `resource` as a capped
+    collection of `size` bytes, unless it exists already. Existing collections
+    are not converted, as that would lock the database while copying them.
+
+    .. versionadded:: 2.4
+    """
+    collection = app.config["SOURCES"][resource]["source"]
+    db = _get_db(app, resource)
+    try:
+        db.create_collection(collection, capped=True, size=size)
+    except pymongo.errors.CollectionInvalid:
+        if not db[collection].options().get("capped"):
+            app.logger.warning(
+                "'%s' collection exists and is not capped. Convert it with the "
+                "'convertToCapped' command." % collection
+            )
+
+
+def _get_db(app, resource):
+    """Returns the database of the mongo collection behind the `resource`.
+
+    .. versionadded:: 2.4
+    """
+    try:
+        # mongo_prefix might have been set by Auth class instance
+        px = g.get("mongo_prefix")
+    except Exception:
+        px = app.config["DOMAIN"][resource].get("mongo_prefix", "MONGO")
+
+    with app.app_context():
+        return app.data.pymongo(resource, px).db
+
+
+def _create_index(
+    app, resource, name, list_of_keys, index_options, versions_only=False
+):
     """Create a specific index composed of the `list_of_keys` for the
     mongo collection behind the `resource` using the `app.config`
     to retrieve all data needed to find out the mongodb configuration.
@@ -1137,6 +1897,10 @@ def _create_index(app, resource, name, list_of_keys, index_options):
     For example:
         {"sparse": True}
 
+    .. versionchanged:: 2.4
+       Added the 'versions_only' argument, to only index the shadow
+       collection of a versioned resource.
+
     .. versionchanged:: 0.8.1
        Add support for IndexKeySpecsConflict error. See #1180.
 
@@ -1149,21 +1913,14 @@ def _create_index(app, resource, name, list_of_keys, index_options):
     collection = app.config["SOURCES"][resource]["source"]
 
     # get db for given prefix
-    try:
-        # mongo_prefix might have been set by Auth class instance
-        px = g.get("mongo_prefix")
-    except Exception:
-        px = app.config["DOMAIN"][resource].get("mongo_prefix", "MONGO")
-
-    with app.app_context():
-        db = app.data.pymongo(resource, px).db
+    db = _get_db(app, resource)
 
     kw = copy(index_options)
     kw["name"] = name
 
-    colls = [db[collection]]
+    colls = [] if versions_only else [db[collection]]
     if app.config["DOMAIN"][resource]["versioning"]:
-        colls.append(db["%s_versions" % collection])
+        colls.append(db["%s%s" % (collection, app.config["VERSIONS"])])
 
     for coll in colls:
         try:
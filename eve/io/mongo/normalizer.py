@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.io.mongo.normalizer
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Casting of client queries to MongoDB types (datetimes and ObjectIds),
+    driven by a lookup table compiled from the resource schema.
+
+    :copyright: (c) 2017 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+import re
+from datetime import datetime
+
+from bson import ObjectId
+
+from eve.utils import config, str_type
+
+#: strings which ObjectId() accepts.
+OBJECTID = re.compile(r"[0-9a-fA-F]{24}\Z")
+
+#: strptime directives which only match digits (and padding spaces).
+NUMERIC_DIRECTIVES = "CdfGHIjmMSuUVwWyY"
+
+
+def schema_type(keys, schema):
+    """Returns the type of the (dotted) field `keys` in `schema`, or None if
+    it can't be determined. Lists are resolved through their ``schema`` and
+    ``items`` rules.
+
+    :param keys: the field path, as a list of keys.
+    :param schema: the schema, or sub-schema, to look the field up in.
+
+    .. versionadded:: 2.4
+    """
+
+    def dict_sub_schema(base):
+        if base.get("type") == "dict":
+            return base.get("schema")
+        return base
+
+    if not isinstance(schema, dict):
+        return None
+    if not keys:
+        return schema.get("type")
+
+    k = keys[0]
+    keys = keys[1:]
+    field_type = schema[k].get("type") if k in schema else None
+    if field_type == "list":
+        if "items" in schema[k]:
+            items = schema[k].get("items") or []
+            possible_types = [schema_type(keys, item) for item in items]
+            if "objectid" in possible_types:
+                return "objectid"
+            return next((t for t in possible_types if t), None)
+        if "schema" in schema[k]:
+            # recursively check the schema
+            return schema_type(keys, dict_sub_schema(schema[k]["schema"]))
+    elif field_type == "dict":
+        if "schema" in schema[k]:
+            return schema_type(keys, dict_sub_schema(schema[k]["schema"]))
+    else:
+        return field_type
+
+
+def date_pattern(date_format):
+    """Returns a regular expression matching (at least) all the strings
+    which can be parsed with `date_format`. Used to avoid costly strptime
+    failures on strings which are obviously not dates.
+
+    :param date_format: a strptime format.
+
+    .. versionadded:: 2.4
+    """
+    pattern = []
+    for literal, directive in re.findall(r"([^%]*)(%.?|$)", date_format):
+        for part in re.split(r"(\s+)", literal):
+            pattern.append(r"\s+" if part.isspace() else re.escape(part))
+        if directive == "%%":
+            pattern.append("%")
+        elif directive[1:] and directive[1] in NUMERIC_DIRECTIVES:
+            pattern.append(r"[\d ]+?")
+        elif directive:
+            pattern.append(".*?")
+    return re.compile(r"\s*%s\s*\Z" % "".join(pattern), re.IGNORECASE)
+
+
+class QueryNormalizer(object):
+    """Casts the string values of a resource query to datetimes and
+    ObjectIds, in place. The schema type of every field is compiled once
+    into a flat path -> type table (other paths resolving to a schema type
+    are added as they are met, while unknown ones are kept in a bounded
+    set, as clients could grow it at will):
+
+    - values are parsed as dates with DATE_FORMAT, then cast to ObjectIds
+      when the field is an objectid (or the id field), or unless
+      'query_objectid_as_string' is set.
+    - with 'mongo_query_dates_by_schema' set, values are only parsed as
+      dates when the field is a datetime, the id field, or is not in the
+      schema.
+
+    Strings which can't possibly be dates or ObjectIds are told apart with
+    regular expressions, without attempting (and failing) the conversion.
+
+    Operators (``$in``, ``$gt``, ...) inherit the type of the field they are
+    applied to.
+
+    :param resource_def: the resource settings.
+    :param version_id_suffix: the VERSION_ID_SUFFIX setting.
+
+    .. versionadded:: 2.4
+    """
+
+    #: Maximum number of unknown paths remembered.
+    max_unknown_paths = 1000
+
+    def __init__(self, resource_def, version_id_suffix):
+        self.schema = resource_def.get("schema")
+        id_field = resource_def["id_field"]
+        self.id_fields = (id_field, id_field + version_id_suffix)
+        self.dates_by_schema = resource_def.get("mongo_query_dates_by_schema", False)
+        self.types = {}
+        self.unknown_paths = set()
+        self._date_format = self._date_pattern = None
+        if isinstance(self.schema, dict):
+            self._compile(self.schema, "")
+
+    def _compile(self, schema, prefix):
+        for field, rules in schema.items():
+            if not isinstance(rules, dict):
+                continue
+            path = prefix + field
+            self.field_type(path)
+            sub_schema = rules.get("schema")
+            if rules.get("type") == "list" and isinstance(sub_schema, dict):
+                sub_schema = sub_schema.get("schema")
+            if isinstance(sub_schema, dict):
+                self._compile(sub_schema, path + ".")
+
+    def field_type(self, path):
+        """Returns the type of the field `path` ('dotted' notation allowed),
+        as a set of allowed types, or None if the type is unknown.
+        """
+        try:
+            return self.types[path]
+        except KeyError:
+            if path in self.unknown_paths:
+                return None
+
+        types = schema_type(path.split("."), self.schema)
+        if isinstance(types, str_type):
+            types = frozenset([types])
+        elif isinstance(types, (list, tuple)):
+            types = frozenset(types)
+        else:
+            # unknown paths come from clients: don't let them fill the set.
+            if len(self.unknown_paths) >= self.max_unknown_paths:
+                self.unknown_paths.clear()
+            self.unknown_paths.add(path)
+            return None
+        self.types[path] = types
+        return types
+
+    def normalize(self, query, field_types=None, parse_objectid=False):
+        """Casts the values of `query`, in place, and returns it.
+
+        :param query: the query to normalize.
+        :param field_types: the types of the field the (operators) query
+                            applies to, if any.
+        :param parse_objectid: cast ObjectId-like strings to ObjectIds, even
+                               if the field type is not objectid.
+        """
+        for key, value in query.items():
+            if key.startswith("$") and field_types is not None:
+                types = field_types
+            else:
+                types = self.field_type(key)
+                if types is None:
+                    types = field_types
+            if isinstance(value, dict):
+                self.normalize(value, types, parse_objectid)
+            elif isinstance(value, list):
+                for i, item in enumerate(value):
+                    if isinstance(item, dict):
+                        value[i] = self.normalize(item, parse_objectid=parse_objectid)
+                    elif isinstance(item, str_type):
+                        value[i] = self.cast(key, item, types, parse_objectid)
+            elif isinstance(value, str_type):
+                query[key] = self.cast(key, value, types, parse_objectid)
+        return query
+
+    def cast(self, key, value, types, parse_objectid):
+        """Casts the string `value` of field `key` according to its `types`."""
+        if types is None or key in self.id_fields:
+            parse_date = True
+            parse_objectid = (
+                parse_objectid
+                or key in self.id_fields
+                or (types is not None and "objectid" in types)
+            )
+        else:
+            parse_date = not self.dates_by_schema or "datetime" in types
+            parse_objectid = parse_objectid or "objectid" in types
+
+        if parse_date and self.date_pattern().match(value):
+            try:
+                return datetime.strptime(value, config.DATE_FORMAT)
+            except ValueError:
+                pass
+        if parse_objectid and OBJECTID.match(value):
+            return ObjectId(value)
+        return value
+
+    def date_pattern(self):
+        """Returns the date pattern for the current DATE_FORMAT."""
+        date_format = config.DATE_FORMAT
+        if date_format != self._date_format:
+            self._date_pattern = date_pattern(date_format)
+            self._date_format = date_format
+        return self._date_pattern
@@ -11,9 +11,12 @@
     :copyright: (c) 2017 by Nicola Iarocci.
     :license: BSD, see LICENSE for more details.
 """
+import time
+
 from bson import ObjectId, decimal128
 from bson.dbref import DBRef
 from flask import current_app as app
+from flask import g, has_app_context
 from werkzeug.datastructures import FileStorage
 
 from eve.auth import auth_field_and_value
@@ -33,6 +36,13 @@ class Validator(Validator):
                    documentation.
     :param resource: the resource name.
 
+    .. versionchanged:: 2.4
+       'unique' rules of bulk inserts are checked with one query per field,
+       and values duplicated within the payload are reported.
+       'data_relation' references are checked with one query per field.
+       'unique' and 'data_relation' rules are deferred when validating in a
+       validation worker process.
+
     .. versionchanged:: 0.6.1
        __init__ signature update for cerberus v0.8.1 compatibility.
        Disable 'transparent_schema_rules' by default in favor of explicit
@@ -52,34 +62,215 @@ class Validator(Validator):
        which allows for insertion of 'default' values in POST requests.
     """
 
+    #: 'unique' rules, and the validation methods implementing them.
+    unique_rules = ("unique", "unique_to_user", "unique_within_resource")
+
+    _bulk_unique = None
+    _bulk_references = None
+
+    def reset(self):
+        super().reset()
+        self._bulk_unique = None
+        self._bulk_references = None
+
+    def prepare_bulk(self, documents, checks=None):
+        """Fetches, with one query per rule and field, which of the values
+        of 'unique' fields in `documents` already exist. The outcome is then
+        used while validating the documents, which are also checked against
+        each other.
+
+        Only root fields are prefetched; values which were not (because of
+        coercion, for example) are checked against the database as usual.
+
+        When DATA_RELATION_CACHE_TTL is set, the references of root
+        'data_relation' fields (and lists of references) are prefetched as
+        well, with one query per related resource and field. The references
+        of deferred 'data_relation' checks are always prefetched.
+
+        :param documents: the (parsed) documents about to be validated.
+        :param checks: the checks deferred by validation workers for these
+                       documents, if any.
+
+        .. versionadded:: 2.4
+        """
+        super().prepare_bulk(documents, checks)
+        self._prepare_bulk_unique(documents)
+        if checks:
+            self._prepare_deferred_references(checks)
+        elif config.DATA_RELATION_CACHE_TTL:
+            self._prepare_bulk_references(documents)
+
+    def _prepare_bulk_unique(self, documents):
+        self._bulk_unique = {}
+        datasource, _, _, _ = app.data.datasource(self.resource)
+        collection = app.data.driver.db[datasource]
+
+        for field, rules in self.schema.items():
+            rules = self._resolve_rules_set(rules)
+            for rule in self.unique_rules:
+                if not rules.get(rule):
+                    continue
+                values = set()
+                for document in documents:
+                    value = document.get(field)
+                    if _hashable(value):
+                        values.add(value)
+                query = self._unique_query(rule)
+                key = (field, repr(query))
+                existing = set()
+                if values:
+                    query[field] = {"$in": list(values)}
+                    self._exclude_soft_deleted(query)
+                    existing.update(
+                        value
+                        for value in collection.distinct(field, query)
+                        if _hashable(value)
+                    )
+                # checked values, existing values, and payload values.
+                self._bulk_unique[key] = values, existing, set()
+
+    def _prepare_bulk_references(self, documents):
+        references = {}
+        for field, rules in self.schema.items():
+            rules = self._resolve_rules_set(rules)
+            data_relation = rules.get("data_relation")
+            if not data_relation and rules.get("type") == "list":
+                items = self._resolve_rules_set(rules.get("schema"))
+                if isinstance(items, dict):
+                    data_relation = items.get("data_relation")
+            if not data_relation or data_relation.get("version"):
+                continue
+
+            values = references.setdefault(
+                (data_relation["resource"], data_relation["field"]), []
+            )
+            for document in documents:
+                value = document.get(field)
+                for item in value if isinstance(value, list) else [value]:
+                    item = item.id if isinstance(item, DBRef) else item
+                    if _hashable(item):
+                        values.append(item)
+
+        for (resource, field), values in references.items():
+            self._existing_references(resource, field, values)
+
+    def _prepare_deferred_references(self, checks):
+        references = {}
+        for check, _, _, value, args in checks:
+            if check != "_check_data_relation" or args[0].get("version"):
+                continue
+            data_relation = args[0]
+            values = references.setdefault(
+                (data_relation["resource"], data_relation["field"]), set()
+            )
+            for item in value if isinstance(value, list) else [value]:
+                item = item.id if isinstance(item, DBRef) else item
+                if _hashable(item):
+                    values.add(item)
+
+        self._bulk_references = {}
+        for (resource, field), values in references.items():
+            existing = self._existing_references(resource, field, values)
+            self._bulk_references[(resource, field)] = values, set(existing)
+
+    def _existing_references(self, resource, field, values):
+        """Returns which of the (hashable) `values` are stored in the `field`
+        of `resource`. When DATA_RELATION_CACHE_TTL is set, values known to
+        exist are cached for the rest of the request (and at most for
+        DATA_RELATION_CACHE_TTL seconds), and not looked up again.
+        """
+        values = list(dict.fromkeys(values))
+        bulk = (self._bulk_references or {}).get((resource, field))
+        if bulk is not None and bulk[0].issuperset(values):
+            # prefetched for the checks deferred by validation workers.
+            return bulk[1].intersection(values)
+
+        cache = _references_cache(resource, field)
+        if cache is None:
+            return app.data.existing_values(resource, field, values)
+
+        now = time.time()
+        existing = set(value for value in values if cache.get(value, 0) > now)
+        missing = [value for value in values if value not in existing]
+        if missing:
+            found = app.data.existing_values(resource, field, missing)
+            expires = now + config.DATA_RELATION_CACHE_TTL
+            for value in found:
+                cache[value] = expires
+            existing.update(found)
+        return existing
+
     def _validate_versioned(self, unique, field, value):
         """{'type': 'boolean'}"""
         pass
 
     def _validate_unique_to_user(self, unique, field, value):
         """{'type': 'boolean'}"""
-        auth_field, auth_value = auth_field_and_value(self.resource)
-
-        # if an auth value has been set for this request, then make sure it is
-        # taken into account when checking for value uniqueness.
-        query = {auth_field: auth_value} if auth_field else {}
-
-        self._is_value_unique(unique, field, value, query)
+        if unique:
+            self._check_unique(field, value, "unique_to_user")
 
     def _validate_unique_within_resource(self, unique, field, value):
         """{'type': 'boolean'}"""
-        _, filter_, _, _ = app.data.datasource(self.resource)
-        if filter_ is None:
-            filter_ = {}
-        self._is_value_unique(unique, field, value, filter_)
+        if unique:
+            self._check_unique(field, value, "unique_within_resource")
 
     def _validate_unique(self, unique, field, value):
         """{'type': 'boolean'}"""
-        self._is_value_unique(unique, field, value, {})
+        if unique:
+            self._check_unique(field, value, "unique")
+
+    def _check_unique(self, field, value, rule):
+        """Checks a 'unique' `rule`, unless it is deferred."""
+        if not self._defer("_check_unique", field, value, rule):
+            self._is_value_unique(True, field, value, self._unique_query(rule))
+
+    def _unique_query(self, rule):
+        """Returns the base query of a 'unique' rule."""
+        if rule == "unique_to_user":
+            # if an auth value has been set for this request, then make sure
+            # it is taken into account when checking for value uniqueness.
+            auth_field, auth_value = auth_field_and_value(self.resource)
+            return {auth_field: auth_value} if auth_field else {}
+        if rule == "unique_within_resource":
+            _, filter_, _, _ = app.data.datasource(self.resource)
+            return filter_ if filter_ is not None else {}
+        return {}
+
+    def _exclude_soft_deleted(self, query):
+        if config.DOMAIN[self.resource]["soft_delete"]:
+            # be aware that, should a previously (soft) deleted document be
+            # restored, and because we explicitly ignore soft deleted
+            # documents while validating 'unique' fields, there is a chance
+            # that a unique field value will end up being now duplicated
+            # in two documents: the restored one, and the one which has
+            # been stored with the same field value while the original
+            # document was in 'deleted' state.
+
+            # we make sure to also include documents which are missing the
+            # DELETED field. This happens when soft deletes are enabled on
+            # an a resource with existing documents.
+            query[config.DELETED] = {"$ne": True}
+
+    def _is_bulk_value_unique(self, path, value, query):
+        """Checks `value` against the values prefetched by
+        :meth:`prepare_bulk`, and those of the previous payload documents.
+        Returns None if the database has to be queried.
+        """
+        bulk = self._bulk_unique.get((path, repr(query)))
+        if bulk is None or not _hashable(value):
+            return None
+        checked, existing, payload = bulk
+        if value in payload or value in existing:
+            return False
+        payload.add(value)
+        return True if value in checked else None
 
     def _is_value_unique(self, unique, field, value, query):
         """Validates that a field value is unique.
 
+        .. versionchanged:: 2.4
+           Use the values prefetched for bulk inserts, if any.
+
         .. versionchanged:: 0.6.2
            Exclude soft deleted documents from uniqueness check. Closes #831.
 
@@ -106,23 +297,19 @@ class Validator(Validator):
                     schema = schema[path]
                     field_schema_path.append(path)
 
-            query[".".join(field_schema_path)] = value
+            path = ".".join(field_schema_path)
+            if self._bulk_unique and not self.document_id:
+                unique = self._is_bulk_value_unique(path, value, query)
+                if unique is not None:
+                    if not unique:
+                        self._error(field, "value '%s' is not unique" % value)
+                    return
+
+            query[path] = value
             resource_config = config.DOMAIN[self.resource]
 
             # exclude soft deleted documents if applicable
-            if resource_config["soft_delete"]:
-                # be aware that, should a previously (soft) deleted document be
-                # restored, and because we explicitly ignore soft deleted
-                # documents while validating 'unique' fields, there is a chance
-                # that a unique field value will end up being now duplicated
-                # in two documents: the restored one, and the one which has
-                # been stored with the same field value while the original
-                # document was in 'deleted' state.
-
-                # we make sure to also include documents which are missing the
-                # DELETED field. This happens when soft deletes are enabled on
-                # an a resource with existing documents.
-                query[config.DELETED] = {"$ne": True}
+            self._exclude_soft_deleted(query)
 
             # exclude current document
             if self.document_id:
@@ -152,6 +339,13 @@ class Validator(Validator):
         if not value and self.schema[field].get("nullable"):
             return
 
+        if not self._defer("_check_data_relation", field, value, data_relation):
+            self._check_data_relation(field, value, data_relation)
+
+    def _check_data_relation(self, field, value, data_relation):
+        """Checks that the `value` of a 'data_relation' field references
+        existing documents.
+        """
         if "version" in data_relation and data_relation["version"] is True:
             value_field = data_relation["field"]
             version_field = app.config["VERSION"]
@@ -196,20 +390,21 @@ class Validator(Validator):
                 value = [value]
 
             data_resource = data_relation["resource"]
-            for item in value:
-                query = {
-                    data_relation["field"]: item.id if isinstance(item, DBRef) else item
-                }
-                if not app.data.find_one(data_resource, None, **query):
+            data_field = data_relation["field"]
+            items = [item.id if isinstance(item, DBRef) else item for item in value]
+            existing = self._existing_references(
+                data_resource, data_field, [item for item in items if _hashable(item)]
+            )
+            for item in items:
+                if _hashable(item):
+                    exists = item in existing
+                else:
+                    exists = app.data.find_one(data_resource, None, **{data_field: item})
+                if not exists:
                     self._error(
                         field,
                         "value '%s' must exist in resource"
-                        " '%s', field '%s'."
-                        % (
-                            item.id if isinstance(item, DBRef) else item,
-                            data_resource,
-                            data_relation["field"],
-                        ),
+                        " '%s', field '%s'." % (item, data_resource, data_field),
                     )
 
     def _validate_type_objectid(self, value):
@@ -298,3 +493,23 @@ class Validator(Validator):
             return True
         except TypeError:
             pass
+
+
+def _hashable(value):
+    if value is None or isinstance(value, (dict, list)):
+        return False
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _references_cache(resource, field):
+    """Returns the (per request) cache of the values known to exist in the
+    `field` of `resource`, or None if DATA_RELATION_CACHE_TTL is not set.
+    """
+    if not config.DATA_RELATION_CACHE_TTL or not has_app_context():
+        return None
+    caches = g.setdefault("data_relation_cache", {})
+    return caches.setdefault((resource, field), {})
@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.methods.bulk
+    ~~~~~~~~~~~~~~~~
+
+    This module implements bulk edits (PATCH, PUT and DELETE of several
+    documents with a single request).
+
+    :copyright: (c) 2017 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import copy
+
+from cerberus.validator import DocumentError
+from flask import abort
+from flask import current_app as app
+from flask import request
+from werkzeug import exceptions
+
+from eve.auth import auth_field_and_value, requires_auth
+from eve.methods.common import (build_response_document, change_feed_push,
+                                date_created, last_updated,
+                                marshal_write_response, oplog_push, parse)
+from eve.methods.common import payload as payload_
+from eve.methods.common import (pre_event, ratelimit, resolve_document_etag,
+                                resolve_sub_resource_path,
+                                resolve_user_restricted_access, utcnow)
+from eve.methods.patch import resolve_nested_documents
+from eve.utils import ParsedRequest, config, debug_error_message, document_etag
+from eve.versioning import (insert_versioning_documents, late_versioning_catch,
+                            resolve_document_version, versioned_id_field)
+
+#: key of the operation field which holds the changes (or new document).
+CHANGES = "changes"
+
+
+@requires_auth("item")
+@ratelimit("item")
+@pre_event
+def bulk_edit(resource, payload=None, **lookup):
+    """
+    Default function for handling requests to bulk edit endpoints, it has
+    decorators for rate limiting, authentication and for raising pre-request
+    events. After the decorators are applied forwards to call to
+    :func:`bulk_edit_internal`
+
+    .. versionadded:: 2.4
+    """
+    return bulk_edit_internal(resource, request.method, payload, **lookup)
+
+
+def bulk_edit_internal(resource, method, payload=None, **lookup):
+    """Intended for internal bulk edits, this method is not rate limited,
+    authentication is not checked and pre-request events are not raised.
+    Applies a list of operations, each one of the form ::
+
+        {"<ID_FIELD>": <id>, "<ETAG>": <etag>, "changes": {...}}
+
+    where `changes` holds the fields to update (PATCH) or the new document
+    (PUT), and is not needed with DELETE. The edited documents are loaded with
+    one query, each operation is validated (and its etag checked) on its own,
+    and all the writes are then performed at once, with
+    :meth:`DataLayer.bulk_change`. Operations succeed or fail independently
+    of each other: the response reports the status of each one, in order.
+    Should all of them fail, the response status is their common one, or
+    207 if they failed in different ways.
+
+    Callbacks, versioning and the oplog work as with single document edits.
+
+    :param resource: the name of the resource to which the documents belong.
+    :param method: the edit method: 'PATCH', 'PUT' or 'DELETE'.
+    :param payload: alternative payload (a list of operations).
+    :param **lookup: sub resource lookup from the endpoint url.
+
+    .. versionadded:: 2.4
+    """
+    if payload is None:
+        payload = payload_()
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not payload:
+        abort(400, description=debug_error_message("Empty bulk edit"))
+
+    resource_def = config.DOMAIN[resource]
+    id_field = resource_def["id_field"]
+
+    operations = [
+        operation if isinstance(operation, dict) else {} for operation in payload
+    ]
+    originals = _originals(
+        resource, [op[id_field] for op in operations if id_field in op], lookup
+    )
+
+    prepare = {"PATCH": _prepare_patch, "PUT": _prepare_put}.get(
+        method, _prepare_delete
+    )
+    validator = app.validator_pool.get(
+        resource_def["schema"],
+        resource=resource,
+        allow_unknown=resource_def["allow_unknown"],
+    )
+
+    results = [None] * len(operations)
+    changes = []
+    prepared = []
+    for i, operation in enumerate(operations):
+        try:
+            if id_field not in operation:
+                abort(
+                    400,
+                    description="Bulk edit operations must be objects with "
+                    "a '%s' field" % id_field,
+                )
+            original = originals.get(str(operation[id_field]))
+            if original is None:
+                if method == "PUT" and _owned_by_others(
+                    resource, operation[id_field], lookup
+                ):
+                    abort(403)
+                abort(404)
+            _check_etag(resource, original, operation.get(config.ETAG))
+
+            change, result = prepare(
+                resource, validator, operation.get(CHANGES), original
+            )
+            if change is None:
+                results[i] = result
+            else:
+                changes.append(change)
+                prepared.append((i, change, result))
+        except exceptions.HTTPException as e:
+            results[i] = _error(e.code, e.description)
+        except DocumentError as e:
+            results[i] = _issues({"validator exception": str(e)})
+        except Exception as e:
+            # most likely a problem with the operation payload, report back to
+            # the client as if it was a validation issue
+            app.logger.exception(e)
+            results[i] = _issues({"exception": str(e)})
+
+    statuses = app.data.bulk_change(resource, changes)
+
+    applied = []
+    for (i, change, result), status in zip(prepared, statuses):
+        if status is None:
+            applied.append((i, change, result))
+        elif status == 412:
+            results[i] = _error(412, "Client and server etags don't match")
+        else:
+            results[i] = _error(status, "The operation could not be applied")
+
+    if applied:
+        finalize = {"PATCH": _patched, "PUT": _replaced}.get(method, _deleted)
+        for i, response in finalize(resource, applied):
+            results[i] = response
+
+    failures = [
+        _status(result)
+        for result in results
+        if result[config.STATUS] != config.STATUS_OK
+    ]
+    response = {
+        config.STATUS: config.STATUS_ERR if failures else config.STATUS_OK,
+        config.ITEMS: results,
+    }
+    return_code = 200
+    if len(failures) == len(results):
+        # none of the operations were applied: report their common status,
+        # or a 207 Multi-Status if they failed in different ways.
+        return_code = failures[0] if len(set(failures)) == 1 else 207
+    return response, None, None, return_code
+
+
+def _originals(resource, ids, lookup):
+    """Returns the documents with the given `ids` (soft deleted ones
+    included), keyed by the string representation of their id.
+    """
+    id_field = config.DOMAIN[resource]["id_field"]
+    req = ParsedRequest()
+    req.show_deleted = True
+    query = dict(lookup)
+    query[id_field] = {"$in": list(ids)}
+    cursor, _ = app.data.find(resource, req, query, perform_count=False)
+
+    originals = {}
+    for document in cursor:
+        # ensure the retrieved documents have LAST_UPDATED and DATE_CREATED,
+        # as get_document() does.
+        document[config.LAST_UPDATED] = last_updated(document)
+        document[config.DATE_CREATED] = date_created(document)
+        originals[str(document[id_field])] = document
+    return originals
+
+
+def _owned_by_others(resource, id_, lookup):
+    """Returns whether the document with id `id_` exists, but is not visible
+    to the current user. Like put_internal(), PUT answers with a 403 then,
+    while PATCH and DELETE answer with a 404, as the item endpoints do.
+    """
+    auth_field, _ = auth_field_and_value(resource)
+    if not auth_field:
+        return False
+    query = dict(lookup)
+    query[config.DOMAIN[resource]["id_field"]] = id_
+    document = app.data.find_one(resource, None, check_auth_value=False, **query)
+    return document is not None
+
+
+def _check_etag(resource, original, etag):
+    """The bulk counterpart of the If-Match checks of get_document()."""
+    if not config.IF_MATCH:
+        return
+    if etag is None:
+        if config.ENFORCE_IF_MATCH:
+            abort(
+                428,
+                description="To edit a document its etag must be provided "
+                "with the '%s' field" % config.ETAG,
+            )
+        return
+    current = original.get(config.ETAG)
+    if current is None:
+        current = document_etag(
+            original, ignore_fields=config.DOMAIN[resource]["etag_ignore_fields"]
+        )
+    if etag != current:
+        abort(412, description="Client and server etags don't match")
+
+
+def _prepare_patch(resource, validator, changes, original):
+    resource_def = config.DOMAIN[resource]
+    object_id = original[resource_def["id_field"]]
+
+    updates = parse(changes or {}, resource)
+    if not validator.validate_update(
+        updates, object_id, original, resource_def.get("normalize_on_patch")
+    ):
+        return None, _issues(validator.errors)
+    updates = validator.document
+
+    # sneak in a shadow copy if it wasn't already there
+    late_versioning_catch(original, resource)
+    resolve_document_version(updates, resource, "PATCH", original)
+    updates[config.LAST_UPDATED] = utcnow()
+    if resource_def["soft_delete"] is True:
+        updates[config.DELETED] = False
+
+    updated = copy.deepcopy(original)
+
+    # notify callbacks
+    getattr(app, "on_update")(resource, updates, original)
+    getattr(app, "on_update_%s" % resource)(updates, original)
+
+    if resource_def["merge_nested_documents"]:
+        updates = resolve_nested_documents(updates, updated)
+    updated.update(updates)
+
+    if config.IF_MATCH:
+        resolve_document_etag(updated, resource)
+        updates[config.ETAG] = updated[config.ETAG]
+    return ("update", object_id, updates, original), updated
+
+
+def _patched(resource, applied):
+    for _, (_, object_id, updates, _), _ in applied:
+        oplog_push(resource, updates, "PATCH", object_id)
+    change_feed_push(resource, [updated for _, _, updated in applied], "update")
+    insert_versioning_documents(
+        resource,
+        [updated for _, _, updated in applied],
+        [original for _, (_, _, _, original), _ in applied],
+    )
+
+    for i, (_, object_id, updates, original), updated in applied:
+        getattr(app, "on_updated")(resource, updates, original)
+        getattr(app, "on_updated_%s" % resource)(updates, original)
+        yield i, _written(resource, updated)
+
+
+def _prepare_put(resource, validator, changes, original):
+    resource_def = config.DOMAIN[resource]
+    object_id = original[resource_def["id_field"]]
+
+    document = parse(changes or {}, resource)
+    resolve_sub_resource_path(document, resource)
+    if not validator.validate_replace(document, object_id, original):
+        return None, _issues(validator.errors)
+    document = validator.document
+
+    # sneak in a shadow copy if it wasn't already there
+    late_versioning_catch(original, resource)
+
+    document[config.LAST_UPDATED] = utcnow()
+    document[config.DATE_CREATED] = original[config.DATE_CREATED]
+    if resource_def["soft_delete"] is True:
+        document[config.DELETED] = False
+    if resource_def["id_field"] not in document:
+        document[resource_def["id_field"]] = object_id
+
+    resolve_user_restricted_access(document, resource)
+    resolve_document_version(document, resource, "PUT", original)
+
+    # notify callbacks
+    getattr(app, "on_replace")(resource, document, original)
+    getattr(app, "on_replace_%s" % resource)(document, original)
+
+    resolve_document_etag(document, resource)
+    return ("replace", object_id, document, original), document
+
+
+def _replaced(resource, applied):
+    documents = [document for _, _, document in applied]
+    oplog_push(resource, documents, "PUT")
+    change_feed_push(resource, documents, "replace")
+    insert_versioning_documents(
+        resource, documents, [original for _, (_, _, _, original), _ in applied]
+    )
+
+    for i, (_, _, document, original), _ in applied:
+        getattr(app, "on_replaced")(resource, document, original)
+        getattr(app, "on_replaced_%s" % resource)(document, original)
+        yield i, _written(resource, document)
+
+
+def _prepare_delete(resource, validator, changes, original):
+    resource_def = config.DOMAIN[resource]
+    object_id = original[resource_def["id_field"]]
+    soft_delete_enabled = resource_def["soft_delete"]
+
+    if soft_delete_enabled and original.get(config.DELETED) is True:
+        # already deleted.
+        return None, _deleted_response(resource, object_id)
+
+    # notify callbacks
+    getattr(app, "on_delete_item")(resource, original)
+    getattr(app, "on_delete_item_%s" % resource)(original)
+
+    if not soft_delete_enabled:
+        return ("remove", object_id, None, original), None
+
+    # instead of removing the document from the db, just mark it as deleted
+    marked_document = copy.deepcopy(original)
+    marked_document[config.DELETED] = True
+    marked_document[config.LAST_UPDATED] = utcnow()
+    if config.IF_MATCH:
+        resolve_document_etag(marked_document, resource)
+    resolve_document_version(marked_document, resource, "DELETE", original)
+    return ("replace", object_id, marked_document, original), marked_document
+
+
+def _deleted(resource, applied):
+    resource_def = config.DOMAIN[resource]
+
+    if resource_def["soft_delete"]:
+        for _, (_, object_id, marked_document, original), _ in applied:
+            # create previous version if it wasn't already there
+            late_versioning_catch(original, resource)
+        insert_versioning_documents(
+            resource,
+            [marked_document for _, _, marked_document in applied],
+            [original for _, (_, _, _, original), _ in applied],
+        )
+        for _, (_, object_id, marked_document, _), _ in applied:
+            oplog_push(resource, marked_document, "DELETE", object_id)
+        change_feed_push(resource, [marked for _, _, marked in applied], "delete")
+    else:
+        media_fields = resource_def["_media"]
+        for _, (_, object_id, _, original), _ in applied:
+            # media cleanup. documents might miss one or more media fields
+            # because of datasource projections: see deleteitem_internal().
+            if any(field not in original for field in media_fields):
+                original = app.data.find_one_raw(
+                    resource, **{resource_def["id_field"]: object_id}
+                ) or original
+            for field in media_fields:
+                media_field = original.get(field)
+                if media_field is None:
+                    continue
+                if isinstance(media_field, list):
+                    for file_id in media_field:
+                        app.media.delete(file_id, resource)
+                else:
+                    app.media.delete(media_field, resource)
+
+        if resource_def["versioning"] is True:
+            app.data.remove(
+                resource + config.VERSIONS,
+                {
+                    versioned_id_field(resource_def): {
+                        "$in": [object_id for _, (_, object_id, _, _), _ in applied]
+                    }
+                },
+            )
+        for _, (_, object_id, _, original), _ in applied:
+            oplog_push(resource, original, "DELETE", object_id)
+        change_feed_push(
+            resource, [original for _, (_, _, _, original), _ in applied], "delete"
+        )
+
+    for i, (_, object_id, _, original), _ in applied:
+        getattr(app, "on_deleted_item")(resource, original)
+        getattr(app, "on_deleted_item_%s" % resource)(original)
+        yield i, _deleted_response(resource, object_id)
+
+
+def _written(resource, document):
+    build_response_document(document, resource, [], document)
+    document[config.STATUS] = config.STATUS_OK
+    # limit what actually gets sent to minimize bandwidth usage
+    return marshal_write_response(document, resource)
+
+
+def _deleted_response(resource, object_id):
+    return {
+        config.STATUS: config.STATUS_OK,
+        config.DOMAIN[resource]["id_field"]: object_id,
+    }
+
+
+def _status(result):
+    if config.ERROR in result:
+        return result[config.ERROR]["code"]
+    return config.VALIDATION_ERROR_STATUS
+
+
+def _error(code, message):
+    return {
+        config.STATUS: config.STATUS_ERR,
+        config.ERROR: {"code": code, "message": message},
+    }
+
+
+def _issues(issues):
+    return {config.STATUS: config.STATUS_ERR, config.ISSUES: issues}
@@ -11,7 +11,6 @@
 """
 import base64
 import re
-import time
 from collections import Counter
 from copy import copy
 from datetime import datetime, timezone
@@ -26,11 +25,13 @@ from flask import current_app as app
 from flask import g, request
 from werkzeug.datastructures import CombinedMultiDict, MultiDict
 
+from eve.auth import resource_auth
 from eve.utils import (
     auto_fields,
     config,
     debug_error_message,
     document_etag,
+    document_etags,
     parse_request,
 )
 from eve.versioning import get_data_version_relation_document, resolve_document_version
@@ -66,6 +67,9 @@ def get_document(
     :param mongo_options: Options to pass to PyMongo. e.g. read_preferences.
     :param **lookup: document lookup query
 
+    .. versionchanged:: 2.4
+       Only compute the etag when it is not stored with the document.
+
     .. versionchanged:: 0.6
         Return soft deleted documents.
 
@@ -119,9 +123,9 @@ def get_document(
 
         if req.if_match and concurrency_check:
             ignore_fields = config.DOMAIN[resource]["etag_ignore_fields"]
-            etag = document.get(
-                config.ETAG, document_etag(document, ignore_fields=ignore_fields)
-            )
+            etag = document.get(config.ETAG)
+            if etag is None:
+                etag = document_etag(document, ignore_fields=ignore_fields)
             if req.if_match != etag:
                 # client and server etags must match, or we don't allow editing
                 # (ensures that client's version of the document is up to date)
@@ -247,7 +251,8 @@ def multidict_to_dict(multidict):
 
 
 class RateLimit:
-    """Implements the Rate-Limiting logic using Redis as a backend.
+    """Implements the Rate-Limiting logic. Requests are counted by the
+    app rate limiter, as configured by ``RATE_LIMIT_BACKEND``.
 
     :param key_prefix: the key used to uniquely identify a client.
     :param limit: requests limit, per period.
@@ -255,21 +260,18 @@ class RateLimit:
     :param send_x_headers: True if response headers are supposed to include
                            special 'X-RateLimit' headers
 
+    .. versionchanged:: 2.4
+       Requests are counted by 'app.rate_limiter'.
+
     .. versionadded:: 0.0.7
     """
 
-    # Maybe has something complicated problems.
-
     def __init__(self, key, limit, period, send_x_headers=True):
-        self.reset = int(time.time()) + period
         self.key = key
         self.limit = limit
         self.period = period
         self.send_x_headers = send_x_headers
-        p = app.redis.pipeline()
-        p.incr(self.key)
-        p.expireat(self.key, self.reset)
-        self.current = p.execute()[0]
+        self.current, self.reset = app.rate_limiter.hit(key, limit, period)
 
     remaining = property(lambda x: x.limit - x.current)
     over_limit = property(lambda x: x.current > x.limit)
@@ -284,35 +286,45 @@ def get_rate_limit():
     return getattr(g, "_rate_limit", None)
 
 
-def ratelimit():
+def ratelimit(endpoint_class=None):
     """Enables support for Rate-Limits on API methods
     The key is constructed by default from the remote address or the
-    authorization.username if authentication is being used. On
-    a authentication-only API, this will impose a ratelimit even on
-    non-authenticated users, reducing exposure to DDoS attacks.
+    authorization.username if authentication is being used. Applied after
+    :func:`eve.auth.requires_auth`, so that the key can be the authenticated
+    user: requests failing authentication are not counted.
 
     Before the function is executed it increments the rate limit with the help
     of the RateLimit class and stores an instance on g as g._rate_limit. Also
     if the client is indeed over limit, we return a 429, see
     http://tools.ietf.org/html/draft-nottingham-http-new-status-04#section-4
 
+    :param endpoint_class: the 'class' to which the decorated endpoint belongs
+                           to, as with :func:`eve.auth.requires_auth`.
+                           Resource and item endpoints honor the resource
+                           'rate_limit' and 'item_rate_limit' settings.
+
+    .. versionchanged:: 2.4
+       Redis is not needed by the 'local' rate limit backend.
+       'endpoint_class' argument added, for resource rate limits.
+       The key is the user or token set by the authentication class, if any.
+       Applied after authentication.
+
     .. versionadded:: 0.0.7
     """
 
     def decorator(f):
         @wraps(f)
         def rate_limited(*args, **kwargs):
-            method_limit = app.config.get("RATE_LIMIT_" + request.method)
-            if method_limit and app.redis:
+            resource = None
+            if endpoint_class == "resource" or endpoint_class == "item":
+                resource = args[0] if args else kwargs.get("resource")
+            method_limit, prefix = app.rate_limiter.policy(
+                resource, endpoint_class, request.method
+            )
+            if method_limit and app.rate_limiter.available():
                 limit = method_limit[0]
                 period = method_limit[1]
-                # If authorization is being used the key is 'username'.
-                # Else, fallback to client IP.
-                key = "rate-limit/%s" % (
-                    request.authorization.username
-                    if request.authorization
-                    else request.remote_addr
-                )
+                key = prefix + rate_limit_client(resource)
                 rlimit = RateLimit(key, limit, period, True)
                 if rlimit.over_limit:
                     abort(429, "Rate limit exceeded")
@@ -328,6 +340,24 @@ def ratelimit():
     return decorator
 
 
+def rate_limit_client(resource=None):
+    """Returns the key identifying the client for rate limiting purposes: the
+    user or token set by the authentication class once the request is
+    authenticated, or the authorization username, or the client IP.
+
+    :param resource: the resource being requested, if any.
+
+    .. versionadded:: 2.4
+    """
+    auth = app.auth
+    if resource in app.config["DOMAIN"]:
+        auth = resource_auth(resource)
+    user = auth.get_user_or_token() if auth else None
+    if not user and request.authorization:
+        user = request.authorization.username
+    return str(user or request.remote_addr)
+
+
 def last_updated(document):
     """Fixes document's LAST_UPDATED field value. Flask-PyMongo returns
     timezone-aware values while stdlib datetime values are timezone-naive.
@@ -383,6 +413,10 @@ def serialize(document, resource=None, schema=None, fields=None):
     """Recursively handles field values that require data-aware serialization.
     Relies on the app.data.serializers dictionary.
 
+    .. versionchanged:: 2.4
+       Execute the compiled serialization plan of the resource (or schema)
+       instead of walking the schema for every document.
+
     .. versionchanged: 0.8.1
        Normalize dotted fields according to normalized_dotted_fields. See #1173.
 
@@ -407,10 +441,6 @@ def serialize(document, resource=None, schema=None, fields=None):
 
     .. versionadded:: 0.1.1
     """
-
-    def resolve_schema(schema):
-        return schema if isinstance(schema, dict) else schema_registry.get(schema)
-
     if (
         resource not in config.DOMAIN
         or config.DOMAIN[resource]["normalize_dotted_fields"]
@@ -419,130 +449,306 @@ def serialize(document, resource=None, schema=None, fields=None):
 
     if app.data.serializers:
         if resource:
-            schema = resolve_schema(config.DOMAIN[resource]["schema"])
-        if not fields:
-            fields = document.keys()
-        for field in fields:
-            if document[field] is None:
-                continue
-            if field in schema:
-                field_schema = schema[field]
-                if not isinstance(field_schema, dict):
-                    field_schema = rules_set_registry.get(field_schema)
-                field_types = field_schema.get("type")
-                if not isinstance(field_types, list):
-                    field_types = [field_types]
-                for field_type in field_types:
-                    for x_of in ["allof", "anyof", "oneof", "noneof"]:
-                        for optschema in field_schema.get(x_of, []):
-                            optschema = dict(field_schema, **optschema)
-                            optschema.pop(x_of, None)
-                            serialize(document, schema={field: optschema})
-                        x_of_type = "{0}_type".format(x_of)
-                        for opttype in field_schema.get(x_of_type, []):
-                            optschema = dict(field_schema, type=opttype)
-                            optschema.pop(x_of_type, None)
-                            serialize(document, schema={field: optschema})
-                    if config.AUTO_CREATE_LISTS and field_type == "list":
-                        # Convert single values to lists
-                        if not isinstance(document[field], list):
-                            document[field] = [document[field]]
-                    if "schema" in field_schema:
-                        field_schema = resolve_schema(field_schema["schema"])
-                        if "dict" in (field_type, field_schema.get("type")):
-                            # either a dict or a list of dicts
-                            embedded = (
-                                [document[field]]
-                                if field_type == "dict"
-                                else document[field]
-                            )
-                            for subdocument in embedded:
-                                if not isinstance(subdocument, dict):
-                                    # value is not a dict - continue
-                                    # serialization error will be reported by
-                                    # validation if appropriate
-                                    continue
-                                if "schema" in field_schema:
-                                    serialize(
-                                        subdocument, schema=field_schema["schema"]
-                                    )
-                                else:
-                                    serialize(subdocument, schema=field_schema)
-                        elif field_schema.get("type") == "list":
-                            # a list of lists
-                            sublist_schema = resolve_schema(field_schema.get("schema"))
-                            item_type = sublist_schema.get("type")
-                            for sublist in document[field]:
-                                for i, v in enumerate(sublist):
-                                    if item_type == "dict":
-                                        serialize(
-                                            sublist[i], schema=sublist_schema["schema"]
-                                        )
-                                    elif item_type in app.data.serializers:
-                                        sublist[i] = serialize_value(item_type, v)
-                        elif field_schema.get("type") is None:
-                            # a list of items determined by *of rules
-                            for x_of in ["allof", "anyof", "oneof", "noneof"]:
-                                for optschema in field_schema.get(x_of, []):
-                                    serialize(
-                                        document,
-                                        schema={
-                                            field: {
-                                                "type": field_type,
-                                                "schema": optschema,
-                                            }
-                                        },
-                                    )
-                                x_of_type = "{0}_type".format(x_of)
-                                for opttype in field_schema.get(x_of_type, []):
-                                    serialize(
-                                        document,
-                                        schema={
-                                            field: {
-                                                "type": field_type,
-                                                "schema": {"type": opttype},
-                                            }
-                                        },
-                                    )
-                        else:
-                            # a list of one type, arbitrary length
-                            field_type = field_schema.get("type")
-                            if field_type in app.data.serializers:
-                                for i, v in enumerate(document[field]):
-                                    document[field][i] = serialize_value(field_type, v)
-                    elif "items" in field_schema:
-                        # a list of multiple types, fixed length
-                        for i, (s, v) in enumerate(
-                            zip(field_schema["items"], document[field])
-                        ):
-                            field_type = s.get("type")
-                            if field_type in app.data.serializers:
-                                document[field][i] = serialize_value(
-                                    field_type, document[field][i]
-                                )
-                    elif "valueschema" in field_schema:
-                        # a valueschema
-                        field_type = field_schema["valueschema"]["type"]
-                        if field_type == "objectid":
-                            target = document[field]
-                            for field in target:
-                                target[field] = serialize_value(
-                                    field_type, target[field]
-                                )
-                        elif field_type == "dict":
-                            for subdocument in document[field].values():
-                                serialize(
-                                    subdocument,
-                                    schema=field_schema["valueschema"]["schema"],
-                                )
-
-                    elif field_type in app.data.serializers:
-                        # a simple field
-                        document[field] = serialize_value(field_type, document[field])
+            plan = serialization_plan(resource)
+        else:
+            plan = compile_serialization_plan(schema)
+        run_serialization_plan(plan, document, fields)
 
     return document
 
 
+def serialization_plan(resource):
+    """Returns the serialization plan of a resource. Plans are compiled on
+    first use, and compiled again when the resource schema is replaced or
+    the ``app.schema_version`` changes (see
+    :meth:`~eve.Eve.invalidate_schema_caches`).
+
+    :param resource: the resource name.
+
+    .. versionadded:: 2.4
+    """
+    schema = _resolve_schema(config.DOMAIN[resource]["schema"])
+    version = app.schema_version
+    cached = app.serialization_plans.get(resource)
+    if cached is None or cached[0] is not schema or cached[1] != version:
+        cached = schema, version, compile_serialization_plan(schema)
+        app.serialization_plans[resource] = cached
+    return cached[2]
+
+
+def compile_serialization_plan(schema, _plans=None):
+    """Compiles a schema into a serialization plan: a dictionary mapping the
+    fields which need serialization to the (ordered) list of operations which
+    serialize their values. Fields whose types have no serializer, and
+    sub-documents without such fields, are left out of the plan altogether.
+
+    Operations are callables accepting the document and the field name. Plans
+    are executed with :func:`run_serialization_plan`.
+
+    :param schema: the schema (or its registry name) to compile.
+
+    .. versionadded:: 2.4
+    """
+    schema = _resolve_schema(schema)
+    if _plans is None:
+        _plans = {}
+    elif id(schema) in _plans:
+        # a recursive schema; the plan might still be being compiled.
+        return _plans[id(schema)][0]
+
+    plan = {}
+    _plans[id(schema)] = plan, True
+    for field, rules in schema.items():
+        operations = _field_operations(rules, _plans)
+        if operations:
+            plan[field] = operations
+    _plans[id(schema)] = plan, False
+    return plan
+
+
+def run_serialization_plan(plan, document, fields=None):
+    """Serializes a document, in place, by executing a serialization plan.
+
+    :param plan: the plan, as returned by :func:`compile_serialization_plan`.
+    :param document: the document to serialize.
+    :param fields: the fields to serialize. Defaults to all document fields.
+
+    .. versionadded:: 2.4
+    """
+    if fields:
+        steps = ((field, plan.get(field, ())) for field in fields)
+    else:
+        steps = ((field, ops) for field, ops in plan.items() if field in document)
+    for field, operations in steps:
+        if document[field] is None:
+            continue
+        for operation in operations:
+            operation(document, field)
+    return document
+
+
+def _resolve_schema(schema):
+    return schema if isinstance(schema, dict) else schema_registry.get(schema)
+
+
+def _subplan(schema, plans):
+    """Returns the plan of a sub-schema, or None if it is (for sure) empty."""
+    plan = compile_serialization_plan(schema, plans)
+    compiling = plans[id(_resolve_schema(schema))][1]
+    return plan if plan or compiling else None
+
+
+def _serializer(field_type):
+    serializer = app.data.serializers.get(field_type)
+    if serializer is None:
+        return None
+
+    def serialize_value(value):
+        try:
+            return serializer(value)
+        except (KeyError, ValueError, TypeError, InvalidId):
+            # value can't be cast, return as is and validation will later
+            # report back the issue.
+            return value
+
+    return serialize_value
+
+
+def _field_operations(rules, plans):
+    """Compiles the rules of a field into the list of operations which
+    serialize its values, mirroring the casting rules of ``serialize``.
+    """
+    if not isinstance(rules, dict):
+        rules = rules_set_registry.get(rules)
+    field_types = rules.get("type")
+    if not isinstance(field_types, list):
+        field_types = [field_types]
+
+    operations = []
+    for field_type in field_types:
+        for x_of in ["allof", "anyof", "oneof", "noneof"]:
+            optschemas = []
+            for optschema in rules.get(x_of, []):
+                optschema = dict(rules, **optschema)
+                optschema.pop(x_of, None)
+                optschemas.append(optschema)
+            x_of_type = "{0}_type".format(x_of)
+            for opttype in rules.get(x_of_type, []):
+                optschema = dict(rules, type=opttype)
+                optschema.pop(x_of_type, None)
+                optschemas.append(optschema)
+            for optschema in optschemas:
+                ops = _field_operations(optschema, plans)
+                if ops:
+                    operations.append(_nested_operations(ops))
+
+        if field_type == "list":
+            operations.append(_auto_create_list)
+
+        if "schema" in rules:
+            field_schema = _resolve_schema(rules["schema"])
+            field_schema_type = field_schema.get("type")
+            if "dict" in (field_type, field_schema_type):
+                # either a dict or a list of dicts
+                plan = _subplan(field_schema.get("schema", field_schema), plans)
+                if plan is not None:
+                    operations.append(_subdocuments(plan, field_type == "dict"))
+            elif field_schema_type == "list":
+                # a list of lists
+                sublist_schema = _resolve_schema(field_schema.get("schema"))
+                item_type = sublist_schema.get("type")
+                serializer = _serializer(item_type)
+                if item_type == "dict":
+                    plan = _subplan(sublist_schema["schema"], plans)
+                    if plan is not None:
+                        operations.append(_sublists_of_subdocuments(plan))
+                elif serializer:
+                    operations.append(_sublists(serializer))
+            elif field_schema_type is None:
+                # a list of items determined by *of rules
+                for x_of in ["allof", "anyof", "oneof", "noneof"]:
+                    optschemas = list(field_schema.get(x_of, []))
+                    optschemas.extend(
+                        {"type": opttype}
+                        for opttype in field_schema.get("{0}_type".format(x_of), [])
+                    )
+                    for optschema in optschemas:
+                        ops = _field_operations(
+                            {"type": field_type, "schema": optschema}, plans
+                        )
+                        if ops:
+                            operations.append(_nested_operations(ops))
+            else:
+                # a list of one type, arbitrary length
+                serializer = _serializer(field_schema_type)
+                if serializer:
+                    operations.append(_items(serializer))
+        elif "items" in rules:
+            # a list of multiple types, fixed length
+            serializers = [
+                (i, _serializer(item.get("type")))
+                for i, item in enumerate(rules["items"])
+            ]
+            serializers = [(i, s) for i, s in serializers if s]
+            if serializers:
+                operations.append(_fixed_items(serializers))
+        elif "valueschema" in rules:
+            # a valueschema
+            valueschema = rules["valueschema"]
+            value_type = valueschema.get("type")
+            serializer = _serializer(value_type)
+            if value_type == "objectid" and serializer:
+                operations.append(_values(serializer))
+            elif value_type == "dict":
+                plan = _subplan(valueschema["schema"], plans)
+                if plan is not None:
+                    operations.append(_value_subdocuments(plan))
+        else:
+            # a simple field
+            serializer = _serializer(field_type)
+            if serializer:
+                operations.append(_value(serializer))
+
+    return operations
+
+
+def _nested_operations(operations):
+    def run(document, field):
+        if document[field] is not None:
+            for operation in operations:
+                operation(document, field)
+
+    return run
+
+
+def _auto_create_list(document, field):
+    if not isinstance(document[field], list) and config.AUTO_CREATE_LISTS:
+        # Convert single values to lists
+        document[field] = [document[field]]
+
+
+def _value(serializer):
+    def run(document, field):
+        document[field] = serializer(document[field])
+
+    return run
+
+
+def _items(serializer):
+    def run(document, field):
+        items = document[field]
+        for i, value in enumerate(items):
+            items[i] = serializer(value)
+
+    return run
+
+
+def _fixed_items(serializers):
+    def run(document, field):
+        items = document[field]
+        length = len(items)
+        for i, serializer in serializers:
+            if i < length:
+                items[i] = serializer(items[i])
+
+    return run
+
+
+def _values(serializer):
+    def run(document, field):
+        values = document[field]
+        for key in values:
+            values[key] = serializer(values[key])
+
+    return run
+
+
+def _sublists(serializer):
+    def run(document, field):
+        for sublist in document[field]:
+            for i, value in enumerate(sublist):
+                sublist[i] = serializer(value)
+
+    return run
+
+
+def _subdocuments(plan, single):
+    def run(document, field):
+        if not plan:
+            return
+        subdocuments = [document[field]] if single else document[field]
+        for subdocument in subdocuments:
+            # value is not a dict - serialization error will be reported by
+            # validation if appropriate
+            if isinstance(subdocument, dict):
+                run_serialization_plan(plan, subdocument)
+
+    return run
+
+
+def _sublists_of_subdocuments(plan):
+    def run(document, field):
+        if not plan:
+            return
+        for sublist in document[field]:
+            for subdocument in sublist:
+                if isinstance(subdocument, dict):
+                    run_serialization_plan(plan, subdocument)
+
+    return run
+
+
+def _value_subdocuments(plan):
+    def run(document, field):
+        if not plan:
+            return
+        for subdocument in document[field].values():
+            if isinstance(subdocument, dict):
+                run_serialization_plan(plan, subdocument)
+
+    return run
+
+
 def serialize_value(field_type, value):
     """Serialize value of a given type. Relies on the app.data.serializers
     dictionary.
@@ -1086,6 +1292,9 @@ def resolve_embedded_documents(document, resource, embedded_fields):
     :param resource: the resource name.
     :param embedded_fields: the list of fields we are allowed to embed.
 
+    .. versionchanged:: 2.4
+       Delegate to resolve_embedded_documents_batch.
+
     .. versionchanged:: 0.5
        Support for embedding documents located in subdocuments.
        Allocated two functions embedded_document and subdocuments.
@@ -1102,16 +1311,132 @@ def resolve_embedded_documents(document, resource, embedded_fields):
 
     .. versionadded:: 0.1.0
     """
+    resolve_embedded_documents_batch([document], resource, embedded_fields)
+
+
+def resolve_embedded_documents_batch(documents, resource, embedded_fields):
+    """Adds embedded representations to a set of documents, typically a
+    whole page of a collection response. For each embedded field, the
+    references of all documents are collected first, then each related
+    resource is fetched with a single query, and the results are stitched
+    back by id.
+
+    References to versioned data relations are still resolved one by one.
+
+    :param documents: the documents to embed other documents into.
+    :param resource: the resource name.
+    :param embedded_fields: the list of fields we are allowed to embed.
+
+    .. versionadded:: 2.4
+    """
     # NOTE(Gonéri): We resolve the embedded documents at the end.
     for field in sorted(embedded_fields, key=lambda a: a.count(".")):
         data_relation = field_definition(resource, field)["data_relation"]
-        getter = lambda ref: embedded_document(ref, data_relation, field)  # noqa
         fields_chain = field.split(".")
         last_field = fields_chain[-1]
-        for subdocument in subdocuments(fields_chain[:-1], resource, document):
-            if not subdocument or last_field not in subdocument:
-                continue
-            subdocument[last_field] = getter(subdocument[last_field])
+
+        targets = []
+        for document in documents:
+            for subdocument in subdocuments(fields_chain[:-1], resource, document):
+                if not subdocument or last_field not in subdocument:
+                    continue
+                targets.append(subdocument)
+
+        if data_relation.get("version") is True:
+            for subdocument in targets:
+                subdocument[last_field] = embedded_document(
+                    subdocument[last_field], data_relation, field
+                )
+            continue
+
+        references = []
+        for subdocument in targets:
+            value = subdocument[last_field]
+            references.extend(value if isinstance(value, list) else [value])
+        embedded = embedded_documents_map(references, data_relation)
+
+        def lookup(reference):
+            # every occurrence gets its own copy, so that deeper embeddings
+            # and callbacks never see a document shared with another one.
+            document = embedded.get(embedded_document_key(reference, data_relation))
+            return copy(document) if document is not None else None
+
+        for subdocument in targets:
+            value = subdocument[last_field]
+            if isinstance(value, list):
+                value = [lookup(reference) for reference in value]
+                subdocument[last_field] = [doc for doc in value if doc is not None]
+            else:
+                subdocument[last_field] = lookup(value)
+
+
+def resolve_embedded_media_files(documents, resource, embedded_fields):
+    """Resolves the media files of documents which have been embedded by the
+    data layer (see ``ParsedRequest.embedded_lookup``).
+
+    :param documents: the documents holding the embedded documents.
+    :param resource: the resource name.
+    :param embedded_fields: the fields embedded by the data layer.
+
+    .. versionadded:: 2.4
+    """
+    for field in embedded_fields:
+        subresource = field_definition(resource, field)["data_relation"]["resource"]
+        for document in documents:
+            value = document.get(field)
+            for embedded in value if isinstance(value, list) else [value]:
+                if isinstance(embedded, dict):
+                    resolve_media_files(embedded, subresource)
+
+
+def embedded_document_key(reference, data_relation):
+    """Returns a ``(resource, id_field, id_value)`` tuple identifying the
+    document referenced by `reference`. Both plain ids and DBRefs are
+    supported. With DBRefs the target resource is the referenced collection,
+    and the id field is always ``_id``.
+
+    :param reference: DBRef or id of the document to be embedded.
+    :param data_relation: the relation schema definition.
+
+    .. versionadded:: 2.4
+    """
+    if isinstance(reference, DBRef):
+        return reference.collection, "_id", reference.id
+    subresource = data_relation["resource"]
+    id_field = data_relation.get("field") or config.DOMAIN[subresource]["id_field"]
+    return subresource, id_field, reference
+
+
+def embedded_documents_map(references, data_relation):
+    """Fetches the documents referenced by `references`, with one query per
+    referenced resource, and returns them as a dict keyed by
+    :func:`embedded_document_key`.
+
+    :param references: list of DBRefs or ids of the documents to be embedded.
+    :param data_relation: the relation schema definition.
+
+    .. versionadded:: 2.4
+    """
+    queries = {}
+    for reference in references:
+        if reference is None:
+            continue
+        subresource, id_field, id_value = embedded_document_key(
+            reference, data_relation
+        )
+        values = queries.setdefault((subresource, id_field), [])
+        if id_value not in values:
+            values.append(id_value)
+
+    embedded = {}
+    for (subresource, id_field), values in queries.items():
+        result, _ = app.data.find(
+            subresource, None, {id_field: {"$in": values}}, perform_count=False
+        )
+        for document in result:
+            resolve_media_files(document, subresource)
+            embedded[(subresource, id_field, document.get(id_field))] = document
+    return embedded
 
 
 def resolve_media_files(document, resource):
@@ -1310,6 +1635,9 @@ def resolve_user_restricted_access(document, resource):
 def resolve_document_etag(documents, resource):
     """Adds etags to documents.
 
+    .. versionchanged:: 2.4
+       Etags are computed for all the documents at once.
+
     .. versionadded:: 0.5
     """
     if config.IF_MATCH:
@@ -1318,8 +1646,9 @@ def resolve_document_etag(documents, resource):
         if not isinstance(documents, list):
             documents = [documents]
 
-        for document in documents:
-            document[config.ETAG] = document_etag(document, ignore_fields=ignore_fields)
+        etags = document_etags(documents, ignore_fields=ignore_fields)
+        for document, etag in zip(documents, etags):
+            document[config.ETAG] = etag
 
 
 def pre_event(f):
@@ -1458,6 +1787,10 @@ def oplog_push(resource, document, op, id=None):
     :param op: operation performed. Can be 'POST', 'PUT', 'PATCH', 'DELETE'.
     :param id: unique id of the document.
 
+    .. versionchanged:: 2.4
+       Entries are written by the 'oplog_writer', as configured by
+       OPLOG_WRITER.
+
     .. versionchanged:: 0.7
        Add user information to the audit. Closes #846.
        Raise on_oplog_push event.
@@ -1527,7 +1860,27 @@ def oplog_push(resource, document, op, id=None):
         # notify callbacks
         getattr(app, "on_oplog_push")(resource, entries)
         # oplog push
-        app.data.insert(config.OPLOG_NAME, entries)
+        app.oplog_writer.push(entries)
+
+
+def change_feed_push(resource, documents, op):
+    """Publishes the changes made to `documents` to the change feed, if
+    enabled for the resource.
+
+    :param resource: name of the resource involved.
+    :param documents: the stored document(s), or the deleted one(s).
+    :param op: operation performed. Can be 'insert', 'update', 'replace' or
+               'delete'.
+
+    .. versionadded:: 2.4
+    """
+    if not config.DOMAIN[resource]["change_feed"] or app.change_feed is None:
+        return
+
+    if not isinstance(documents, list):
+        documents = [documents]
+    if documents:
+        app.change_feed.publish(resource, op, documents)
 
 
 def utcnow():
@@ -16,8 +16,9 @@ from flask import abort
 from flask import current_app as app
 
 from eve.auth import requires_auth
-from eve.methods.common import (get_document, oplog_push, pre_event, ratelimit,
-                                resolve_document_etag, utcnow)
+from eve.methods.common import (change_feed_push, get_document, oplog_push,
+                                pre_event, ratelimit, resolve_document_etag,
+                                utcnow)
 from eve.utils import ParsedRequest, config
 from eve.versioning import (insert_versioning_documents, late_versioning_catch,
                             resolve_document_version, versioned_id_field)
@@ -27,8 +28,8 @@ def all_done():
     return {}, None, None, 204
 
 
-@ratelimit()
 @requires_auth("item")
+@ratelimit("item")
 @pre_event
 def deleteitem(resource, **lookup):
     """
@@ -55,6 +56,9 @@ def deleteitem_internal(
     :param original: original document if already fetched from the database
     :param **lookup: item lookup query.
 
+    .. versionchanged:: 2.4
+       Pass the original document to insert_versioning_documents().
+
     .. versionchanged:: 0.6
        Support for soft delete.
 
@@ -131,9 +135,10 @@ def deleteitem_internal(
         # create previous version if it wasn't already there
         late_versioning_catch(original, resource)
         # and add deleted version
-        insert_versioning_documents(resource, marked_document)
+        insert_versioning_documents(resource, marked_document, original)
         # update oplog if needed
         oplog_push(resource, marked_document, "DELETE", id)
+        change_feed_push(resource, marked_document, "delete")
 
     else:
         # Delete the document for real
@@ -174,6 +179,7 @@ def deleteitem_internal(
 
         # update oplog if needed
         oplog_push(resource, original, "DELETE", id)
+        change_feed_push(resource, original, "delete")
 
     if not suppress_callbacks:
         getattr(app, "on_deleted_item")(resource, original)
@@ -13,35 +13,47 @@
 from __future__ import division
 
 import copy
+import itertools
 import math
 
 import simplejson as json
-from flask import abort
+from flask import Response, abort
 from flask import current_app as app
-from flask import request
+from flask import request, stream_with_context
 from werkzeug.datastructures import MultiDict
 
-from eve.auth import requires_auth
-from eve.utils import config, home_link, parse_request, querydef
+from eve.auth import requires_auth, resource_auth
+from eve.render import JSONRenderer, _best_mime
+from eve.utils import (config, encode_cursor, home_link, json_dumps,
+                       parse_request, querydef)
 from eve.versioning import (diff_document, get_old_document,
+                            is_version_delta, rebuild_versions,
                             synthesize_versioned_document, versioned_id_field)
 
 from .common import (build_response_document, document_link, epoch,
                      last_updated, pre_event, ratelimit,
-                     resolve_embedded_fields, resource_link)
+                     resolve_embedded_documents_batch, resolve_embedded_fields,
+                     resolve_embedded_media_files, resource_link)
 
 
-@ratelimit()
 @requires_auth("resource")
+@ratelimit("resource")
 @pre_event
 def get(resource, **lookup):
     """
     Default function for handling GET requests, it has decorators for
     rate limiting, authentication and for raising pre-request events. After the
-    decorators are applied forwards to call to :func:`get_internal`
+    decorators are applied forwards to call to :func:`get_internal`, unless
+    the response is streamed.
+
+    .. versionchanged:: 2.4
+       Support for streamed responses ('streaming_get').
 
     .. versionadded:: 0.6.2
     """
+    datasource = config.DOMAIN[resource]["datasource"]
+    if not datasource.get("aggregation") and _streaming_get(resource):
+        return _perform_find(resource, lookup, streaming=True)
     return get_internal(resource, **lookup)
 
 
@@ -238,8 +250,15 @@ def _perform_aggregation(resource, pipeline, options):
     return response, None, None, 200, []
 
 
-def _perform_find(resource, lookup):
+def _perform_find(resource, lookup, streaming=False):
     """
+    .. versionchanged:: 2.4
+       Support for keyset pagination.
+       HEADER_TOTAL_COUNT_STRATEGY header.
+       Embedded documents are resolved for the whole page at once.
+       Support for server-side embedding ('embedding_lookup').
+       Support for streamed responses ('streaming' argument).
+
     .. versionadded:: 0.7
     """
     documents = []
@@ -248,40 +267,91 @@ def _perform_find(resource, lookup):
     req = parse_request(resource)
     embedded_fields = resolve_embedded_fields(resource, req)
 
+    keyset_sort = None
+    if (
+        config.DOMAIN[resource]["pagination"]
+        and config.DOMAIN[resource]["keyset_pagination"]
+    ):
+        keyset_sort = app.data.keyset_sort(resource, req)
+        if req.page > 1:
+            abort(
+                400,
+                description="Keyset paginated resources don't support `page`, "
+                "follow the `cursor` of the pagination links instead",
+            )
+    first_values = last_values = None
+
+    if embedded_fields and config.DOMAIN[resource]["embedding_lookup"]:
+        # let the data layer embed whatever it can in the same round trip.
+        req.embedded_lookup = [
+            field
+            for field in embedded_fields
+            if app.data.lookup_embeddable(resource, field)
+        ]
+        embedded_fields = [
+            field for field in embedded_fields if field not in req.embedded_lookup
+        ]
+
     # continue processing the full request
     last_update = epoch()
 
     # If-Modified-Since disabled on collections (#334)
     req.if_modified_since = None
 
+    embedded_lookup = req.embedded_lookup
     cursor, count = app.data.find(
         resource, req, lookup, perform_count=not config.DOMAIN[resource]["optimize_pagination_for_speed"]
     )
+    if embedded_lookup and not req.embedded_lookup:
+        # the data layer could not embed them after all.
+        embedded_fields = embedded_fields + embedded_lookup
+
+    status = 200
+    headers = []
+
+    if count is not None:
+        headers.append((config.HEADER_TOTAL_COUNT, count))
+        if _report_count_strategy(resource, req):
+            headers.append((config.HEADER_TOTAL_COUNT_STRATEGY, req.count_strategy))
+
+    if streaming:
+        # documents are encoded and sent as they come out of the cursor, so
+        # neither Last-Modified nor ETag are known when headers go out.
+        response = _stream_find(
+            resource, req, cursor, count, keyset_sort, embedded_fields
+        )
+        return response, None, etag, status, headers
+
     # If soft delete is enabled, data.find will not include items marked
     # deleted unless req.show_deleted is True
     for document in cursor:
-        build_response_document(document, resource, embedded_fields)
+        if keyset_sort:
+            # cursor values must be collected before the document is
+            # altered by embedding and the like.
+            last_values = _keyset_values(document, keyset_sort)
+            if first_values is None:
+                first_values = last_values
+        # embedded documents are resolved later on, for the whole page.
+        build_response_document(document, resource, [])
         documents.append(document)
 
         # build last update for entire response
         if document[config.LAST_UPDATED] > last_update:
             last_update = document[config.LAST_UPDATED]
 
-    status = 200
-    headers = []
+    _resolve_page_embedding(resource, req, documents, embedded_fields)
+
     last_modified = last_update if last_update > epoch() else None
 
     response[config.ITEMS] = documents
 
-    if count is not None:
-        headers.append((config.HEADER_TOTAL_COUNT, count))
-
-    if config.DOMAIN[resource]["hateoas"]:
-        response[config.LINKS] = _pagination_links(resource, req, count)
+    cursors = None
+    if keyset_sort:
+        cursors = _keyset_cursors(
+            req, keyset_sort, len(documents), first_values, last_values
+        )
 
-    # add pagination info
-    if config.DOMAIN[resource]["pagination"]:
-        response[config.META] = _meta_links(resource, req, count)
+    response.update(_collection_envelope(resource, req, count, cursors))
 
     # notify registered callback functions. Please note that, should the
     # functions modify the documents, the last_modified and etag won't be
@@ -299,8 +369,332 @@ def _perform_find(resource, lookup):
     return response, last_modified, etag, status, headers
 
 
-@ratelimit()
+def _resolve_page_embedding(resource, req, documents, embedded_fields):
+    """Completes embedding for a page (or a chunk of a page) of documents
+    which have already been processed by :func:`build_response_document`.
+
+    :param resource: the resource name.
+    :param req: parsed request object.
+    :param documents: the documents to be sent to the client.
+    :param embedded_fields: fields to be embedded by the API (as opposed to
+                            those embedded by the data layer already).
+
+    .. versionadded:: 2.4
+    """
+    if req.embedded_lookup:
+        resolve_embedded_media_files(documents, resource, req.embedded_lookup)
+
+    if embedded_fields:
+        # soft deleted documents are sent without expansion of embedded
+        # documents.
+        soft_delete = config.DOMAIN[resource]["soft_delete"]
+        resolve_embedded_documents_batch(
+            [
+                document
+                for document in documents
+                if not (soft_delete and document.get(config.DELETED) is True)
+            ],
+            resource,
+            embedded_fields,
+        )
+
+
+def _collection_envelope(resource, req, count, cursors):
+    """Returns the ``_links`` and ``_meta`` fields of a collection response,
+    as configured for the resource.
+
+    .. versionadded:: 2.4
+    """
+    envelope = {}
+    if config.DOMAIN[resource]["hateoas"]:
+        envelope[config.LINKS] = _pagination_links(
+            resource, req, count, cursors=cursors
+        )
+
+    # add pagination info
+    if config.DOMAIN[resource]["pagination"]:
+        envelope[config.META] = _meta_links(
+            resource, req, count, keyset=cursors is not None
+        )
+    return envelope
+
+
+def _streaming_get(resource):
+    """Returns True if the current collection request should be served with
+    a streamed response. That is the case when streaming is enabled for the
+    resource and the response is going to be plain JSON. Since callbacks
+    expect the whole response payload, the standard response is sent if any
+    ``on_fetched_resource`` callback is registered for the resource.
+
+    .. versionadded:: 2.4
+    """
+    if not config.DOMAIN[resource]["streaming_get"]:
+        return False
+
+    if request.method != "GET" or "pretty" in request.args:
+        return False
+
+    if config.JSONP_ARGUMENT and config.JSONP_ARGUMENT in request.args:
+        return False
+
+    if _best_mime()[1] is not JSONRenderer:
+        return False
+
+    return not (
+        len(getattr(app, "on_fetched_resource"))
+        or len(getattr(app, "on_fetched_resource_%s" % resource))
+    )
+
+
+def _stream_find(resource, req, cursor, count, keyset_sort, embedded_fields):
+    """Returns a response which streams the collection payload while the
+    cursor is being consumed. Documents are processed and encoded in chunks
+    of ``STREAMING_GET_CHUNK_SIZE``, so memory usage does not depend on the
+    number of documents being sent. ``_links`` and ``_meta`` are sent after
+    the items.
+
+    .. versionadded:: 2.4
+    """
+
+    def generate():
+        first_values = last_values = None
+        sent = 0
+        documents = iter(cursor)
+
+        yield "{%s: [" % json_dumps(config.ITEMS)
+        while True:
+            chunk = list(
+                itertools.islice(documents, config.STREAMING_GET_CHUNK_SIZE)
+            )
+            if not chunk:
+                break
+            for document in chunk:
+                if keyset_sort:
+                    last_values = _keyset_values(document, keyset_sort)
+                    if first_values is None:
+                        first_values = last_values
+                build_response_document(document, resource, [])
+            _resolve_page_embedding(resource, req, chunk, embedded_fields)
+
+            yield (", " if sent else "") + ", ".join(json_dumps(doc) for doc in chunk)
+            sent += len(chunk)
+
+        cursors = None
+        if keyset_sort:
+            cursors = _keyset_cursors(req, keyset_sort, sent, first_values, last_values)
+        envelope = _collection_envelope(resource, req, count, cursors)
+
+        # the 'extra' cursor field, if present, will be added to the response.
+        if hasattr(cursor, "extra"):
+            getattr(cursor, "extra")(envelope)
+
+        yield ("], %s" % json_dumps(envelope)[1:]) if envelope else "]}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+@requires_auth("resource")
+@ratelimit("resource")
+@pre_event
+def export(resource, **lookup):
+    """
+    Default function for handling GET requests to export endpoints, it has
+    decorators for rate limiting, authentication and for raising pre-request
+    events. After the decorators are applied forwards to call to
+    :func:`export_internal`
+
+    .. versionadded:: 2.4
+    """
+    return export_internal(resource, **lookup)
+
+
+def export_internal(resource, **lookup):
+    """Streams all the resource documents matching the current request as
+    newline-delimited JSON, one raw document per line, sorted by id field.
+    Filters and projections are honored like with standard GET requests, while
+    pagination is not; no count is performed and no HATEOAS metafields are
+    added. Clients can resume an interrupted export by passing the id of the
+    last document received with the ``QUERY_EXPORT_AFTER`` query parameter.
+
+    :param resource: the name of the resource.
+    :param **lookup: sub resource lookup from the endpoint url.
+
+    .. versionadded:: 2.4
+    """
+    req = parse_request(resource)
+    after = request.args.get(config.QUERY_EXPORT_AFTER)
+    cursor = app.data.export(resource, req, lookup, after=after)
+
+    def generate():
+        documents = iter(cursor)
+        try:
+            while True:
+                batch = list(
+                    itertools.islice(documents, config.EXPORT_BATCH_SIZE)
+                )
+                if not batch:
+                    break
+                yield "".join("%s\n" % json_dumps(document) for document in batch)
+        finally:
+            # the cursor does not time out on its own.
+            if hasattr(cursor, "close"):
+                cursor.close()
+
+    response = Response(
+        stream_with_context(generate()), mimetype="application/x-ndjson"
+    )
+    return response, None, None, 200, []
+
+
+@requires_auth("resource")
+@ratelimit("resource")
+@pre_event
+def tail(resource, **lookup):
+    """
+    Default function for handling GET requests to the oplog tail endpoint, it
+    has decorators for rate limiting, authentication and for raising
+    pre-request events. After the decorators are applied forwards to call to
+    :func:`tail_internal`
+
+    .. versionadded:: 2.4
+    """
+    return tail_internal(resource, **lookup)
+
+
+def tail_internal(resource, **lookup):
+    """Returns the oplog entries added after the one whose id is passed
+    with the ``QUERY_EXPORT_AFTER`` query parameter, or, if it is missing,
+    after the last one. If there are none yet, the request waits up to
+    ``OPLOG_TAIL_TIMEOUT`` seconds for new entries to come in. Filters and
+    projections are honored like with standard GET requests. The payload
+    ``_meta`` has the id clients should pass with their next request.
+
+    Entries are only returned once their id is ``OPLOG_TAIL_DELAY`` seconds
+    old: ids are not generated in insertion order by concurrent processes
+    (nor by the asynchronous oplog writers), so an entry with a lower id
+    could otherwise be added after the client moved past it. No entry is lost
+    or returned twice as long as entries are stored within that delay.
+
+    :param resource: the name of the resource.
+    :param **lookup: sub resource lookup from the endpoint url.
+
+    .. versionadded:: 2.4
+    """
+    req = parse_request(resource)
+    after = request.args.get(config.QUERY_EXPORT_AFTER)
+    documents, after = app.data.tail(
+        resource,
+        req,
+        lookup,
+        after=after,
+        timeout=config.OPLOG_TAIL_TIMEOUT,
+        delay=config.OPLOG_TAIL_DELAY,
+    )
+
+    for document in documents:
+        build_response_document(document, resource, [])
+
+    response = {config.ITEMS: documents, config.META: {"after": after}}
+    return response, None, None, 200, []
+
+
+@requires_auth("resource")
+@ratelimit("resource")
+@pre_event
+def changes(resource, **lookup):
+    """
+    Default function for handling GET requests to change feed endpoints, it
+    has decorators for rate limiting, authentication and for raising
+    pre-request events. After the decorators are applied forwards to call to
+    :func:`changes_internal`
+
+    .. versionadded:: 2.4
+    """
+    return changes_internal(resource, **lookup)
+
+
+def changes_internal(resource, **lookup):
+    """Streams the changes made to the resource documents as Server-Sent
+    Events, from the application change feed. Each event is named after the
+    operation performed ('insert', 'update', 'replace' or 'delete') and its
+    data is the document, as stored (before deletion for deletes), with the
+    resource datasource projection applied. Clients can resume an interrupted
+    stream with the ``Last-Event-ID`` header.
+
+    Changes to documents which are not visible through the datasource filter
+    are not sent, nor are those to documents of other users with
+    User-Restricted Resource Access. Client filters and projections are not
+    supported.
+
+    :param resource: the name of the resource.
+    :param **lookup: sub resource lookup from the endpoint url.
+
+    .. versionadded:: 2.4
+    """
+    resource_def = config.DOMAIN[resource]
+    auth_field = resource_def["auth_field"]
+    if auth_field and request.method not in resource_def["public_methods"]:
+        auth = resource_auth(resource)
+        auth_value = auth.get_request_auth_value() if auth else None
+    else:
+        auth_value = None
+
+    def match(document):
+        if auth_value:
+            value = document.get(auth_field)
+            if value != auth_value and not (
+                isinstance(value, list) and auth_value in value
+            ):
+                return False
+        return all(str(document.get(field)) == value for field, value in lookup.items())
+
+    changes = app.change_feed.subscribe(
+        resource, request.headers.get("Last-Event-ID"), match
+    )
+    projection = resource_def["datasource"]["projection"]
+
+    def generate():
+        try:
+            # let the client know the stream is open.
+            yield ": %s\n\n" % resource
+            for change in changes:
+                if change is None:
+                    # keep the connection alive.
+                    yield ":\n\n"
+                    continue
+                event = "event: %s\ndata: %s\n\n" % (
+                    change.op,
+                    json_dumps(_projected(change.document or {}, projection)),
+                )
+                if change.id is not None:
+                    event = "id: %s\n%s" % (change.id, event)
+                yield event
+        finally:
+            # the client went away.
+            if hasattr(changes, "close"):
+                changes.close()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    return response, None, None, 200, []
+
+
+def _projected(document, projection):
+    """Returns the fields of `document` which are included by the
+    `projection` (a datasource projection).
+    """
+    if not projection:
+        return document
+    if any(projection.values()):
+        return dict((k, v) for k, v in document.items() if projection.get(k))
+    return dict((k, v) for k, v in document.items() if projection.get(k, 1))
+
+
 @requires_auth("item")
+@ratelimit("item")
 @pre_event
 def getitem(resource, **lookup):
     """
@@ -319,6 +713,12 @@ def getitem_internal(resource, **lookup):
     :param resource: the name of the resource to which the document belongs.
     :param **lookup: the lookup query.
 
+    .. versionchanged:: 2.4
+       Rebuild versions stored as deltas, and diff them on the fields they
+       changed.
+       Pages of versions are found by range on the version field, when
+       listed in their natural order with no version missing.
+
     .. versionchanged:: 0.8.2
        Prevent extra hateoas links from overwriting
        already existed data relation hateoas links.
@@ -446,6 +846,21 @@ def getitem_internal(resource, **lookup):
             req.sort = '[("%s", 1)]' % config.VERSION
         req.if_modified_since = None  # we always want the full history here
         cursor, count = app.data.find(resource + config.VERSIONS, req, lookup)
+        if _versions_range(req, latest_doc, count):
+            # versions are numbered from 1 to the latest one, with none
+            # missing: find those of the page by range on the (indexed)
+            # version field, instead of skipping the previous ones.
+            first = (req.page - 1) * req.max_results + 1
+            page_lookup = dict(lookup)
+            page_lookup[config.VERSION] = {
+                "$gte": first,
+                "$lt": first + req.max_results,
+            }
+            page = copy.copy(req)
+            page.page = 1
+            cursor, _ = app.data.find(
+                resource + config.VERSIONS, page, page_lookup, perform_count=False
+            )
 
         # build all versions
         documents = []
@@ -456,25 +871,40 @@ def getitem_internal(resource, **lookup):
         else:
             last_document = {}
 
-            # if we aren't starting on page 1, then we need to init last_doc
-            if version == "diffs" and req.page > 1:
-                # grab the last document on the previous page to diff from
-                last_version = cursor[0][app.config["VERSION"]] - 1
-                last_document = get_old_document(
-                    resource, req, lookup, latest_doc, last_version
-                )
-
-            for i, document in enumerate(cursor):
+            # versions stored as deltas know which fields they changed.
+            versions = list(cursor)
+            changes = [None] * len(versions)
+            if any(is_version_delta(document) for document in versions):
+                schema = resource_def["schema"]
+                changes = [
+                    (
+                        [field for field in document if field in schema]
+                        if is_version_delta(document)
+                        else None
+                    )
+                    for document in versions
+                ]
+                versions = rebuild_versions(resource, versions, req)
+
+            for i, document in enumerate(versions):
                 document = synthesize_versioned_document(
                     latest_doc, document, resource_def
                 )
                 build_response_document(document, resource, embedded_fields, latest_doc)
                 if version == "diffs":
+                    # each page starts with a whole version.
                     if i == 0:
                         documents.append(document)
                     else:
+                        changed_fields = changes[i]
+                        if last_document.get(config.VERSION) != (
+                            document[config.VERSION] - 1
+                        ):
+                            changed_fields = None
                         documents.append(
-                            diff_document(resource_def, last_document, document)
+                            diff_document(
+                                resource_def, last_document, document, changed_fields
+                            )
                         )
                     last_document = document
                 else:
@@ -539,7 +969,28 @@ def getitem_internal(resource, **lookup):
     return response, last_modified, etag, 200
 
 
-def _pagination_links(resource, req, document_count, document_id=None):
+def _versions_range(req, latest_doc, count):
+    """Returns True if the page of versions requested by `req` can be found
+    by range on the version field: versions are listed in their natural
+    order, with no client filter, and none of them is missing.
+
+    :param req: and instace of :class:`eve.utils.ParsedRequest`.
+    :param latest_doc: the latest version of the document.
+    :param count: the number of stored versions.
+
+    .. versionadded:: 2.4
+    """
+    return (
+        bool(req.max_results)
+        and req.page > 1
+        and not req.where
+        and req.sort == '[("%s", 1)]' % config.VERSION
+        and count is not None
+        and count == latest_doc.get(config.VERSION)
+    )
+
+
+def _pagination_links(resource, req, document_count, document_id=None, cursors=None):
     """Returns the appropriate set of resource links depending on the
     current page and the total number of documents returned by the query.
 
@@ -547,6 +998,12 @@ def _pagination_links(resource, req, document_count, document_id=None):
     :param req: and instace of :class:`eve.utils.ParsedRequest`.
     :param document_count: the number of documents returned by the query.
     :param document_id: the document id (used for versions). Defaults to None.
+    :param cursors: a ``(prev, next)`` tuple of keyset pagination tokens.
+                    When provided, pagination links are cursor based.
+                    Defaults to None.
+
+    .. versionchanged:: 2.4
+       Support for keyset pagination links.
 
     .. versionchanged:: 0.5
        Create pagination links given a document ID to allow paginated versions
@@ -609,7 +1066,36 @@ def _pagination_links(resource, req, document_count, document_id=None):
         _links["self"] = document_link(resource, document_id, version)
 
     # create pagination links
-    if config.DOMAIN[resource]["pagination"]:
+    if cursors is not None:
+        _pagination_link = _links["self"]["href"].split("?")[0]
+        if document_count:
+            q = querydef(
+                req.max_results,
+                req.where,
+                req.sort,
+                version,
+                other_params=other_params,
+                cursor=request.args.get(config.QUERY_CURSOR),
+            )
+            _links["self"]["href"] = "%s%s" % (_pagination_link, q)
+        for rel, title, token in (
+            ("prev", "previous page", cursors[0]),
+            ("next", "next page", cursors[1]),
+        ):
+            if token:
+                q = querydef(
+                    req.max_results,
+                    req.where,
+                    req.sort,
+                    version,
+                    other_params=other_params,
+                    cursor=token,
+                )
+                _links[rel] = {
+                    "title": title,
+                    "href": "%s%s" % (_pagination_link, q),
+                }
+    elif config.DOMAIN[resource]["pagination"]:
         # For version pagination (all/diffs), use the document self link.
         # Otherwise, use the resource (collection) link so that item
         # endpoints don't include a document ID in the next/prev/last hrefs.
@@ -679,6 +1165,7 @@ def _other_params(args):
         config.QUERY_MAX_RESULTS,
         config.QUERY_EMBEDDED,
         config.QUERY_PROJECTION,
+        config.QUERY_CURSOR,
         config.VERSION_PARAM,
     ]
     return MultiDict(
@@ -689,15 +1176,85 @@ def _other_params(args):
     )
 
 
-def _meta_links(resource, req, count):
+def _meta_links(resource, req, count, keyset=False):
     """Reterns the meta links for a paginated query.
 
     :param req: parsed request object.
     :param count: total number of documents in a query.
+    :param keyset: True if the query is keyset paginated.
+
+    .. versionchanged:: 2.4
+       No 'page' value for keyset paginated queries.
+       'total_strategy' reports the strategy which produced the count.
 
     .. versionadded:: 0.5
     """
-    meta = {config.QUERY_PAGE: req.page, config.QUERY_MAX_RESULTS: req.max_results}
+    meta = {config.QUERY_MAX_RESULTS: req.max_results}
+    if not keyset:
+        meta[config.QUERY_PAGE] = req.page
     if config.DOMAIN[resource]["optimize_pagination_for_speed"] is False:
         meta["total"] = count
+        if _report_count_strategy(resource, req):
+            meta["total_strategy"] = req.count_strategy
     return meta
+
+
+def _report_count_strategy(resource, req):
+    """Returns True if the strategy which produced the document count should
+    be reported to the client, which is the case when a count strategy other
+    than 'exact' has been configured for the resource.
+
+    .. versionadded:: 2.4
+    """
+    return (
+        req.count_strategy is not None
+        and config.DOMAIN[resource]["count_strategy"] != "exact"
+    )
+
+
+def _keyset_values(document, sort):
+    """Returns the values of the sort fields for a raw document, in sort
+    order. Dotted fields are supported.
+
+    :param document: the document, as returned by the data layer.
+    :param sort: a list of ``(field, direction)`` tuples.
+
+    .. versionadded:: 2.4
+    """
+    values = []
+    for field, _ in sort:
+        value = document
+        for part in field.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        values.append(value)
+    return values
+
+
+def _keyset_cursors(req, sort, count, first_values, last_values):
+    """Returns a ``(prev, next)`` tuple of keyset pagination tokens for the
+    current page. A token is None when the corresponding page does not
+    exist.
+
+    :param req: parsed request object.
+    :param sort: the keyset sort, as a list of ``(field, direction)`` tuples.
+    :param count: number of documents on the current page.
+    :param first_values: sort values of the first document on the page.
+    :param last_values: sort values of the last document on the page.
+
+    .. versionadded:: 2.4
+    """
+    if not count:
+        return None, None
+
+    full_page = count >= req.max_results
+    reverse = req.cursor is not None and req.cursor["reverse"]
+
+    prev_token = next_token = None
+    # when paging backwards the next page is always there (we come from it)
+    # while a full page hints that there might be more documents behind.
+    fields = [field for field, _ in sort]
+    if full_page or reverse:
+        next_token = encode_cursor(last_values, fields=fields)
+    if (req.cursor and not reverse) or (reverse and full_page):
+        prev_token = encode_cursor(first_values, reverse=True, fields=fields)
+    return prev_token, next_token
@@ -18,19 +18,21 @@ from flask import current_app as app
 from werkzeug import exceptions
 
 from eve.auth import requires_auth
-from eve.methods.common import (build_response_document, get_document,
+from eve.methods.common import (build_response_document, change_feed_push,
+                                date_created, get_document, last_updated,
                                 marshal_write_response, oplog_push, parse)
 from eve.methods.common import payload as payload_
 from eve.methods.common import (pre_event, ratelimit, resolve_document_etag,
-                                resolve_embedded_fields, store_media_files,
-                                utcnow)
-from eve.utils import config, debug_error_message, parse_request
+                                resolve_embedded_fields, serialize,
+                                store_media_files, utcnow)
+from eve.utils import (config, debug_error_message, document_etag,
+                       parse_request)
 from eve.versioning import (insert_versioning_documents, late_versioning_catch,
                             resolve_document_version)
 
 
-@ratelimit()
 @requires_auth("item")
+@ratelimit("item")
 @pre_event
 def patch(resource, payload=None, **lookup):
     """
@@ -75,6 +77,12 @@ def patch_internal(
     :param mongo_options: options to pass to PyMongo. e.g. read_preferences of the initial get.
     :param **lookup: document lookup query.
 
+    .. versionchanged:: 2.4
+       Validators are taken from the app validator pool.
+       Documents are updated with a single round trip when
+       'patch_find_and_modify' is enabled, and possible.
+       Pass the original document to insert_versioning_documents().
+
     .. versionchanged:: 0.6.2
        Fix: validator is not set when skip_validation is true.
 
@@ -143,6 +151,11 @@ def patch_internal(
     if payload is None:
         payload = payload_()
 
+    if concurrency_check and find_and_modify_allowed(resource, lookup):
+        result = patch_find_and_modify(resource, payload, skip_validation, **lookup)
+        if result is not None:
+            return result
+
     original = get_document(
         resource, concurrency_check, mongo_options=mongo_options, **lookup
     )
@@ -153,7 +166,7 @@ def patch_internal(
     resource_def = app.config["DOMAIN"][resource]
     schema = resource_def["schema"]
     normalize_document = resource_def.get("normalize_on_patch")
-    validator = app.validator(
+    validator = app.validator_pool.get(
         schema, resource=resource, allow_unknown=resource_def["allow_unknown"]
     )
 
@@ -227,8 +240,9 @@ def patch_internal(
 
             # update oplog if needed
             oplog_push(resource, updates, "PATCH", object_id)
+            change_feed_push(resource, updated, "update")
 
-            insert_versioning_documents(resource, updated)
+            insert_versioning_documents(resource, updated, original)
 
             # nofity callbacks
             getattr(app, "on_updated")(resource, updates, original)
@@ -268,6 +282,187 @@ def patch_internal(
     return response, last_modified, etag, status
 
 
+def find_and_modify_allowed(resource, lookup):
+    """Returns True if a PATCH to the `resource` document matching `lookup`
+    can go through :func:`patch_find_and_modify`: the resource allows it,
+    documents are looked up by id, and nothing but the document id and etag
+    is needed from the stored document.
+
+    .. versionadded:: 2.4
+    """
+    resource_def = config.DOMAIN[resource]
+    events = ("on_update", "on_updated")
+    return (
+        resource_def["patch_find_and_modify"]
+        and config.IF_MATCH
+        and list(lookup) == [resource_def["id_field"]]
+        and not resource_def["versioning"]
+        and not resource_def["_media"]
+        and not resource_def["etag_ignore_fields"]
+        # callbacks are passed the stored document.
+        and not any(len(getattr(app, event)) for event in events)
+        and not any(len(getattr(app, "%s_%s" % (e, resource))) for e in events)
+        and not _depends_on_original(resource_def["schema"])
+    )
+
+
+def patch_find_and_modify(resource, payload, skip_validation, **lookup):
+    """Performs a document patch with a single round trip to the database,
+    instead of loading the document first: the validated updates are
+    written with :meth:`~eve.io.DataLayer.find_one_and_update`, filtered on
+    the document id and the etag provided by the client, and the response
+    is built from the updated document the data layer returns. Nested
+    documents are merged by the database.
+
+    Since the whole document is not known before it is written, it is
+    stored with a provisional etag, which is replaced with one computed from
+    the updated document right after.
+
+    Returns None if the patch has to go through the regular path instead:
+    the client provided no etag, the document does not match it (or does not
+    exist), or the updates don't validate.
+
+    .. versionadded:: 2.4
+    """
+    if_match = parse_request(resource).if_match
+    if not if_match:
+        return None
+
+    resource_def = app.config["DOMAIN"][resource]
+    id_field = resource_def["id_field"]
+    try:
+        object_id = serialize({id_field: lookup[id_field]}, resource)[id_field]
+        updates = parse(payload, resource)
+        if not skip_validation:
+            validator = app.validator_pool.get(
+                resource_def["schema"],
+                resource=resource,
+                allow_unknown=resource_def["allow_unknown"],
+            )
+            if not validator.validate_update(
+                updates, object_id, None, resource_def.get("normalize_on_patch")
+            ):
+                return None
+            updates = validator.document
+
+        updates[config.LAST_UPDATED] = utcnow()
+        if resource_def["soft_delete"] is True:
+            updates[config.DELETED] = False
+        # a provisional etag, so that the stored one stops matching as soon
+        # as the document is updated.
+        updates[config.ETAG] = document_etag(
+            {config.ETAG: if_match, "updates": updates}
+        )
+        changes = updates
+        if resource_def["merge_nested_documents"]:
+            changes = _dotted(updates)
+    except Exception:
+        # issues are reported by the regular path.
+        return None
+
+    updated = app.data.find_one_and_update(resource, object_id, changes, if_match)
+    if updated is None:
+        return None
+
+    # the actual etag is computed as on the regular path, from the updated
+    # document (previous etag included).
+    provisional = updated[config.ETAG]
+    updated[config.ETAG] = if_match
+    resolve_document_etag(updated, resource)
+    updates[config.ETAG] = updated[config.ETAG]
+    try:
+        app.data.update(
+            resource,
+            object_id,
+            {config.ETAG: updated[config.ETAG]},
+            {config.ETAG: provisional},
+        )
+    except app.data.OriginalChangedError:
+        # the document has been changed since: the etag is stale already.
+        pass
+
+    oplog_push(resource, updates, "PATCH", object_id)
+    change_feed_push(resource, updated, "update")
+
+    if config.BANDWIDTH_SAVER is True:
+        embedded_fields = []
+    else:
+        embedded_fields = resolve_embedded_fields(resource, parse_request(resource))
+    updated[config.LAST_UPDATED] = last_updated(updated)
+    updated[config.DATE_CREATED] = date_created(updated)
+    build_response_document(updated, resource, embedded_fields, updated)
+    etag = updated[config.ETAG]
+    updated[config.STATUS] = config.STATUS_OK
+    return marshal_write_response(updated, resource), None, etag, 200
+
+
+#: Validation rules which need the stored document.
+_ORIGINAL_RULES = ("default", "default_setter", "dependencies", "readonly")
+
+
+def _depends_on_original(schema):
+    """Returns True if validating updates against `schema` needs the stored
+    document.
+    """
+    for rules in schema.values():
+        if not isinstance(rules, dict):
+            # rules sets from the registry are not looked into.
+            return True
+        if any(rule in rules for rule in _ORIGINAL_RULES):
+            return True
+        for rule in ("schema", "valuesrules", "valueschema"):
+            nested = rules.get(rule)
+            if nested is None:
+                continue
+            if not isinstance(nested, dict):
+                return True
+            if rule != "schema" or rules.get("type") == "list":
+                # the rules set of list items, or of mapping values.
+                nested = {rule: nested}
+            if _depends_on_original(nested):
+                return True
+    return False
+
+
+def _dotted(updates, prefix=""):
+    """Returns `updates` with nested documents flattened into dotted fields,
+    so that the database merges them with the stored ones, as
+    :func:`resolve_nested_documents` would. Raises ValueError if the
+    flattened fields would not address the same values.
+    """
+    changes = {}
+    for field, value in updates.items():
+        if prefix:
+            _check_path_key(field)
+        if isinstance(value, dict):
+            if not value:
+                # whether the field is set, or left as is, depends on the
+                # stored document.
+                raise ValueError("empty nested document")
+            if "." in field:
+                # the field would be replaced as a whole.
+                raise ValueError("dotted field %r" % field)
+            changes.update(_dotted(value, "%s%s." % (prefix, field)))
+        else:
+            changes[prefix + field] = value
+    return changes
+
+
+def _check_path_key(key):
+    """Raises ValueError if the nested document `key` can't be part of a
+    dotted field: it would address another field, an array item, or be taken
+    for an operator.
+    """
+    if (
+        not isinstance(key, str)
+        or not key
+        or "." in key
+        or key.startswith("$")
+        or key.isdigit()
+    ):
+        raise ValueError("nested key %r can't be dotted" % key)
+
+
 def resolve_nested_documents(updates, original):
     """Nested document updates are merged with the original contents
     we don't overwrite the whole thing. See #519 for details.
@@ -11,25 +11,34 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import itertools
+
+import simplejson as json
 from cerberus.validator import DocumentError
-from flask import abort
+from flask import Response, abort
 from flask import current_app as app
+from flask import request, stream_with_context
+from werkzeug import exceptions
 
 from eve.auth import requires_auth
-from eve.methods.common import (build_response_document,
+from eve.methods.common import (build_response_document, change_feed_push,
                                 marshal_write_response, oplog_push, parse,
                                 payload, pre_event, ratelimit,
                                 resolve_document_etag, resolve_embedded_fields,
                                 resolve_sub_resource_path,
                                 resolve_user_restricted_access, resource_link,
-                                store_media_files, utcnow)
-from eve.utils import config, debug_error_message, parse_request
+                                resource_media_fields, store_media_files,
+                                utcnow)
+from eve.utils import config, debug_error_message, json_dumps, parse_request
 from eve.versioning import (insert_versioning_documents,
                             resolve_document_version)
 
+#: Content-Type of newline-delimited JSON payloads.
+NDJSON = "application/x-ndjson"
+
 
-@ratelimit()
 @requires_auth("resource")
+@ratelimit("resource")
 @pre_event
 def post(resource, payl=None):
     """
@@ -37,12 +46,99 @@ def post(resource, payl=None):
     rate limiting, authentication and for raising pre-request events. After the
     decorators are applied forwards to call to :func:`post_internal`
 
+    .. versionchanged:: 2.4
+       Newline-delimited JSON payloads are handed to
+       :func:`post_ndjson_internal`, when enabled.
+
     .. versionchanged:: 0.5
        Split original post() into post/post_internal combo.
     """
+    if (
+        payl is None
+        and request.mimetype == NDJSON
+        and config.DOMAIN[resource]["ndjson_ingestion"]
+    ):
+        return post_ndjson_internal(resource)
     return post_internal(resource, payl, skip_validation=False)
 
 
+def post_ndjson_internal(resource, stream=None):
+    """Ingests a newline-delimited JSON payload (one document per line),
+    reading it from the request stream, NDJSON_BATCH_SIZE documents at a
+    time. Each batch goes through :func:`post_internal`, like a bulk insert
+    would, and its outcome is streamed back as soon as it is known, one line
+    per batch: ::
+
+        {"_batch": 0, "_code": 201, "_status": "OK", "_items": [...]}
+
+    Batches succeed or fail independently of each other. Memory usage is
+    bound by the batch size, and not by the payload size.
+
+    :param resource: name of the resource involved.
+    :param stream: alternative (binary) payload stream. Defaults to the
+                   request input stream.
+
+    .. versionadded:: 2.4
+    """
+    if not config.DOMAIN[resource]["bulk_enabled"]:
+        abort(400, description=debug_error_message("Bulk insert not allowed"))
+    if stream is None:
+        stream = request.stream
+
+    lines = (line for line in iter(stream.readline, b"") if line.strip())
+
+    def generate():
+        for index in itertools.count():
+            batch = list(itertools.islice(lines, config.NDJSON_BATCH_SIZE))
+            if not batch:
+                break
+            yield json_dumps(_ingest(resource, index, batch)) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON)
+
+
+def _ingest(resource, index, batch):
+    """Inserts a batch of NDJSON lines, and returns its outcome."""
+    documents = []
+    issues = []
+    for line in batch:
+        try:
+            documents.append(json.loads(line))
+            issues.append(None)
+        except ValueError as e:
+            issues.append("Unable to parse document: %s" % e)
+
+    result = {"_batch": index}
+    if any(issues):
+        # the batch is rejected, as it would with validation errors.
+        result["_code"] = 400
+        result[config.STATUS] = config.STATUS_ERR
+        result[config.ITEMS] = [
+            {config.STATUS: config.STATUS_ERR, config.ISSUES: {"exception": issue}}
+            if issue
+            else {config.STATUS: config.STATUS_OK}
+            for issue in issues
+        ]
+        return result
+
+    try:
+        response, _, _, code, _ = post_internal(resource, payl=documents)
+    except exceptions.HTTPException as e:
+        result["_code"] = e.code
+        result[config.STATUS] = config.STATUS_ERR
+        result[config.ERROR] = {"code": e.code, "message": e.description}
+        return result
+
+    result["_code"] = code
+    if config.ITEMS in response:
+        result.update(response)
+    else:
+        # single document batches.
+        result[config.STATUS] = response[config.STATUS]
+        result[config.ITEMS] = [response]
+    return result
+
+
 def post_internal(resource, payl=None, skip_validation=False):
     """
     Intended for internal post calls, this method is not rate limited,
@@ -67,6 +163,16 @@ def post_internal(resource, payl=None, skip_validation=False):
                  discussion, and a typical use case.
     :param skip_validation: skip payload validation before write (bool)
 
+    .. versionchanged:: 2.4
+       Validators are taken from the app validator pool.
+       Bulk payloads are handed to the validator before validation, so that
+       'unique' constraints are checked with one query per field, and
+       between the payload documents themselves.
+       Support for unordered bulk inserts ('bulk_insert_unordered'), with
+       write errors reported per document.
+       Large payloads are validated in parallel by the validation worker
+       processes ('VALIDATION_WORKERS'), if any.
+
     .. versionchanged:: 0.7
        Add support for Location header. Closes #795.
 
@@ -138,7 +244,8 @@ def post_internal(resource, payl=None, skip_validation=False):
        'unique' constraint is set, the payload will validate successfully, as
        there are no duplicates in the database (yet). If this is an issue, the
        client can always send the documents once at a time for insertion, or
-       validate locally before submitting the payload to the API.
+       validate locally before submitting the payload to the API. (Since 2.4,
+       duplicated values of root 'unique' fields are reported.)
 
     .. versionchanged:: 0.0.5
        Support for 'application/json' Content-Type .
@@ -157,7 +264,7 @@ def post_internal(resource, payl=None, skip_validation=False):
     validator = (
         None
         if skip_validation
-        else app.validator(
+        else app.validator_pool.get(
             schema, resource=resource, allow_unknown=resource_def["allow_unknown"]
         )
     )
@@ -187,14 +294,51 @@ def post_internal(resource, payl=None, skip_validation=False):
     if len(payl) > 1 and not config.DOMAIN[resource]["bulk_enabled"]:
         abort(400, description=debug_error_message("Bulk insert not allowed"))
 
+    # parse all the documents first, so that bulk payloads can be prepared
+    # for validation at once.
+    parsed = []
     for value in payl:
-        document = []
-        doc_issues = {}
         try:
             document = parse(value, resource)
             resolve_sub_resource_path(document, resource)
+        except Exception as e:
+            document = e
+        parsed.append(document)
+
+    valid = [document for document in parsed if isinstance(document, dict)]
+    # large payloads are validated by the worker processes, if any.
+    outcomes = None
+    if validator is not None and len(valid) >= config.VALIDATION_WORKERS_THRESHOLD:
+        outcomes = app.validation_workers.validate(
+            resource, valid, allow_unknown=resource_def["allow_unknown"]
+        )
+
+    if outcomes is not None:
+        validator.prepare_bulk(
+            valid,
+            [
+                check
+                for outcome in outcomes
+                if not isinstance(outcome, Exception)
+                for check in outcome[2]
+            ],
+        )
+        outcomes = iter(outcomes)
+    elif len(parsed) > 1 and hasattr(validator, "prepare_bulk"):
+        validator.prepare_bulk(valid)
+
+    for document in parsed:
+        doc_issues = {}
+        try:
+            if isinstance(document, Exception):
+                raise document
             if skip_validation:
                 validation = True
+            elif outcomes is not None:
+                outcome = next(outcomes)
+                if isinstance(outcome, Exception):
+                    raise outcome
+                validation = validator.resume(*outcome)
             else:
                 validation = validator.validate(document)
             if validation:  # validation is successful
@@ -242,6 +386,7 @@ def post_internal(resource, payl=None, skip_validation=False):
                 results.append({config.STATUS: config.STATUS_OK})
 
         return_code = config.VALIDATION_ERROR_STATUS
+        error = "document(s) contain(s) error(s)"
     else:
         # notify callbacks
         getattr(app, "on_insert")(resource, documents)
@@ -251,16 +396,50 @@ def post_internal(resource, payl=None, skip_validation=False):
         resolve_document_etag(documents, resource)
 
         # bulk insert
-        ids = app.data.insert(resource, documents)
+        if resource_def["bulk_insert_unordered"]:
+            outcomes = app.data.insert_unordered(
+                resource, documents, resource_def["bulk_insert_chunk_size"]
+            )
+        else:
+            outcomes = [(id_, None) for id_ in app.data.insert(resource, documents)]
+        # the documents which were actually stored.
+        landed = [
+            document
+            for document, (_, status) in zip(documents, outcomes)
+            if status is None
+        ]
 
         # update oplog if needed
-        oplog_push(resource, documents, "POST")
+        oplog_push(resource, landed, "POST")
+        change_feed_push(resource, landed, "insert")
 
         # assign document ids
-        for document in documents:
+        for document, (id_, status) in zip(documents, outcomes):
+            if status is not None:
+                failures += 1
+                # media files were stored in advance.
+                for field in resource_media_fields(document, resource):
+                    file_ids = document[field] or []
+                    if not isinstance(file_ids, list):
+                        file_ids = [file_ids]
+                    for file_id in file_ids:
+                        app.media.delete(file_id, resource)
+                results.append(
+                    {
+                        config.STATUS: config.STATUS_ERR,
+                        config.ERROR: {
+                            "code": status,
+                            "message": "Duplicate key"
+                            if status == 409
+                            else "The document could not be stored",
+                        },
+                    }
+                )
+                continue
+
             # either return the custom ID_FIELD or the id returned by
             # data.insert().
-            id_ = document.get(id_field, ids.pop(0))
+            id_ = document.get(id_field, id_)
             document[id_field] = id_
 
             # build the full response document
@@ -274,16 +453,23 @@ def post_internal(resource, payl=None, skip_validation=False):
             result = marshal_write_response(result, resource)
             results.append(result)
 
-        # insert versioning docs
-        insert_versioning_documents(resource, documents)
+        if landed:
+            # insert versioning docs
+            insert_versioning_documents(resource, landed)
 
-        # notify callbacks
-        getattr(app, "on_inserted")(resource, documents)
-        getattr(app, "on_inserted_%s" % resource)(documents)
-        # request was received and accepted; at least one document passed
-        # validation and was accepted for insertion.
+            # notify callbacks
+            getattr(app, "on_inserted")(resource, landed)
+            getattr(app, "on_inserted_%s" % resource)(landed)
+            # request was received and accepted; at least one document passed
+            # validation and was accepted for insertion.
 
-        return_code = 201
+            return_code = 201
+        else:
+            # none of the (unordered) inserts succeeded.
+            return_code = max(status for _, status in outcomes)
+        documents = landed
+        if failures:
+            error = "document(s) could not be stored"
 
     if len(results) == 1:
         response = results.pop(0)
@@ -293,12 +479,16 @@ def post_internal(resource, payl=None, skip_validation=False):
             config.ITEMS: results,
         }
 
-    if failures:
-        response[config.ERROR] = {
-            "code": return_code,
-            "message": "Insertion failure: %d document(s) contain(s) error(s)"
-            % failures,
-        }
+    if failures and return_code != 201:
+        # single documents which could not be stored carry their own error,
+        # while partial failures are reported by the items only.
+        response.setdefault(
+            config.ERROR,
+            {
+                "code": return_code,
+                "message": "Insertion failure: %d %s" % (failures, error),
+            },
+        )
 
     location_header = (
         None
@@ -16,8 +16,9 @@ from flask import current_app as app
 from werkzeug import exceptions
 
 from eve.auth import auth_field_and_value, requires_auth
-from eve.methods.common import (build_response_document, get_document,
-                                marshal_write_response, oplog_push, parse)
+from eve.methods.common import (build_response_document, change_feed_push,
+                                get_document, marshal_write_response,
+                                oplog_push, parse)
 from eve.methods.common import payload as payload_
 from eve.methods.common import (pre_event, ratelimit, resolve_document_etag,
                                 resolve_embedded_fields,
@@ -30,8 +31,8 @@ from eve.versioning import (insert_versioning_documents, late_versioning_catch,
                             resolve_document_version)
 
 
-@ratelimit()
 @requires_auth("item")
+@ratelimit("item")
 @pre_event
 def put(resource, payload=None, **lookup):
     """
@@ -70,6 +71,10 @@ def put_internal(
     :param skip_validation: skip payload validation before write (bool)
     :param **lookup: document lookup query.
 
+    .. versionchanged:: 2.4
+       Validators are taken from the app validator pool.
+       Pass the original document to insert_versioning_documents().
+
     .. versionchanged:: 0.6
        Create document if it does not exist. Closes #634.
        Allow restoring soft deleted documents via PUT
@@ -114,7 +119,7 @@ def put_internal(
     """
     resource_def = app.config["DOMAIN"][resource]
     schema = resource_def["schema"]
-    validator = app.validator(
+    validator = app.validator_pool.get(
         schema, resource=resource, allow_unknown=resource_def["allow_unknown"]
     )
 
@@ -211,8 +216,9 @@ def put_internal(
 
             # update oplog if needed
             oplog_push(resource, document, "PUT")
+            change_feed_push(resource, document, "replace")
 
-            insert_versioning_documents(resource, document)
+            insert_versioning_documents(resource, document, original)
 
             # notify callbacks
             getattr(app, "on_replaced")(resource, document, original)
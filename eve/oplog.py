@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.oplog
+    ~~~~~~~~~
+
+    Writes oplog entries to the database, either within the request which
+    performed the edit operation or in batches from a background thread.
+
+    :copyright: (c) 2017 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+from flask import g
+
+
+class _Push:
+    """Oplog entries pushed by a single request, waiting to be written."""
+
+    __slots__ = ("entries", "mongo_prefix", "done", "error", "claimed")
+
+    def __init__(self, entries, mongo_prefix=None, done=None):
+        self.entries = entries
+        self.mongo_prefix = mongo_prefix
+        self.done = done
+        self.error = None
+        # set by whoever writes the entries: the writer thread, or the
+        # request itself when it is done waiting.
+        self.claimed = False
+
+
+#: Queued by :meth:`OplogWriter.shutdown` to stop the writer thread.
+_STOP = _Push([])
+
+
+class OplogWriter:
+    """Writes the entries pushed to the oplog, as configured by
+    ``OPLOG_WRITER``:
+
+    - ``sync``: entries are inserted by the request performing the edit
+      operation.
+    - ``async``: entries are queued (up to ``OPLOG_QUEUE_SIZE`` pushes) and
+      inserted with a single ``insert_many`` by a background thread, once
+      ``OPLOG_BATCH_SIZE`` entries are pending or ``OPLOG_FLUSH_INTERVAL``
+      seconds have passed since the oldest of them was queued. Entries still
+      queued are written on :meth:`shutdown`.
+    - ``async_fsync``: like ``async``, but the request waits until its entries
+      have been written (with a journaled write concern), so that concurrent
+      requests share the same ``insert_many``. Requests waiting longer than
+      ``OPLOG_WRITE_TIMEOUT`` seconds write their entries themselves, unless
+      the writer thread is writing them already.
+
+    Requests write their entries themselves when the queue is full.
+
+    :param app: the Eve application.
+
+    .. versionadded:: 2.4
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._atexit = False
+        self._counters = dict.fromkeys(
+            ("pushed", "written", "batches", "overflows", "timeouts", "errors"), 0
+        )
+
+    def push(self, entries):
+        """Writes `entries` to the oplog, or queues them for the writer
+        thread. Errors raised while writing are propagated to the caller,
+        unless the write happens in the background, in which case they are
+        logged.
+
+        :param entries: the oplog entries to be written.
+        """
+        mode = self.app.config["OPLOG_WRITER"]
+        self._count("pushed", len(entries))
+        if mode == "sync":
+            self._write(entries)
+            return
+
+        done = threading.Event() if mode == "async_fsync" else None
+        push = _Push(entries, self._mongo_prefix(), done)
+        try:
+            self._get_queue().put_nowait(push)
+        except queue.Full:
+            self._count("overflows", len(entries))
+            self._write(entries)
+            return
+
+        if done is not None:
+            timeout = self.app.config["OPLOG_WRITE_TIMEOUT"]
+            if not done.wait(timeout):
+                if self._claim(push):
+                    # the writer thread is stuck, or lagging behind.
+                    self._count("timeouts", len(entries))
+                    self._write(entries)
+                    return
+                # the entries are being written already.
+                if not done.wait(timeout):
+                    raise TimeoutError(
+                        "Oplog entries not written within %s seconds" % (2 * timeout)
+                    )
+            if push.error is not None:
+                raise push.error
+
+    def flush(self, timeout=None):
+        """Waits until the entries queued so far have been written. Returns
+        False if `timeout` (in seconds) expires first.
+        """
+        with self._lock:
+            q = self._queue if self._pid == os.getpid() else None
+        if q is None:
+            return True
+        marker = _Push([], done=threading.Event())
+        q.put(marker)
+        return marker.done.wait(timeout)
+
+    def shutdown(self):
+        """Writes the queued entries and stops the writer thread, if any. The
+        thread is started again on next push.
+        """
+        with self._lock:
+            q, thread = self._queue, self._thread
+            self._queue = self._thread = None
+        if thread is not None and self._pid == os.getpid():
+            q.put(_STOP)
+            thread.join()
+
+    def metrics(self):
+        """Returns the writer counters: entries pushed, written (and failed to
+        be written, 'errors') by the writer thread, written by requests because
+        the queue was full ('overflows') or the writer thread did not get to
+        them in time ('timeouts'), ``insert_many`` batches, and the pushes
+        currently queued out of the queue capacity.
+        """
+        with self._lock:
+            metrics = dict(self._counters)
+            q = self._queue if self._pid == os.getpid() else None
+        metrics["mode"] = self.app.config["OPLOG_WRITER"]
+        metrics["queued"] = q.qsize() if q is not None else 0
+        metrics["capacity"] = self.app.config["OPLOG_QUEUE_SIZE"]
+        return metrics
+
+    def _count(self, counter, value=1):
+        with self._lock:
+            self._counters[counter] += value
+
+    def _claim(self, push):
+        """Returns True if the entries of `push` are to be written by the
+        caller, False if somebody else claimed them already.
+        """
+        with self._lock:
+            if push.claimed:
+                return False
+            push.claimed = True
+            return True
+
+    def _mongo_prefix(self):
+        # the writer thread has no request to resolve the prefix from. As with
+        # sync writes, the prefix is the oplog one, not the resource one.
+        current_mongo_prefix = getattr(self.app.data, "current_mongo_prefix", None)
+        if current_mongo_prefix is None:
+            return None
+        return current_mongo_prefix(self.app.config["OPLOG_NAME"])
+
+    def _write(self, entries):
+        self.app.data.insert(self.app.config["OPLOG_NAME"], entries)
+
+    def _get_queue(self):
+        with self._lock:
+            # threads don't survive a fork: the child gets its own writer.
+            if self._queue is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue(self.app.config["OPLOG_QUEUE_SIZE"])
+                self._thread = threading.Thread(
+                    target=self._run,
+                    args=(self._queue,),
+                    name="eve-oplog-writer",
+                    daemon=True,
+                )
+                self._thread.start()
+                if not self._atexit:
+                    atexit.register(self.shutdown)
+                    self._atexit = True
+            return self._queue
+
+    def _run(self, q):
+        pending, size, deadline, stop = [], 0, None, False
+        while not stop:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                push = q.get(timeout=timeout)
+            except queue.Empty:
+                pass
+            else:
+                if push is _STOP:
+                    stop = True
+                else:
+                    pending.append(push)
+                    size += len(push.entries)
+                    if deadline is None:
+                        interval = self.app.config["OPLOG_FLUSH_INTERVAL"]
+                        deadline = time.monotonic() + interval
+
+            if not pending:
+                continue
+            if (
+                stop
+                or size >= self.app.config["OPLOG_BATCH_SIZE"]
+                or time.monotonic() >= deadline
+                # somebody is waiting: don't let more entries in.
+                or (q.empty() and any(p.done is not None for p in pending))
+            ):
+                self._flush(pending)
+                pending, size, deadline = [], 0, None
+
+    def _flush(self, pending):
+        batches = {}
+        for push in pending:
+            # requests which gave up waiting wrote their entries already.
+            if self._claim(push):
+                batches.setdefault(push.mongo_prefix, []).append(push)
+
+        for mongo_prefix, pushes in batches.items():
+            entries = [entry for push in pushes for entry in push.entries]
+            error = None
+            if entries:
+                try:
+                    with self.app.app_context():
+                        if mongo_prefix is not None:
+                            g.mongo_prefix = mongo_prefix
+                        self._write(entries)
+                except Exception as e:
+                    self.app.logger.exception(e)
+                    error = e
+                    self._count("errors", len(entries))
+                else:
+                    self._count("written", len(entries))
+                    self._count("batches")
+            for push in pushes:
+                push.error = error
+                if push.done is not None:
+                    push.done.set()
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.ratelimit
+    ~~~~~~~~~~~~~
+
+    Counts the requests made by each client, so that rate limits can be
+    enforced either by Redis or by the worker process itself.
+
+    :copyright: (c) 2017 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import math
+import threading
+import time
+
+#: Counts a request in a fixed window with a single, atomic round trip.
+#: Windows left without expiration (by a crash, or by another client) get one.
+WINDOW_SCRIPT = """
+local current = redis.call('INCR', KEYS[1])
+local ttl = redis.call('TTL', KEYS[1])
+if ttl < 0 then
+    ttl = tonumber(ARGV[1])
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+return {current, ttl}
+"""
+
+
+class RateLimiter:
+    """Counts the requests made by each client, as configured by
+    ``RATE_LIMIT_BACKEND``:
+
+    - ``redis``: requests are counted by Redis with an ``INCR`` and
+      ``EXPIREAT`` pipeline. The window is extended by each request.
+    - ``redis_script``: requests are counted by Redis in fixed windows, with a
+      Lua script performing the check in a single atomic round trip.
+    - ``local``: each worker process keeps a token bucket per client. There is
+      no network round trip (nor any need for Redis), but limits are enforced
+      by each process on its own.
+    - ``local_sync``: each worker process counts requests in fixed windows,
+      and adds its counts to the Redis ones every
+      ``RATE_LIMIT_SYNC_INTERVAL`` seconds, with a single pipeline, fetching
+      the counts of all processes back. Syncs are performed by a background
+      thread, so that requests never wait for Redis. Clients can exceed their
+      limits by the requests served by other processes between two syncs.
+      When Redis is not available (or slow), processes keep counting on their
+      own.
+
+    :param app: the Eve application.
+
+    .. versionadded:: 2.4
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # token buckets by key: (tokens, last update, period).
+        self._buckets = {}
+        self._sweep_size = 1024
+        # fixed windows by key: [end, count fetched from redis, count since].
+        self._windows = {}
+        self._synced = 0
+        self._sync_thread = None
+        self._script = None
+        # resource limits by (resource, endpoint class, method).
+        self._policies = {}
+
+    def available(self):
+        """Returns whether requests can be counted: all backends but
+        ``local`` need Redis.
+        """
+        return self.app.config["RATE_LIMIT_BACKEND"] == "local" or bool(self.app.redis)
+
+    def compile_policies(self, resource):
+        """Compiles the ``rate_limit`` and ``item_rate_limit`` settings of
+        `resource`, so that they don't need to be looked up by each request.
+        Invoked when the resource is registered.
+
+        :param resource: the resource name.
+        """
+        settings = self.app.config["DOMAIN"][resource]
+        policies = {k: v for k, v in self._policies.items() if k[0] != resource}
+        for endpoint_class, setting in (
+            ("resource", "rate_limit"),
+            ("item", "item_rate_limit"),
+        ):
+            # each resource endpoint has its own counters.
+            prefix = "rate-limit/%s|%s/" % (resource, endpoint_class)
+            for method, limit in (settings.get(setting) or {}).items():
+                policies[(resource, endpoint_class, method)] = limit, prefix
+        self._policies = policies
+
+    def policy(self, resource, endpoint_class, method):
+        """Returns the rate limit for `method` requests to the endpoint, as a
+        (limit, period) tuple or None, and the prefix of its client keys.
+        Endpoints without a resource limit for the method share the global
+        ``RATE_LIMIT_<METHOD>`` one.
+
+        :param resource: the resource name, if any.
+        :param endpoint_class: 'resource', 'item' or 'home'.
+        :param method: the request method.
+        """
+        policy = self._policies.get((resource, endpoint_class, method))
+        if policy is None:
+            return self.app.config.get("RATE_LIMIT_" + method), "rate-limit/"
+        return policy
+
+    def hit(self, key, limit, period):
+        """Counts a request made by the client identified by `key`. Returns
+        the number of requests counted so far (more than `limit` when over
+        limit), and the time (in seconds since the epoch) at which the count
+        is reset.
+
+        :param key: the client key.
+        :param limit: requests limit, per period.
+        :param period: limit validity period, in seconds.
+        """
+        backend = self.app.config["RATE_LIMIT_BACKEND"]
+        return getattr(self, "_hit_" + backend)(key, limit, period)
+
+    def sync(self):
+        """Adds the requests counted by this process since the last sync to
+        the Redis counts, and fetches back the counts of all processes. Only
+        one sync runs at a time, requests carry on counting meanwhile. Used by
+        the ``local_sync`` backend, from a background thread.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._synced = now = time.time()
+            with self._lock:
+                self._windows = {
+                    key: window
+                    for key, window in self._windows.items()
+                    if window[0] > now
+                }
+                # counts of windows with no new requests are fetched too.
+                pending = []
+                for key, window in self._windows.items():
+                    pending.append((key, window[0], window[2]))
+                    window[1] += window[2]
+                    window[2] = 0
+            if not pending:
+                return
+
+            p = self.app.redis.pipeline()
+            for key, end, count in pending:
+                window_key = "%s/%d" % (key, end)
+                p.incrby(window_key, count)
+                p.expireat(window_key, int(end))
+            try:
+                totals = p.execute()[::2]
+            except Exception:
+                self.app.logger.exception("Failed to sync rate limits with Redis")
+                return
+
+            with self._lock:
+                for (key, end, _), total in zip(pending, totals):
+                    window = self._windows.get(key)
+                    if window is not None and window[0] == end:
+                        window[1] = max(window[1], total)
+        finally:
+            self._sync_lock.release()
+
+    def wait_sync(self, timeout=None):
+        """Waits until the background sync in progress, if any, is over.
+        Returns False if `timeout` (in seconds) expires first.
+        """
+        thread = self._sync_thread
+        if thread is None:
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def _sync_in_background(self):
+        with self._lock:
+            # threads don't survive a fork: the child starts its own.
+            if self._sync_thread is not None and self._sync_thread.is_alive():
+                return
+            self._synced = time.time()
+            self._sync_thread = threading.Thread(
+                target=self.sync, name="eve-rate-limit-sync", daemon=True
+            )
+            self._sync_thread.start()
+
+    def _hit_redis(self, key, limit, period):
+        reset = int(time.time()) + period
+        p = self.app.redis.pipeline()
+        p.incr(key)
+        p.expireat(key, reset)
+        return p.execute()[0], reset
+
+    def _hit_redis_script(self, key, limit, period):
+        redis = self.app.redis
+        if self._script is None or self._script[0] is not redis:
+            self._script = redis, redis.register_script(WINDOW_SCRIPT)
+        current, ttl = self._script[1](keys=[key], args=[math.ceil(period)])
+        return current, int(time.time()) + ttl
+
+    def _hit_local(self, key, limit, period):
+        now = time.time()
+        rate = limit / period
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = limit
+            else:
+                tokens = min(limit, bucket[0] + (now - bucket[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, period)
+            if len(self._buckets) >= self._sweep_size:
+                self._sweep(now)
+        current = limit - int(tokens) if allowed else limit + 1
+        # the bucket is full again.
+        return current, math.ceil(now + (limit - tokens) / rate)
+
+    def _sweep(self, now):
+        # buckets left alone for a whole period are full, as missing ones.
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if now - bucket[1] < bucket[2]
+        }
+        self._sweep_size = max(1024, 2 * len(self._buckets))
+
+    def _hit_local_sync(self, key, limit, period):
+        now = time.time()
+        # windows are aligned, so that processes share them.
+        end = (now // period + 1) * period
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or window[0] != end:
+                window = self._windows[key] = [end, 0, 0]
+            window[2] += 1
+            current = window[1] + window[2]
+        if now - self._synced >= self.app.config["RATE_LIMIT_SYNC_INTERVAL"]:
+            self._sync_in_background()
+        return current, math.ceil(end)
@@ -16,7 +16,6 @@ import time
 from collections import OrderedDict  # noqa
 from functools import wraps
 
-import simplejson as json
 from flask import Response, abort
 from flask import current_app as app
 from flask import make_response, request
@@ -25,7 +24,7 @@ from werkzeug import utils
 
 from eve.methods.common import get_rate_limit
 from eve.utils import (config, date_to_rfc1123, date_to_str,
-                       debug_error_message, import_from_string)
+                       debug_error_message, import_from_string, json_dumps)
 
 
 def raise_event(f):
@@ -311,6 +310,9 @@ class JSONRenderer(Renderer):
 
         :param data: the data stream to be rendered as json.
 
+        .. versionchanged:: 2.4
+           Support for JSON_BACKEND.
+
         .. versionchanged:: 0.2
            Json encoder class is now inferred by the active data layer,
            allowing for customized, data-aware JSON encoding.
@@ -323,12 +325,7 @@ class JSONRenderer(Renderer):
         # make pretty prints available
         if "GET" in request.method and "pretty" in request.args:
             set_indent = 4
-        return json.dumps(
-            data,
-            indent=set_indent,
-            cls=app.data.json_encoder_class,
-            sort_keys=config.JSON_SORT_KEYS,
-        )
+        return json_dumps(data, indent=set_indent)
 
 
 class XMLRenderer(Renderer):
@@ -10,15 +10,19 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import base64
 import hashlib
 import sys
-from copy import deepcopy
 from datetime import datetime, timedelta
+from functools import partial
 from importlib import import_module
+from uuid import UUID
 
+import simplejson as json
 import werkzeug.exceptions
-from bson import UuidRepresentation
+from bson import DBRef, Decimal128, ObjectId, UuidRepresentation, json_util
 from bson.json_util import dumps
+from flask import abort
 from flask import current_app as app
 from flask import request
 from werkzeug.datastructures import MultiDict
@@ -26,6 +30,11 @@ from werkzeug.datastructures import MultiDict
 import eve
 from eve import RFC1123_DATE_FORMAT
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 
 class Config():
     """Helper class used through the code to access configuration settings.
@@ -52,6 +61,11 @@ config = Config()
 class ParsedRequest():
     """This class, by means of its attributes, describes a client request.
 
+    .. versionchanged:: 2.4
+       'cursor' keyword.
+       'count_strategy' keyword.
+       'embedded_lookup' keyword.
+
     .. versionchanged:: 9,5
        'args' keyword.
 
@@ -90,6 +104,10 @@ class ParsedRequest():
     # `embedded` value of the query string (?embedded). Defaults to None.
     embedded = None
 
+    # embedded fields which the data layer is asked to resolve along with the
+    # documents themselves (server-side embedding). Defaults to None.
+    embedded_lookup = None
+
     # `show_deleted` True when the SHOW_DELETED_PARAM is included in query.
     # Only relevant when soft delete is enabled. Defaults to False.
     show_deleted = False
@@ -100,6 +118,17 @@ class ParsedRequest():
     # `args` value of the original request. Defaults to None.
     args = None
 
+    # decoded `cursor` value of the query string (?cursor), only set when
+    # keyset pagination is enabled for the resource. When available, it is
+    # a dict with the sort key `values` of the boundary document, and
+    # a `reverse` flag which is True when paging backwards. Defaults to None.
+    cursor = None
+
+    # name of the strategy which produced the document count ('exact',
+    # 'capped', 'estimated' or 'cached'). Set by the data layer when a count
+    # is performed. Defaults to None.
+    count_strategy = None
+
 
 def parse_request(resource):
     """Parses a client request, returning instance of :class:`ParsedRequest`
@@ -107,6 +136,9 @@ def parse_request(resource):
 
     :param resource: the resource currently being accessed by the client.
 
+    .. versionchanged:: 2.4
+       Support for keyset pagination cursors.
+
     .. versionchanged:: 0.7
        Handle ETag values surrounded by double quotes. Closes #794.
 
@@ -165,6 +197,13 @@ def parse_request(resource):
         if r.max_results > pagination_limit:
             r.max_results = pagination_limit
 
+        if settings["keyset_pagination"] and args.get(config.QUERY_CURSOR):
+            if config.QUERY_PAGE in args:
+                abort(400, description="`page` and `cursor` can't be combined")
+            r.cursor = decode_cursor(args.get(config.QUERY_CURSOR))
+            if r.cursor is None:
+                abort(400, description="Unable to parse `cursor` clause")
+
     def etag_parse(challenge):
         if challenge in headers:
             etag = headers[challenge]
@@ -271,6 +310,7 @@ def querydef(
     version=None,
     page=None,
     other_params=MultiDict(),
+    cursor=None,
 ):
     """Returns a valid query string.
 
@@ -282,6 +322,11 @@ def querydef(
     :param page: `page` part of the query string. Defaults to None.
     :param other_params: dictionary of parameters that are not used
                          internally by Eve
+    :param cursor: `cursor` part of the query string (keyset pagination).
+                   Defaults to None.
+
+    .. versionchanged:: 2.4
+       Support for keyset pagination cursors.
 
     .. versionchanged:: 0.5
        Support for customizable query parameters.
@@ -291,6 +336,7 @@ def querydef(
     sort_part = "&%s=%s" % (config.QUERY_SORT, sort) if sort else ""
     page_part = "&%s=%s" % (config.QUERY_PAGE, page) if page and page > 1 else ""
     version_part = "&%s=%s" % (config.VERSION_PARAM, version) if version else ""
+    cursor_part = "&%s=%s" % (config.QUERY_CURSOR, cursor) if cursor else ""
     max_results_part = (
         "%s=%s" % (config.QUERY_MAX_RESULTS, max_results)
         if max_results != config.PAGINATION_DEFAULT
@@ -319,12 +365,61 @@ def querydef(
                 sort_part,
                 version_part,
                 page_part,
+                cursor_part,
                 other_params_part,
             ]
         ).lstrip("&")
     ).rstrip("?")
 
 
+def encode_cursor(values, reverse=False, fields=None):
+    """Returns an opaque, url-safe keyset pagination token.
+
+    :param values: the sort key values of the boundary document, in sort
+                   order (the unique id tie-breaker included).
+    :param reverse: True if the token points to the previous page.
+    :param fields: the sort fields the values belong to.
+
+    .. versionadded:: 2.4
+    """
+    token = json_util.dumps(
+        {"f": list(fields or []), "v": list(values), "r": reverse},
+        json_options=json_util.CANONICAL_JSON_OPTIONS,
+    )
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Decodes a token built by :func:`encode_cursor`. Returns a dict with
+    `fields`, `values` and `reverse` keys, or None if the token is not valid.
+    Tokens are built by clients as much as by the API: since values end up in
+    queries, documents and lists (which could carry query operators) are not
+    valid values.
+
+    :param token: the keyset pagination token.
+
+    .. versionadded:: 2.4
+    """
+    try:
+        padding = "=" * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode((token + padding).encode("ascii"))
+        cursor = json_util.loads(
+            raw.decode("utf-8"), json_options=json_util.CANONICAL_JSON_OPTIONS
+        )
+        fields, values, reverse = cursor["f"], cursor["v"], cursor["r"]
+    except Exception:
+        return None
+    if (
+        not isinstance(fields, list)
+        or not isinstance(values, list)
+        or not isinstance(reverse, bool)
+        or not all(isinstance(field, str) for field in fields)
+        or any(isinstance(value, (dict, list)) for value in values)
+    ):
+        return None
+    return {"fields": fields, "values": values, "reverse": reverse}
+
+
 def document_etag(value, ignore_fields=None):
     """Computes and returns a valid ETag for the input value.
 
@@ -332,6 +427,11 @@ def document_etag(value, ignore_fields=None):
     :param ignore_fields: `ignore_fields` list of fields to skip to
                           compute the ETag value.
 
+    .. versionchanged:: 2.4
+       Support for ETAG_VERSION 2, based on orjson.
+       Support for ETAG_VERSION 3 and ETAG_HASH.
+       Ignored fields are skipped without copying the whole value.
+
     .. versionchanged:: 0.5.4
        Use json_encoder_class. See #624.
 
@@ -339,6 +439,19 @@ def document_etag(value, ignore_fields=None):
        Using bson.json_util.dumps over str(value) to make etag computation
        consistent between different runs and/or server instances (#16).
     """
+    return document_etags([value], ignore_fields)[0]
+
+
+def document_etags(values, ignore_fields=None):
+    """Computes and returns the ETags for a list of values. Equivalent to
+    calling :func:`document_etag` for each value, only cheaper.
+
+    :param values: the values to compute the ETags with.
+    :param ignore_fields: `ignore_fields` list of fields to skip to
+                          compute the ETag values.
+
+    .. versionadded:: 2.4
+    """
 
     def uuid_representation_as_string():
         uuid_map = {
@@ -352,42 +465,251 @@ def document_etag(value, ignore_fields=None):
             config.MONGO_OPTIONS.get("uuidRepresentation", "standard")
         ]
 
-    if ignore_fields:
-
-        def filter_ignore_fields(d, fields):
-            # recursive function to remove the fields that they are in d,
-            # field is a list of fields to skip or dotted fields to look up
-            # to nested keys such as  ["foo", "dict.bar", "dict.joe"]
-            for field in fields:
-                key, _, value = field.partition(".")
-                if value and key in d:
-                    filter_ignore_fields(d[key], [value])
-                elif field in d:
-                    d.pop(field)
-                else:
-                    # not required fields can be not present
-                    pass
-
-        value_ = deepcopy(value)
-        filter_ignore_fields(value_, ignore_fields)
+    # ignored fields, as a tree of (nested) keys such as
+    # {"foo": True, "dict": {"bar": True, "joe": True}}
+    ignore = {}
+    for field in ignore_fields or []:
+        node = ignore
+        keys = field.split(".")
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+            if node is True:
+                break
+        else:
+            node[keys[-1]] = True
+
+    new_hash = etag_hash(config.ETAG_HASH)
+    json_encoder = app.data.json_encoder_class()
+    version = config.ETAG_VERSION
+
+    if version == 3:
+
+        def encode(value):
+            parts = []
+            _etag_parts(value, ignore, json_encoder.default, parts.append)
+            return b"".join(parts)
+
+    elif version == 2:
+        default = _orjson_default(json_encoder)
+
+        def etag_default(obj):
+            if isinstance(obj, bytes):
+                return base64.b64encode(obj).decode("ascii")
+            return default(obj)
+
+        def encode(value):
+            return orjson.dumps(
+                _without_fields(value, ignore),
+                default=etag_default,
+                option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+            )
+
     else:
-        value_ = value
+        from bson.json_util import DEFAULT_JSON_OPTIONS
 
-    h = hashlib.sha1()
-    json_encoder = app.data.json_encoder_class()
-    from bson.json_util import DEFAULT_JSON_OPTIONS
-
-    h.update(
-        dumps(
-            value_,
-            sort_keys=True,
-            default=json_encoder.default,
-            json_options=DEFAULT_JSON_OPTIONS.with_options(
-                uuid_representation=uuid_representation_as_string()
-            ),
-        ).encode("utf-8")
+        json_options = DEFAULT_JSON_OPTIONS.with_options(
+            uuid_representation=uuid_representation_as_string()
+        )
+
+        def encode(value):
+            return dumps(
+                _without_fields(value, ignore),
+                sort_keys=True,
+                default=json_encoder.default,
+                json_options=json_options,
+            ).encode("utf-8")
+
+    etags = []
+    for value in values:
+        h = new_hash()
+        h.update(encode(value))
+        etags.append(h.hexdigest())
+    return etags
+
+
+def etag_hash(name):
+    """Returns a constructor for the ETag hash function `name`: ``xxhash``
+    (128 bit XXH3, needs the xxhash package), ``blake2b`` (with a 160 bit
+    digest, like SHA-1), or any other algorithm supported by hashlib.
+
+    :param name: the hash function name, as set by ETAG_HASH.
+
+    .. versionadded:: 2.4
+    """
+    if name == "xxhash":
+        import xxhash
+
+        return xxhash.xxh3_128
+    if name == "blake2b":
+        return partial(hashlib.blake2b, digest_size=20)
+    if name in hashlib.algorithms_guaranteed:
+        return getattr(hashlib, name)
+    return partial(hashlib.new, name)
+
+
+def _without_fields(value, ignore):
+    """Returns `value` without the `ignore` (tree of) fields. Only the
+    dictionaries holding ignored fields are copied, and only shallowly.
+
+    .. versionadded:: 2.4
+    """
+    if not ignore or not isinstance(value, dict):
+        return value
+
+    value = dict(value)
+    for key, node in ignore.items():
+        if key not in value:
+            # not required fields can be not present
+            continue
+        if node is True:
+            del value[key]
+        else:
+            value[key] = _without_fields(value[key], node)
+    return value
+
+
+def _etag_parts(value, ignore, default, append):
+    """Feeds `append` with a canonical binary encoding of `value`, as used by
+    ETAG_VERSION 3. Dictionary keys are sorted, `ignore` (tree of) fields are
+    skipped, and every value is tagged with its type (and length, when
+    variable). Values of other types are converted with the json encoder
+    `default` function first, and tagged with their original type, so that
+    they don't share an encoding with the value they are converted to (a
+    ``Decimal128`` and its string, say). Lists and tuples are encoded alike.
+
+    .. versionadded:: 2.4
+    """
+    if isinstance(value, dict):
+        append(b"{")
+        for key in sorted(value, key=lambda key: (str(key), type(key).__name__)):
+            node = ignore.get(key) if ignore else None
+            if node is True:
+                continue
+            if isinstance(key, str):
+                encoded = key.encode("utf-8")
+                append(b"%d:" % len(encoded))
+                append(encoded)
+            else:
+                # 1 and "1" are different keys.
+                append(b"k")
+                _etag_parts(key, None, default, append)
+            _etag_parts(value[key], node, default, append)
+        append(b"}")
+    elif isinstance(value, str):
+        encoded = value.encode("utf-8")
+        append(b"s%d:" % len(encoded))
+        append(encoded)
+    elif isinstance(value, (list, tuple)):
+        append(b"[")
+        for item in value:
+            _etag_parts(item, None, default, append)
+        append(b"]")
+    elif value is None:
+        append(b"n")
+    elif isinstance(value, bool):
+        append(b"t" if value else b"f")
+    elif isinstance(value, int):
+        append(b"i%d;" % value)
+    elif isinstance(value, float):
+        append(b"d%s;" % repr(value).encode("ascii"))
+    elif isinstance(value, ObjectId):
+        append(b"o")
+        append(value.binary)
+    elif isinstance(value, datetime):
+        append(b"D%s;" % value.isoformat().encode("ascii"))
+    elif isinstance(value, UUID):
+        append(b"u")
+        append(value.bytes)
+    elif isinstance(value, bytes):
+        append(b"b%d:" % len(value))
+        append(value)
+    else:
+        name = "%s.%s" % (type(value).__module__, type(value).__qualname__)
+        encoded = name.encode("utf-8")
+        append(b"x%d:" % len(encoded))
+        append(encoded)
+        value = default(value)
+        if isinstance(value, json.RawJSON):
+            value = value.encoded_json
+        _etag_parts(value, None, default, append)
+
+
+def json_dumps(value, indent=None):
+    """Serializes `value` to a JSON string with the configured JSON_BACKEND.
+    Values which are not natively supported by the backend are encoded by the
+    data layer ``json_encoder_class``. The orjson backend produces compact
+    output and is only used when no indentation is requested; should it fail
+    to encode the value, simplejson is used instead.
+
+    :param value: the value to be serialized.
+    :param indent: indentation level, for pretty printing.
+
+    .. versionadded:: 2.4
+    """
+    if config.JSON_BACKEND == "orjson" and indent is None:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if config.JSON_SORT_KEYS:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(
+                value,
+                default=_orjson_default(app.data.json_encoder_class()),
+                option=option,
+            ).decode("utf-8")
+        except TypeError:
+            pass
+
+    return json.dumps(
+        value,
+        indent=indent,
+        cls=app.data.json_encoder_class,
+        sort_keys=config.JSON_SORT_KEYS,
     )
-    return h.hexdigest()
+
+
+def _orjson_default(encoder):
+    """Returns a `default` function for orjson, which delegates to the
+    `default` method of a ``json_encoder_class`` instance. Bytes are decoded
+    like simplejson does, and raw JSON values returned by the encoder are
+    parsed back. The types listed by the ``orjson_fast_types`` attribute of
+    the encoder class (not inherited by subclasses, which may encode them
+    differently) are encoded by a fast path which produces the same output.
+
+    .. versionadded:: 2.4
+    """
+    date_format = config.DATE_FORMAT
+    fast_paths = {
+        datetime: lambda value: value.strftime(date_format),
+        ObjectId: str,
+        Decimal128: str,
+        DBRef: _dbref_to_dict,
+    }
+    handlers = {bytes: lambda value: value.decode("utf-8")}
+    for type_ in vars(type(encoder)).get("orjson_fast_types", ()):
+        if type_ in fast_paths:
+            handlers[type_] = fast_paths[type_]
+
+    def default(obj):
+        handler = handlers.get(type(obj))
+        if handler is not None:
+            return handler(obj)
+        value = encoder.default(obj)
+        if isinstance(value, json.RawJSON):
+            return orjson.loads(value.encoded_json)
+        return value
+
+    return default
+
+
+def _dbref_to_dict(dbref):
+    """Returns a DBRef as it is encoded by the Mongo json encoder.
+
+    .. versionadded:: 2.4
+    """
+    value = {"$ref": dbref.collection, "$id": str(dbref.id)}
+    if dbref.database:
+        value["$db"] = dbref.database
+    return value
 
 
 def extract_key_values(key, d):
@@ -426,6 +748,9 @@ def validate_filters(where, resource):
     :param where: the where clause, as a dict.
     :param resource: the resource being inspected.
 
+    .. versionchanged:: 2.4
+       Validators are taken from the app validator pool.
+
     .. versionchanged: 0.5
        If the data layer supports a list of allowed operators, take them
        into consideration when validating the query string (#388).
@@ -507,7 +832,7 @@ def validate_filters(where, resource):
 
                             return False
                         field_schema = schema.get(key)
-                        v = app.validator({key: field_schema})
+                        v = app.validator_pool.get_field(key, field_schema)
                         return v.validate({key: value})
 
                     res_schema = config.DOMAIN[resource]["schema"]
@@ -527,6 +852,9 @@ def auto_fields(resource):
 
     :param resource: the resource currently being accessed by the client.
 
+    .. versionchanged:: 2.4
+       VERSION_DELTA is preserved meta data for versioned resources.
+
     .. versionchanged: 0.5
        ETAG is now a preserved meta data (#369).
 
@@ -549,6 +877,7 @@ def auto_fields(resource):
         fields.append(config.VERSION)
         fields.append(config.LATEST_VERSION)  # on-the-fly meta data
         fields.append(resource_def["id_field"] + config.VERSION_ID_SUFFIX)
+        fields.append(config.VERSION_DELTA)  # only found in shadow documents
 
     if resource_def["soft_delete"] is True:
         fields.append(config.DELETED)
@@ -13,15 +13,65 @@
 """
 
 import copy
+import multiprocessing
+import os
+import threading
+import weakref
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 import cerberus
 import cerberus.errors
+import cerberus.schema
 from cerberus import DocumentError, SchemaError  # noqa
+from cerberus import rules_set_registry, schema_registry
+from flask import current_app as app
 
 from eve.utils import config
 
+#: Checks deferred by the validators of a worker process (see
+#: :class:`ValidationWorkers`); None in any other process.
+_deferred_checks = None
+
+
+class DefinitionSchema(cerberus.schema.DefinitionSchema):
+    """A Cerberus definition schema whose copies are not validated again.
+
+    Cerberus copies the validator schema, and validates the copy one rules
+    set at a time, whenever a document is normalized. A copy of a valid
+    schema is valid too, so for large schemas this is just wasted time.
+
+    .. versionadded:: 2.4
+    """
+
+    def copy(self):
+        return ValidatedSchema(self.validator, self.schema.copy())
+
+
+class ValidatedSchema(DefinitionSchema):
+    """The copy of a :class:`DefinitionSchema`, which is known to be valid
+    already. Rules sets assigned to it are expected to be valid and expanded,
+    as those of its original (or of the rules set registry) are.
+
+    .. versionadded:: 2.4
+    """
+
+    def __init__(self, validator, schema):
+        self.validator = validator
+        self.schema = schema
+
+    def __setitem__(self, key, value):
+        self.schema[key] = value
+
 
 class Validator(cerberus.Validator):
+    """
+    .. versionchanged:: 2.4
+       Use :class:`DefinitionSchema` for the validation schema.
+       Add :meth:`reset`, :meth:`prepare_bulk` and :meth:`resume`.
+    """
+
     def __init__(self, *args, **kwargs):
         if not config.VALIDATION_ERROR_AS_LIST:
             kwargs["error_handler"] = SingleErrorAsStringErrorHandler
@@ -29,6 +79,90 @@ class Validator(cerberus.Validator):
         self.is_update_operation = False
         super().__init__(*args, **kwargs)
 
+    @property
+    def schema(self):
+        return self._schema
+
+    @schema.setter
+    def schema(self, schema):
+        if not (
+            schema is None
+            or self.is_child
+            or isinstance(schema, cerberus.schema.DefinitionSchema)
+        ):
+            schema = DefinitionSchema(self, schema)
+        self._schema = schema
+
+    def reset(self):
+        """Clears the state of the last validation (document id, persisted
+        document and kind of operation), so that the validator can be reused.
+
+        .. versionadded:: 2.4
+        """
+        self.is_update_operation = False
+        self.document_id = None
+        self.persisted_document = None
+
+    def prepare_bulk(self, documents, checks=None):
+        """Invoked before the documents of a bulk insert are validated (one at
+        a time, with :meth:`validate` or :meth:`resume`). Data layer
+        validators can override it to batch the checks which would otherwise
+        cost a database round trip per document. Bulk state is cleared by
+        :meth:`reset`.
+
+        :param documents: the (parsed) documents about to be validated.
+        :param checks: the checks deferred by validation workers for these
+                       documents, if any.
+
+        .. versionadded:: 2.4
+        """
+        pass
+
+    def resume(self, document, errors, checks):
+        """Completes the validation of a document started by a validation
+        worker (see :class:`ValidationWorkers`), running the checks which were
+        deferred to this process. Returns True if the document is valid; its
+        normalized version and issues are then available as usual, through
+        ``document`` and ``errors``.
+
+        :param document: the document, as normalized by the worker.
+        :param errors: the validation errors reported by the worker.
+        :param checks: the checks deferred by the worker.
+
+        .. versionadded:: 2.4
+        """
+        self.document = document
+        self.document_error_tree = cerberus.errors.DocumentErrorTree()
+        self.schema_error_tree = cerberus.errors.SchemaErrorTree()
+        self._errors = cerberus.errors.ErrorList()
+        self.recent_error = None
+        if errors:
+            self._error(errors)
+        try:
+            for check, document_path, field, value, args in checks:
+                # checks run as if by the validator of the (sub)document.
+                self.document, self.document_path = document, document_path
+                for key in document_path:
+                    self.document = self.document[key]
+                getattr(self, check)(field, value, *args)
+        finally:
+            self.document_path = ()
+            self.document = document
+        return not self._errors
+
+    def _defer(self, check, field, value, *args):
+        """Defers `check` (the name of a validator method, invoked with
+        `field`, `value` and `args`) to the parent process, when validating
+        in a validation worker. Checks which need the database, or a request,
+        are deferred. Returns False if the check is to be run right away.
+
+        .. versionadded:: 2.4
+        """
+        if _deferred_checks is None:
+            return False
+        _deferred_checks.append((check, self.document_path, field, value, args))
+        return True
+
     def validate_update(
         self, document, document_id, persisted_document=None, normalize_document=True
     ):
@@ -153,6 +287,360 @@ class Validator(cerberus.Validator):
         self._config["persisted_document"] = value
 
 
+class ValidatorPool:
+    """Keeps validators around for reuse, so that the (costly) schema
+    normalization and validation performed by Cerberus on construction only
+    happens once per schema and thread, instead of once per request.
+
+    Validators are keyed by validator class, schema identity and construction
+    arguments, and are dropped when :attr:`eve.Eve.schema_version` changes:
+    resources being registered, the Cerberus registries being updated or
+    :meth:`eve.Eve.invalidate_schema_caches` being called (which is needed
+    after schemas are changed in place). Only :class:`Validator` subclasses
+    are reused, as they know how to :meth:`~Validator.reset` their state;
+    other validator classes are instantiated on every call.
+
+    :param app: the Eve application.
+
+    .. versionadded:: 2.4
+    """
+
+    #: Maximum number of validators kept, per thread.
+    max_size = 1000
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def get(self, schema, **kwargs):
+        """Returns a validator for `schema`, ready for use.
+
+        :param schema: the validation schema. Validators are only reused for
+                       the very same schema object.
+        :param kwargs: optional validator arguments (``resource``,
+                       ``allow_unknown``, ...).
+        """
+        validator_cls = self.app.validator
+        if not self.app.config["REUSE_VALIDATORS"] or not issubclass(
+            validator_cls, Validator
+        ):
+            return validator_cls(schema, **kwargs)
+
+        try:
+            key = (
+                validator_cls,
+                id(schema),
+                tuple(sorted(kwargs.items())),
+                self.app.config["VALIDATION_ERROR_AS_LIST"],
+            )
+            hash(key)
+        except TypeError:
+            # unhashable arguments.
+            return validator_cls(schema, **kwargs)
+
+        validators = self._validators()
+        entry = validators.get(key)
+        # the schema is kept along, so that its id can't be reused.
+        if entry is None or entry[0] is not schema:
+            if len(validators) >= self.max_size:
+                validators.clear()
+            entry = schema, validator_cls(schema, **kwargs)
+            validators[key] = entry
+        else:
+            entry[1].reset()
+        return entry[1]
+
+    def get_field(self, field, rules):
+        """Returns a validator for a schema made of `field` only, ready for
+        use. The schema is built once per field and rules set.
+
+        :param field: the field name.
+        :param rules: the rules set of the field.
+        """
+        schemas = self._local_cache("field_schemas")
+        key = field, id(rules)
+        entry = schemas.get(key)
+        if entry is None or entry[0] is not rules:
+            if len(schemas) >= self.max_size:
+                schemas.clear()
+            entry = rules, {field: rules}
+            schemas[key] = entry
+        return self.get(entry[1])
+
+    def clear(self):
+        """Drops the validators of the current thread."""
+        self._validators().clear()
+        self._local_cache("field_schemas").clear()
+
+    def _validators(self):
+        return self._local_cache("validators")
+
+    def _local_cache(self, name):
+        # caches are dropped, per thread, when the schemas change.
+        version = self.app.schema_version
+        local = self._local
+        if getattr(local, "version", None) != version:
+            local.version = version
+            local.validators = {}
+            local.field_schemas = {}
+        return getattr(local, name)
+
+
+class ValidationWorkers:
+    """A pool of worker processes validating the documents of large bulk
+    inserts in parallel, as Cerberus validation is CPU bound. Workers are
+    forked, with an application context pushed and the resource validators
+    already built. Checks needing the database (or the current request) are
+    deferred to the parent process, where the validator :meth:`prepares
+    <Validator.prepare_bulk>` them in batches before :meth:`resuming
+    <Validator.resume>` the validation of each document.
+
+    Workers have no request context, and no database connection of their
+    own: only resources whose rules are known not to rely on them (see
+    :attr:`pure_modules`) are validated by the workers.
+
+    The pool of ``VALIDATION_WORKERS`` processes is started by :meth:`start`,
+    which the application invokes once it is set up, as forking a process
+    which already runs threads (or holds database connections) is not safe.
+    Validation happens in the calling process when the pool is disabled or
+    not running in the current process (when the application is preloaded
+    and then forked by the server, for example), processes can't be forked,
+    or schemas changed since the pool was started. The pool is shut down
+    along with the application, or when the interpreter exits.
+
+    :param app: the Eve application.
+
+    .. versionadded:: 2.4
+    """
+
+    #: Chunks each worker gets, per payload.
+    chunks_per_worker = 4
+
+    #: Modules whose callables (schema rules such as ``coerce`` or
+    #: ``check_with``, and validator rule methods) are known not to need the
+    #: request or the database, and can be run by the workers. Resources
+    #: relying on callables from other modules are validated by the calling
+    #: process.
+    pure_modules = ("builtins", "cerberus", "eve")
+
+    #: Prefixes of the validator methods implementing rules.
+    rule_prefixes = ("_check_with_", "_normalize_", "_validate_", "_validator_")
+
+    def __init__(self, app):
+        self.app = app
+        self._executor = None
+        self._pid = None
+        # shuts the pool down along with the application.
+        self._finalizer = None
+        # resources known to the workers, and the schemas they know.
+        self._resources = frozenset()
+        self._schema_version = None
+        self._lock = threading.Lock()
+
+    def validate(self, resource, documents, **kwargs):
+        """Validates `documents` against the `resource` schema in the worker
+        processes. Returns, in payload order, the ``(document, errors,
+        checks)`` to be passed to :meth:`Validator.resume` for each document
+        (or the exception raised while validating it). Returns None if
+        `documents` have to be validated by the calling process.
+
+        :param resource: the resource name.
+        :param documents: the (parsed) documents to be validated.
+        :param kwargs: optional validator arguments (``allow_unknown``, ...).
+        """
+        executor = self._get_executor()
+        if executor is None or resource not in self._resources:
+            return None
+
+        # workers have their own copy of the domain: schemas (and their
+        # callables, which can't be pickled) are not sent along.
+        chunks = self.app.config["VALIDATION_WORKERS"] * self.chunks_per_worker
+        size = -(-len(documents) // chunks)
+        args = [
+            (resource, kwargs, documents[i : i + size])
+            for i in range(0, len(documents), size)
+        ]
+        results = []
+        try:
+            for outcomes in executor.map(_validate_chunk, *zip(*args)):
+                results.extend(outcomes)
+        except BrokenProcessPool as e:
+            self.app.logger.exception(e)
+            self.shutdown()
+            return None
+        except Exception as e:
+            # documents which can't be pickled: the calling process
+            # validates them as usual.
+            self.app.logger.exception(e)
+            return None
+        return results
+
+    def start(self):
+        """Forks the ``VALIDATION_WORKERS`` processes, unless they are
+        disabled or already running. Invoked by the application once it is
+        set up. Servers which fork the application after loading it should
+        invoke it in each of their processes, before serving requests.
+
+        Workers validate against the schemas known when they are started:
+        once resources are added or changed, documents are validated by the
+        calling process, until the workers are restarted (:meth:`shutdown`,
+        then :meth:`start`).
+        """
+        workers = self.app.config["VALIDATION_WORKERS"]
+        if (
+            not workers
+            or not issubclass(self.app.validator, Validator)
+            or "fork" not in multiprocessing.get_all_start_methods()
+        ):
+            return
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                return
+            resources = self._pure_resources()
+            if not resources:
+                return
+            # workers get the application from the parent memory; a weak
+            # reference keeps the pool from holding it alive.
+            executor = ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker,
+                initargs=(weakref.ref(self.app),),
+            )
+            # processes are forked on first submit: right now, not later on
+            # from a request thread.
+            executor.submit(os.getpid).result()
+            self._executor, self._pid = executor, os.getpid()
+            self._finalizer = weakref.finalize(
+                self.app, _shutdown_executor, executor, self._pid
+            )
+            self._resources = resources
+            self._schema_version = self.app.schema_version
+
+    def shutdown(self):
+        """Stops the worker processes, if any. Documents are then validated
+        by the calling process, until the pool is started again.
+        """
+        with self._lock:
+            finalizer, self._finalizer = self._finalizer, None
+            self._executor = None
+        if finalizer is not None:
+            finalizer()
+
+    def _get_executor(self):
+        if not self.app.config["VALIDATION_WORKERS"]:
+            return None
+        with self._lock:
+            # a pool inherited from the parent process can't be used.
+            if self._executor is None or self._pid != os.getpid():
+                return None
+            if self._schema_version == self.app.schema_version:
+                return self._executor
+        self.app.logger.warning(
+            "schemas changed since the validation workers were started: "
+            "validation happens in the request process until they are "
+            "restarted."
+        )
+        self.shutdown()
+        return None
+
+    def _pure_resources(self):
+        """Returns the resources which can be validated by the workers."""
+        validator_cls = self.app.validator
+        for name in dir(validator_cls):
+            if name.startswith(self.rule_prefixes) and not self._is_pure(
+                getattr(validator_cls, name)
+            ):
+                return frozenset()
+        return frozenset(
+            resource
+            for resource, settings in self.app.config["DOMAIN"].items()
+            if self._is_pure(settings["schema"])
+        )
+
+    def _is_pure(self, value, seen=None):
+        """Tells whether a schema (or a callable) can be run by the workers.
+        Definitions from the Cerberus registries are checked as well.
+        """
+        if seen is None:
+            seen = set()
+        if isinstance(value, Mapping):
+            return all(self._is_pure(v, seen) for v in value.values())
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return all(self._is_pure(v, seen) for v in value)
+        if isinstance(value, str):
+            for registry in (schema_registry, rules_set_registry):
+                definition = registry.get(value)
+                if definition is None or (registry, value) in seen:
+                    continue
+                seen.add((registry, value))
+                if not self._is_pure(definition, seen):
+                    return False
+            return True
+        if not callable(value) or isinstance(value, type):
+            return True
+        module = getattr(value, "__module__", None)
+        if module is None:
+            owner = getattr(value, "__objclass__", None) or type(
+                getattr(value, "__self__", None)
+            )
+            module = owner.__module__
+        return any(
+            module == name or module.startswith(name + ".")
+            for name in self.pure_modules
+        )
+
+
+def _shutdown_executor(executor, pid):
+    """Shuts `executor` down, unless it was inherited from the parent
+    process."""
+    if pid == os.getpid():
+        executor.shutdown()
+
+
+def _init_worker(app_ref):
+    """Initializes a validation worker process."""
+    app = app_ref()
+    # database clients don't survive a fork: the worker opens its own, if
+    # ever needed.
+    driver = getattr(app.data, "driver", None)
+    if isinstance(driver, dict):
+        driver.clear()
+    # the application context stays for the lifetime of the worker.
+    app.app_context().push()
+    for resource, settings in app.config["DOMAIN"].items():
+        if "POST" not in settings["resource_methods"]:
+            continue
+        try:
+            app.validator_pool.get(
+                settings["schema"],
+                resource=resource,
+                allow_unknown=settings["allow_unknown"],
+            )
+        except SchemaError:
+            # reported when the resource is validated against.
+            pass
+
+
+def _validate_chunk(resource, kwargs, documents):
+    """Validates `documents` in a validation worker process."""
+    global _deferred_checks
+
+    schema = app.config["DOMAIN"][resource]["schema"]
+    validator = app.validator_pool.get(schema, resource=resource, **kwargs)
+    outcomes = []
+    for document in documents:
+        _deferred_checks = []
+        try:
+            validator.validate(document)
+            outcome = validator.document, list(validator._errors), _deferred_checks
+        except Exception as e:
+            outcome = e
+        outcomes.append(outcome)
+    _deferred_checks = None
+    return outcomes
+
+
 class SingleErrorAsStringErrorHandler(cerberus.errors.BasicErrorHandler):
     """Default Cerberus error handler for Eve.
 
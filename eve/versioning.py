@@ -1,5 +1,6 @@
 from flask import abort
 from flask import current_app as app
+from pymongo import ReplaceOne
 from werkzeug.exceptions import BadRequestKeyError
 
 from eve.utils import ParsedRequest, config, debug_error_message
@@ -105,11 +106,19 @@ def late_versioning_catch(document, resource):
             insert_versioning_documents(resource, document)
 
 
-def insert_versioning_documents(resource, documents):
+def insert_versioning_documents(resource, documents, originals=None):
     """Insert versioning copy of document. Intended for POST, PUT, and PATCH.
 
+    With 'version_storage' set to 'delta', versions following the version of
+    their original are stored as deltas (see :func:`version_delta`), unless
+    they are due for a snapshot.
+
     :param resource: the resource of the request/document.
     :param documents: the documents be written by POST, PUT, or PATCH.
+    :param originals: the documents as they were before the changes, if any.
+
+    .. versionchanged:: 2.4
+       Added the 'originals' argument. Support for delta storage.
 
     .. versionadded:: 0.4
     """
@@ -123,6 +132,8 @@ def insert_versioning_documents(resource, documents):
         # force input as lists
         if not isinstance(documents, list):
             documents = [documents]
+        if originals is not None and not isinstance(originals, list):
+            originals = [originals]
 
         # if 'user-restricted resource access' is enabled and there's
         # an Auth request active, inject the username into the document
@@ -134,16 +145,21 @@ def insert_versioning_documents(resource, documents):
 
         # build vesioning documents
         version = app.config["VERSION"]
+        fields = versioned_fields(resource_def)
         versioned_documents = []
         for index, document in enumerate(documents):
             ver_doc = {}
 
             # push normal fields
-            fields = versioned_fields(resource_def)
             for field in document:
                 if field in fields:
                     ver_doc[field] = document[field]
 
+            # only store the changes since the original, when appropriate
+            original = originals[index] if originals else None
+            if original and _store_as_delta(resource_def, document[version], original):
+                ver_doc = version_delta(resource_def, original, ver_doc)
+
             # push special fields
             ver_doc[versioned_id_field(resource_def)] = document[_id]
             ver_doc[version] = document[version]
@@ -160,6 +176,233 @@ def insert_versioning_documents(resource, documents):
         app.data.insert(versionable_resource_name, versioned_documents)
 
 
+def _store_as_delta(resource_def, version, original):
+    """Returns True if `version` of a document can be stored as a delta of
+    its `original` document: versions are stored as deltas of the previous
+    one, with a snapshot every 'version_snapshot_interval' versions.
+
+    .. versionadded:: 2.4
+    """
+    return (
+        resource_def["version_storage"] == "delta"
+        and original.get(app.config["VERSION"]) == version - 1
+        and (version - 1) % resource_def["version_snapshot_interval"] != 0
+    )
+
+
+def version_delta(resource_def, previous, document):
+    """Returns the delta between two versions of a document: the versioned
+    fields added or modified by `document`, and the list of versioned fields
+    it removed, stored under VERSION_DELTA.
+
+    :param resource_def: a resource definition.
+    :param previous: the previous version of the document.
+    :param document: the versioned fields of the new version.
+
+    .. versionadded:: 2.4
+    """
+    delta = dict(
+        (field, value)
+        for field, value in document.items()
+        if field not in previous or previous[field] != value
+    )
+    delta[app.config["VERSION_DELTA"]] = [
+        field
+        for field in versioned_fields(resource_def)
+        if field in previous and field not in document
+    ]
+    return delta
+
+
+def is_version_delta(shadow_document):
+    """Returns True if a shadow document is stored as a delta.
+
+    .. versionadded:: 2.4
+    """
+    return app.config["VERSION_DELTA"] in shadow_document
+
+
+def apply_version_delta(shadow_document, delta):
+    """Returns the shadow document of the version following
+    `shadow_document`, given its `delta` (which is returned as is when it is
+    a snapshot).
+
+    :param shadow_document: a version of a document, with all its fields.
+    :param delta: the following version, possibly stored as a delta.
+
+    .. versionadded:: 2.4
+    """
+    if not is_version_delta(delta):
+        return delta
+
+    document = dict(shadow_document)
+    for field in delta[app.config["VERSION_DELTA"]]:
+        document.pop(field, None)
+    document.update(delta)
+    del document[app.config["VERSION_DELTA"]]
+    return document
+
+
+def rebuild_version(resource, delta, req=None):
+    """Returns the full shadow document of a version stored as a delta, by
+    applying it, and the deltas preceding it, to the nearest snapshot. Aborts
+    with 500 if the history has no snapshot to start from, or misses one of
+    the versions in between.
+
+    :param resource: the name of the resource.
+    :param delta: the shadow document of the version.
+    :param req: the parsed request object, its projection is honored.
+
+    .. versionadded:: 2.4
+    """
+    resource_def = config.DOMAIN[resource]
+    id_field = versioned_id_field(resource_def)
+
+    history = ParsedRequest()
+    history.show_deleted = True
+    history.projection = req.projection if req else None
+    history.sort = '[("%s", -1)]' % config.VERSION
+    history.max_results = resource_def["version_snapshot_interval"]
+
+    # walk back the history, one snapshot interval at a time.
+    versions = [delta]
+    while is_version_delta(versions[-1]):
+        lookup = {
+            id_field: delta[id_field],
+            config.VERSION: {"$lt": versions[-1][config.VERSION]},
+        }
+        cursor, _ = app.data.find(
+            resource + config.VERSIONS, history, lookup, perform_count=False
+        )
+        previous = list(cursor)
+        for version in previous:
+            if version.get(config.VERSION) != versions[-1][config.VERSION] - 1:
+                # the version a delta was computed from is missing.
+                break
+            versions.append(version)
+            if not is_version_delta(version):
+                break
+        else:
+            if len(previous) == history.max_results:
+                continue
+        if is_version_delta(versions[-1]):
+            abort(
+                500,
+                description=debug_error_message(
+                    "Version %s of document %s can't be rebuilt: the versions "
+                    "preceding it are incomplete"
+                    % (delta[config.VERSION], delta[id_field])
+                ),
+            )
+
+    document = {}
+    for version in reversed(versions):
+        document = apply_version_delta(document, version)
+    return document
+
+
+def rebuild_versions(resource, shadow_documents, req=None):
+    """Returns a list of shadow documents where versions stored as deltas
+    are replaced by their full shadow documents. When they belong to the
+    same document, the versions are rebuilt in sequence, so that at most one
+    history lookup is needed for a page of versions.
+
+    :param resource: the name of the resource.
+    :param shadow_documents: the shadow documents, in any order.
+    :param req: the parsed request object, its projection is honored.
+
+    .. versionadded:: 2.4
+    """
+    id_field = versioned_id_field(config.DOMAIN[resource])
+    version = config.VERSION
+
+    rebuilt = list(shadow_documents)
+    previous = None
+    for index in sorted(
+        range(len(rebuilt)),
+        key=lambda i: (str(rebuilt[i].get(id_field)), rebuilt[i][version]),
+    ):
+        document = rebuilt[index]
+        if is_version_delta(document):
+            if (
+                previous is not None
+                and previous.get(id_field) == document.get(id_field)
+                and previous[version] == document[version] - 1
+            ):
+                document = apply_version_delta(previous, document)
+            else:
+                document = rebuild_version(resource, document, req)
+        rebuilt[index] = previous = document
+    return rebuilt
+
+
+def migrate_versions(resource, storage=None, snapshot_interval=None):
+    """Rewrites the shadow collection of a resource, so that all its versions
+    are stored as configured with 'version_storage' and
+    'version_snapshot_interval' (or as `storage` and `snapshot_interval`,
+    when given). Versions can thus be compacted into deltas after turning
+    delta storage on, or restored as full copies. Shadow documents are read
+    and written raw, so the MongoDB data layer is needed; run it with no
+    writes in progress on the resource, as in: ::
+
+        with app.app_context():
+            migrate_versions("people")
+
+    :param resource: the name of the resource.
+    :param storage: the target storage, 'full' or 'delta'.
+    :param snapshot_interval: the number of versions between two snapshots.
+    :return: the number of shadow documents which were rewritten.
+
+    .. versionadded:: 2.4
+    """
+    resource_def = config.DOMAIN[resource]
+    storage = storage or resource_def["version_storage"]
+    interval = snapshot_interval or resource_def["version_snapshot_interval"]
+    if storage not in ("full", "delta"):
+        raise ValueError('Unknown version storage "%s"' % storage)
+
+    versioned_resource = resource + config.VERSIONS
+    datasource, _, _, _ = app.data.datasource(versioned_resource)
+    collection = app.data.pymongo(versioned_resource).db[datasource]
+    id_field = versioned_id_field(resource_def)
+    version = config.VERSION
+    fields = versioned_fields(resource_def)
+
+    rewritten = 0
+    requests = []
+    previous = {}
+    for document in collection.find(
+        sort=[(id_field, 1), (version, 1)], allow_disk_use=True
+    ):
+        if previous.get(id_field) != document[id_field]:
+            previous = {}
+        current = apply_version_delta(previous, document)
+
+        target = current
+        if (
+            storage == "delta"
+            and previous.get(version) == current[version] - 1
+            and (current[version] - 1) % interval != 0
+        ):
+            target = version_delta(
+                resource_def,
+                previous,
+                dict((k, v) for k, v in current.items() if k in fields),
+            )
+            target.update((k, v) for k, v in current.items() if k not in fields)
+
+        if target != document:
+            requests.append(ReplaceOne({"_id": document["_id"]}, target))
+            if len(requests) == 1000:
+                rewritten += collection.bulk_write(requests).modified_count
+                requests = []
+        previous = current
+
+    if requests:
+        rewritten += collection.bulk_write(requests).modified_count
+    return rewritten
+
+
 def versioned_fields(resource_def):
     """Returns a list of versioned fields for a resource.
 
@@ -191,17 +434,25 @@ def versioned_fields(resource_def):
     return fields
 
 
-def diff_document(resource_def, old_doc, new_doc):
+def diff_document(resource_def, old_doc, new_doc, changed_fields=None):
     """Returns a list of added or modified fields.
 
     :param resource_def: a resource definition.
     :param old_doc: the document to compare against.
     :param new_doc: the document in question.
+    :param changed_fields: the fields which might have changed, when known
+                           (as with versions stored as deltas). Defaults to
+                           all the fields in the schema.
+
+    .. versionchanged:: 2.4
+       Added the 'changed_fields' argument.
 
     .. versionadded:: 0.4
     """
     diff = {}
-    fields = list(resource_def["schema"].keys()) + [
+    if changed_fields is None:
+        changed_fields = resource_def["schema"].keys()
+    fields = list(changed_fields) + [
         app.config["VERSION"],
         app.config["LATEST_VERSION"],
         resource_def["id_field"],
@@ -280,6 +531,9 @@ def get_old_document(resource, req, lookup, document, version):
     :param document: the current version of the document.
     :param version: the value of the version request parameter.
 
+    .. versionchanged:: 2.4
+       Rebuild versions stored as deltas.
+
     .. versionchanged:: 0.6.1
        Use shallow copies instead of deepcopies to optimize for performance.
        #732.
@@ -309,6 +563,8 @@ def get_old_document(resource, req, lookup, document, version):
         delta = app.data.find_one(resource + config.VERSIONS, req, **lookup)
         if not delta:
             abort(404)
+        if is_version_delta(delta):
+            delta = rebuild_version(resource, delta, req)
         old_document = synthesize_versioned_document(document, delta, resource_def)
     else:
         # perform a shallow copy to allow this document to be used as a delta
@@ -327,6 +583,9 @@ def get_data_version_relation_document(data_relation, reference, latest=False):
     :param reference: a dictionary with a value_field and a version_field.
     :param latest: if we should obey the version param in reference or not.
 
+    .. versionchanged:: 2.4
+       Support for versions stored as deltas.
+
     .. versionadded:: 0.4
     """
     value_field = data_relation["field"]
@@ -353,11 +612,40 @@ def get_data_version_relation_document(data_relation, reference, latest=False):
         if not latest_version:
             return None
         query[versioned_id_field(resource_def)] = latest_version[id_field]
+    elif resource_def["version_storage"] == "delta":
+        # Versions stored as deltas only hold the field if it changed. Find
+        # the document through the last version which set it.
+        req = ParsedRequest()
+        req.sort = '[("%s", -1)]' % version_field
+        req.max_results = 1
+        lookup = {
+            value_field: reference[value_field],
+            version_field: {"$lte": reference[version_field]},
+        }
+        cursor, _ = app.data.find(
+            versioned_collection, req, lookup, perform_count=False
+        )
+        changed = next(iter(cursor), None)
+        if changed is None:
+            query = None
+        else:
+            vid = versioned_id_field(resource_def)
+            query[vid] = changed[vid]
     else:
         # Field will be present in the versioned collection
         query[value_field] = reference[value_field]
 
-    referenced_version = app.data.find_one(versioned_collection, None, **query)
+    referenced_version = None
+    if query:
+        referenced_version = app.data.find_one(versioned_collection, None, **query)
+    if referenced_version and is_version_delta(referenced_version):
+        referenced_version = rebuild_version(collection, referenced_version)
+        if (
+            value_field in versioned_fields(resource_def)
+            and referenced_version.get(value_field) != reference[value_field]
+        ):
+            # the field changed again before the referenced version.
+            referenced_version = None
 
     # support late versioning
     if referenced_version is None and reference[version_field] == 1:
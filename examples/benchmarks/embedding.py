@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Embedding benchmark
+    ~~~~~~~~~~~~~~~~~~~
+
+    Compares the two ways Eve can serve ``?embedded=`` collection requests:
+    the default path, where related documents are fetched by the API with
+    one query per embedded field, and the server-side path
+    (``embedding_lookup``), where they come along with the page thanks to
+    ``$lookup`` aggregation stages.
+
+    Needs a MongoDB 5.0+ instance running on localhost. The benchmark
+    database is dropped when done.
+
+        $ python examples/benchmarks/embedding.py
+
+    Checkout Eve at https://github.com/pyeve/eve
+"""
+import copy
+import time
+
+from pymongo import MongoClient
+
+from eve import Eve
+
+DBNAME = "eve_benchmarks"
+BOOKS = 2000
+AUTHORS = 200
+PAGE_SIZES = (10, 25, 50, 100)
+ROUNDS = 50
+
+SETTINGS = {
+    "MONGO_DBNAME": DBNAME,
+    "PAGINATION_LIMIT": max(PAGE_SIZES),
+    "DOMAIN": {
+        "authors": {"schema": {"name": {"type": "string"}}},
+        "books": {
+            "schema": {
+                "title": {"type": "string"},
+                "author": {
+                    "type": "objectid",
+                    "data_relation": {"resource": "authors", "embeddable": True},
+                },
+                "reviewers": {
+                    "type": "list",
+                    "schema": {
+                        "type": "objectid",
+                        "data_relation": {"resource": "authors", "embeddable": True},
+                    },
+                },
+            }
+        },
+    },
+}
+
+
+def populate(db):
+    authors = db.authors.insert_many(
+        [{"name": "author %d" % i} for i in range(AUTHORS)]
+    ).inserted_ids
+    db.books.insert_many(
+        [
+            {
+                "title": "book %d" % i,
+                "author": authors[i % AUTHORS],
+                "reviewers": [authors[(i + j) % AUTHORS] for j in range(1, 4)],
+            }
+            for i in range(BOOKS)
+        ]
+    )
+
+
+def run(lookup):
+    settings = copy.deepcopy(SETTINGS)
+    settings["DOMAIN"]["books"]["embedding_lookup"] = lookup
+    client = Eve(settings=settings).test_client()
+
+    results = {}
+    for page_size in PAGE_SIZES:
+        url = '/books?max_results=%d&embedded={"author": 1, "reviewers": 1}' % (
+            page_size
+        )
+        assert client.get(url).status_code == 200
+        pages = BOOKS // page_size
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            client.get("%s&page=%d" % (url, i % pages + 1))
+        results[page_size] = (time.perf_counter() - start) / ROUNDS * 1000
+    return results
+
+
+if __name__ == "__main__":
+    connection = MongoClient()
+    connection.drop_database(DBNAME)
+    populate(connection[DBNAME])
+    try:
+        default, lookup = run(False), run(True)
+    finally:
+        connection.drop_database(DBNAME)
+
+    print("page size   default (ms)   $lookup (ms)")
+    for page_size in PAGE_SIZES:
+        print(
+            "%9d   %12.2f   %12.2f" % (page_size, default[page_size], lookup[page_size])
+        )
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+    JSON encoding benchmark
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Compares the JSON backends Eve can use to render responses
+    (``JSON_BACKEND``) and the algorithms it can use to compute document
+    ETags (``ETAG_VERSION``), over pages of representative documents.
+
+    Needs the orjson package, but no database.
+
+        $ python examples/benchmarks/json_encoding.py
+
+    Checkout Eve at https://github.com/pyeve/eve
+"""
+import datetime
+import time
+
+from bson import DBRef, Decimal128, ObjectId
+
+from eve import Eve
+from eve.utils import document_etag, json_dumps
+
+PAGE_SIZES = (25, 100, 1000)
+ROUNDS = 20
+
+
+def document(i):
+    now = datetime.datetime(2024, 1, 1) + datetime.timedelta(minutes=i)
+    return {
+        "_id": ObjectId(),
+        "_created": now,
+        "_updated": now,
+        "_etag": "%040x" % i,
+        "name": "person %d" % i,
+        "age": 20 + i % 50,
+        "rating": 0.5 * (i % 10),
+        "balance": Decimal128("%d.25" % i),
+        "tags": ["tag%d" % (i % 5), "tag%d" % (i % 7)],
+        "address": {"street": "%d main street" % i, "city": "Rome", "zip": "00100"},
+        "manager": DBRef("people", ObjectId()),
+        "_links": {"self": {"title": "person", "href": "people/%d" % i}},
+    }
+
+
+def timed(func, documents):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(documents)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def render(documents):
+    json_dumps({"_items": documents, "_meta": {"total": len(documents)}})
+
+
+def etags(documents):
+    for doc in documents:
+        document_etag(doc)
+
+
+def run(json_backend, etag_version):
+    app = Eve(
+        settings={
+            "DOMAIN": {"people": {}},
+            "JSON_BACKEND": json_backend,
+            "ETAG_VERSION": etag_version,
+        }
+    )
+    results = {}
+    with app.test_request_context():
+        for page_size in PAGE_SIZES:
+            documents = [document(i) for i in range(page_size)]
+            results[page_size] = (
+                timed(render, documents),
+                timed(etags, documents),
+            )
+    return results
+
+
+if __name__ == "__main__":
+    default, fast = run("simplejson", 1), run("orjson", 2)
+
+    print("            render (ms)              etags (ms)")
+    print("page size   simplejson    orjson     version 1   version 2")
+    for page_size in PAGE_SIZES:
+        print(
+            "%9d   %10.2f  %8.2f   %10.2f  %10.2f"
+            % (
+                page_size,
+                default[page_size][0],
+                fast[page_size][0],
+                default[page_size][1],
+                fast[page_size][1],
+            )
+        )
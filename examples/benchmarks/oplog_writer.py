@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Oplog writer benchmark
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Measures the throughput of POST requests, issued by several concurrent
+    clients, with the oplog enabled and its entries written by the request
+    (``OPLOG_WRITER = 'sync'``), in batches by a background thread
+    (``'async'``), or in batches while the request waits for them to be
+    written (``'async_fsync'``).
+
+    Needs a MongoDB instance running on localhost. The benchmark database is
+    dropped when done.
+
+        $ python examples/benchmarks/oplog_writer.py
+
+    Checkout Eve at https://github.com/pyeve/eve
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import MongoClient
+
+from eve import Eve
+
+DBNAME = "eve_benchmarks"
+CLIENTS = 8
+REQUESTS = 500
+WRITERS = ("sync", "async", "async_fsync")
+
+
+def run(writer):
+    app = Eve(
+        settings={
+            "MONGO_DBNAME": DBNAME,
+            "RESOURCE_METHODS": ["GET", "POST", "DELETE"],
+            "OPLOG": True,
+            "OPLOG_WRITER": writer,
+            "DOMAIN": {"items": {"schema": {"name": {"type": "string"}}}},
+        }
+    )
+    app.test_client().delete("/items")
+    MongoClient()[DBNAME]["oplog"].drop()
+
+    def post(n):
+        client = app.test_client()
+        headers = [("Content-Type", "application/json")]
+        for i in range(REQUESTS):
+            data = json.dumps({"name": "client %d item %d" % (n, i)})
+            r = client.post("/items", data=data, headers=headers)
+            assert r.status_code == 201
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CLIENTS) as executor:
+        list(executor.map(post, range(CLIENTS)))
+    elapsed = time.perf_counter() - start
+    app.oplog_writer.flush()
+    total = time.perf_counter() - start
+
+    metrics = app.oplog_writer.metrics()
+    app.oplog_writer.shutdown()
+    assert MongoClient()[DBNAME]["oplog"].count_documents({}) == CLIENTS * REQUESTS
+    return CLIENTS * REQUESTS / elapsed, total, metrics["batches"]
+
+
+if __name__ == "__main__":
+    connection = MongoClient()
+    connection.drop_database(DBNAME)
+    try:
+        results = [(w,) + run(w) for w in WRITERS]
+    finally:
+        connection.drop_database(DBNAME)
+
+    baseline = results[0][1]
+    print("     writer      req/s   speedup   total (flushed)   batches")
+    for writer, throughput, total, batches in results:
+        print(
+            "%11s  %9.1f  %7.2fx  %14.2f s  %8s"
+            % (writer, throughput, throughput / baseline, total, batches)
+        )
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Parallel validation benchmark
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Measures bulk POST throughput (documents per second) on a resource with a
+    large (200 fields) schema, with payloads validated by the request process
+    (``VALIDATION_WORKERS = 0``) and by an increasing number of worker
+    processes.
+
+    Needs a MongoDB instance running on localhost, and a platform which can
+    fork processes. The benchmark database is dropped when done.
+
+        $ python examples/benchmarks/parallel_validation.py
+
+    Checkout Eve at https://github.com/pyeve/eve
+"""
+import json
+import os
+import time
+
+from pymongo import MongoClient
+
+from eve import Eve
+
+DBNAME = "eve_benchmarks"
+FIELDS = 200
+PAYLOAD = 5000
+REQUESTS = 3
+WORKERS = sorted(set((0, 1, 2, 4, os.cpu_count() or 1)))
+
+
+def schema():
+    schema = {"code": {"type": "string", "unique": True}}
+    for i in range(FIELDS):
+        kind = i % 4
+        if kind == 0:
+            schema["field%d" % i] = {"type": "string", "regex": "^value [0-9]+$"}
+        elif kind == 1:
+            schema["field%d" % i] = {"type": "integer", "min": 0, "max": 1000}
+        elif kind == 2:
+            schema["field%d" % i] = {"type": "list", "schema": {"type": "string"}}
+        else:
+            schema["field%d" % i] = {
+                "type": "dict",
+                "schema": {"a": {"type": "string"}, "b": {"type": "boolean"}},
+            }
+    return schema
+
+
+def document(i):
+    values = ("value %d" % i, i % 1000, ["a", "b"], {"a": "x", "b": True})
+    document = {"field%d" % j: values[j % 4] for j in range(FIELDS)}
+    document["code"] = "code %d" % i
+    return document
+
+
+def run(workers):
+    app = Eve(
+        settings={
+            "MONGO_DBNAME": DBNAME,
+            "RESOURCE_METHODS": ["GET", "POST", "DELETE"],
+            "VALIDATION_WORKERS": workers,
+            "VALIDATION_WORKERS_THRESHOLD": 1,
+            "DOMAIN": {"items": {"schema": schema()}},
+        }
+    )
+    client = app.test_client()
+
+    body = json.dumps([document(i) for i in range(PAYLOAD)])
+    headers = [("Content-Type", "application/json")]
+    elapsed = 0
+    try:
+        # the first request warms up the validators.
+        for i in range(REQUESTS + 1):
+            client.delete("/items")
+            start = time.perf_counter()
+            assert client.post("/items", data=body, headers=headers).status_code == 201
+            if i:
+                elapsed += time.perf_counter() - start
+    finally:
+        app.validation_workers.shutdown()
+    return PAYLOAD * REQUESTS / elapsed
+
+
+if __name__ == "__main__":
+    connection = MongoClient()
+    connection.drop_database(DBNAME)
+    try:
+        results = [(workers, run(workers)) for workers in WORKERS]
+    finally:
+        connection.drop_database(DBNAME)
+
+    baseline = results[0][1]
+    print("workers   documents/s   speedup")
+    for workers, throughput in results:
+        print("%7d   %11.1f   %6.2fx" % (workers, throughput, throughput / baseline))
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Query normalizer benchmark
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Compares the compiled, per-resource query normalizer Eve uses to cast
+    client queries to MongoDB types with the recursive ``_mongotize``
+    implementation it replaced, over nested ``$and``/``$or`` queries of
+    growing size.
+
+    Needs no database.
+
+        $ python examples/benchmarks/query_normalizer.py
+
+    Checkout Eve at https://github.com/pyeve/eve
+"""
+import copy
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from eve import Eve
+from eve.io.mongo.normalizer import schema_type
+from eve.utils import config, str_type
+
+CLAUSES = (10, 100, 1000)
+ROUNDS = 20
+
+SCHEMA = {
+    "name": {"type": "string"},
+    "age": {"type": "integer"},
+    "born": {"type": "datetime"},
+    "manager": {"type": "objectid"},
+    "tags": {"type": "list", "schema": {"type": "string"}},
+    "address": {
+        "type": "dict",
+        "schema": {"street": {"type": "string"}, "city": {"type": "string"}},
+    },
+}
+
+
+def legacy_mongotize(source, resource, parse_objectid=False):
+    """The recursive implementation shipped up to Eve 2.3."""
+    resource_def = config.DOMAIN[resource]
+    schema = resource_def.get("schema")
+    id_field = resource_def["id_field"]
+    id_field_versioned = id_field + config.VERSION_ID_SUFFIX
+    query_objectid_as_string = resource_def.get("query_objectid_as_string", False)
+    parse_objectid = parse_objectid or not query_objectid_as_string
+
+    def try_cast(k, v, should_parse_objectid):
+        try:
+            return datetime.strptime(v, config.DATE_FORMAT)
+        except Exception:
+            if k in (id_field, id_field_versioned) or should_parse_objectid:
+                try:
+                    return ObjectId(v)
+                except Exception:
+                    return v
+            else:
+                return v
+
+    for k, v in source.items():
+        is_objectid = (schema_type(k.split("."), schema) == "objectid") or (
+            parse_objectid
+        )
+        if isinstance(v, dict):
+            legacy_mongotize(v, resource, is_objectid)
+        elif isinstance(v, list):
+            for i, v1 in enumerate(v):
+                if isinstance(v1, dict):
+                    source[k][i] = legacy_mongotize(v1, resource)
+                else:
+                    source[k][i] = try_cast(k, v1, is_objectid)
+        elif isinstance(v, str_type):
+            source[k] = try_cast(k, v, is_objectid)
+
+    return source
+
+
+def query(clauses):
+    """A query with `clauses` leaf clauses, nested in $and/$or groups."""
+    leaves = []
+    for i in range(clauses):
+        leaves.append(
+            [
+                {"name": "person %d" % i},
+                {"born": {"$gte": "Tue, 02 Apr 2013 10:29:08 GMT"}},
+                {"manager": {"$in": ["%024x" % i, "%024x" % (i + 1)]}},
+                {"tags": {"$all": ["tag%d" % i, "tag%d" % (i + 1)]}},
+                {"address.city": "Rome"},
+                {"_id": "%024x" % i},
+            ][i % 6]
+        )
+    groups = [
+        {"$or": leaves[i : i + 5]} if (i // 5) % 2 else {"$and": leaves[i : i + 5]}
+        for i in range(0, clauses, 5)
+    ]
+    return {"$and": [{"$or": groups[i : i + 4]} for i in range(0, len(groups), 4)]}
+
+
+def timed(func, source):
+    queries = [copy.deepcopy(source) for _ in range(ROUNDS)]
+    start = time.perf_counter()
+    for q in queries:
+        func(q, "people")
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+if __name__ == "__main__":
+    app = Eve(settings={"DOMAIN": {"people": {"schema": SCHEMA}}})
+
+    with app.test_request_context():
+        source = query(10)
+        assert legacy_mongotize(copy.deepcopy(source), "people") == (
+            app.data._mongotize(copy.deepcopy(source), "people")
+        )
+
+        print("clauses    legacy (ms)   compiled (ms)   speedup")
+        for clauses in CLAUSES:
+            source = query(clauses)
+            legacy = timed(legacy_mongotize, source)
+            compiled = timed(app.data._mongotize, source)
+            print(
+                "%7d   %12.2f   %13.2f   %6.1fx"
+                % (clauses, legacy, compiled, legacy / compiled)
+            )
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Rate limit benchmark
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Measures the overhead of the ``ratelimit()`` decorator, with requests
+    counted by Redis with a pipeline (``RATE_LIMIT_BACKEND = 'redis'``) or a
+    Lua script (``'redis_script'``), by the process itself (``'local'``) or by
+    the process with periodic Redis syncs (``'local_sync'``). Requests come
+    from a few hundred different clients.
+
+    Redis backends need a Redis server running on localhost, and are skipped
+    otherwise. The benchmark keys are deleted when done.
+
+        $ python examples/benchmarks/ratelimit.py
+
+    Checkout Eve at https://github.com/pyeve/eve
+"""
+import time
+
+from eve import Eve
+from eve.methods.common import ratelimit
+
+CLIENTS = 250
+REQUESTS = 20000
+BACKENDS = (None, "redis", "redis_script", "local", "local_sync")
+
+
+@ratelimit()
+def endpoint():
+    return None
+
+
+def get_redis():
+    try:
+        from redis import Redis
+        from redis.exceptions import ConnectionError
+    except ImportError:
+        return None
+    redis = Redis()
+    try:
+        redis.ping()
+    except ConnectionError:
+        return None
+    return redis
+
+
+def run(app, backend):
+    app.config["RATE_LIMIT_GET"] = (REQUESTS, 60) if backend else None
+    app.config["RATE_LIMIT_BACKEND"] = backend or "redis"
+    contexts = [
+        app.test_request_context("/", environ_base={"REMOTE_ADDR": "10.0.0.%d" % i})
+        for i in range(CLIENTS)
+    ]
+
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        with contexts[i % CLIENTS]:
+            endpoint()
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+if __name__ == "__main__":
+    redis = get_redis()
+    app = Eve(settings={"DOMAIN": {"items": {}}}, redis=redis)
+    try:
+        results = []
+        for backend in BACKENDS:
+            if backend in ("redis", "redis_script", "local_sync") and not redis:
+                print("%s: skipped, no Redis server running." % backend)
+                continue
+            results.append((backend or "disabled", run(app, backend)))
+    finally:
+        if redis:
+            keys = redis.keys("rate-limit/*")
+            if keys:
+                redis.delete(*keys)
+
+    baseline = results[0][1]
+    print("    backend   us/request   overhead (us)")
+    for backend, elapsed in results:
+        print("%11s  %11.1f  %14.1f" % (backend, elapsed, elapsed - baseline))
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Serialization benchmark
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Compares the compiled serialization plans Eve uses to cast incoming
+    documents to data layer types with the recursive ``serialize``
+    implementation they replaced, over bulk payloads of documents with deep
+    (nested dicts, lists of lists, ``valueschema`` and ``*of`` rules)
+    schemas.
+
+    Needs no database.
+
+        $ python examples/benchmarks/serialization.py
+
+    Checkout Eve at https://github.com/pyeve/eve
+"""
+import copy
+import time
+
+from cerberus import rules_set_registry, schema_registry
+from flask import current_app as app
+
+from eve import Eve
+from eve.methods.common import normalize_dotted_fields, serialize, serialize_value
+from eve.utils import config
+
+PAYLOADS = (1, 10, 100)
+ROUNDS = 10
+DEPTH = 2
+
+
+def subschema(depth):
+    """A schema with all sort of serializable fields, nested `depth` times."""
+    schema = {
+        "name": {"type": "string"},
+        "count": {"type": "integer"},
+        "born": {"type": "datetime"},
+        "owner": {"type": "objectid"},
+        "tags": {"type": "list", "schema": {"type": "string"}},
+        "friends": {"type": "list", "schema": {"type": "objectid"}},
+        "matrix": {
+            "type": "list",
+            "schema": {"type": "list", "schema": {"type": "objectid"}},
+        },
+        "by_name": {"type": "dict", "valueschema": {"type": "objectid"}},
+        "either": {"anyof": [{"type": "objectid"}, {"type": "datetime"}]},
+        "pair": {"type": "list", "items": [{"type": "objectid"}, {"type": "string"}]},
+    }
+    if depth:
+        schema["child"] = {"type": "dict", "schema": subschema(depth - 1)}
+        schema["children"] = {
+            "type": "list",
+            "schema": {"type": "dict", "schema": subschema(depth - 1)},
+        }
+    return schema
+
+
+def subdocument(i, depth):
+    oid = "%024x" % i
+    document = {
+        "name": "item %d" % i,
+        "count": i,
+        "born": "Tue, 02 Apr 2013 10:29:08 GMT",
+        "owner": oid,
+        "tags": ["a", "b", "c"],
+        "friends": [oid, oid],
+        "matrix": [[oid, oid], [oid]],
+        "by_name": {"john": oid, "jane": oid},
+        "either": oid,
+        "pair": [oid, "label"],
+    }
+    if depth:
+        document["child"] = subdocument(i, depth - 1)
+        document["children"] = [subdocument(i, depth - 1) for _ in range(2)]
+    return document
+
+
+def legacy_serialize(document, resource=None, schema=None, fields=None):
+    """The recursive implementation shipped up to Eve 2.3."""
+
+    def resolve_schema(schema):
+        return schema if isinstance(schema, dict) else schema_registry.get(schema)
+
+    if (
+        resource not in config.DOMAIN
+        or config.DOMAIN[resource]["normalize_dotted_fields"]
+    ):
+        normalize_dotted_fields(document)
+
+    if app.data.serializers:
+        if resource:
+            schema = resolve_schema(config.DOMAIN[resource]["schema"])
+        if not fields:
+            fields = document.keys()
+        for field in fields:
+            if document[field] is None:
+                continue
+            if field in schema:
+                field_schema = schema[field]
+                if not isinstance(field_schema, dict):
+                    field_schema = rules_set_registry.get(field_schema)
+                field_types = field_schema.get("type")
+                if not isinstance(field_types, list):
+                    field_types = [field_types]
+                for field_type in field_types:
+                    for x_of in ["allof", "anyof", "oneof", "noneof"]:
+                        for optschema in field_schema.get(x_of, []):
+                            optschema = dict(field_schema, **optschema)
+                            optschema.pop(x_of, None)
+                            legacy_serialize(document, schema={field: optschema})
+                        x_of_type = "{0}_type".format(x_of)
+                        for opttype in field_schema.get(x_of_type, []):
+                            optschema = dict(field_schema, type=opttype)
+                            optschema.pop(x_of_type, None)
+                            legacy_serialize(document, schema={field: optschema})
+                    if config.AUTO_CREATE_LISTS and field_type == "list":
+                        # Convert single values to lists
+                        if not isinstance(document[field], list):
+                            document[field] = [document[field]]
+                    if "schema" in field_schema:
+                        field_schema = resolve_schema(field_schema["schema"])
+                        if "dict" in (field_type, field_schema.get("type")):
+                            # either a dict or a list of dicts
+                            embedded = (
+                                [document[field]]
+                                if field_type == "dict"
+                                else document[field]
+                            )
+                            for subdocument in embedded:
+                                if not isinstance(subdocument, dict):
+                                    # value is not a dict - continue
+                                    # serialization error will be reported by
+                                    # validation if appropriate
+                                    continue
+                                if "schema" in field_schema:
+                                    legacy_serialize(
+                                        subdocument, schema=field_schema["schema"]
+                                    )
+                                else:
+                                    legacy_serialize(subdocument, schema=field_schema)
+                        elif field_schema.get("type") == "list":
+                            # a list of lists
+                            sublist_schema = resolve_schema(field_schema.get("schema"))
+                            item_type = sublist_schema.get("type")
+                            for sublist in document[field]:
+                                for i, v in enumerate(sublist):
+                                    if item_type == "dict":
+                                        legacy_serialize(
+                                            sublist[i], schema=sublist_schema["schema"]
+                                        )
+                                    elif item_type in app.data.serializers:
+                                        sublist[i] = serialize_value(item_type, v)
+                        elif field_schema.get("type") is None:
+                            # a list of items determined by *of rules
+                            for x_of in ["allof", "anyof", "oneof", "noneof"]:
+                                for optschema in field_schema.get(x_of, []):
+                                    legacy_serialize(
+                                        document,
+                                        schema={
+                                            field: {
+                                                "type": field_type,
+                                                "schema": optschema,
+                                            }
+                                        },
+                                    )
+                                x_of_type = "{0}_type".format(x_of)
+                                for opttype in field_schema.get(x_of_type, []):
+                                    legacy_serialize(
+                                        document,
+                                        schema={
+                                            field: {
+                                                "type": field_type,
+                                                "schema": {"type": opttype},
+                                            }
+                                        },
+                                    )
+                        else:
+                            # a list of one type, arbitrary length
+                            field_type = field_schema.get("type")
+                            if field_type in app.data.serializers:
+                                for i, v in enumerate(document[field]):
+                                    document[field][i] = serialize_value(field_type, v)
+                    elif "items" in field_schema:
+                        # a list of multiple types, fixed length
+                        for i, (s, v) in enumerate(
+                            zip(field_schema["items"], document[field])
+                        ):
+                            field_type = s.get("type")
+                            if field_type in app.data.serializers:
+                                document[field][i] = serialize_value(
+                                    field_type, document[field][i]
+                                )
+                    elif "valueschema" in field_schema:
+                        # a valueschema
+                        field_type = field_schema["valueschema"]["type"]
+                        if field_type == "objectid":
+                            target = document[field]
+                            for field in target:
+                                target[field] = serialize_value(
+                                    field_type, target[field]
+                                )
+                        elif field_type == "dict":
+                            for subdocument in document[field].values():
+                                legacy_serialize(
+                                    subdocument,
+                                    schema=field_schema["valueschema"]["schema"],
+                                )
+
+                    elif field_type in app.data.serializers:
+                        # a simple field
+                        document[field] = serialize_value(field_type, document[field])
+
+    return document
+
+
+def timed(func, documents):
+    payloads = [copy.deepcopy(documents) for _ in range(ROUNDS)]
+    start = time.perf_counter()
+    for payload in payloads:
+        for document in payload:
+            func(document, "items")
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+if __name__ == "__main__":
+    api = Eve(settings={"DOMAIN": {"items": {"schema": subschema(DEPTH)}}})
+
+    with api.app_context():
+        document = subdocument(0, DEPTH)
+        assert legacy_serialize(copy.deepcopy(document), "items") == serialize(
+            copy.deepcopy(document), "items"
+        )
+
+        print("documents   legacy (ms)   compiled (ms)   speedup")
+        for payload in PAYLOADS:
+            documents = [subdocument(i, DEPTH) for i in range(payload)]
+            legacy = timed(legacy_serialize, documents)
+            compiled = timed(serialize, documents)
+            print(
+                "%9d   %11.2f   %13.2f   %6.1fx"
+                % (payload, legacy, compiled, legacy / compiled)
+            )
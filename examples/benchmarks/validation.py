@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Validation benchmark
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Measures bulk POST throughput (requests per second) on a resource with a
+    large (200 fields) schema, with validators built for every request
+    (``REUSE_VALIDATORS = False``) and reused across requests (the default).
+
+    Needs a MongoDB instance running on localhost. The benchmark database is
+    dropped when done.
+
+        $ python examples/benchmarks/validation.py
+
+    Checkout Eve at https://github.com/pyeve/eve
+"""
+import json
+import time
+
+from pymongo import MongoClient
+
+from eve import Eve
+
+DBNAME = "eve_benchmarks"
+FIELDS = 200
+PAYLOADS = (1, 10, 100)
+REQUESTS = 50
+
+
+def schema():
+    schema = {}
+    for i in range(FIELDS):
+        kind = i % 4
+        if kind == 0:
+            schema["field%d" % i] = {"type": "string", "maxlength": 50}
+        elif kind == 1:
+            schema["field%d" % i] = {"type": "integer", "min": 0, "max": 1000}
+        elif kind == 2:
+            schema["field%d" % i] = {"type": "list", "schema": {"type": "string"}}
+        else:
+            schema["field%d" % i] = {
+                "type": "dict",
+                "schema": {"a": {"type": "string"}, "b": {"type": "boolean"}},
+            }
+    return schema
+
+
+def document(i):
+    values = ("value %d" % i, i % 1000, ["a", "b"], {"a": "x", "b": True})
+    # payloads only carry a fraction of the fields.
+    return {"field%d" % j: values[j % 4] for j in range(0, FIELDS, 10)}
+
+
+def run(reuse):
+    client = Eve(
+        settings={
+            "MONGO_DBNAME": DBNAME,
+            "RESOURCE_METHODS": ["GET", "POST"],
+            "REUSE_VALIDATORS": reuse,
+            "DOMAIN": {"items": {"schema": schema()}},
+        }
+    ).test_client()
+
+    results = {}
+    for payload in PAYLOADS:
+        body = json.dumps([document(i) for i in range(payload)])
+        headers = [("Content-Type", "application/json")]
+        assert client.post("/items", data=body, headers=headers).status_code == 201
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            client.post("/items", data=body, headers=headers)
+        results[payload] = REQUESTS / (time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    connection = MongoClient()
+    connection.drop_database(DBNAME)
+    try:
+        before, after = run(False), run(True)
+    finally:
+        connection.drop_database(DBNAME)
+
+    print("documents   new validators (req/s)   reused validators (req/s)")
+    for payload in PAYLOADS:
+        print("%9d   %22.1f   %25.1f" % (payload, before[payload], after[payload]))
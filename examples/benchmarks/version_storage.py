@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Version storage benchmark
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Measures the size of the shadow collection of a versioned resource, where
+    each PATCH changes a single field of a large (50 fields) document, and the
+    latency of ``?version=K`` and ``?version=all`` reads, with versions stored
+    as full copies (``VERSION_STORAGE = 'full'``) and as deltas with several
+    snapshot intervals.
+
+    Needs a MongoDB instance running on localhost. The benchmark database is
+    dropped when done.
+
+        $ python examples/benchmarks/version_storage.py
+
+    Checkout Eve at https://github.com/pyeve/eve
+"""
+import json
+import time
+
+import bson
+from pymongo import MongoClient
+
+from eve import Eve
+
+DBNAME = "eve_benchmarks"
+FIELDS = 50
+DOCUMENTS = 10
+VERSIONS = 100
+READS = 200
+STORAGES = (("full", 10), ("delta", 5), ("delta", 10), ("delta", 25))
+
+
+def run(storage, interval):
+    app = Eve(
+        settings={
+            "MONGO_DBNAME": DBNAME,
+            "RESOURCE_METHODS": ["GET", "POST", "DELETE"],
+            "ITEM_METHODS": ["GET", "PATCH"],
+            "VERSIONING": True,
+            "VERSION_STORAGE": storage,
+            "VERSION_SNAPSHOT_INTERVAL": interval,
+            "PAGINATION_LIMIT": VERSIONS,
+            "DOMAIN": {
+                "items": {
+                    "schema": dict(
+                        ("field%d" % i, {"type": "string"}) for i in range(FIELDS)
+                    )
+                }
+            },
+        }
+    )
+    client = app.test_client()
+    headers = [("Content-Type", "application/json")]
+
+    client.delete("/items")
+    ids = []
+    for _ in range(DOCUMENTS):
+        document = dict(("field%d" % i, ("value %d " % i) * 10) for i in range(FIELDS))
+        r = client.post("/items", data=json.dumps(document), headers=headers)
+        item = json.loads(r.get_data())
+        etag = item["_etag"]
+        for version in range(2, VERSIONS + 1):
+            changes = {"field%d" % (version % FIELDS): "version %d" % version}
+            r = client.patch(
+                "/items/%s" % item["_id"],
+                data=json.dumps(changes),
+                headers=headers + [("If-Match", etag)],
+            )
+            etag = json.loads(r.get_data())["_etag"]
+        ids.append(item["_id"])
+
+    shadow = MongoClient()[DBNAME]["items_versions"]
+    size = sum(len(bson.encode(document)) for document in shadow.find())
+
+    def latency(query):
+        start = time.perf_counter()
+        for i in range(READS):
+            url = "/items/%s?%s" % (ids[i % DOCUMENTS], query(i))
+            assert client.get(url).status_code == 200
+        return (time.perf_counter() - start) / READS * 1000
+
+    version_k = latency(lambda i: "version=%d" % (i % VERSIONS + 1))
+    version_all = latency(lambda i: "version=all&max_results=%d" % VERSIONS)
+    return size, version_k, version_all
+
+
+if __name__ == "__main__":
+    connection = MongoClient()
+    connection.drop_database(DBNAME)
+    try:
+        results = [(s, i) + run(s, i) for s, i in STORAGES]
+    finally:
+        connection.drop_database(DBNAME)
+
+    baseline = results[0][2]
+    print("storage  interval   shadow size    ratio   ?version=K   ?version=all")
+    for storage, interval, size, version_k, version_all in results:
+        interval = interval if storage == "delta" else "-"
+        print(
+            "%7s  %8s  %10.1f KB  %6.2fx  %8.2f ms  %10.2f ms"
+            % (storage, interval, size / 1024, size / baseline, version_k, version_all)
+        )
@@ -23,6 +23,7 @@ INSTALL_REQUIRES = [
 EXTRAS_REQUIRE = {
     "docs": ["sphinx", "alabaster", "doc8"],
     "tests": ["redis", "testfixtures", "pytest", "tox"],
+    "orjson": ["orjson"],
 }
 EXTRAS_REQUIRE["dev"] = EXTRAS_REQUIRE["tests"] + EXTRAS_REQUIRE["docs"]
 
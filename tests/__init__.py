@@ -399,6 +399,7 @@ class TestMinimal(unittest.TestCase):
 
     def clearSchemaCache(self):
         field_definition.cache_clear()
+        self.app.invalidate_schema_caches()
 
 
 class TestBase(TestMinimal):
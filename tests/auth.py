@@ -715,6 +715,32 @@ class TestUserRestrictedAccess(TestBase):
         self.assert200(status)
         self.assertEqual(data["ref"], new_ref)
 
+    def test_bulk_put(self):
+        self.resource["bulk_edit"] = True
+        self.app.register_resource(self.url, self.resource)
+        data, status = self.post()
+        url = "%s/%s" % (self.url, data["_id"])
+        etag = self.test_client.get(url, headers=self.valid_auth).headers["ETag"]
+        operations = json.dumps(
+            [{"_id": data["_id"], "_etag": etag.strip('"'), "changes": {}}]
+        )
+
+        # PUT on documents owned by others fails like with the item endpoint.
+        self.resource["authentication"].request_auth_value = "alt"
+        alt_auth = ("Authorization", "Basic YWx0OnNlY3JldA==")
+        for method, code in (("PUT", 403), ("PATCH", 404), ("DELETE", 404)):
+            response, status = self.parse_response(
+                self.test_client.open(
+                    "%s/_bulk" % self.url,
+                    method=method,
+                    data=operations,
+                    headers=[alt_auth],
+                    content_type="application/json",
+                )
+            )
+            self.assertEqual(status, code)
+            self.assertEqual(response["_items"][0]["_error"]["code"], code)
+
     def test_put_resource_auth(self):
         # no global auth.
         self.app = Eve(settings=self.settings_file)
@@ -60,6 +60,7 @@ class TestConfig(TestBase):
         self.assertEqual(self.app.config["MONGO_PORT"], MONGO_PORT)
         self.assertEqual(self.app.config["MONGO_QUERY_BLACKLIST"], ["$where", "$regex"])
         self.assertEqual(self.app.config["MONGO_QUERY_WHITELIST"], [])
+        self.assertEqual(self.app.config["MONGO_QUERY_DATES_BY_SCHEMA"], False)
         self.assertEqual(self.app.config["MONGO_WRITE_CONCERN"], {"w": 1})
         self.assertEqual(self.app.config["ISSUES"], "_issues")
 
@@ -80,6 +81,7 @@ class TestConfig(TestBase):
         self.assertEqual(self.app.config["QUERY_MAX_RESULTS"], "max_results")
         self.assertEqual(self.app.config["QUERY_EMBEDDED"], "embedded")
         self.assertEqual(self.app.config["QUERY_AGGREGATION"], "aggregate")
+        self.assertEqual(self.app.config["QUERY_CURSOR"], "cursor")
 
         self.assertEqual(self.app.config["JSON_SORT_KEYS"], False)
         self.assertEqual(self.app.config["SOFT_DELETE"], False)
@@ -95,6 +97,55 @@ class TestConfig(TestBase):
         )
         self.assertEqual(self.app.config["NORMALIZE_DOTTED_FIELDS"], True)
         self.assertEqual(self.app.config["OPTIMIZE_PAGINATION_FOR_SPEED"], False)
+        self.assertEqual(self.app.config["KEYSET_PAGINATION"], False)
+        self.assertEqual(self.app.config["COUNT_STRATEGY"], "exact")
+        self.assertEqual(self.app.config["EMBEDDING_LOOKUP"], False)
+        self.assertEqual(self.app.config["COUNT_LIMIT"], 1000)
+        self.assertEqual(self.app.config["COUNT_CACHE_TTL"], 60)
+        self.assertEqual(
+            self.app.config["HEADER_TOTAL_COUNT_STRATEGY"], "X-Total-Count-Strategy"
+        )
+        self.assertEqual(self.app.config["STREAMING_GET"], False)
+        self.assertEqual(self.app.config["STREAMING_GET_CHUNK_SIZE"], 100)
+        self.assertEqual(self.app.config["EXPORT"], False)
+        self.assertEqual(self.app.config["EXPORT_URL"], "_export")
+        self.assertEqual(self.app.config["EXPORT_BATCH_SIZE"], 1000)
+        self.assertEqual(self.app.config["QUERY_EXPORT_AFTER"], "after")
+        self.assertEqual(self.app.config["JSON_BACKEND"], "simplejson")
+        self.assertEqual(self.app.config["ETAG_VERSION"], 1)
+        self.assertEqual(self.app.config["ETAG_HASH"], "sha1")
+        self.assertEqual(self.app.config["REUSE_VALIDATORS"], True)
+        self.assertEqual(self.app.config["DATA_RELATION_CACHE_TTL"], 0)
+        self.assertEqual(self.app.config["VALIDATION_WORKERS"], 0)
+        self.assertEqual(self.app.config["VALIDATION_WORKERS_THRESHOLD"], 1000)
+        self.assertEqual(self.app.config["PATCH_FIND_AND_MODIFY"], False)
+        self.assertEqual(self.app.config["VERSION_STORAGE"], "full")
+        self.assertEqual(self.app.config["VERSION_SNAPSHOT_INTERVAL"], 10)
+        self.assertEqual(self.app.config["VERSION_DELTA"], "_delta")
+        self.assertEqual(self.app.config["MONGO_VERSIONS_INDEX"], False)
+        self.assertEqual(self.app.config["OPLOG_WRITER"], "sync")
+        self.assertEqual(self.app.config["OPLOG_QUEUE_SIZE"], 10000)
+        self.assertEqual(self.app.config["OPLOG_BATCH_SIZE"], 500)
+        self.assertEqual(self.app.config["OPLOG_FLUSH_INTERVAL"], 1.0)
+        self.assertEqual(self.app.config["OPLOG_CAPPED_SIZE"], None)
+        self.assertEqual(self.app.config["OPLOG_TTL"], None)
+        self.assertEqual(self.app.config["MONGO_OPLOG_INDEXES"], True)
+        self.assertEqual(self.app.config["OPLOG_TAIL"], False)
+        self.assertEqual(self.app.config["OPLOG_TAIL_URL"], "_tail")
+        self.assertEqual(self.app.config["OPLOG_TAIL_TIMEOUT"], 30)
+        self.assertEqual(self.app.config["OPLOG_TAIL_DELAY"], 2)
+        self.assertEqual(self.app.config["CHANGE_FEED"], False)
+        self.assertEqual(self.app.config["CHANGE_FEED_URL"], "_changes")
+        self.assertEqual(self.app.config["CHANGE_FEED_BUFFER"], 1000)
+        self.assertEqual(self.app.config["CHANGE_FEED_HEARTBEAT"], 15)
+        self.assertEqual(self.app.config["RATE_LIMIT_BACKEND"], "redis")
+        self.assertEqual(self.app.config["RATE_LIMIT_SYNC_INTERVAL"], 1.0)
+        self.assertEqual(self.app.config["BULK_EDIT"], False)
+        self.assertEqual(self.app.config["BULK_EDIT_URL"], "_bulk")
+        self.assertEqual(self.app.config["BULK_INSERT_UNORDERED"], False)
+        self.assertEqual(self.app.config["BULK_INSERT_CHUNK_SIZE"], 1000)
+        self.assertEqual(self.app.config["NDJSON_INGESTION"], False)
+        self.assertEqual(self.app.config["NDJSON_BATCH_SIZE"], 1000)
 
     def test_settings_as_dict(self):
         my_settings = {"API_VERSION": "override!", "DOMAIN": {"contacts": {}}}
@@ -275,6 +326,10 @@ class TestConfig(TestBase):
         self.assertEqual(
             settings["mongo_query_whitelist"], self.app.config["MONGO_QUERY_WHITELIST"]
         )
+        self.assertEqual(
+            settings["mongo_query_dates_by_schema"],
+            self.app.config["MONGO_QUERY_DATES_BY_SCHEMA"],
+        )
         self.assertEqual(
             settings["mongo_write_concern"], self.app.config["MONGO_WRITE_CONCERN"]
         )
@@ -287,6 +342,42 @@ class TestConfig(TestBase):
             settings["optimize_pagination_for_speed"],
             self.app.config["OPTIMIZE_PAGINATION_FOR_SPEED"]
         )
+        self.assertEqual(
+            settings["keyset_pagination"], self.app.config["KEYSET_PAGINATION"]
+        )
+        self.assertEqual(settings["count_strategy"], self.app.config["COUNT_STRATEGY"])
+        self.assertEqual(
+            settings["embedding_lookup"], self.app.config["EMBEDDING_LOOKUP"]
+        )
+        self.assertEqual(settings["count_limit"], self.app.config["COUNT_LIMIT"])
+        self.assertEqual(
+            settings["count_cache_ttl"], self.app.config["COUNT_CACHE_TTL"]
+        )
+        self.assertEqual(settings["streaming_get"], self.app.config["STREAMING_GET"])
+        self.assertEqual(settings["export"], self.app.config["EXPORT"])
+        self.assertEqual(settings["bulk_edit"], self.app.config["BULK_EDIT"])
+        self.assertEqual(settings["change_feed"], self.app.config["CHANGE_FEED"])
+        self.assertEqual(settings["rate_limit"], None)
+        self.assertEqual(settings["item_rate_limit"], None)
+        self.assertEqual(
+            settings["bulk_insert_unordered"], self.app.config["BULK_INSERT_UNORDERED"]
+        )
+        self.assertEqual(
+            settings["bulk_insert_chunk_size"], self.app.config["BULK_INSERT_CHUNK_SIZE"]
+        )
+        self.assertEqual(
+            settings["ndjson_ingestion"], self.app.config["NDJSON_INGESTION"]
+        )
+        self.assertEqual(
+            settings["patch_find_and_modify"], self.app.config["PATCH_FIND_AND_MODIFY"]
+        )
+        self.assertEqual(
+            settings["version_storage"], self.app.config["VERSION_STORAGE"]
+        )
+        self.assertEqual(
+            settings["version_snapshot_interval"],
+            self.app.config["VERSION_SNAPSHOT_INTERVAL"],
+        )
 
     def test_datasource(self):
         self._test_datasource_for_resource("invoices")
@@ -428,6 +519,88 @@ class TestConfig(TestBase):
             ConfigException, self.app.register_resource, resource, settings
         )
 
+    def test_unknown_count_strategy(self):
+        resource = "resource"
+        settings = {"count_strategy": "guess"}
+        self.assertRaises(
+            ConfigException, self.app.register_resource, resource, settings
+        )
+
+    def test_estimated_count_strategy(self):
+        resource = "resource"
+        for settings in (
+            {"count_strategy": "estimated", "soft_delete": True},
+            {"count_strategy": "estimated", "datasource": {"filter": {"a": 1}}},
+        ):
+            self.assertRaises(
+                ConfigException, self.app.register_resource, resource, settings
+            )
+        self.app.register_resource(resource, {"count_strategy": "estimated"})
+
+        # the global strategy falls back to exact counts instead.
+        self.app.config["COUNT_STRATEGY"] = "estimated"
+        self.app.register_resource("deleted", {"soft_delete": True})
+        self.assertEqual(self.domain["deleted"]["count_strategy"], "exact")
+        self.app.register_resource("filtered", {"datasource": {"filter": {"a": 1}}})
+        self.assertEqual(self.domain["filtered"]["count_strategy"], "exact")
+        self.app.register_resource("plain", {})
+        self.assertEqual(self.domain["plain"]["count_strategy"], "estimated")
+
+    def test_version_storage(self):
+        resource = "resource"
+        settings = {"version_storage": "diff"}
+        self.assertRaises(
+            ConfigException, self.app.register_resource, resource, settings
+        )
+        settings = {"version_storage": "delta", "version_snapshot_interval": 0}
+        self.assertRaises(
+            ConfigException, self.app.register_resource, resource, settings
+        )
+
+    def test_json_settings(self):
+        self.app.config["JSON_BACKEND"] = "ujson"
+        self.assertValidateConfigFailure("JSON_BACKEND")
+        self.app.config["JSON_BACKEND"] = "simplejson"
+        self.app.config["ETAG_VERSION"] = 4
+        self.assertValidateConfigFailure("ETAG_VERSION")
+        self.app.config["ETAG_VERSION"] = 3
+        self.app.config["ETAG_HASH"] = "nohash"
+        self.assertValidateConfigFailure("ETAG_HASH")
+        self.app.config["ETAG_HASH"] = "blake2b"
+        self.assertValidateConfigSuccess()
+
+    def test_oplog_writer_setting(self):
+        self.app.config["OPLOG_WRITER"] = "queue"
+        self.assertValidateConfigFailure("OPLOG_WRITER")
+        self.app.config["OPLOG_WRITER"] = "async_fsync"
+        self.assertValidateConfigSuccess()
+        self.app.config["OPLOG_TTL"] = 3600
+        self.app.config["OPLOG_CAPPED_SIZE"] = 1024 * 1024
+        self.assertValidateConfigFailure("OPLOG_TTL")
+
+    def test_rate_limit_backend_setting(self):
+        self.app.config["RATE_LIMIT_BACKEND"] = "memcached"
+        self.assertValidateConfigFailure("RATE_LIMIT_BACKEND")
+        self.app.config["RATE_LIMIT_BACKEND"] = "local_sync"
+        self.assertValidateConfigSuccess()
+
+    def test_rate_limit_setting(self):
+        for limit in (300, (300,), ("300", 60), (300, 0), [300, 60, 1]):
+            self.app.config["RATE_LIMIT_GET"] = limit
+            self.assertValidateConfigFailure("RATE_LIMIT_GET")
+        self.app.config["RATE_LIMIT_GET"] = [300, 0.5]
+        self.app.config["RATE_LIMIT_PUT"] = (300, 60)
+        self.assertValidateConfigSuccess()
+
+    def test_resource_rate_limit_setting(self):
+        settings = self.domain[self.known_resource]
+        settings["item_rate_limit"] = {"POST": (10, 60)}
+        self.assertValidateConfigFailure("POST")
+        settings["item_rate_limit"] = {"PATCH": (10, 60), "GET": 10}
+        self.assertValidateConfigFailure("item_rate_limit GET")
+        settings["item_rate_limit"] = {"PATCH": (10, 60), "GET": None}
+        self.assertValidateConfigSuccess()
+
     def test_oplog_config(self):
         # if OPLOG_ENDPOINT is enabled the endoint is included with the domain
         self.app.config["OPLOG_ENDPOINT"] = "oplog"
@@ -523,6 +696,32 @@ class TestConfig(TestBase):
                     self.assertTrue(arg in indexes[key])
                     self.assertEqual(args[arg], indexes[key][arg])
 
+    def test_create_versions_index(self):
+        self.app.config["MONGO_VERSIONS_INDEX"] = True
+        self.app.register_resource(
+            "mongodb_features", {"schema": {"name": {"type": "string"}}}
+        )
+        self.app.register_resource(
+            "mongodb_versions",
+            {"schema": {"name": {"type": "string"}}, "versioning": True},
+        )
+
+        from pymongo import MongoClient
+
+        db = MongoClient(host=MONGO_HOST, port=MONGO_PORT)[
+            self.app.config["MONGO_DBNAME"]
+        ]
+        indexes = db["mongodb_versions_versions"].index_information()
+        self.assertEqual(
+            indexes["document_versions"]["key"], [("_id_document", 1), ("_version", 1)]
+        )
+        self.assertNotIn(
+            "document_versions", db["mongodb_versions"].index_information()
+        )
+        self.assertNotIn(
+            "document_versions", db["mongodb_features_versions"].index_information()
+        )
+
     def test_custom_error_handlers(self):
         """Test that the standard, custom error handler is registered for
         supported error codes.
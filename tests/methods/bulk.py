@@ -0,0 +1,154 @@
+import simplejson as json
+from bson import ObjectId
+
+from eve import ETAG, ISSUES, STATUS, STATUS_ERR, STATUS_OK
+from tests import TestBase
+from tests.test_settings import MONGO_DBNAME
+
+
+class TestBulkEdit(TestBase):
+    def setUp(self):
+        super().setUp()
+        self.app.register_resource(
+            "people",
+            {
+                "bulk_edit": True,
+                "datasource": {"source": "contacts"},
+                "schema": {"ref": {"type": "string"}, "prog": {"type": "integer"}},
+            },
+        )
+        response, _ = self.get("people", "?max_results=4")
+        self.people = response["_items"]
+
+    def bulk(self, method, data):
+        r = self.test_client.open(
+            "/people/_bulk",
+            method=method,
+            data=json.dumps(data),
+            headers=[("Content-Type", "application/json")],
+        )
+        return self.parse_response(r)
+
+    def operation(self, person, changes=None):
+        operation = {"_id": person["_id"], ETAG: person[ETAG]}
+        if changes is not None:
+            operation["changes"] = changes
+        return operation
+
+    def test_bulk_patch(self):
+        first, second, third, fourth = self.people
+        data = [
+            self.operation(first, {"prog": 1000}),
+            dict(self.operation(second, {"prog": 1001}), _etag="stale"),
+            {"_id": str(ObjectId()), ETAG: "unknown", "changes": {"prog": 1}},
+            self.operation(third, {"prog": "not a number"}),
+            self.operation(fourth, {"prog": 1003}),
+        ]
+        r, status = self.bulk("PATCH", data)
+        self.assert200(status)
+        self.assertEqual(r[STATUS], STATUS_ERR)
+        results = r["_items"]
+        self.assertEqual(len(results), 5)
+
+        self.assertEqual(results[0][STATUS], STATUS_OK)
+        self.assertEqual(results[0]["_id"], first["_id"])
+        self.assertNotEqual(results[0][ETAG], first[ETAG])
+        self.assertEqual(results[1]["_error"]["code"], 412)
+        self.assertEqual(results[2]["_error"]["code"], 404)
+        self.assertIn("prog", results[3][ISSUES])
+        self.assertEqual(results[4][STATUS], STATUS_OK)
+
+        contacts = self.connection[MONGO_DBNAME].contacts
+        ids = [ObjectId(person["_id"]) for person in self.people]
+        progs = dict(
+            (str(c["_id"]), c["prog"]) for c in contacts.find({"_id": {"$in": ids}})
+        )
+        self.assertEqual(progs[first["_id"]], 1000)
+        self.assertEqual(progs[second["_id"]], second["prog"])
+        self.assertEqual(progs[third["_id"]], third["prog"])
+        self.assertEqual(progs[fourth["_id"]], 1003)
+
+        # the returned etag is the current one.
+        r, status = self.bulk("PATCH", [self.operation(results[0], {"prog": 2000})])
+        self.assert200(status)
+        self.assertEqual(r[STATUS], STATUS_OK)
+
+    def test_bulk_patch_etag_required(self):
+        first = self.people[0]
+        r, status = self.bulk(
+            "PATCH", [{"_id": first["_id"], "changes": {"prog": 1}}, {"prog": 1}]
+        )
+        # all the operations failed, in different ways.
+        self.assertEqual(status, 207)
+        self.assertEqual(r["_items"][0]["_error"]["code"], 428)
+        self.assertEqual(r["_items"][1]["_error"]["code"], 400)
+
+    def test_bulk_put(self):
+        first, second = self.people[:2]
+        data = [
+            self.operation(first, {"ref": "1234567890123456789054321"}),
+            dict(self.operation(second, {"ref": "x"}), _etag="stale"),
+        ]
+        r, status = self.bulk("PUT", data)
+        self.assert200(status)
+        results = r["_items"]
+        self.assertEqual(results[0][STATUS], STATUS_OK)
+        self.assertEqual(results[1]["_error"]["code"], 412)
+
+        # all the operations failed the same way.
+        r, status = self.bulk("PUT", data[1:])
+        self.assertEqual(status, 412)
+        self.assertEqual(r[STATUS], STATUS_ERR)
+
+        contacts = self.connection[MONGO_DBNAME].contacts
+        replaced = contacts.find_one({"_id": ObjectId(first["_id"])})
+        self.assertEqual(replaced["ref"], "1234567890123456789054321")
+        self.assertNotIn("prog", replaced)
+
+    def test_bulk_delete(self):
+        first, second, third = self.people[:3]
+        data = [
+            self.operation(first),
+            dict(self.operation(second), _etag="stale"),
+            self.operation(third),
+        ]
+        r, status = self.bulk("DELETE", data)
+        self.assert200(status)
+        results = r["_items"]
+        self.assertEqual(results[0], {STATUS: STATUS_OK, "_id": first["_id"]})
+        self.assertEqual(results[1]["_error"]["code"], 412)
+        self.assertEqual(results[2][STATUS], STATUS_OK)
+
+        contacts = self.connection[MONGO_DBNAME].contacts
+        ids = [ObjectId(p["_id"]) for p in (first, second, third)]
+        remaining = [c["_id"] for c in contacts.find({"_id": {"$in": ids}})]
+        self.assertEqual(remaining, [ids[1]])
+
+    def test_bulk_change_conflicts(self):
+        first, second = self.people[:2]
+        with self.app.test_request_context():
+            originals = [
+                self.app.data.find_one_raw("people", _id=ObjectId(p["_id"]))
+                for p in (first, second)
+            ]
+            for original in originals:
+                original[ETAG] = "stored"
+            contacts = self.app.data.driver.db["contacts"]
+            first_id, second_id = [original["_id"] for original in originals]
+            contacts.update_one({"_id": first_id}, {"$set": {ETAG: "stored"}})
+            # the second document changed since it was loaded.
+            contacts.update_one({"_id": second_id}, {"$set": {ETAG: "other"}})
+
+            changes = [
+                ("update", o["_id"], {"prog": -1, ETAG: "new"}, o) for o in originals
+            ]
+            results = self.app.data.bulk_change("people", changes)
+            self.assertEqual(results, [None, 412])
+            self.assertEqual(contacts.find_one({"_id": first_id})["prog"], -1)
+
+    def test_bulk_edit_disabled(self):
+        self.assertIn("people|bulk", self.app.view_functions)
+        self.assertNotIn("contacts|bulk", self.app.view_functions)
+
+        r, status = self.bulk("POST", [])
+        self.assert405(status)
@@ -1,18 +1,27 @@
+import threading
 import time
 from collections import OrderedDict  # noqa
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from random import shuffle
 
 import simplejson as json
 from bson import ObjectId, decimal128
 from bson.dbref import DBRef
-
-from eve.methods.common import normalize_dotted_fields, serialize, sort_per_resource
+from cerberus import schema_registry
+
+from eve.exceptions import ConfigException
+from eve.methods.common import (
+    compile_serialization_plan,
+    normalize_dotted_fields,
+    serialize,
+    serialization_plan,
+    sort_per_resource,
+)
 from eve.utils import config
 from tests import TestBase
 from tests.auth import ValidBasicAuth, ValidHMACAuth, ValidTokenAuth
 from tests.suite_generator import EmbeddedDoc
-from tests.test_settings import MONGO_DBNAME
+from tests.test_settings import MONGO1_DBNAME, MONGO_DBNAME
 
 
 class TestSerializer(TestBase):
@@ -446,6 +455,67 @@ class TestSerializer(TestBase):
                 serialized_oid = serialized["list-field"][0]
                 self.assertTrue(isinstance(serialized_oid, ObjectId))
 
+    def test_serialize_valueschema_of_dicts(self):
+        schema = {
+            "by_name": {
+                "type": "dict",
+                "valueschema": {
+                    "type": "dict",
+                    "schema": {"friend": {"type": "objectid"}},
+                },
+            }
+        }
+        doc = {"by_name": {"john": {"friend": "50656e4538345b39dd0414f0"}}}
+        with self.app.app_context():
+            serialized = serialize(doc, schema=schema)
+        self.assertTrue(isinstance(serialized["by_name"]["john"]["friend"], ObjectId))
+
+    def test_serialization_plan(self):
+        schema = {
+            "name": {"type": "string"},
+            "address": {"type": "dict", "schema": {"city": {"type": "string"}}},
+            "born": {"type": "datetime"},
+            "friends": {"type": "list", "schema": {"type": "objectid"}},
+        }
+        with self.app.app_context():
+            plan = compile_serialization_plan(schema)
+        # fields which don't need serialization are left out of the plan.
+        self.assertEqual(sorted(plan), ["born", "friends"])
+
+    def test_serialization_plan_recursive_schema(self):
+        schema_registry.add(
+            "tree", {"leaf": {"type": "objectid"}, "child": {"type": "dict"}}
+        )
+        schema_registry.get("tree")["child"]["schema"] = "tree"
+        doc = {
+            "leaf": "50656e4538345b39dd0414f0",
+            "child": {"child": {"leaf": "50656e4538345b39dd0414f0"}},
+        }
+        with self.app.app_context():
+            serialized = serialize(doc, schema="tree")
+        self.assertTrue(isinstance(serialized["leaf"], ObjectId))
+        self.assertTrue(isinstance(serialized["child"]["child"]["leaf"], ObjectId))
+
+    def test_serialization_plan_is_cached(self):
+        with self.app.app_context():
+            plan = serialization_plan(self.known_resource)
+            self.assertIs(plan, serialization_plan(self.known_resource))
+
+            # schema changes are picked up.
+            settings = self.domain[self.known_resource]
+            settings["schema"]["title"] = {"type": "objectid"}
+            self.clearSchemaCache()
+            self.assertIn("title", serialization_plan(self.known_resource))
+
+            settings["schema"] = {"born": {"type": "datetime"}}
+            self.assertEqual(list(serialization_plan(self.known_resource)), ["born"])
+
+            schema_registry.add("tree", {"leaf": {"type": "objectid"}})
+            settings["schema"] = "tree"
+            self.assertEqual(list(serialization_plan(self.known_resource)), ["leaf"])
+            schema_registry.add("tree", {"stem": {"type": "objectid"}})
+            self.assertEqual(list(serialization_plan(self.known_resource)), ["stem"])
+
 
 class TestNormalizeDottedFields(TestBase):
     def test_normalize_dotted_fields(self):
@@ -755,6 +825,237 @@ class TestOpLogEndpointEnabled(TestOpLogBase):
         return self.parse_response(r)
 
 
+class TestOpLogWriter(TestOpLogBase):
+    def setUp(self):
+        super().setUp()
+
+        self.app.config["OPLOG"] = True
+        self.app.config["OPLOG_FLUSH_INTERVAL"] = 60
+        self.oplog_reset()
+        self.db = self.connection[MONGO_DBNAME]
+
+    def tearDown(self):
+        self.app.oplog_writer.shutdown()
+        super().tearDown()
+
+    def post(self):
+        self.data[self.test_field] = str(ObjectId()) + "0"
+        return self.test_client.post(
+            self.known_resource_url,
+            data=json.dumps(self.data),
+            headers=self.headers,
+            environ_base={"REMOTE_ADDR": "127.0.0.1"},
+        )
+
+    def test_async_writer(self):
+        self.app.config["OPLOG_WRITER"] = "async"
+        pushed = []
+        self.app.on_oplog_push += lambda resource, entries: pushed.extend(entries)
+
+        self.post()
+        self.post()
+
+        # callbacks are invoked by the request, entries are written later.
+        self.assertEqual(len(pushed), 2)
+        self.assertEqual(self.db.oplog.count_documents({}), 0)
+
+        self.assertTrue(self.app.oplog_writer.flush(timeout=5))
+        self.assertEqual(self.db.oplog.count_documents({}), 2)
+        self.assertOpLogEntry(self.db.oplog.find()[0], "POST")
+
+        metrics = self.app.oplog_writer.metrics()
+        self.assertEqual(metrics["mode"], "async")
+        self.assertEqual(metrics["pushed"], 2)
+        self.assertEqual(metrics["written"], 2)
+        self.assertEqual(metrics["batches"], 1)
+        self.assertEqual(metrics["queued"], 0)
+        self.assertEqual(metrics["errors"], 0)
+
+    def test_async_writer_batch_size(self):
+        self.app.config["OPLOG_WRITER"] = "async"
+        self.app.config["OPLOG_BATCH_SIZE"] = 1
+
+        self.post()
+        self.post()
+        self.assertTrue(self.app.oplog_writer.flush(timeout=5))
+        self.assertEqual(self.app.oplog_writer.metrics()["batches"], 2)
+
+    def test_async_writer_shutdown(self):
+        self.app.config["OPLOG_WRITER"] = "async"
+
+        self.post()
+        self.app.oplog_writer.shutdown()
+        self.assertEqual(self.db.oplog.count_documents({}), 1)
+
+        # the writer is started again on next push.
+        self.post()
+        self.assertTrue(self.app.oplog_writer.flush(timeout=5))
+        self.assertEqual(self.db.oplog.count_documents({}), 2)
+
+    def test_async_fsync_writer(self):
+        self.app.config["OPLOG_WRITER"] = "async_fsync"
+
+        self.post()
+
+        # the request waits for its entries to be written.
+        self.assertEqual(self.db.oplog.count_documents({}), 1)
+        self.assertOpLogEntry(self.db.oplog.find()[0], "POST")
+        self.assertEqual(self.app.oplog_writer.metrics()["written"], 1)
+
+    def test_async_fsync_writer_timeout(self):
+        self.app.config["OPLOG_WRITER"] = "async_fsync"
+        self.app.config["OPLOG_WRITE_TIMEOUT"] = 0.1
+        writer = self.app.oplog_writer
+        release = threading.Event()
+        flush = writer._flush
+
+        def stuck(pending):
+            release.wait(5)
+            flush(pending)
+
+        writer._flush = stuck
+        r = self.post()
+        self.assert201(r.status_code)
+
+        # the request did not wait for the writer thread any longer.
+        self.assertEqual(self.db.oplog.count_documents({}), 1)
+        release.set()
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(self.db.oplog.count_documents({}), 1)
+        metrics = writer.metrics()
+        self.assertEqual(metrics["timeouts"], 1)
+        self.assertEqual(metrics["written"], 0)
+
+    def test_async_writer_mongo_prefix(self):
+        self.app.config["OPLOG_WRITER"] = "async"
+        self.domain[self.known_resource]["mongo_prefix"] = "MONGO1"
+
+        r = self.post()
+        self.assert201(r.status_code)
+        self.assertTrue(self.app.oplog_writer.flush(timeout=5))
+
+        # entries land where sync writes would put them.
+        self.assertEqual(self.db.oplog.count_documents({}), 1)
+        self.assertEqual(self.connection[MONGO1_DBNAME].oplog.count_documents({}), 0)
+
+    def test_async_fsync_write_concern(self):
+        self.app.config["OPLOG_WRITER"] = "async_fsync"
+        del self.domain["oplog"]["mongo_write_concern"]
+        self.oplog_reset()
+        self.assertEqual(
+            self.domain["oplog"]["mongo_write_concern"], {"w": 1, "j": True}
+        )
+
+
+class TestOpLogTail(TestOpLogBase):
+    def setUp(self):
+        super().setUp()
+
+        self.app.config["OPLOG"] = True
+        self.app.config["OPLOG_ENDPOINT"] = "oplog"
+        self.app.config["OPLOG_TAIL"] = True
+        self.app.config["OPLOG_TAIL_TIMEOUT"] = 0
+        self.app.config["OPLOG_TAIL_DELAY"] = 0
+        self.app.data.tail_poll_interval = 0.05
+        self.oplog_reset()
+        self.db = self.connection[MONGO_DBNAME]
+
+    def post(self):
+        self.data[self.test_field] = str(ObjectId()) + "0"
+        return self.test_client.post(
+            self.known_resource_url,
+            data=json.dumps(self.data),
+            headers=self.headers,
+            environ_base={"REMOTE_ADDR": "127.0.0.1"},
+        )
+
+    def test_oplog_indexes(self):
+        indexes = self.db.oplog.index_information()
+        self.assertEqual(indexes["oplog_resource"]["key"], [("r", 1), ("_updated", 1)])
+        self.assertEqual(indexes["oplog_document"]["key"], [("i", 1), ("_updated", 1)])
+        self.assertTrue("oplog_ttl" not in indexes)
+
+        self.app.config["OPLOG_TTL"] = 3600
+        self.oplog_reset()
+        indexes = self.db.oplog.index_information()
+        self.assertEqual(indexes["oplog_ttl"]["expireAfterSeconds"], 3600)
+
+    def test_oplog_ttl_and_capped(self):
+        self.app.config["OPLOG_TTL"] = 3600
+        self.app.config["OPLOG_CAPPED_SIZE"] = 1024 * 1024
+        self.assertRaises(ConfigException, self.app._init_oplog)
+
+    def test_tail(self):
+        self.post()
+
+        # without 'after', the tail starts from the last entry.
+        r, status = self.oplog_get("/oplog/_tail")
+        self.assert200(status)
+        self.assertEqual(r["_items"], [])
+        after = r["_meta"]["after"]
+        self.assertEqual(after, str(self.db.oplog.find_one()["_id"]))
+
+        self.post()
+        self.post()
+        r, status = self.oplog_get("/oplog/_tail?after=%s" % after)
+        self.assert200(status)
+        self.assertEqual(len(r["_items"]), 2)
+        self.assertOpLogEntry(r["_items"][0], "POST")
+        self.assertEqual(r["_meta"]["after"], r["_items"][1]["_id"])
+
+        r, status = self.oplog_get("/oplog/_tail?after=%s&max_results=1" % after)
+        self.assertEqual(len(r["_items"]), 1)
+
+        r, status = self.oplog_get("/oplog/_tail?after=%s" % r["_meta"]["after"])
+        self.assertEqual(len(r["_items"]), 1)
+
+    def test_tail_waits_for_entries(self):
+        self.app.config["OPLOG_TAIL_TIMEOUT"] = 5
+        self.post()
+        after = str(self.db.oplog.find_one()["_id"])
+
+        entry = {"r": "contacts", "o": "POST", "_updated": datetime.now()}
+        timer = threading.Timer(0.2, self.db.oplog.insert_one, (entry,))
+        timer.start()
+        r, status = self.oplog_get("/oplog/_tail?after=%s" % after)
+        timer.join()
+        self.assert200(status)
+        self.assertEqual(len(r["_items"]), 1)
+        self.assertEqual(r["_items"][0]["_id"], str(entry["_id"]))
+
+    def test_tail_delay(self):
+        self.app.config["OPLOG_TAIL_DELAY"] = 60
+        now = datetime.now(timezone.utc)
+
+        def insert(seconds_ago):
+            id_ = ObjectId.from_datetime(now - timedelta(seconds=seconds_ago))
+            self.db.oplog.insert_one({"_id": id_, "r": "contacts", "o": "POST"})
+            return str(id_)
+
+        settled = insert(120)
+        insert(0)
+        r, status = self.oplog_get("/oplog/_tail")
+        self.assertEqual(r["_items"], [])
+        self.assertEqual(r["_meta"]["after"], settled)
+
+        after = str(ObjectId.from_datetime(now - timedelta(seconds=300)))
+        r, status = self.oplog_get("/oplog/_tail?after=%s" % after)
+        self.assert200(status)
+        self.assertEqual([item["_id"] for item in r["_items"]], [settled])
+
+        # stored late, with an id lower than the unsettled entry.
+        late = insert(90)
+        r, status = self.oplog_get("/oplog/_tail?after=%s" % r["_meta"]["after"])
+        self.assertEqual([item["_id"] for item in r["_items"]], [late])
+
+    def test_tail_endpoint_disabled(self):
+        self.app.config["OPLOG_TAIL_URL"] = "_wait"
+        self.app.config["OPLOG_TAIL"] = False
+        self.oplog_reset()
+        r, status = self.oplog_get("/oplog/_wait")
+        self.assert404(status)
+
+
 class TestTickets(TestBase):
     def test_ticket_681(self):
         # See https://github.com/pyeve/eve/issues/681
@@ -1,5 +1,6 @@
 import base64
 import time
+import unittest
 from datetime import datetime, timedelta
 from io import BytesIO
 
@@ -7,10 +8,12 @@ import simplejson as json
 from bson import ObjectId
 from bson.dbref import DBRef
 from bson.son import SON
+from pymongo.errors import OperationFailure
 from werkzeug.datastructures import ImmutableMultiDict, MultiDict
 
+from eve.io.mongo import MongoChangeFeed
 from eve.methods.get import get_internal, getitem_internal
-from eve.utils import date_to_rfc1123, str_to_date
+from eve.utils import date_to_rfc1123, encode_cursor, orjson, str_to_date
 from tests import TestBase
 from tests.test_settings import MONGO_DBNAME
 from tests.utils import DummyEvent
@@ -106,6 +109,437 @@ class TestGet(TestBase):
         self.assertPrevLink(links, 1)
         self.assertFalse(self.app.config["HEADER_TOTAL_COUNT"] in r.headers)
 
+    def test_get_keyset_pagination(self):
+        self.app.config["DOMAIN"][self.known_resource]["keyset_pagination"] = True
+
+        response, status = self.get(self.known_resource, "?max_results=40")
+        self.assert200(status)
+        links = response["_links"]
+        self.assertNotIn("prev", links)
+        self.assertNotIn("last", links)
+        self.assertNotIn("page", response["_meta"])
+        self.assertIn("cursor=", links["next"]["href"])
+        seen = [item["_id"] for item in response["_items"]]
+
+        pages = 1
+        while "next" in links:
+            r = self.test_client.get("/%s" % links["next"]["href"])
+            response, status = self.parse_response(r)
+            self.assert200(status)
+            links = response["_links"]
+            seen.extend(item["_id"] for item in response["_items"])
+            pages += 1
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(seen), 101)
+        self.assertEqual(len(set(seen)), 101)
+        self.assertEqual(response["_meta"]["total"], 101)
+
+        # walking back from the last page returns the previous one.
+        r = self.test_client.get("/%s" % links["prev"]["href"])
+        response, status = self.parse_response(r)
+        self.assert200(status)
+        self.assertEqual([item["_id"] for item in response["_items"]], seen[40:80])
+        self.assertIn("prev", response["_links"])
+        self.assertIn("next", response["_links"])
+
+        r = self.test_client.get("/%s" % response["_links"]["prev"]["href"])
+        response, status = self.parse_response(r)
+        self.assertEqual([item["_id"] for item in response["_items"]], seen[:40])
+
+    def test_get_keyset_pagination_sort(self):
+        self.app.config["DOMAIN"][self.known_resource]["keyset_pagination"] = True
+
+        response, status = self.get(self.known_resource, '?sort=[("prog", -1)]')
+        self.assert200(status)
+        self.assertEqual(
+            [item["prog"] for item in response["_items"]], list(range(100, 75, -1))
+        )
+        self.assertIn("sort=", response["_links"]["next"]["href"])
+
+        r = self.test_client.get("/%s" % response["_links"]["next"]["href"])
+        response, status = self.parse_response(r)
+        self.assert200(status)
+        self.assertEqual(
+            [item["prog"] for item in response["_items"]], list(range(75, 50, -1))
+        )
+
+    def test_get_keyset_pagination_bad_cursor(self):
+        self.app.config["DOMAIN"][self.known_resource]["keyset_pagination"] = True
+
+        _, status = self.get(self.known_resource, "?cursor=notatoken")
+        self.assert400(status)
+
+        # forged cursors are rejected.
+        forged = encode_cursor([{"$ne": None}], fields=["_id"])
+        _, status = self.get(self.known_resource, "?cursor=%s" % forged)
+        self.assert400(status)
+
+        # so are cursors built for another sort.
+        token = encode_cursor([1, ObjectId()], fields=["prog", "_id"])
+        _, status = self.get(self.known_resource, "?cursor=%s" % token)
+        self.assert400(status)
+        _, status = self.get(self.known_resource, "?sort=prog&cursor=%s" % token)
+        self.assert200(status)
+
+        # pages are reached through cursors only.
+        _, status = self.get(self.known_resource, "?page=2")
+        self.assert400(status)
+        _, status = self.get(self.known_resource, "?sort=prog&page=1&cursor=%s" % token)
+        self.assert400(status)
+
+    def test_get_keyset_pagination_mixed_types(self):
+        self.app.config["DOMAIN"][self.known_resource]["keyset_pagination"] = True
+        contacts = self.connection[MONGO_DBNAME].contacts
+        ids = [document["_id"] for document in contacts.find().sort("_id", 1)]
+        # sort values of different BSON types, null or missing.
+        for i, _id in enumerate(ids[:40]):
+            if i < 10:
+                contacts.update_one({"_id": _id}, {"$set": {"prog": None}})
+            elif i < 20:
+                contacts.update_one({"_id": _id}, {"$unset": {"prog": 1}})
+            elif i < 30:
+                contacts.update_one({"_id": _id}, {"$set": {"prog": "p%d" % (i % 3)}})
+            else:
+                contacts.update_one(
+                    {"_id": _id}, {"$set": {"prog": datetime(2020, 1, i - 29)}}
+                )
+
+        for direction in (1, -1):
+            documents = contacts.find({"username": {"$exists": False}})
+            expected = [
+                str(document["_id"])
+                for document in documents.sort([("prog", direction), ("_id", 1)])
+            ]
+            response, status = self.get(
+                self.known_resource,
+                '?max_results=7&sort=[("prog", %d)]' % direction,
+            )
+            self.assert200(status)
+            pages = [[item["_id"] for item in response["_items"]]]
+            while "next" in response["_links"]:
+                r = self.test_client.get("/%s" % response["_links"]["next"]["href"])
+                response, status = self.parse_response(r)
+                self.assert200(status)
+                pages.append([item["_id"] for item in response["_items"]])
+            self.assertEqual(sum(pages, []), expected)
+
+            # and back.
+            for page in reversed(pages[:-1]):
+                r = self.test_client.get("/%s" % response["_links"]["prev"]["href"])
+                response, status = self.parse_response(r)
+                self.assertEqual([item["_id"] for item in response["_items"]], page)
+
+    def test_get_streaming(self):
+        url = "%s?max_results=40" % self.known_resource_url
+        expected = self.test_client.get(url)
+        self.assertIn("Content-Length", expected.headers)
+
+        settings = self.app.config["DOMAIN"][self.known_resource]
+        settings["streaming_get"] = True
+        self.app.config["STREAMING_GET_CHUNK_SIZE"] = 7
+        r = self.test_client.get(url)
+        self.assert200(r.status_code)
+        self.assertNotIn("Content-Length", r.headers)
+        self.assertEqual(r.mimetype, "application/json")
+        self.assertEqual(
+            r.headers[self.app.config["HEADER_TOTAL_COUNT"]],
+            expected.headers[self.app.config["HEADER_TOTAL_COUNT"]],
+        )
+        self.assertEqual(json.loads(r.get_data()), json.loads(expected.get_data()))
+
+        # keyset pagination tokens are computed as documents go by.
+        settings["keyset_pagination"] = True
+        response, status = self.parse_response(self.test_client.get(url))
+        self.assert200(status)
+        self.assertEqual(len(response["_items"]), 40)
+        r = self.test_client.get("/%s" % response["_links"]["next"]["href"])
+        response, status = self.parse_response(r)
+        self.assert200(status)
+        self.assertEqual(len(response["_items"]), 40)
+        self.assertIn("prev", response["_links"])
+
+        # empty pages are valid payloads, too.
+        response, status = self.get(self.known_resource, '?where={"prog": -1}')
+        self.assert200(status)
+        self.assertEqual(response["_items"], [])
+
+    def test_get_streaming_fallback(self):
+        self.app.config["DOMAIN"][self.known_resource]["streaming_get"] = True
+
+        r = self.test_client.get("%s?pretty" % self.known_resource_url)
+        self.assert200(r.status_code)
+        self.assertIn("Content-Length", r.headers)
+
+        # as are internal calls.
+        with self.app.test_request_context(self.known_resource_url):
+            response, _, _, status, _ = get_internal(self.known_resource)
+        self.assert200(status)
+        self.assertEqual(len(response["_items"]), 25)
+
+        # callbacks are handed the whole response payload.
+        def fetched(response):
+            response["hooked"] = True
+
+        self.app.on_fetched_resource_contacts += fetched
+        response, status = self.get(self.known_resource)
+        self.assert200(status)
+        self.assertTrue(response["hooked"])
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_get_orjson_backend(self):
+        expected = self.test_client.get(self.known_resource_url)
+        self.app.config["JSON_BACKEND"] = "orjson"
+        r = self.test_client.get(self.known_resource_url)
+        self.assert200(r.status_code)
+        self.assertEqual(json.loads(r.get_data()), json.loads(expected.get_data()))
+
+    def test_export(self):
+        self.app.register_resource(
+            "people",
+            {
+                "export": True,
+                "datasource": {"source": "contacts"},
+                "schema": {"ref": {"type": "string"}, "prog": {"type": "integer"}},
+            },
+        )
+        self.app.config["EXPORT_BATCH_SIZE"] = 7
+
+        r = self.test_client.get("/people/_export")
+        self.assert200(r.status_code)
+        self.assertEqual(r.mimetype, "application/x-ndjson")
+        self.assertNotIn(self.app.config["HEADER_TOTAL_COUNT"], r.headers)
+        documents = [json.loads(line) for line in r.get_data().splitlines()]
+        _db = self.connection[MONGO_DBNAME]
+        self.assertEqual(len(documents), _db.contacts.count_documents({}))
+        ids = [document["_id"] for document in documents]
+        self.assertEqual(ids, sorted(ids))
+        self.assertIn("ref", documents[0])
+        self.assertNotIn("name", documents[0])
+        self.assertNotIn("_links", documents[0])
+
+        r = self.test_client.get('/people/_export?where={"prog": {"$lt": 10}}')
+        self.assert200(r.status_code)
+        self.assertEqual(
+            len(r.get_data().splitlines()),
+            _db.contacts.count_documents({"prog": {"$lt": 10}}),
+        )
+
+        # resume an interrupted export.
+        r = self.test_client.get("/people/_export?after=%s" % ids[49])
+        self.assert200(r.status_code)
+        self.assertEqual(
+            [json.loads(line)["_id"] for line in r.get_data().splitlines()],
+            ids[50:],
+        )
+
+        r = self.test_client.get("%s/_export" % self.known_resource_url)
+        self.assert404(r.status_code)
+
+    def changes(self, url, last_event_id=None):
+        headers = [("Last-Event-ID", last_event_id)] if last_event_id else []
+        r = self.test_client.get(url, headers=headers, buffered=False)
+        self.assert200(r.status_code)
+        self.assertEqual(r.mimetype, "text/event-stream")
+        events = iter(r.response)
+        self.assertTrue(next(events).startswith(b":"))
+        return r, events
+
+    def parse_event(self, event):
+        lines = event.decode().strip().splitlines()
+        fields = dict(line.split(": ", 1) for line in lines)
+        return fields.get("id"), fields["event"], json.loads(fields["data"])
+
+    def test_changes(self):
+        self.app.config["CHANGE_FEED_HEARTBEAT"] = 0.01
+        self.app.register_resource(
+            "people",
+            {
+                "change_feed": True,
+                "resource_methods": ["GET", "POST"],
+                "item_methods": ["GET", "DELETE"],
+                "datasource": {"source": "contacts", "projection": {"ref": 1}},
+                "schema": {"ref": {"type": "string"}, "prog": {"type": "integer"}},
+            },
+        )
+        r, events = self.changes("/people/_changes")
+
+        # idle streams are kept alive.
+        self.assertEqual(next(events), b":\n\n")
+
+        headers = [("Content-Type", "application/json")]
+        data = {"ref": "1234567890123456789054321", "prog": 1}
+        self.test_client.post("/people", data=json.dumps(data), headers=headers)
+        id_, event, document = self.parse_event(next(events))
+        self.assertEqual(event, "insert")
+        self.assertEqual(document["ref"], data["ref"])
+        self.assertNotIn("prog", document)
+
+        r = self.test_client.delete(
+            "/people/%s" % document["_id"], headers=[("If-Match", document["_etag"])]
+        )
+        self.assert204(r.status_code)
+        _, event, deleted = self.parse_event(next(events))
+        self.assertEqual(event, "delete")
+        self.assertEqual(deleted["_id"], document["_id"])
+
+        # resume after the insert.
+        r, events = self.changes("/people/_changes", id_)
+        _, event, _ = self.parse_event(next(events))
+        self.assertEqual(event, "delete")
+
+        # changes made before the stream could be resumed are lost.
+        r, events = self.changes("/people/_changes", "1")
+        _, event, _ = self.parse_event(next(events))
+        self.assertEqual(event, "reset")
+
+        r = self.test_client.get("%s/_changes" % self.known_resource_url)
+        self.assert404(r.status_code)
+
+    def test_changes_datasource_filter(self):
+        changes = self.app.change_feed.subscribe(self.known_resource)
+
+        # documents with a 'username' are not visible through 'contacts'.
+        visible = self.connection[MONGO_DBNAME].contacts.find_one(
+            {"username": {"$exists": False}}
+        )
+        hidden = {"_id": ObjectId(), "username": "hidden"}
+        self.connection[MONGO_DBNAME].contacts.insert_one(hidden)
+        with self.app.test_request_context():
+            self.app.change_feed.publish(
+                self.known_resource, "update", [hidden, visible]
+            )
+        change = next(changes)
+        self.assertEqual(change.op, "update")
+        self.assertEqual(change.document["_id"], visible["_id"])
+
+    def test_changes_buffer(self):
+        self.app.config["CHANGE_FEED_BUFFER"] = 2
+        self.app.config["CHANGE_FEED_HEARTBEAT"] = 0.01
+        feed = self.app.change_feed
+        for i in range(3):
+            feed.publish("invoices", "insert", [{"_id": i}])
+        kept = list(feed._changes["invoices"])
+        self.assertEqual([c.document for c in kept], [{"_id": 1}, {"_id": 2}])
+
+        changes = feed.subscribe("invoices", str(kept[0].id))
+        self.assertEqual(next(changes).document, {"_id": 2})
+        self.assertEqual(next(changes), None)
+
+        # the first change is gone.
+        changes = feed.subscribe("invoices", str(kept[0].id - 2))
+        self.assertEqual(next(changes).op, "reset")
+
+        changes = feed.subscribe("invoices", match=lambda document: document["_id"] > 3)
+        feed.publish("invoices", "delete", [{"_id": 3}, {"_id": 4}])
+        self.assertEqual(next(changes).document, {"_id": 4})
+
+    def test_changes_mongo_soft_delete(self):
+        class Stream:
+            alive = True
+
+            def __init__(self, changes):
+                self.changes = changes
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def try_next(self):
+                return self.changes.pop(0)
+
+        def change(op, document, updated=None):
+            change = {"_id": {"_data": op}, "operationType": op}
+            change["fullDocument"] = document
+            change["documentKey"] = {"_id": document["_id"]}
+            if updated is not None:
+                change["updateDescription"] = {"updatedFields": updated}
+            return change
+
+        feed = MongoChangeFeed(self.app)
+        stream = Stream(
+            [
+                change("update", {"_id": 1, "_deleted": False}, {"prog": 1}),
+                change("replace", {"_id": 1, "_deleted": True}),
+                change("update", {"_id": 2, "_deleted": True}, {"_deleted": True}),
+            ]
+        )
+        changes = feed._listen(stream, False, None, True)
+        # soft deletes are notified as deletions, like the local feed does.
+        self.assertEqual(
+            [next(changes).op for _ in range(3)], ["update", "delete", "delete"]
+        )
+
+    def test_get_count_strategy_exact(self):
+        response, status = self.get(self.known_resource)
+        self.assert200(status)
+        self.assertNotIn("total_strategy", response["_meta"])
+
+        r = self.test_client.get(self.known_resource_url)
+        self.assertNotIn(self.app.config["HEADER_TOTAL_COUNT_STRATEGY"], r.headers)
+
+    def test_get_count_strategy_capped(self):
+        settings = self.app.config["DOMAIN"][self.known_resource]
+        settings["count_strategy"] = "capped"
+        settings["count_limit"] = 50
+
+        r = self.test_client.get(self.known_resource_url)
+        response, status = self.parse_response(r)
+        self.assert200(status)
+        self.assertEqual(response["_meta"]["total"], 50)
+        self.assertEqual(response["_meta"]["total_strategy"], "capped")
+        self.assertEqual(r.headers[self.app.config["HEADER_TOTAL_COUNT"]], "50")
+        self.assertEqual(
+            r.headers[self.app.config["HEADER_TOTAL_COUNT_STRATEGY"]], "capped"
+        )
+
+        # below the limit the count is exact.
+        response, status = self.get(self.known_resource, '?where={"prog": 1}')
+        self.assertEqual(response["_meta"]["total"], 1)
+        self.assertEqual(response["_meta"]["total_strategy"], "exact")
+
+    def test_get_count_strategy_estimated(self):
+        settings = self.app.config["DOMAIN"]["payments"]
+        settings["count_strategy"] = "estimated"
+
+        response, status = self.get("payments")
+        self.assert200(status)
+        self.assertEqual(response["_meta"]["total"], 10)
+        self.assertEqual(response["_meta"]["total_strategy"], "estimated")
+
+        # a filtered query falls back to an exact count.
+        response, status = self.get("payments", '?where={"a": "none"}')
+        self.assert200(status)
+        self.assertEqual(response["_meta"]["total"], 0)
+        self.assertEqual(response["_meta"]["total_strategy"], "exact")
+
+    def test_get_count_strategy_cached(self):
+        self.app.config["DOMAIN"][self.known_resource]["count_strategy"] = "cached"
+
+        response, status = self.get(self.known_resource)
+        self.assertEqual(response["_meta"]["total"], 101)
+        self.assertEqual(response["_meta"]["total_strategy"], "exact")
+
+        response, status = self.get(self.known_resource)
+        self.assertEqual(response["_meta"]["total"], 101)
+        self.assertEqual(response["_meta"]["total_strategy"], "cached")
+
+        # a different filter is counted on its own.
+        response, status = self.get(self.known_resource, '?where={"prog": 1}')
+        self.assertEqual(response["_meta"]["total"], 1)
+        self.assertEqual(response["_meta"]["total_strategy"], "exact")
+
+        # writes invalidate the cached counts.
+        _, status = self.delete(
+            self.item_id_url, headers=[("If-Match", self.item_etag)]
+        )
+        self.assert204(status)
+        response, status = self.get(self.known_resource)
+        self.assertEqual(response["_meta"]["total"], 100)
+        self.assertEqual(response["_meta"]["total_strategy"], "exact")
+
     def test_get_internal_page(self):
         with self.app.test_request_context(self.known_resource_url):
             response, _, _, status, _ = get_internal(self.known_resource)
@@ -897,6 +1331,140 @@ class TestGet(TestBase):
         self.assertEqual(returned, encoded)
         self.assertEqual(base64.b64decode(returned.encode()), asset)
 
+    def test_get_embedded_batch(self):
+        _db = self.connection[MONGO_DBNAME]
+        ids = _db.contacts.insert_many(self.random_contacts(3)).inserted_ids
+        invoices = [
+            {
+                "inv_number": "a",
+                "person": ids[0],
+                "persondbref": DBRef("contacts", ids[1]),
+            },
+            {
+                "inv_number": "b",
+                "person": ids[1],
+                "persondbref": DBRef("contacts", ids[2]),
+            },
+            {"inv_number": "c", "person": ids[0]},
+        ]
+        _db.invoices.insert_many(invoices)
+
+        settings = self.domain["invoices"]
+        for field in ("person", "persondbref"):
+            settings["schema"][field]["data_relation"]["embeddable"] = True
+        self.clearSchemaCache()
+
+        lookups = []
+        find = self.app.data.find
+
+        def counting_find(resource, *args, **kwargs):
+            lookups.append(resource)
+            return find(resource, *args, **kwargs)
+
+        self.app.data.find = counting_find
+        response, status = self.get(
+            "invoices",
+            '?embedded={"person": 1, "persondbref": 1}'
+            '&where={"inv_number": {"$in": ["a", "b", "c"]}}',
+        )
+        self.assert200(status)
+
+        # one query for the page, plus one per embedded field.
+        self.assertEqual(lookups, ["invoices", "contacts", "contacts"])
+
+        items = dict((item["inv_number"], item) for item in response["_items"])
+        self.assertEqual(items["a"]["person"]["_id"], str(ids[0]))
+        self.assertEqual(items["b"]["person"]["_id"], str(ids[1]))
+        self.assertEqual(items["c"]["person"]["_id"], str(ids[0]))
+        self.assertEqual(items["a"]["persondbref"]["_id"], str(ids[1]))
+        self.assertEqual(items["b"]["persondbref"]["_id"], str(ids[2]))
+        self.assertNotIn("persondbref", items["c"])
+
+    def test_get_embedded_lookup(self):
+        _db = self.connection[MONGO_DBNAME]
+        payments = list(_db.payments.find().limit(3))
+        ids = [payment["_id"] for payment in payments]
+        self.app.register_resource(
+            "bills",
+            {
+                "embedding_lookup": True,
+                "schema": {
+                    "number": {"type": "string"},
+                    "payment": {
+                        "type": "objectid",
+                        "data_relation": {"resource": "payments", "embeddable": True},
+                    },
+                    "payments": {
+                        "type": "list",
+                        "schema": {
+                            "type": "objectid",
+                            "data_relation": {
+                                "resource": "payments",
+                                "embeddable": True,
+                            },
+                        },
+                    },
+                },
+            },
+        )
+        _db.bills.insert_many(
+            [
+                {"number": "1", "payment": ids[0], "payments": ids[::-1]},
+                {"number": "2", "payment": ObjectId(), "payments": [ids[1]]},
+            ]
+        )
+
+        lookups = []
+        find = self.app.data.find
+
+        def counting_find(resource, *args, **kwargs):
+            lookups.append(resource)
+            return find(resource, *args, **kwargs)
+
+        self.app.data.find = counting_find
+        response, status = self.get(
+            "bills", '?embedded={"payment": 1, "payments": 1}&sort=number'
+        )
+        self.assert200(status)
+        # related documents came along with the page.
+        self.assertEqual(lookups, ["bills"])
+
+        first, second = response["_items"]
+        self.assertEqual(first["payment"]["_id"], str(ids[0]))
+        self.assertEqual(
+            [payment["_id"] for payment in first["payments"]],
+            [str(i) for i in ids[::-1]],
+        )
+        # dangling references are embedded as None.
+        self.assertIsNone(second["payment"])
+        self.assertEqual(second["payments"][0]["_id"], str(ids[1]))
+
+    def test_get_embedded_lookup_fallback(self):
+        _db = self.connection[MONGO_DBNAME]
+        payment = _db.payments.find_one()
+        self.app.register_resource(
+            "bills",
+            {
+                "embedding_lookup": True,
+                "schema": {
+                    "payment": {
+                        "type": "objectid",
+                        "data_relation": {"resource": "payments", "embeddable": True},
+                    },
+                },
+            },
+        )
+        _db.bills.insert_one({"payment": payment["_id"]})
+
+        def failing_lookups(*args):
+            raise OperationFailure("$lookup with 'pipeline' is not supported")
+
+        # servers which can't run the lookups fall back to batched embedding.
+        self.app.data._find_with_lookups = failing_lookups
+        response, status = self.get("bills", '?embedded={"payment": 1}')
+        self.assert200(status)
+        self.assertEqual(response["_items"][0]["payment"]["_id"], str(payment["_id"]))
+
     def test_get_embedded(self):
         # We need to assign a `person` to our test invoice
         _db = self.connection[MONGO_DBNAME]
@@ -1763,6 +2331,14 @@ class TestGet(TestBase):
         item, value = 0, expected_length - 1
         self.assertEqual(items[item]["x"], value)
 
+        # aggregations are paginated by page number, even when keyset
+        # pagination is enabled.
+        self.app.config["DOMAIN"]["aggregate_test"]["keyset_pagination"] = True
+        response, status = self.get("aggregate_test?page=2")
+        self.assert200(status)
+        self.assertPagination(response, 2, 75, 25)
+        self.assertEqual(response["_items"][0]["x"], num - 1 - 25)
+
         item, value = expected_length - 1, 0
         self.assertEqual(items[item]["x"], 0)
 
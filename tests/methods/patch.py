@@ -3,7 +3,8 @@ from bson import ObjectId
 from pymongo import ReadPreference
 
 from eve import ETAG, ISSUES, LAST_UPDATED, STATUS, STATUS_OK
-from eve.methods.patch import patch_internal
+from eve.methods.patch import _dotted, patch_internal
+from eve.utils import document_etag
 from tests import TestBase
 from tests.test_settings import MONGO_DBNAME
 from tests.utils import DummyEvent
@@ -854,6 +855,90 @@ class TestPatch(TestBase):
         self.assertTrue("_links" in response)
         self.assertItemLink(response["_links"], item_id)
 
+    def test_patch_find_and_modify(self):
+        self.app.register_resource(
+            "people",
+            {
+                "patch_find_and_modify": True,
+                "schema": {
+                    "name": {"type": "string"},
+                    "address": {
+                        "type": "dict",
+                        "nullable": True,
+                        "schema": {
+                            "city": {"type": "string"},
+                            "street": {"type": "string"},
+                        },
+                    },
+                },
+            },
+        )
+        data = {"name": "john", "address": {"city": "Rome", "street": "Via Roma"}}
+        r, status = self.post("/people", data=data)
+        self.assert201(status)
+        url = "/people/%s" % r["_id"]
+
+        calls = []
+        find_one = self.app.data.find_one
+
+        def counted(*args, **kwargs):
+            calls.append(args)
+            return find_one(*args, **kwargs)
+
+        self.app.data.find_one = counted
+        changes = {"address": {"city": "Milan"}}
+        patched, status = self.patch(url, changes, [("If-Match", r[ETAG])])
+        self.assert200(status)
+        # the document was not loaded first.
+        self.assertEqual(calls, [])
+        self.assertNotEqual(patched[ETAG], r[ETAG])
+
+        person, status = self.get("people", item=r["_id"])
+        self.assertEqual(person["address"], {"city": "Milan", "street": "Via Roma"})
+        self.assertEqual(person[ETAG], patched[ETAG])
+        with self.app.app_context():
+            people = self.app.data.driver.db["people"]
+            stored = people.find_one({"_id": ObjectId(r["_id"])})
+            stored[ETAG] = r[ETAG]
+            self.assertEqual(patched[ETAG], document_etag(stored))
+
+        # nested documents which are null are replaced, not merged.
+        patched, status = self.patch(
+            url, {"address": None}, [("If-Match", patched[ETAG])]
+        )
+        self.assert200(status)
+        del calls[:]
+        patched, status = self.patch(
+            url, {"address": {"city": "Turin"}}, [("If-Match", patched[ETAG])]
+        )
+        self.assert200(status)
+        self.assertEqual(len(calls), 1)
+        person, status = self.get("people", item=r["_id"])
+        self.assertEqual(person["address"], {"city": "Turin"})
+        self.assertEqual(person[ETAG], patched[ETAG])
+
+        # as do nested keys which can't be dotted.
+        self.assertEqual(_dotted({"a": {"b": {"c": 1}}}), {"a.b.c": 1})
+        for updates in ({"a": {"b.c": 1}}, {"a": {"$c": 1}}, {"a.b": {"c": 1}}):
+            self.assertRaises(ValueError, _dotted, updates)
+
+        # stale etags and validation issues go through the regular path.
+        del calls[:]
+        _, status = self.patch(url, {"name": "jack"}, [("If-Match", r[ETAG])])
+        self.assert412(status)
+        self.assertEqual(len(calls), 1)
+        del calls[:]
+        _, status = self.patch(url, {"name": 1}, [("If-Match", patched[ETAG])])
+        self.assertValidationErrorStatus(status)
+        self.assertEqual(len(calls), 1)
+
+        # as do resources whose validation needs the stored document.
+        self.app.config["DOMAIN"]["people"]["schema"]["name"]["default"] = "anon"
+        del calls[:]
+        _, status = self.patch(url, {"name": "jack"}, [("If-Match", patched[ETAG])])
+        self.assert200(status)
+        self.assertEqual(len(calls), 1)
+
     def patch(self, url, data, headers=[]):
         headers.append(("Content-Type", "application/json"))
         r = self.test_client.patch(url, data=json.dumps(data), headers=headers)
@@ -1,3 +1,4 @@
+import copy
 from base64 import b64decode
 from io import BytesIO
 
@@ -392,6 +393,39 @@ class TestPost(TestBase):
         self.assert201(status)
         self.assertPostResponse(r)
 
+    def test_post_referential_integrity_bulk(self):
+        self.app.config["DATA_RELATION_CACHE_TTL"] = 60
+        calls = []
+        existing_values = self.app.data.existing_values
+
+        def counted(resource, field, values):
+            calls.append(values)
+            return existing_values(resource, field, values)
+
+        self.app.data.existing_values = counted
+        data = [
+            {"person": self.item_id, "invoicing_contacts": [self.item_id] * 3},
+            {"persondbref": {"$col": "contacts", "$id": self.item_id}},
+            {"invoicing_contacts": [self.item_id]},
+        ]
+        r, status = self.post("/invoices/", data=data)
+        self.assert201(status)
+        # references are prefetched once, for the whole payload.
+        self.assertEqual(len(calls), 1)
+
+        del calls[:]
+        data = [{"person": self.item_id}, {"person": self.unknown_item_id}]
+        r, status = self.post("/invoices/", data=data)
+        self.assertValidationErrorStatus(status)
+        expected = "value '%s' must exist in resource '%s', field '%s'" % (
+            self.unknown_item_id,
+            "contacts",
+            self.domain["contacts"]["id_field"],
+        )
+        self.assertValidationError(r["_items"][1], {"person": expected})
+        # missing references are not cached.
+        self.assertEqual(len(calls), 2)
+
     def test_post_allow_unknown(self):
         del self.domain["contacts"]["schema"]["ref"]["required"]
         data = {"unknown": "unknown"}
@@ -1036,6 +1070,212 @@ class TestPost(TestBase):
         r, status = self.post("test_unique", data=make_payload("unique_value_2"))
         self.assert201(status)
 
+    def test_unique_in_bulk_payload(self):
+        r, status = self.post("test_unique", data={"unique_attribute": "stored"})
+        self.assert201(status)
+
+        data = [
+            {"unique_attribute": "new"},
+            {"unique_attribute": "stored"},
+            {"unique_attribute": "other"},
+            {"unique_attribute": "new"},
+        ]
+        r, status = self.post("test_unique", data=data)
+        self.assert422(status)
+        results = r["_items"]
+        self.assertEqual(results[0]["_status"], "OK")
+        self.assertEqual(results[2]["_status"], "OK")
+        self.assertValidationError(results[1], {"unique_attribute": "not unique"})
+        self.assertValidationError(results[3], {"unique_attribute": "not unique"})
+
+        r, status = self.post("test_unique", data=data[2:3] + data[:1])
+        self.assert201(status)
+
+    def test_post_bulk_insert_unordered(self):
+        self.app.register_resource(
+            "people",
+            {
+                "bulk_insert_unordered": True,
+                "bulk_insert_chunk_size": 2,
+                "versioning": True,
+                "schema": {"name": {"type": "string"}},
+            },
+        )
+        stored = str(ObjectId())
+        r, status = self.post("people", data={"_id": stored, "name": "stored"})
+        self.assert201(status)
+
+        duplicate = str(ObjectId())
+        data = [
+            {"name": "first"},
+            {"_id": stored, "name": "existing"},
+            {"_id": duplicate, "name": "second"},
+            {"_id": duplicate, "name": "duplicate"},
+            {"name": "third"},
+        ]
+        r, status = self.post("people", data=data)
+        self.assert201(status)
+        self.assertEqual(r[STATUS], "ERR")
+        # partial failures are reported by the items only.
+        self.assertNotIn("_error", r)
+        results = r["_items"]
+        self.assertEqual(
+            [result[STATUS] for result in results], ["OK", "ERR", "OK", "ERR", "OK"]
+        )
+        self.assertEqual(results[1]["_error"]["code"], 409)
+        self.assertEqual(results[3]["_error"]["code"], 409)
+        self.assertEqual(results[2]["_id"], duplicate)
+
+        _db = self.connection[MONGO_DBNAME]
+        self.assertEqual(_db.people.count_documents({}), 4)
+        self.assertEqual(
+            _db.people.find_one({"name": "stored"})["_id"], ObjectId(stored)
+        )
+        # versions are only stored for the documents which landed.
+        self.assertEqual(_db.people_versions.count_documents({}), 4)
+
+        r, status = self.post("people", data=[{"_id": stored}, {"_id": duplicate}])
+        self.assertEqual(status, 409)
+        self.assertEqual(r["_error"]["code"], 409)
+
+    def test_post_bulk_insert_unordered_media_cleanup(self):
+        self.app.register_resource(
+            "people",
+            {
+                "bulk_insert_unordered": True,
+                "schema": {"name": {"type": "string"}, "pic": {"type": "media"}},
+            },
+        )
+        stored = str(ObjectId())
+        r, status = self.post("people", data={"_id": stored})
+        self.assert201(status)
+
+        # media files of documents which could not be stored are deleted.
+        data = MultiDict([("_id", stored), ("pic", (BytesIO(b"content"), "a.txt"))])
+        r = self.test_client.post(
+            "/people", data=data, content_type="multipart/form-data"
+        )
+        self.assertEqual(r.status_code, 409)
+        _db = self.connection[MONGO_DBNAME]
+        self.assertEqual(_db.fs.files.count_documents({}), 0)
+
+    def test_post_ndjson(self):
+        self.app.register_resource(
+            "people",
+            {"ndjson_ingestion": True, "schema": {"name": {"type": "string"}}},
+        )
+        self.app.config["NDJSON_BATCH_SIZE"] = 2
+        lines = [{"name": "first"}, {"name": "second"}, {"name": 3}, {"name": "4th"}]
+        body = "\n".join(json.dumps(line) for line in lines) + "\n\n{broken\n"
+
+        r = self.test_client.post(
+            "/people", data=body, headers=[("Content-Type", "application/x-ndjson")]
+        )
+        self.assert200(r.status_code)
+        self.assertEqual(r.mimetype, "application/x-ndjson")
+        batches = [json.loads(line) for line in r.get_data().splitlines()]
+        self.assertEqual([batch["_batch"] for batch in batches], [0, 1, 2])
+        self.assertEqual([batch["_code"] for batch in batches], [201, 422, 400])
+        self.assertEqual(len(batches[0]["_items"]), 2)
+        self.assertEqual(batches[0]["_items"][0][STATUS], STATUS_OK)
+        self.assertIn("name", batches[1]["_items"][0][ISSUES])
+        self.assertIn("exception", batches[2]["_items"][0][ISSUES])
+
+        _db = self.connection[MONGO_DBNAME]
+        self.assertEqual(_db.people.count_documents({}), 2)
+
+        # disabled by default.
+        r = self.test_client.post(
+            self.known_resource_url,
+            data=body,
+            headers=[("Content-Type", "application/x-ndjson")],
+        )
+        self.assert400(r.status_code)
+
+    def test_post_validation_workers(self):
+        self.app.register_resource(
+            "people",
+            {
+                "schema": {
+                    "name": {"type": "string", "unique": True, "coerce": str.strip},
+                    "code": {
+                        "type": "dict",
+                        "schema": {"value": {"type": "string", "unique": True}},
+                    },
+                    "person": {
+                        "type": "objectid",
+                        "data_relation": {"resource": "contacts"},
+                    },
+                    "age": {"type": "integer", "min": 0, "default": 18},
+                }
+            },
+        )
+        r, status = self.post("people", data={"name": "stored", "code": {"value": "x"}})
+        self.assert201(status)
+
+        data = [
+            {"name": "first", "person": self.item_id},
+            {"name": "stored", "code": {"value": "x"}, "age": -1},
+            {"name": "second", "person": self.unknown_item_id},
+            {"name": "first", "age": "old"},
+        ]
+        expected, status = self.post("people", data=data)
+        self.assertValidationErrorStatus(status)
+
+        self.app.config["VALIDATION_WORKERS"] = 2
+        self.app.config["VALIDATION_WORKERS_THRESHOLD"] = 2
+        # without workers running, documents are validated as usual.
+        r, status = self.post("people", data=data)
+        self.assertEqual(r, expected)
+
+        self.app.validation_workers.start()
+        self.addCleanup(self.app.validation_workers.shutdown)
+        executor = self.app.validation_workers._executor
+        self.assertIsNotNone(executor)
+        r, status = self.post("people", data=data)
+        self.assertValidationErrorStatus(status)
+        self.assertIs(self.app.validation_workers._executor, executor)
+        self.assertEqual(r, expected)
+        results = r["_items"]
+        self.assertEqual(results[0][STATUS], STATUS_OK)
+        self.assertValidationError(results[1], {"name": "not unique"})
+        self.assertIn("not unique", results[1][ISSUES]["code"]["value"])
+        self.assertValidationError(results[1], {"age": "min value is 0"})
+        self.assertValidationError(results[2], {"person": "must exist"})
+        self.assertValidationError(results[3], {"name": "not unique"})
+
+        r, status = self.post("people", data=[data[0], {"name": "third"}])
+        self.assert201(status)
+        r, status = self.get("people", "?sort=name")
+        self.assertEqual([item["age"] for item in r["_items"]], [18, 18, 18])
+
+    def test_post_validation_workers_impure_rules(self):
+        settings = {"schema": {"name": {"type": "string"}}}
+        self.app.register_resource("pure", copy.deepcopy(settings))
+        # callables which might need the request, or the database.
+        settings["schema"]["name"]["coerce"] = lambda value: value.strip()
+        self.app.register_resource("impure", settings)
+        self.app.config["VALIDATION_WORKERS"] = 2
+        self.app.validation_workers.start()
+        self.addCleanup(self.app.validation_workers.shutdown)
+        workers = self.app.validation_workers
+        documents = [{"name": " first "}, {"name": " second "}]
+
+        self.assertIsNotNone(workers.validate("pure", documents))
+        self.assertIsNone(workers.validate("impure", documents))
+        self.app.config["VALIDATION_WORKERS_THRESHOLD"] = 2
+        r, status = self.post("impure", data=documents)
+        self.assert201(status)
+        r, status = self.get("impure", "?sort=name")
+        self.assertEqual([item["name"] for item in r["_items"]], ["first", "second"])
+
+        # workers don't know about schema changes: they are shut down.
+        self.app.register_resource("other", copy.deepcopy(settings))
+        self.assertIsNone(workers.validate("pure", documents))
+        self.assertIsNone(workers._executor)
+        workers.start()
+        self.assertIsNotNone(workers.validate("pure", documents))
+
     def test_unique_in_dict_attribute(self):
         def make_payload(unique_value):
             return {"unique_in_dict_attribute": {"unique_attribute": unique_value}}
@@ -1,5 +1,10 @@
+import threading
 import time
 
+from flask import request
+
+from eve.auth import BasicAuth, TokenAuth
+from eve.ratelimit import RateLimiter
 from tests import TestBase
 
 
@@ -66,3 +71,206 @@ class TestRateLimit(TestBase):
         self.assertEqual(r.headers["X-RateLimit-Limit"], "1")
         # renouncing on testing the actual Reset value:
         self.assertTrue("X-RateLimit-Reset" in r.headers)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args):
+            self.commands.append((getattr(self.redis, name), args))
+            return self
+
+        return command
+
+    def execute(self):
+        self.redis.round_trips += 1
+        if self.redis.stalled is not None:
+            self.redis.stalled.wait(5)
+        if self.redis.down:
+            raise ConnectionError("Redis is down")
+        return [command(*args) for command, args in self.commands]
+
+
+class FakeRedis:
+    """Just enough of a Redis client for the rate limiters."""
+
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+        self.round_trips = 0
+        self.down = False
+        self.stalled = None
+
+    def incr(self, key, amount=1):
+        self.values[key] = self.values.get(key, 0) + amount
+        return self.values[key]
+
+    incrby = incr
+
+    def expireat(self, key, when):
+        self.expires[key] = int(when)
+        return True
+
+    def ttl(self, key):
+        return self.expires[key] - int(time.time()) if key in self.expires else -1
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def register_script(self, script):
+        def window(keys, args):
+            # what the WINDOW_SCRIPT does.
+            self.round_trips += 1
+            current, ttl = self.incr(keys[0]), self.ttl(keys[0])
+            if ttl < 0:
+                ttl = args[0]
+                self.expireat(keys[0], int(time.time()) + ttl)
+            return [current, ttl]
+
+        return window
+
+
+class Tenants(BasicAuth):
+    def get_user_or_token(self):
+        return request.headers.get("X-Tenant")
+
+    def authorized(self, allowed_roles, resource, method):
+        return True
+
+
+class Tokens(TokenAuth):
+    def check_auth(self, token, allowed_roles, resource, method):
+        return token in ("first", "second")
+
+
+class TestRateLimitBackends(TestBase):
+    def setUp(self):
+        super().setUp()
+        self.app.redis = FakeRedis()
+        self.app.config["RATE_LIMIT_GET"] = (2, 60)
+
+    def test_ratelimit_redis(self):
+        self.assertRateLimits()
+        self.assertEqual(self.app.redis.round_trips, 3)
+        self.assertEqual(self.app.redis.values["rate-limit/127.0.0.1"], 3)
+
+    def test_ratelimit_redis_script(self):
+        self.app.config["RATE_LIMIT_BACKEND"] = "redis_script"
+        self.assertRateLimits()
+        self.assertEqual(self.app.redis.round_trips, 3)
+        self.assertEqual(self.app.redis.ttl("rate-limit/127.0.0.1"), 60)
+
+    def test_ratelimit_local(self):
+        self.app.config["RATE_LIMIT_BACKEND"] = "local"
+        self.app.redis = None
+        self.assertRateLimits()
+
+        # tokens are given back over time.
+        self.app.config["RATE_LIMIT_GET"] = (1, 0.05)
+        self.test_client.get("/")
+        self.assert429(self.test_client.get("/").status_code)
+        time.sleep(0.06)
+        self.assert200(self.test_client.get("/").status_code)
+
+    def test_ratelimit_local_sync(self):
+        self.app.config["RATE_LIMIT_BACKEND"] = "local_sync"
+        self.app.config["RATE_LIMIT_SYNC_INTERVAL"] = 60
+        self.assertRateLimits()
+        # the first request synced, the others were counted locally.
+        self.assertTrue(self.app.rate_limiter.wait_sync(timeout=5))
+        self.assertEqual(self.app.redis.round_trips, 1)
+
+        # another process counting requests of the same client.
+        worker = RateLimiter(self.app)
+        with self.app.app_context():
+            self.assertEqual(worker.hit("client", 2, 60)[0], 1)
+            self.assertTrue(worker.wait_sync(timeout=5))
+            self.app.rate_limiter.hit("client", 2, 60)
+            self.app.rate_limiter.sync()
+            worker.sync()
+            self.assertEqual(worker.hit("client", 2, 60)[0], 3)
+
+    def test_ratelimit_local_sync_redis_down(self):
+        self.app.config["RATE_LIMIT_BACKEND"] = "local_sync"
+        self.app.config["RATE_LIMIT_SYNC_INTERVAL"] = 0
+        self.app.redis.down = True
+        self.assertRateLimits()
+        self.assertTrue(self.app.rate_limiter.wait_sync(timeout=5))
+        self.assertGreaterEqual(self.app.redis.round_trips, 1)
+
+    def test_ratelimit_local_sync_redis_stalled(self):
+        self.app.config["RATE_LIMIT_BACKEND"] = "local_sync"
+        self.app.config["RATE_LIMIT_SYNC_INTERVAL"] = 0
+        self.app.redis.stalled = threading.Event()
+        # requests don't wait for the sync in progress.
+        self.assertRateLimits()
+        self.assertFalse(self.app.rate_limiter.wait_sync(timeout=0))
+        self.app.redis.stalled.set()
+        self.assertTrue(self.app.rate_limiter.wait_sync(timeout=5))
+        self.assertEqual(self.app.redis.round_trips, 1)
+
+    def test_ratelimit_resource_policies(self):
+        self.app.config["RATE_LIMIT_BACKEND"] = "local"
+        self.app.config["RATE_LIMIT_GET"] = (1, 60)
+        settings = self.domain[self.known_resource]
+        settings["rate_limit"] = {"GET": (2, 60)}
+        settings["item_rate_limit"] = {"GET": None}
+        self.app.register_resource(self.known_resource, settings)
+
+        # the resource endpoint has its own limit, and counters.
+        self.assertRateLimits(self.known_resource_url)
+        self.assertRateLimits(self.different_resource_url, 1)
+        # other endpoints share the global counters.
+        self.assert429(self.test_client.get("/").status_code)
+
+        # item endpoints are not limited.
+        for _ in range(3):
+            r = self.test_client.get(self.item_id_url)
+            self.assert200(r.status_code)
+            self.assertNotIn("X-RateLimit-Limit", r.headers)
+
+    def test_ratelimit_client(self):
+        self.app.config["RATE_LIMIT_BACKEND"] = "local"
+        self.app.auth = Tenants()
+        self.test_client.get("/", headers=[("X-Tenant", "noisy")])
+        self.test_client.get("/", headers=[("X-Tenant", "noisy")])
+        r = self.test_client.get("/", headers=[("X-Tenant", "noisy")])
+        self.assert429(r.status_code)
+        r = self.test_client.get("/", headers=[("X-Tenant", "quiet")])
+        self.assertEqual(r.headers["X-RateLimit-Remaining"], "1")
+
+        # no user set: the client IP is used.
+        r = self.test_client.get("/")
+        self.assertEqual(r.headers["X-RateLimit-Remaining"], "1")
+
+    def test_ratelimit_authenticated_client(self):
+        self.app.config["RATE_LIMIT_BACKEND"] = "local"
+        self.app.auth = Tokens()
+        first = [("Authorization", "Bearer first")]
+        second = [("Authorization", "Bearer second")]
+        # clients are keyed by the token set by the authentication class.
+        self.test_client.get("/", headers=first)
+        self.test_client.get("/", headers=first)
+        r = self.test_client.get("/", headers=first)
+        self.assert429(r.status_code)
+        r = self.test_client.get("/", headers=second)
+        self.assertEqual(r.headers["X-RateLimit-Remaining"], "1")
+
+        # requests failing authentication are not counted.
+        for _ in range(3):
+            r = self.test_client.get("/", headers=[("Authorization", "Bearer x")])
+            self.assert401(r.status_code)
+        r = self.test_client.get("/", headers=second)
+        self.assertEqual(r.headers["X-RateLimit-Remaining"], "0")
+
+    def assertRateLimits(self, url="/", limit=2):
+        for remaining in range(limit - 1, -1, -1):
+            r = self.test_client.get(url)
+            self.assert200(r.status_code)
+            self.assertEqual(r.headers["X-RateLimit-Remaining"], str(remaining))
+            self.assertEqual(r.headers["X-RateLimit-Limit"], str(limit))
+            self.assertGreater(int(r.headers["X-RateLimit-Reset"]), time.time())
+        self.assert429(self.test_client.get(url).status_code)
@@ -8,7 +8,9 @@ from bson.dbref import DBRef
 from cerberus import SchemaError
 
 from eve.io.mongo import Mongo, MongoJSONEncoder, Validator
+from eve.io.mongo.normalizer import QueryNormalizer, date_pattern
 from eve.io.mongo.parser import ParseError, parse
+from eve.validation import DefinitionSchema, ValidatedSchema
 from tests import TestBase
 from tests.test_settings import MONGO_DBNAME
 
@@ -81,6 +83,34 @@ class TestPythonParser(TestCase):
         self.assertRaises(ParseError, parse, "a | 2")
 
 
+class TestQueryNormalizer(TestCase):
+    def test_date_pattern(self):
+        pattern = date_pattern("%a, %d %b %Y %H:%M:%S GMT")
+        self.assertTrue(pattern.match("Tue, 02 Apr 2013 10:29:08 GMT"))
+        self.assertTrue(pattern.match(" Tue, 2 Apr 2013 10:29:08  GMT "))
+        self.assertFalse(pattern.match("abcdef012345678901234567"))
+        self.assertFalse(pattern.match("Tue, 02 Apr 2013 10:29:08"))
+
+        pattern = date_pattern("%Y-%m-%dT%H:%M:%S%%")
+        self.assertTrue(pattern.match("2013-04-02T10:29:08%"))
+        self.assertFalse(pattern.match("2013-04-02"))
+
+    def test_field_type_cache(self):
+        schema = {"born": {"type": "datetime"}}
+        normalizer = QueryNormalizer({"schema": schema, "id_field": "_id"}, "_ver")
+        self.assertEqual(normalizer.field_type("born"), frozenset(["datetime"]))
+
+        # paths which are not in the schema are remembered, up to a bound.
+        normalizer.max_unknown_paths = 10
+        for i in range(15):
+            self.assertIsNone(normalizer.field_type("unknown%d" % i))
+        self.assertEqual(list(normalizer.types), ["born"])
+        self.assertEqual(
+            normalizer.unknown_paths,
+            set(["unknown10", "unknown11", "unknown12", "unknown13", "unknown14"]),
+        )
+
+
 class TestMongoValidator(TestCase):
     def test_unique_fail(self):
         """relying on POST and PATCH tests since we don't have an active
@@ -100,6 +130,22 @@ class TestMongoValidator(TestCase):
         self.assertTrue("decimal" in v.errors)
         self.assertTrue("decimal" in v.errors["decimal"])
 
+    def test_schema_copies(self):
+        schema = {
+            "id": {"type": "objectid"},
+            "name": {"type": "string", "default": "john"},
+        }
+        v = Validator(schema, None)
+        self.assertTrue(isinstance(v.schema, DefinitionSchema))
+        # normalization works on copies, which are not validated again.
+        self.assertTrue(isinstance(v.schema.copy(), ValidatedSchema))
+        for _ in range(2):
+            self.assertTrue(v.validate({"id": ObjectId()}))
+            self.assertEqual(v.document["name"], "john")
+        self.assertFalse(v.validate({"id": "not_an_object_id"}))
+
+        self.assertRaises(SchemaError, Validator, {"id": {"type": "nope"}}, None)
+
     def test_decimal_success(self):
         schema = {"decimal": {"type": "decimal"}}
         doc = {"decimal": decimal128.Decimal128("123.123")}
@@ -475,6 +521,92 @@ class TestMongoDriver(TestBase):
         self.assertTrue(mongo.query_contains_field(compound_query, "_id"))
         self.assertFalse(mongo.query_contains_field(compound_query, "fake-field"))
 
+    def test_lookup_embeddable(self):
+        with self.app.test_request_context():
+            self.assertTrue(self.app.data.lookup_embeddable("invoices", "person"))
+            # DBRefs might point to any collection.
+            self.assertFalse(self.app.data.lookup_embeddable("invoices", "persondbref"))
+            self.assertFalse(self.app.data.lookup_embeddable("invoices", "inv_number"))
+            self.assertFalse(
+                self.app.data.lookup_embeddable("companies", "departments.members")
+            )
+
+    def test_lookup_stage(self):
+        with self.app.test_request_context():
+            stage, key = self.app.data._lookup_stage("invoices", "person")
+        self.assertEqual(key, "_id")
+        self.assertEqual(stage["from"], "contacts")
+        self.assertEqual(stage["localField"], "person")
+        self.assertEqual(stage["foreignField"], "_id")
+        self.assertEqual(stage["as"], "__lookup_person")
+        match, project = stage["pipeline"]
+        # the related datasource filter and projection are honored.
+        self.assertEqual(match, {"$match": {"username": {"$exists": False}}})
+        self.assertEqual(project["$project"]["_id"], 1)
+        self.assertEqual(project["$project"]["location"], 1)
+        self.assertNotIn("password", project["$project"])
+
+    def test_query_normalizer(self):
+        oid = "abcdef012345678901234567"
+        date = "Tue, 02 Apr 2013 10:29:08 GMT"
+        with self.app.test_request_context():
+            normalizer = self.app.data.query_normalizer("contacts")
+            self.assertEqual(normalizer.field_type("born"), frozenset(["datetime"]))
+            self.assertEqual(normalizer.field_type("rows.sku"), frozenset(["string"]))
+            self.assertEqual(
+                normalizer.field_type("id_list_of_dict.id"), frozenset(["objectid"])
+            )
+            self.assertIsNone(normalizer.field_type("unknown"))
+
+            query = self.app.data._mongotize(
+                {
+                    "$or": [
+                        {"born": {"$gt": date}},
+                        {"title": date},
+                        {"$and": [{"tid": {"$in": [oid]}}, {"unknown": date}]},
+                    ]
+                },
+                "contacts",
+            )
+            born, title, and_ = query["$or"]
+            self.assertEqual(born["born"]["$gt"], datetime(2013, 4, 2, 10, 29, 8))
+            self.assertEqual(title["title"], datetime(2013, 4, 2, 10, 29, 8))
+            tid, unknown = and_["$and"]
+            self.assertEqual(tid["tid"]["$in"], [ObjectId(oid)])
+            self.assertEqual(unknown["unknown"], datetime(2013, 4, 2, 10, 29, 8))
+
+            # dates are only parsed for datetime (and unknown) fields. The
+            # normalizer is compiled again once schema caches are dropped.
+            self.app.config["DOMAIN"]["contacts"]["mongo_query_dates_by_schema"] = True
+            self.app.invalidate_schema_caches()
+            self.assertIsNot(self.app.data.query_normalizer("contacts"), normalizer)
+            query = self.app.data._mongotize(
+                {"born": date, "title": date, "unknown": date}, "contacts"
+            )
+            self.assertEqual(query["born"], datetime(2013, 4, 2, 10, 29, 8))
+            self.assertEqual(query["title"], date)
+            self.assertEqual(query["unknown"], datetime(2013, 4, 2, 10, 29, 8))
+
+            self.app.config["DOMAIN"]["contacts"]["query_objectid_as_string"] = True
+            query = self.app.data._mongotize(
+                {"tid": oid, "title": oid, "_id": oid}, "contacts"
+            )
+            self.assertEqual(
+                query, {"tid": ObjectId(oid), "title": oid, "_id": ObjectId(oid)}
+            )
+
+    def test_existing_values(self):
+        unknown = ObjectId()
+        with self.app.test_request_context():
+            found = self.app.data.existing_values(
+                "contacts", "_id", [self.item_id, str(self.item_id), unknown]
+            )
+            # ObjectId strings are cast, but reported as they were given.
+            self.assertEqual(found, set([self.item_id, str(self.item_id)]))
+            found = self.app.data.existing_values("contacts", "ref", [self.item_name])
+            self.assertEqual(found, set([self.item_name]))
+            self.assertEqual(self.app.data.existing_values("contacts", "ref", []), set())
+
     def test_delete_returns_status(self):
         db = self.connection[MONGO_DBNAME]
         count = db.contacts.count_documents({})
@@ -2,17 +2,27 @@
 
 import copy
 import hashlib
+import threading
+import unittest
 from datetime import datetime, timedelta
 
+import simplejson as json
+from bson import DBRef, Decimal128, ObjectId
 from bson.json_util import dumps
+from cerberus import schema_registry
 
 from eve.utils import (
     config,
     date_to_str,
     debug_error_message,
+    decode_cursor,
     document_etag,
+    document_etags,
+    encode_cursor,
     extract_key_values,
     import_from_string,
+    json_dumps,
+    orjson,
     parse_request,
     querydef,
     str_to_date,
@@ -164,6 +174,22 @@ class TestUtils(TestBase):
             querydef(max_results=10, sort="sortpart"), "?max_results=10&sort=sortpart"
         )
 
+    def test_encode_decode_cursor(self):
+        values = [datetime(2020, 1, 1), "name", ObjectId()]
+        token = encode_cursor(values, fields=["_updated", "name", "_id"])
+        self.assertNotIn("=", token)
+        self.assertEqual(
+            decode_cursor(token),
+            {"fields": ["_updated", "name", "_id"], "values": values, "reverse": False},
+        )
+        token = encode_cursor(values, reverse=True)
+        self.assertEqual(decode_cursor(token)["reverse"], True)
+        self.assertEqual(decode_cursor("notatoken"), None)
+        # query operators can't be smuggled in.
+        self.assertEqual(decode_cursor(encode_cursor([{"$ne": None}])), None)
+        self.assertEqual(decode_cursor(encode_cursor([["a"]])), None)
+        self.assertEqual(querydef(cursor=token), "?cursor=%s" % token)
+
     def test_document_etag(self):
         test = {"key1": "value1", "another": "value2"}
         challenge = dumps(test, sort_keys=True).encode("utf-8")
@@ -214,6 +240,103 @@ class TestUtils(TestBase):
                 hashlib.sha1(challenge).hexdigest(), document_etag(test, ignore_fields)
             )
 
+    def test_document_etag_ignore_fields_no_copy(self):
+        nested = {"key2": "value2", "key3": [1, 2]}
+        test = {"key1": "value1", "dict": nested, "list": [nested]}
+        challenge = dumps(
+            {"key1": "value1", "dict": {"key3": [1, 2]}, "list": [nested]},
+            sort_keys=True,
+        ).encode("utf-8")
+        with self.app.test_request_context():
+            self.assertEqual(
+                hashlib.sha1(challenge).hexdigest(),
+                document_etag(test, ["dict.key2", "missing.key"]),
+            )
+        # only the dicts holding ignored fields are copied.
+        self.assertEqual(test["dict"], {"key2": "value2", "key3": [1, 2]})
+        self.assertIs(test["list"][0], nested)
+
+    def test_document_etags(self):
+        test = [{"key1": "value1"}, {"key1": "value2", "key2": 1}]
+        with self.app.test_request_context():
+            self.assertEqual(
+                document_etags(test, ["key2"]),
+                [document_etag(test[0]), document_etag({"key1": "value2"})],
+            )
+
+    def test_document_etag_version_3(self):
+        self.app.config["ETAG_VERSION"] = 3
+        test = {
+            "key1": "value1",
+            "key2": ObjectId(),
+            "dict": {"key3": datetime.now(), "key4": [1, 1.5, None, True]},
+        }
+        with self.app.test_request_context():
+            etag = document_etag(test)
+            self.assertEqual(len(etag), 40)
+            self.assertEqual(etag, document_etag(copy.deepcopy(test)))
+
+            # values of different types never collide.
+            self.assertNotEqual(document_etag({"a": 1}), document_etag({"a": "1"}))
+            self.assertNotEqual(document_etag({"a": 1}), document_etag({"a": True}))
+            self.assertNotEqual(
+                document_etag({"a": ["b", "c"]}), document_etag({"a": ["bc"]})
+            )
+            self.assertNotEqual(
+                document_etag({"a": Decimal128("1.5")}), document_etag({"a": "1.5"})
+            )
+            self.assertNotEqual(document_etag({1: "a"}), document_etag({"1": "a"}))
+
+            # ignored fields are skipped.
+            other = copy.deepcopy(test)
+            other["key2"] = ObjectId()
+            other["dict"]["key3"] = datetime(2020, 1, 1)
+            self.assertNotEqual(etag, document_etag(other))
+            self.assertEqual(
+                document_etag(test, ["key2", "dict.key3"]),
+                document_etag(other, ["key2", "dict.key3"]),
+            )
+
+            self.app.config["ETAG_HASH"] = "blake2b"
+            self.assertEqual(len(document_etag(test)), 40)
+            self.assertNotEqual(etag, document_etag(test))
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_document_etag_version_2(self):
+        self.app.config["ETAG_VERSION"] = 2
+        test = {"key1": "value1", "key2": ObjectId(), "dict": {"key3": datetime.now()}}
+        challenge = orjson.dumps(
+            {"key1": "value1", "dict": {}}, option=orjson.OPT_SORT_KEYS
+        )
+        with self.app.test_request_context():
+            etag = document_etag(test)
+            self.assertEqual(etag, document_etag(copy.deepcopy(test)))
+            self.assertEqual(
+                hashlib.sha1(challenge).hexdigest(),
+                document_etag(test, ["key2", "dict.key3"]),
+            )
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_json_dumps_orjson(self):
+        test = {
+            "_id": ObjectId(),
+            "date": datetime(2020, 1, 1),
+            "ref": DBRef("contacts", ObjectId(), "db"),
+            "list": [1, 2.5, None, "a"],
+            "dict": {"b": b"bytes"},
+        }
+        with self.app.test_request_context():
+            expected = json_dumps(test)
+            self.app.config["JSON_BACKEND"] = "orjson"
+            self.assertEqual(json.loads(json_dumps(test)), json.loads(expected))
+            self.assertIn('"list":[1,2.5,null,"a"]', json_dumps(test))
+            # unlike simplejson, orjson has no NaN nor Infinity.
+            self.assertEqual(json_dumps({"nan": float("nan")}), '{"nan":null}')
+            # pretty printing is delegated to simplejson.
+            pretty = json_dumps(test, indent=4)
+            self.assertIn('\n    "list": [', pretty)
+            self.assertEqual(json.loads(pretty), json.loads(expected))
+
     def test_extract_key_values(self):
         test = {
             "key1": "value1",
@@ -298,6 +421,55 @@ class TestUtils(TestBase):
                 is None
             )
 
+    def test_validator_pool(self):
+        pool = self.app.validator_pool
+        schema = self.domain[self.known_resource]["schema"]
+        with self.app.app_context():
+            validator = pool.get(schema, resource=self.known_resource)
+            validator.validate_update({}, "id", {"title": "Mr."})
+            self.assertIs(validator, pool.get(schema, resource=self.known_resource))
+            # the state of the previous validation is gone.
+            self.assertFalse(validator.is_update_operation)
+            self.assertIsNone(validator.document_id)
+            self.assertIsNone(validator.persisted_document)
+
+            # different arguments, or schemas, get their own validators.
+            self.assertIsNot(validator, pool.get(schema, resource="other"))
+            self.assertIsNot(validator, pool.get(dict(schema)))
+
+            # schemas changed in place call for invalidated schema caches.
+            schema["title"]["maxlength"] = 5
+            self.assertIs(validator, pool.get(schema, resource=self.known_resource))
+            self.app.invalidate_schema_caches()
+            validator = pool.get(schema, resource=self.known_resource)
+            self.assertFalse(validator.validate_update({"title": "Mister"}, "id", {}))
+            # as do registry updates.
+            schema_registry.add("validator_pool", {"name": {"type": "string"}})
+            self.addCleanup(schema_registry.remove, "validator_pool")
+            self.assertIsNot(validator, pool.get(schema, resource=self.known_resource))
+            validator = pool.get(schema, resource=self.known_resource)
+
+            # single field schemas are built once.
+            field_validator = pool.get_field("title", schema["title"])
+            self.assertIs(field_validator, pool.get_field("title", schema["title"]))
+            self.assertFalse(field_validator.validate({"title": "Mister"}))
+
+            # validators are not shared across threads.
+            other = []
+            thread = threading.Thread(
+                target=lambda: other.append(
+                    pool.get(schema, resource=self.known_resource)
+                )
+            )
+            with self.app.app_context():
+                thread.start()
+                thread.join()
+            self.assertIsNot(other[0], pool.get(schema, resource=self.known_resource))
+
+            self.app.config["REUSE_VALIDATORS"] = False
+            validator = pool.get(schema, resource=self.known_resource)
+            self.assertIsNot(validator, pool.get(schema, resource=self.known_resource))
+
     def test_import_from_string(self):
         dt = import_from_string("datetime.datetime")
         self.assertEqual(dt, datetime)
@@ -9,6 +9,8 @@ from eve import ETAG, STATUS, STATUS_OK
 
 from . import TestBase
 from .test_settings import MONGO_DBNAME
+from eve.versioning import migrate_versions
+
 from .utils import DummyEvent
 
 
@@ -448,6 +450,87 @@ class TestCompleteVersioning(TestNormalVersioning):
         self.assertPagination(response, 2, 102, 25)
         self.assertHateoasLinks(links, "all")
 
+    def test_getitem_version_diffs_pagination(self):
+        """Verify that pages of diffs after the first one start with a whole
+        version, followed by diffs, and that missing versions are accounted
+        for.
+        """
+        etag = self.item_etag
+        for n in range(2, 7):
+            response, status = self.patch(
+                self.item_id_url,
+                data={self.versioned_field: "ref value %d.............." % n},
+                headers=[("If-Match", etag)],
+            )
+            etag = response[ETAG]
+
+        response, status = self.get(
+            self.known_resource,
+            item=self.item_id,
+            query="?version=diffs&max_results=2&page=2",
+        )
+        self.assert200(status)
+        self.assertPagination(response, 2, 6, 2)
+        items = response[self.app.config["ITEMS"]]
+        self.assertEqual([item[self.version_field] for item in items], [3, 4])
+        self.assertIn(self.unversioned_field, items[0])
+        self.assertIn(self.versioned_field, items[1])
+        self.assertNotIn(self.unversioned_field, items[1])
+
+        # versions might be missing (with delta storage, the following one
+        # has to be a snapshot for the history to be rebuilt).
+        self._db[self.known_resource_shadow].delete_one(
+            {self.document_id_field: ObjectId(self.item_id), self.version_field: 3}
+        )
+        response, status = self.get(
+            self.known_resource,
+            item=self.item_id,
+            query="?version=all&max_results=2&page=2",
+        )
+        self.assert200(status)
+        self.assertPagination(response, 2, 5, 2)
+        items = response[self.app.config["ITEMS"]]
+        self.assertEqual([item[self.version_field] for item in items], [4, 5])
+
+        # filtered versions are paginated as usual.
+        response, status = self.get(
+            self.known_resource,
+            item=self.item_id,
+            query='?version=all&max_results=2&where={"%s": {"$gt": 2}}'
+            % self.version_field,
+        )
+        self.assert200(status)
+        self.assertPagination(response, 1, 3, 2)
+        items = response[self.app.config["ITEMS"]]
+        self.assertEqual([item[self.version_field] for item in items], [4, 5])
+
+    def test_getitem_version_pagination_keyset(self):
+        """Verify that version listings are paginated by page number, even
+        when the resource is keyset paginated.
+        """
+        settings = self.domain[self.known_resource]
+        settings["keyset_pagination"] = True
+        self.app.register_resource(self.known_resource, settings)
+        etag = self.item_etag
+        for n in range(2, 7):
+            response, status = self.patch(
+                self.item_id_url,
+                data={self.versioned_field: "ref value %d.............." % n},
+                headers=[("If-Match", etag)],
+            )
+            etag = response[ETAG]
+
+        response, status = self.get(
+            self.known_resource,
+            item=self.item_id,
+            query='?version=all&max_results=2&page=2&sort=[("%s", -1)]'
+            % self.version_field,
+        )
+        self.assert200(status)
+        self.assertPagination(response, 2, 6, 2)
+        items = response[self.app.config["ITEMS"]]
+        self.assertEqual([item[self.version_field] for item in items], [4, 3])
+
     def test_on_fetched_item(self):
         """Verify that on_fetched_item events are fired for versioned
         requests.
@@ -1206,6 +1289,31 @@ class TestVersionedDataRelationCustomField(TestNormalVersioning):
         self.assertEqual(response["person"].get(self.version_field), 1)
 
 
+class TestDeltaVersionedDataRelationCustomField(TestVersionedDataRelationCustomField):
+    def setUp(self):
+        TestNormalVersioning.setUp(self)
+        self.enableDataVersionRelation(custom_field=self.versioned_field)
+        for settings in self.domain.values():
+            settings["version_storage"] = "delta"
+        self.enableVersioning()
+        self.insertTestData()
+
+    def test_referential_integrity_unchanged_field(self):
+        """Make sure that versions stored as deltas are found by the value of
+        fields they did not change.
+        """
+        response, status = self.patch(
+            self.item_id_url,
+            data={self.unversioned_field: 789},
+            headers=[("If-Match", self.item_etag)],
+        )
+        self.assertGoodPutPatch(response, status)
+
+        data = {"person": {"ref": self.item["ref"], self.version_field: 2}}
+        r, status = self.post("/invoices/", data=data)
+        self.assert201(status)
+
+
 class TestVersionedDataRelationUnversionedField(TestNormalVersioning):
     def setUp(self):
         super().setUp()
@@ -1506,3 +1614,199 @@ class TestVersioningWithCustomIdField(TestNormalVersioning):
     def test_getitem(self):
         """Make sure we can insert at least two versioning documents."""
         self.do_test_getitem(partial=False)
+
+
+class TestDeltaVersioning(TestCompleteVersioning):
+    def setUp(self):
+        TestNormalVersioning.setUp(self)
+        for settings in self.domain.values():
+            settings["version_storage"] = "delta"
+            settings["version_snapshot_interval"] = 3
+        self.enableVersioning()
+        self.insertTestData()
+
+    def changeVersions(self, count):
+        """Creates `count` more versions of the test document, each changing
+        the versioned field, and returns the expected response fields of all
+        the versions.
+        """
+        versions = [dict(self.item)]
+        etag = self.item_etag
+        for version in range(2, count + 2):
+            changes = {self.versioned_field: "ref value %d.............." % version}
+            if version == 3:
+                # the unversioned field is removed by a PUT.
+                response, status = self.put(
+                    self.item_id_url, data=changes, headers=[("If-Match", etag)]
+                )
+                changes = dict(changes)
+            else:
+                response, status = self.patch(
+                    self.item_id_url, data=changes, headers=[("If-Match", etag)]
+                )
+                changes = dict(versions[-1], **changes)
+            self.assertGoodPutPatch(response, status)
+            etag = response[ETAG]
+            versions.append(changes)
+        return versions
+
+    def test_put(self):
+        """Verify that only the changed fields of a new version are stored."""
+        self.changeVersions(2)
+        delta_field = self.app.config["VERSION_DELTA"]
+
+        shadow_document = self.directGetShadowDocument(self.item_id, 2)
+        self.assertEqual(shadow_document[delta_field], [])
+        self.assertIn(self.versioned_field, shadow_document)
+        self.assertNotIn(self.unversioned_field, shadow_document)
+
+        # the PUT removed the unversioned field.
+        shadow_document = self.directGetShadowDocument(self.item_id, 3)
+        self.assertEqual(shadow_document[delta_field], [self.unversioned_field])
+        self.assertIn(self.versioned_field, shadow_document)
+
+    def test_patch(self):
+        """Verify that a full snapshot is stored every few versions."""
+        self.changeVersions(6)
+        delta_field = self.app.config["VERSION_DELTA"]
+        snapshots = [
+            version
+            for version in range(1, 8)
+            if delta_field not in self.directGetShadowDocument(self.item_id, version)
+        ]
+        self.assertEqual(snapshots, [1, 4, 7])
+
+        document = self.directGetDocument(self.item_id)
+        shadow_document = self.directGetShadowDocument(self.item_id, 7)
+        self.assertEqual(
+            shadow_document[self.versioned_field], document[self.versioned_field]
+        )
+        self.assertEqual(shadow_document[ETAG], document[ETAG])
+
+    def test_getitem_version_delta(self):
+        """Verify that versions stored as deltas are rebuilt."""
+        versions = self.changeVersions(6)
+        for version, expected in enumerate(versions, 1):
+            response, status = self.get(
+                self.known_resource, item=self.item_id, query="?version=%d" % version
+            )
+            self.assert200(status)
+            self.assertDocumentVersionFields(response, version, 7)
+            self.assertEqual(
+                response[self.versioned_field], expected[self.versioned_field]
+            )
+            if version < 3:
+                self.assertEqual(
+                    response[self.unversioned_field], self.item[self.unversioned_field]
+                )
+            else:
+                self.assertNotIn(self.unversioned_field, response)
+
+    def test_getitem_version_delta_incomplete(self):
+        """Verify that versions whose history is incomplete are not rebuilt
+        into partial documents.
+        """
+        self.changeVersions(4)
+        shadow = self._db[self.known_resource_shadow]
+        version_field = self.app.config["VERSION"]
+        item_id = ObjectId(self.item_id)
+
+        # the snapshot is missing.
+        shadow.delete_one({self.document_id_field: item_id, version_field: 1})
+        response, status = self.get(
+            self.known_resource, item=self.item_id, query="?version=2"
+        )
+        self.assert500(status)
+        response, status = self.get(
+            self.known_resource, item=self.item_id, query="?version=5"
+        )
+        self.assert200(status)
+
+        # the version a delta was computed from is missing.
+        shadow.delete_one({self.document_id_field: item_id, version_field: 4})
+        response, status = self.get(
+            self.known_resource, item=self.item_id, query="?version=5"
+        )
+        self.assert500(status)
+
+    def test_getitem_version_all_delta(self):
+        """Verify that pages of versions stored as deltas are rebuilt."""
+        versions = self.changeVersions(6)
+        for page in (1, 2, 3):
+            response, status = self.get(
+                self.known_resource,
+                item=self.item_id,
+                query="?version=all&max_results=3&page=%d" % page,
+            )
+            self.assert200(status)
+            for item in response[self.app.config["ITEMS"]]:
+                expected = versions[item[self.version_field] - 1]
+                self.assertEqual(
+                    item[self.versioned_field], expected[self.versioned_field]
+                )
+                self.assertEqual(
+                    item.get(self.unversioned_field),
+                    expected.get(self.unversioned_field),
+                )
+
+        # versions are rebuilt whatever their order.
+        response, status = self.get(
+            self.known_resource,
+            item=self.item_id,
+            query='?version=all&sort=[("%s", -1)]' % self.version_field,
+        )
+        items = response[self.app.config["ITEMS"]]
+        self.assertEqual(
+            [item[self.version_field] for item in items], [7, 6, 5, 4, 3, 2, 1]
+        )
+        self.assertEqual(
+            items[1][self.versioned_field], versions[5][self.versioned_field]
+        )
+
+    def test_getitem_version_diffs_delta(self):
+        """Verify that diffs of versions stored as deltas only hold the
+        changed fields.
+        """
+        versions = self.changeVersions(6)
+        response, status = self.get(
+            self.known_resource,
+            item=self.item_id,
+            query="?version=diffs&max_results=3&page=2",
+        )
+        self.assert200(status)
+        items = response[self.app.config["ITEMS"]]
+        self.assertEqual([item[self.version_field] for item in items], [4, 5, 6])
+        for item in items[1:]:
+            expected = versions[item[self.version_field] - 1]
+            self.assertEqual(item[self.versioned_field], expected[self.versioned_field])
+            self.assertNotIn(self.unversioned_field, item)
+            self.assertNotIn(self.app.config["DATE_CREATED"], item)
+
+    def test_migrate_versions(self):
+        """Verify that shadow collections can be migrated between full and
+        delta storage, with no changes to the versions.
+        """
+        self.changeVersions(6)
+        delta_field = self.app.config["VERSION_DELTA"]
+        shadow = self._db[self.known_resource_shadow]
+
+        def version_all():
+            response, status = self.get(
+                self.known_resource, item=self.item_id, query="?version=all"
+            )
+            self.assert200(status)
+            for item in response[self.app.config["ITEMS"]]:
+                del item[self.app.config["LINKS"]]
+            return response[self.app.config["ITEMS"]]
+
+        expected = version_all()
+        with self.app.app_context():
+            self.assertEqual(migrate_versions(self.known_resource, "full"), 4)
+            self.assertEqual(migrate_versions(self.known_resource, "full"), 0)
+        self.assertEqual(shadow.count_documents({delta_field: {"$exists": True}}), 0)
+        self.assertEqual(version_all(), expected)
+
+        with self.app.app_context():
+            self.assertEqual(migrate_versions(self.known_resource), 4)
+        self.assertEqual(shadow.count_documents({delta_field: {"$exists": True}}), 4)
+        self.assertEqual(version_all(), expected)